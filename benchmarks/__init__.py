@@ -0,0 +1 @@
+"""Offline benchmarks for sven_scraping_projects (not part of the Actor image's runtime path)."""
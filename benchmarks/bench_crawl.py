@@ -0,0 +1,363 @@
+"""
+Offline end-to-end crawl benchmark against a local stand-in for all five sites.
+
+    python -m benchmarks.bench_crawl [--profiles 200] [--spiders uke,kvhh] [--mode sequential]
+        [--latency-ms 20 --jitter-ms 10] [--error-rate-503 0.02] [--error-rate-429 0.01]
+        [--respect-delays] [--adaptive] [--sample-profile-ms 5] [--tracemalloc]
+        [--event-loop threaded|single] [--incremental reemit|skip --recrawl-dir DIR]
+        [--conditional-get --validator-dir DIR] [--http-cache record|replay --cache-dir DIR]
+        [--output storage/benchmarks/crawl.json]
+
+The stand-in server (benchmarks/standin) runs in its own process and serves
+fixture pages shaped like each site's real markup: the UKE searchadapter JSON,
+the KVHH sitemap.xml, the Asklepios sitemap index with gzipped child sitemaps,
+the zahnarztsuche page with its data-filter-data JSON and the paginated
+apothekenfinder. The real spiders run through src.main.run_spiders with the
+project settings; only the download handler is swapped so requests go to the
+stand-in, and ApifyPipeline forwards finished records to a local sink instead
+of the dataset API.
+
+Per spider it reports pages/sec, items/sec, CPU time and RSS. CPU time is the
+process CPU used between spider_opened and spider_closed, so it is per spider
+only in --mode sequential. Spider DOWNLOAD_DELAY/AutoThrottle settings,
+adaptive-concurrency delay floors and Retry-After pauses are turned off unless
+--respect-delays is given, so by default the numbers show what the code can
+do rather than the politeness budget. --adaptive turns on the adaptive
+concurrency controller (off in the project settings); its increases/decreases
+are reported per spider. --sample-profile-ms runs the stack-sampling profiler
+(collapsed stacks land in storage/profiles) and --tracemalloc traces the
+Python heap, to measure what either costs. --event-loop single runs the crawl
+on the AsyncioSelectorReactor as src/main.py does for Actor input
+`event_loop: "single"` (records still go to the local sink;
+benchmarks/bench_event_loop.py compares the push path itself).
+--incremental turns on the sitemap recrawl state (recrawl_state.py) with its
+state in --recrawl-dir: run twice with the same directory, and the second run
+shows how many KVHH/Asklepios profile requests an unchanged sitemap saves.
+--conditional-get does the same for the ETag/Last-Modified store
+(validator_store.py) in --validator-dir; the stand-in answers matching
+If-None-Match with 304, and "KiB in" (downloader/response_bytes) shows the
+transfer saved.
+--http-cache record writes every response to the packed HTTP cache
+(http_cache.py) in --cache-dir; --http-cache replay then re-runs the spiders
+from that cache without sending a request, which is the offline re-parse
+after an extractor change.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "sven_scraping_projects.settings")
+
+# Nothing imported here may import twisted.internet.reactor: with --event-loop single,
+# run_crawl() installs the asyncio reactor first.
+from scrapy import signals  # noqa: E402
+from scrapy.utils.project import get_project_settings  # noqa: E402
+
+from benchmarks.standin.server import add_fault_arguments, fault_profile_from_args, serve_in_process  # noqa: E402
+from sven_scraping_projects.memory_accounting import rss_bytes  # noqa: E402
+from tests.fakes import FakeDatasetClient  # noqa: E402
+
+DEFAULT_OUTPUT = os.path.join("storage", "benchmarks", "crawl.json")
+DEFAULT_SPIDERS = ("uke", "apothekerkammer-hamburg", "asklepios", "kvhh", "zahnaerzte_hh")
+RSS_SAMPLE_INTERVAL_S = 0.25
+
+# Filled by CrawlMetricsExtension, one entry per finished spider.
+_results: dict[str, dict] = {}
+
+
+class CrawlMetricsExtension:
+    """Records wall time, CPU time, RSS and page/item counts for each spider."""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self._started = None
+        self._cpu_started = None
+        self._rss_started = 0
+        self._rss_peak = 0
+        self._sampler = None
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def _sample_rss(self):
+        self._rss_peak = max(self._rss_peak, rss_bytes())
+
+    def spider_opened(self, spider):
+        from twisted.internet.task import LoopingCall
+
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        self._rss_started = self._rss_peak = rss_bytes()
+        self._sampler = LoopingCall(self._sample_rss)
+        self._sampler.start(RSS_SAMPLE_INTERVAL_S, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self._sampler is not None and self._sampler.running:
+            self._sampler.stop()
+        elapsed = time.perf_counter() - self._started
+        cpu = time.process_time() - self._cpu_started
+        self._sample_rss()
+        stats = self.crawler.stats
+        pages = stats.get_value("response_received_count", 0) or 0
+        items = stats.get_value("item_scraped_count", 0) or 0
+        statuses = {
+            key.rsplit("/", 1)[-1]: value
+            for key, value in stats.get_stats().items()
+            if key.startswith("downloader/response_status_count/")
+        }
+        _results[spider.name] = {
+            "finish_reason": reason,
+            "elapsed_s": round(elapsed, 3),
+            "cpu_s": round(cpu, 3),
+            "pages": pages,
+            "items": items,
+            "pages_per_sec": round(pages / elapsed, 1) if elapsed > 0 else None,
+            "items_per_sec": round(items / elapsed, 1) if elapsed > 0 else None,
+            "cpu_ms_per_page": round(cpu * 1000.0 / pages, 3) if pages else None,
+            "retries": stats.get_value("retry/count", 0) or 0,
+            "adaptive_increases": stats.get_value("adaptive_concurrency/increases", 0) or 0,
+            "adaptive_decreases": stats.get_value("adaptive_concurrency/decreases", 0) or 0,
+            "status_counts": statuses,
+            "response_bytes": stats.get_value("downloader/response_bytes", 0) or 0,
+            "not_modified": stats.get_value("conditional_get/not_modified", 0) or 0,
+            "cache_hits": stats.get_value("httpcache/hit", 0) or 0,
+            "rss_start_mib": round(self._rss_started / 2**20, 1),
+            "rss_peak_mib": round(self._rss_peak / 2**20, 1),
+            "rss_end_mib": round(rss_bytes() / 2**20, 1),
+        }
+
+
+class _SinkConnection:
+    """Pipe-shaped adapter so ApifyPipeline's record sink lands in a FakeDatasetClient."""
+
+    def __init__(self, client: FakeDatasetClient):
+        self.client = client
+
+    def send(self, chunk) -> None:
+        self.client.push_items(chunk)
+
+    def close(self) -> None:
+        pass
+
+
+def _start_standin(profiles: int, faults, seed: int):
+    ctx = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    proc = ctx.Process(
+        target=serve_in_process,
+        args=(profiles, faults, seed, child_conn),
+        name="standin-server",
+        daemon=True,
+    )
+    proc.start()
+    child_conn.close()
+    if not parent_conn.poll(120):
+        proc.terminate()
+        raise RuntimeError("stand-in server did not start within 120s")
+    return proc, f"http://127.0.0.1:{parent_conn.recv()}"
+
+
+def _crawl_settings(base_url: str, args):
+    settings = get_project_settings()
+    handler = "benchmarks.standin.handler.StandInDownloadHandler"
+    settings.set("DOWNLOAD_HANDLERS", {"http": handler, "https": handler}, priority="cmdline")
+    settings.set("STANDIN_BASE_URL", base_url, priority="cmdline")
+    extensions = dict(settings.getdict("EXTENSIONS"))
+    extensions[f"{__name__}.CrawlMetricsExtension"] = 900
+    settings.set("EXTENSIONS", extensions, priority="cmdline")
+    settings.set("LOG_LEVEL", args.log_level, priority="cmdline")
+    if args.adaptive:
+        settings.set("ADAPTIVE_CONCURRENCY_ENABLED", True, priority="cmdline")
+    if args.sample_profile_ms:
+        settings.set("SAMPLING_PROFILER_INTERVAL_MS", args.sample_profile_ms, priority="cmdline")
+    if args.tracemalloc:
+        settings.set("MEMORY_TRACEMALLOC", True, priority="cmdline")
+    if args.incremental:
+        settings.set("RECRAWL_ENABLED", True, priority="cmdline")
+        settings.set("RECRAWL_POLICY", args.incremental, priority="cmdline")
+        settings.set("RECRAWL_STORE", "local", priority="cmdline")
+        settings.set("RECRAWL_STATE_DIR", args.recrawl_dir, priority="cmdline")
+    if args.conditional_get:
+        settings.set("CONDITIONAL_GET_ENABLED", True, priority="cmdline")
+        settings.set("CONDITIONAL_GET_STORE", "local", priority="cmdline")
+        settings.set("CONDITIONAL_GET_STATE_DIR", args.validator_dir, priority="cmdline")
+    if args.http_cache:
+        from src.main import _http_cache_settings
+
+        _http_cache_settings({"mode": args.http_cache, "dir": args.cache_dir}, settings)
+    if not args.respect_delays:
+        # cmdline priority beats the spiders' custom_settings.
+        settings.set("DOWNLOAD_DELAY", 0, priority="cmdline")
+        settings.set("AUTOTHROTTLE_ENABLED", False, priority="cmdline")
+        # AdaptiveConcurrencyMiddleware still reacts to injected 429/503s, but without a
+        # delay floor or Retry-After pauses.
+        settings.set("ADAPTIVE_CONCURRENCY_MIN_DELAY", 0, priority="cmdline")
+        settings.set("ADAPTIVE_CONCURRENCY_RESPECT_RETRY_AFTER", False, priority="cmdline")
+    return settings
+
+
+def run_crawl(spider_names: list[str], base_url: str, args) -> tuple[dict, FakeDatasetClient]:
+    from scrapy.utils.log import configure_logging
+
+    from src.main import _install_reactor, run_spiders
+    from sven_scraping_projects.apify_runtime import RecordSink, set_record_sink
+
+    settings = _crawl_settings(base_url, args)
+    reactor = _install_reactor(args.event_loop, asyncio.new_event_loop(), settings)
+    configure_logging(settings)
+    client = FakeDatasetClient()
+    set_record_sink(RecordSink(_SinkConnection(client)))
+    failure: list = []
+
+    def _stop_on_error(f):
+        failure.append(f)
+        if reactor.running:
+            reactor.stop()
+
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    try:
+        d = run_spiders(spider_names, settings, log_fn=lambda m: print(m, flush=True), mode=args.mode)
+        d.addErrback(_stop_on_error)
+        reactor.run()
+    finally:
+        set_record_sink(None)
+    if failure:
+        failure[0].raiseException()
+
+    elapsed = time.perf_counter() - started
+    pages = sum(r["pages"] for r in _results.values())
+    items = sum(r["items"] for r in _results.values())
+    total = {
+        "elapsed_s": round(elapsed, 3),
+        "cpu_s": round(time.process_time() - cpu_started, 3),
+        "pages": pages,
+        "items": items,
+        "pages_per_sec": round(pages / elapsed, 1) if elapsed > 0 else None,
+        "items_per_sec": round(items / elapsed, 1) if elapsed > 0 else None,
+        "response_bytes": sum(r["response_bytes"] for r in _results.values()),
+        "records_pushed": client.items,
+        "bytes_pushed": client.bytes,
+        "rss_peak_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    return total, client
+
+
+def _print_table(report: dict) -> None:
+    print(
+        f"{'spider':<26}{'pages':>7}{'items':>7}{'pages/s':>10}{'items/s':>10}{'cpu s':>8}{'rss MiB':>9}"
+        f"{'retries':>9}{'KiB in':>10}{'304s':>7}"
+    )
+    for name, res in report["spiders"].items():
+        print(
+            f"{name:<26}{res['pages']:>7}{res['items']:>7}{res['pages_per_sec'] or 0:>10,.1f}"
+            f"{res['items_per_sec'] or 0:>10,.1f}{res['cpu_s']:>8.2f}{res['rss_peak_mib']:>9.1f}{res['retries']:>9}"
+            f"{res['response_bytes'] / 1024:>10,.0f}{res['not_modified']:>7}"
+        )
+    t = report["total"]
+    print(
+        f"{'total':<26}{t['pages']:>7}{t['items']:>7}{t['pages_per_sec'] or 0:>10,.1f}"
+        f"{t['items_per_sec'] or 0:>10,.1f}{t['cpu_s']:>8.2f}{t['rss_peak_mib']:>9.1f}{'':>9}"
+        f"{t['response_bytes'] / 1024:>10,.0f}"
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=200, help="synthetic profiles per site")
+    parser.add_argument("--spiders", default=",".join(DEFAULT_SPIDERS), help="comma-separated spider names")
+    parser.add_argument("--mode", choices=("sequential", "concurrent"), default="sequential")
+    parser.add_argument("--event-loop", choices=("threaded", "single"), default="threaded")
+    parser.add_argument("--respect-delays", action="store_true", help="keep the spiders' DOWNLOAD_DELAY/AutoThrottle")
+    parser.add_argument("--adaptive", action="store_true", help="enable AdaptiveConcurrencyMiddleware")
+    parser.add_argument(
+        "--sample-profile-ms", type=float, default=0, help="run the stack-sampling profiler at this interval"
+    )
+    parser.add_argument("--tracemalloc", action="store_true", help="trace the Python heap per spider")
+    parser.add_argument("--incremental", choices=("reemit", "skip"), help="enable the sitemap recrawl state")
+    parser.add_argument(
+        "--recrawl-dir", default=os.path.join("storage", "benchmarks", "recrawl"), help="recrawl state directory"
+    )
+    parser.add_argument("--conditional-get", action="store_true", help="enable the ETag/Last-Modified store")
+    parser.add_argument(
+        "--validator-dir",
+        default=os.path.join("storage", "benchmarks", "http_validators"),
+        help="conditional GET state directory",
+    )
+    parser.add_argument("--http-cache", choices=("record", "replay"), help="record to / replay from the HTTP cache")
+    parser.add_argument(
+        "--cache-dir", default=os.path.join("storage", "benchmarks", "httpcache"), help="HTTP cache directory"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    spider_names = [n.strip() for n in args.spiders.split(",") if n.strip()]
+    faults = fault_profile_from_args(args, args.seed)
+    server, base_url = _start_standin(args.profiles, faults, args.seed)
+    # Fresh JOBDIRs so a previous run's dupefilter/scheduler state is not resumed.
+    jobdir_root = tempfile.mkdtemp(prefix="bench-crawl-jobdir-")
+    os.environ["SCRAPY_JOBDIR_ROOT"] = jobdir_root
+    try:
+        total, _ = run_crawl(spider_names, base_url, args)
+    finally:
+        server.terminate()
+        server.join(timeout=10)
+        shutil.rmtree(jobdir_root, ignore_errors=True)
+
+    from benchmarks.bench_pipeline import _git_rev
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_rev": _git_rev(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "profiles_per_site": args.profiles,
+            "mode": args.mode,
+            "event_loop": args.event_loop,
+            "respect_delays": args.respect_delays,
+            "adaptive_concurrency": args.adaptive,
+            "sample_profile_ms": args.sample_profile_ms,
+            "tracemalloc": args.tracemalloc,
+            "incremental": args.incremental,
+            "conditional_get": args.conditional_get,
+            "http_cache": args.http_cache,
+            "latency_ms": faults.latency_ms,
+            "jitter_ms": faults.jitter_ms,
+            "error_rate_503": faults.error_rate_503,
+            "error_rate_429": faults.error_rate_429,
+            "seed": args.seed,
+        },
+        "spiders": {name: _results[name] for name in spider_names if name in _results},
+        "total": total,
+    }
+    _print_table(report)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,219 @@
+"""
+Threaded vs single event loop push path (APIFY_EVENT_LOOP_MODE).
+
+    python -m benchmarks.bench_event_loop [--items 5000] [--push-latency-ms 50] [--slice 50]
+        [--modes threaded,single] [--output storage/benchmarks/event_loop.json]
+
+Each mode runs in its own interpreter, because a process can install only one
+Twisted reactor. The reactor is installed the way src/main.py does it
+(_install_reactor). In threaded mode the Actor SDK loop gets its own thread,
+and ApifyPipeline pushes through the blocking client from its push worker and
+pool threads. In single mode the reactor runs on that loop, and batches are
+awaited there through the async client. Both clients are fakes
+(tests/fakes.py) with the same serialisation cost and round-trip time.
+
+Synthetic items for all five spiders go through process_item on the reactor,
+`--slice` per reactor turn, which stands in for callbacks yielding items.
+close_spider then waits for the last push. The push ledger is on, in a
+temporary JOBDIR.
+
+Reported per mode:
+- items/sec until the last record reached the client,
+- process CPU time and the peak thread count,
+- p50/p99 enqueue-to-pushed latency,
+- reactor lag: how late a 10 ms LoopingCall fired (p99/max). This is the
+  time the reactor was busy and could not serve downloads.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+DEFAULT_OUTPUT = os.path.join("storage", "benchmarks", "event_loop.json")
+MODES = ("threaded", "single")
+LAG_TICK_S = 0.01
+
+
+def run_mode(mode: str, items_per_source: int, push_latency_s: float, slice_size: int, seed: int = 0) -> dict:
+    """Run one mode in this process. Installs a reactor, so call it at most once per process."""
+    import asyncio
+    import logging
+
+    from scrapy.settings import Settings
+
+    from src.main import _install_reactor
+
+    loop = asyncio.new_event_loop()
+    reactor = _install_reactor(mode, loop, Settings())
+    if mode == "threaded":
+        threading.Thread(target=loop.run_forever, name="apify-actor-loop", daemon=True).start()
+
+    # Imported after the reactor is installed: pipelines.py imports twisted.internet.reactor.
+    from twisted.internet.task import LoopingCall
+
+    from benchmarks.bench_pipeline import _percentile
+    from tests.fakes import FakeAsyncDatasetClient, FakeDatasetClient, fake_spider
+    from benchmarks.synthetic_items import SOURCES, generate_mixed_items
+    from sven_scraping_projects.pipelines import ApifyPipeline
+
+    logging.getLogger("apify").setLevel(logging.WARNING)
+    items = generate_mixed_items(items_per_source, seed=seed)
+    jobdir = tempfile.mkdtemp(prefix="bench-event-loop-")
+    spider = fake_spider("benchmark", {"APIFY_EVENT_LOOP_MODE": mode, "JOBDIR": jobdir})
+    spiders = {source: fake_spider(source) for source in SOURCES}
+    client = FakeAsyncDatasetClient(push_latency_s) if mode == "single" else FakeDatasetClient(push_latency_s)
+    pipeline = ApifyPipeline()
+    enqueued_at: dict[str, float] = {}
+    lags: list[float] = []
+    threads_max = [threading.active_count()]
+    failure: list = []
+    result: dict = {}
+
+    def tick(last=[None]):
+        now = time.perf_counter()
+        if last[0] is not None:
+            lags.append(max(0.0, now - last[0] - LAG_TICK_S))
+        last[0] = now
+        threads_max[0] = max(threads_max[0], threading.active_count())
+
+    lag_probe = LoopingCall(tick)
+
+    def feed(start: int):
+        for item in items[start : start + slice_size]:
+            enqueued_at[item["url"]] = time.perf_counter()
+            pipeline.process_item(dict(item), spiders.get(item.get("source"), spider))
+        if start + slice_size < len(items):
+            reactor.callLater(0, feed, start + slice_size)
+        else:
+            d = pipeline.close_spider(spider)
+            d.addErrback(failure.append)
+            d.addBoth(lambda _: reactor.stop())
+
+    def begin():
+        pipeline.open_spider(spider)
+        if mode == "single":
+            pipeline._apify_dataset_async = client
+        else:
+            pipeline._apify_dataset = client
+        result["started"] = time.perf_counter()
+        result["cpu_started"] = time.process_time()
+        lag_probe.start(LAG_TICK_S)
+        feed(0)
+
+    reactor.callWhenRunning(begin)
+    try:
+        reactor.run()
+    finally:
+        shutil.rmtree(jobdir, ignore_errors=True)
+    if failure:
+        failure[0].raiseException()
+    if client.items < len(items):
+        raise RuntimeError(f"only {client.items}/{len(items)} records pushed")
+
+    elapsed = max(client.push_times) - result["started"]
+    latencies = sorted(
+        pushed - enqueued_at[url] for url, pushed in zip(client.pushed_urls, client.push_times) if url in enqueued_at
+    )
+    lags.sort()
+    return {
+        "items": len(items),
+        "elapsed_s": round(elapsed, 4),
+        "items_per_sec": round(len(items) / elapsed, 1) if elapsed > 0 else None,
+        "cpu_s": round(time.process_time() - result["cpu_started"], 3),
+        "threads_max": threads_max[0],
+        "batches": client.batches,
+        "push_p50_ms": round(_percentile(latencies, 50) * 1000.0, 1),
+        "push_p99_ms": round(_percentile(latencies, 99) * 1000.0, 1),
+        "reactor_lag_p99_ms": round(_percentile(lags, 99) * 1000.0, 2),
+        "reactor_lag_max_ms": round((lags[-1] if lags else 0.0) * 1000.0, 2),
+    }
+
+
+def _run_in_subprocess(mode: str, args) -> dict:
+    cmd = [
+        sys.executable,
+        "-m",
+        "benchmarks.bench_event_loop",
+        "--worker",
+        mode,
+        "--items",
+        str(args.items),
+        "--push-latency-ms",
+        str(args.push_latency_ms),
+        "--slice",
+        str(args.slice),
+        "--seed",
+        str(args.seed),
+    ]
+    out = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def _print_table(report: dict) -> None:
+    print(
+        f"{'mode':<10}{'items/s':>10}{'cpu s':>8}{'threads':>9}{'push p50':>10}{'push p99':>10}"
+        f"{'lag p99':>9}{'lag max':>9}"
+    )
+    for mode, res in report["modes"].items():
+        print(
+            f"{mode:<10}{res['items_per_sec'] or 0:>10,.0f}{res['cpu_s']:>8.2f}{res['threads_max']:>9}"
+            f"{res['push_p50_ms']:>10.1f}{res['push_p99_ms']:>10.1f}"
+            f"{res['reactor_lag_p99_ms']:>9.2f}{res['reactor_lag_max_ms']:>9.2f}"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000, help="synthetic items per source")
+    parser.add_argument("--push-latency-ms", type=float, default=50.0, help="fake dataset round-trip time")
+    parser.add_argument("--slice", type=int, default=50, help="items processed per reactor turn")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated event loop modes to compare")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        res = run_mode(args.worker, args.items, args.push_latency_ms / 1000.0, args.slice, seed=args.seed)
+        print(json.dumps(res), flush=True)
+        return 0
+
+    # bench_pipeline imports the pipeline, and with it the default reactor: parent process only.
+    from benchmarks.bench_pipeline import _git_rev
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_rev": _git_rev(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "items_per_source": args.items,
+            "push_latency_ms": args.push_latency_ms,
+            "slice": args.slice,
+            "seed": args.seed,
+        },
+        "modes": {mode: _run_in_subprocess(mode, args) for mode in modes},
+    }
+    _print_table(report)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,225 @@
+"""
+Micro-benchmark: unified trie title parser vs. the four linear-scan parsers it replaced.
+
+    python -m benchmarks.bench_name_parsing [--names 20000] [--distinct 2000] [--repeat 5]
+
+Raw names are drawn from --distinct generated names (titles, Frau/Herr,
+irregular whitespace), so repeated names exercise the LRU cache the way a
+crawl does. Reports calls/sec per parser for the legacy and the unified
+version, with a cold cache (first pass) and a warm one (best of --repeat).
+
+The legacy_* functions are verbatim copies of the old implementations; the
+equivalence tests in tests/test_name_parsing.py compare against them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from sven_scraping_projects.pipelines import _extract_academic_titles_left
+from sven_scraping_projects.spiders.kvhh import parse_doctor_name
+from sven_scraping_projects.spiders.zahnaerzte_hh import parse_dentist_name
+from sven_scraping_projects.utils import name_parsing
+from sven_scraping_projects.utils.name_parsing import parse_person_name
+
+# -- legacy implementations ----------------------------------------------------
+
+_LEGACY_ACADEMIC_TITLES = (
+    "Prof. Dr. med. dent.",
+    "Prof. Dr. med.",
+    "Prof. Dr.",
+    "PD Dr. med. dent.",
+    "PD Dr. med.",
+    "PD Dr.",
+    "Dr. med. dent.",
+    "Dr. med.",
+    "Dr.",
+    "Dipl.-Psych.",
+    "Med. pract.",
+)
+_LEGACY_KVHH_TITLES = [
+    "Dr. med.",
+    "Dr.",
+    "Prof. Dr. med.",
+    "Prof. Dr.",
+    "Dipl.-Psych.",
+    "PD Dr. med.",
+    "PD Dr.",
+    "Med. pract.",
+]
+_LEGACY_DENTAL_TITLES = [
+    "Dr. med. dent.",
+    "Dr. med.",
+    "Dr.",
+    "Prof. Dr. med. dent.",
+    "Prof. Dr. med.",
+    "Prof. Dr.",
+    "PD Dr. med. dent.",
+    "PD Dr. med.",
+    "PD Dr.",
+]
+_LEGACY_PIPELINE_PREFIXES = (
+    "Prof. Dr. med. dent.",
+    "Prof. Dr. med.",
+    "Prof. Dr.",
+    "PD Dr. med. dent.",
+    "PD Dr. med.",
+    "PD Dr.",
+    "Univ.-Prof. Dr. med.",
+    "Univ.-Prof. Dr.",
+    "apl. Prof. Dr. med.",
+    "apl. Prof. Dr.",
+    "Dr. med. dent.",
+    "Dr. med.",
+    "Dr.",
+    "Dipl.-Psych.",
+    "Med. pract.",
+)
+
+
+def _split_first_last(name):
+    parts = name.split()
+    if len(parts) <= 1:
+        return (parts[0] if parts else ""), ""
+    return parts[0], " ".join(parts[1:])
+
+
+def legacy_parse_person_name(raw_name):
+    name = " ".join(str(raw_name or "").split())
+    if not name:
+        return {"title": "", "first_name": "", "last_name": "", "name": ""}
+    for prefix in ("Frau ", "Herr "):
+        if name.startswith(prefix):
+            name = name[len(prefix) :].strip()
+            break
+    title = ""
+    for t in _LEGACY_ACADEMIC_TITLES:
+        if name.startswith(t):
+            title = t
+            name = name[len(t) :].strip()
+            break
+    first_name, last_name = _split_first_last(name)
+    full_name = " ".join(p for p in (title, first_name, last_name) if p)
+    return {"title": title, "first_name": first_name, "last_name": last_name, "name": full_name}
+
+
+def _legacy_title_then_names(raw_name, titles, salutations):
+    if not raw_name:
+        return {"title": "", "first_name": "", "last_name": ""}
+    name = raw_name.strip()
+    for prefix in salutations:
+        if name.startswith(prefix):
+            name = name[len(prefix) :].strip()
+            break
+    matched_title = None
+    for t in titles:
+        if name.startswith(t):
+            matched_title = t
+            name = name.replace(t, "", 1).strip()
+            break
+    first_name, last_name = _split_first_last(name)
+    return {"title": matched_title or "", "first_name": first_name, "last_name": last_name}
+
+
+def legacy_parse_doctor_name(raw_name):
+    return _legacy_title_then_names(raw_name, _LEGACY_KVHH_TITLES, ())
+
+
+def legacy_parse_dentist_name(raw_name):
+    return _legacy_title_then_names(raw_name, _LEGACY_DENTAL_TITLES, ("Frau ", "Herr "))
+
+
+def _collapse_ws(value):
+    return " ".join((value or "").split())
+
+
+def _legacy_strip_one_title(s):
+    s = _collapse_ws(s)
+    if not s:
+        return None, s
+    for prefix in _LEGACY_PIPELINE_PREFIXES:
+        if not s.startswith(prefix):
+            continue
+        if len(s) == len(prefix):
+            return prefix, ""
+        nxt = s[len(prefix) : len(prefix) + 1]
+        if nxt.isspace() or nxt in ",;":
+            return prefix, _collapse_ws(s[len(prefix) :].lstrip(" ,;"))
+    return None, s
+
+
+def legacy_extract_academic_titles_left(s):
+    titles = []
+    rest = _collapse_ws(s)
+    while rest:
+        t, rest = _legacy_strip_one_title(rest)
+        if t is None:
+            break
+        titles.append(t)
+    return titles, rest
+
+
+# -- inputs --------------------------------------------------------------------
+
+_TITLES = ("", "", "Dr.", "Dr. med.", "Dr. med. dent.", "Prof. Dr. med.", "PD Dr. med.", "Dipl.-Psych.",
+           "Univ.-Prof. Dr. med.", "Med. pract.")
+_SALUTATIONS = ("", "", "Frau ", "Herr ")
+_FIRST = ("Anna", "Jan", "Maria", "Lukas", "Sophie", "Felix", "Lea", "Jonas", "Hanna-Lena", "Jörg")
+_LAST = ("Schmidt", "Müller", "Schneider", "Fischer", "Weber", "von Hoff", "Meyer-Stein", "Özdemir")
+
+
+def generate_raw_names(count: int, *, distinct: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(distinct):
+        parts = [rng.choice(_SALUTATIONS) + rng.choice(_TITLES), rng.choice(_FIRST), rng.choice(_LAST)]
+        sep = rng.choice((" ", " ", "  ", " "))
+        pool.append(sep.join(p.strip() for p in parts if p.strip()))
+    return [rng.choice(pool) for _ in range(count)]
+
+
+PARSERS = (
+    ("parse_person_name", legacy_parse_person_name, parse_person_name),
+    ("kvhh.parse_doctor_name", legacy_parse_doctor_name, parse_doctor_name),
+    ("zahnaerzte_hh.parse_dentist_name", legacy_parse_dentist_name, parse_dentist_name),
+    ("pipeline._extract_academic_titles_left", legacy_extract_academic_titles_left, _extract_academic_titles_left),
+)
+
+
+def _clear_caches() -> None:
+    name_parsing.split_academic_titles.cache_clear()
+    name_parsing._parse_person_name.cache_clear()
+
+
+def _calls_per_sec(fn, names, repeat: int, *, cold: bool) -> float:
+    best = float("inf")
+    for _ in range(1 if cold else repeat):
+        if cold:
+            _clear_caches()
+        start = time.perf_counter()
+        for name in names:
+            fn(name)
+        best = min(best, time.perf_counter() - start)
+    return len(names) / best if best > 0 else float("inf")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--names", type=int, default=20000)
+    parser.add_argument("--distinct", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    names = generate_raw_names(args.names, distinct=args.distinct)
+    print(f"{'parser':<42}{'legacy/s':>12}{'cold/s':>12}{'warm/s':>12}{'warm speedup':>14}")
+    for label, legacy, unified in PARSERS:
+        legacy_rate = _calls_per_sec(legacy, names, args.repeat, cold=False)
+        cold = _calls_per_sec(unified, names, args.repeat, cold=True)
+        warm = _calls_per_sec(unified, names, args.repeat, cold=False)
+        print(f"{label:<42}{legacy_rate:>12,.0f}{cold:>12,.0f}{warm:>12,.0f}{warm / legacy_rate:>13.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Benchmark suite for the ApifyPipeline hot path.
+
+    python -m benchmarks.bench_pipeline [--items 5000] [--push-latency-ms 50] [--repeat 3]
+        [--push-concurrency 1,2,4,8] [--output storage/benchmarks/pipeline.json]
+        [--baseline previous.json --max-regression 0.15]
+
+Benchmarks (synthetic items for all five spiders, see synthetic_items.py):
+
+- to_apify_dataset_record/<source>: record building only
+- process_item/<source>: full process_item (record build, duplicate-key index check, queue put)
+- push_worker/mixed: process_item -> streaming push worker -> fake dataset client,
+  timed until the last record reaches the client
+- push_worker/zahnaerzte_hh/n<N>: the same for one fast source with N push
+  batches in flight (APIFY_PUSH_CONCURRENCY), one entry per --push-concurrency value
+
+Each result reports items/sec, p50/p99 per-item latency and peak traced memory.
+Results are written as JSON; with --baseline the run fails (exit 1) when any
+benchmark's items/sec drops by more than --max-regression.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks.synthetic_items import SOURCES, generate_items, generate_mixed_items
+from sven_scraping_projects.pipelines import ApifyPipeline, _to_apify_dataset_record
+from tests.fakes import FakeDatasetClient, fake_spider
+
+DEFAULT_OUTPUT = os.path.join("storage", "benchmarks", "pipeline.json")
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def _summarise(latencies_ns: list[int], elapsed_s: float, peak_bytes: int, **extra) -> dict:
+    lat = sorted(latencies_ns)
+    n = len(lat)
+    out = {
+        "items": n,
+        "elapsed_s": round(elapsed_s, 6),
+        "items_per_sec": round(n / elapsed_s, 1) if elapsed_s > 0 else None,
+        "p50_us": round(_percentile(lat, 50) / 1000.0, 2),
+        "p99_us": round(_percentile(lat, 99) / 1000.0, 2),
+        "peak_mem_kib": round(peak_bytes / 1024.0, 1),
+    }
+    out.update(extra)
+    return out
+
+
+def _traced_peak(fn) -> int:
+    """Run fn once under tracemalloc and return the peak traced size in bytes."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def _open_pipeline(spider, dataset_client) -> ApifyPipeline:
+    p = ApifyPipeline()
+    p.open_spider(spider)
+    p._apify_dataset = dataset_client
+    return p
+
+
+def _finish_pipeline(p: ApifyPipeline, spider, dataset_client, expected: int, timeout_s: float = 600.0) -> None:
+    """Run close_spider and wait (without a reactor) until every record reached the client."""
+    p.close_spider(spider)
+    deadline = time.monotonic() + timeout_s
+    while dataset_client.items < expected and time.monotonic() < deadline:
+        time.sleep(0.002)
+    if p._push_worker is not None:
+        p._push_worker.join(timeout=max(0.0, deadline - time.monotonic()))
+    if dataset_client.items < expected:
+        raise RuntimeError(f"only {dataset_client.items}/{expected} records pushed before timeout")
+
+
+def _best_of(repeat: int, fn):
+    """Call fn() -> (elapsed, latencies) `repeat` times and keep the fastest run."""
+    best = None
+    for _ in range(max(1, repeat)):
+        res = fn()
+        if best is None or res[0] < best[0]:
+            best = res
+    return best
+
+
+def bench_to_record(source: str, items: list[dict], repeat: int = 3) -> dict:
+    def run():
+        for item in items:
+            _to_apify_dataset_record(item)
+
+    def timed():
+        latencies = []
+        perf = time.perf_counter_ns
+        start = time.perf_counter()
+        for item in items:
+            t0 = perf()
+            _to_apify_dataset_record(item)
+            latencies.append(perf() - t0)
+        return time.perf_counter() - start, latencies
+
+    elapsed, latencies = _best_of(repeat, timed)
+    return _summarise(latencies, elapsed, _traced_peak(run))
+
+
+def bench_process_item(source: str, items: list[dict], repeat: int = 3) -> dict:
+    def run_once(record_latencies: list | None):
+        spider = fake_spider(source)
+        client = FakeDatasetClient()
+        p = _open_pipeline(spider, client)
+        perf = time.perf_counter_ns
+        start = time.perf_counter()
+        for item in items:
+            t0 = perf()
+            p.process_item(dict(item), spider)
+            if record_latencies is not None:
+                record_latencies.append(perf() - t0)
+        elapsed = time.perf_counter() - start
+        _finish_pipeline(p, spider, client, len(items))
+        return elapsed
+
+    def timed():
+        latencies: list[int] = []
+        return run_once(latencies), latencies
+
+    elapsed, latencies = _best_of(repeat, timed)
+    peak = _traced_peak(lambda: run_once(None))
+    return _summarise(latencies, elapsed, peak)
+
+
+def bench_push_worker(
+    items: list[dict], push_latency_s: float, push_concurrency: int | None = None, settings: dict | None = None
+) -> dict:
+    settings = dict(settings or {})
+    if push_concurrency is not None:
+        settings["APIFY_PUSH_CONCURRENCY"] = push_concurrency
+
+    def run_once(collect: bool):
+        spider = fake_spider("benchmark", settings)
+        # One pipeline, but each item keeps its own spider name so records use their source's field map.
+        spiders = {source: fake_spider(source) for source in SOURCES}
+        client = FakeDatasetClient(latency_s=push_latency_s)
+        p = _open_pipeline(spider, client)
+        spider_stats[:] = [spider.crawler.stats]
+        enqueued_at: dict[str, float] = {}
+        start = time.perf_counter()
+        for item in items:
+            if collect:
+                enqueued_at[item["url"]] = time.perf_counter()
+            p.process_item(dict(item), spiders.get(item.get("source"), spider))
+        _finish_pipeline(p, spider, client, len(items))
+        elapsed = max(client.push_times) - start if client.push_times else time.perf_counter() - start
+        latencies = []
+        if collect:
+            for url, pushed in zip(client.pushed_urls, client.push_times):
+                t0 = enqueued_at.get(url)
+                if t0 is not None:
+                    latencies.append(int((pushed - t0) * 1e9))
+        return elapsed, latencies, client
+
+    spider_stats: list = []
+    elapsed, latencies, client = run_once(True)
+    peak = _traced_peak(lambda: run_once(False))
+    stats = spider_stats[0]
+    return _summarise(
+        latencies,
+        elapsed,
+        peak,
+        batches=client.batches,
+        bytes_uploaded=client.bytes,
+        push_latency_ms=push_latency_s * 1000.0,
+        push_concurrency=push_concurrency,
+        in_flight_max=stats.get_value("pipeline/push/in_flight_max"),
+        queue_depth_max=stats.get_value("pipeline/push/queue_depth_max"),
+    )
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def run_suite(
+    items_per_source: int,
+    push_latency_ms: float,
+    seed: int = 0,
+    repeat: int = 3,
+    push_concurrency: tuple[int, ...] = (1, 2, 4, 8),
+) -> dict:
+    results: dict[str, dict] = {}
+    for source in SOURCES:
+        items = list(generate_items(source, items_per_source, seed=seed))
+        results[f"to_apify_dataset_record/{source}"] = bench_to_record(source, items, repeat)
+        # process_item sets `source` itself from spider.name.
+        raw_items = list(generate_items(source, items_per_source, seed=seed, with_source=False))
+        results[f"process_item/{source}"] = bench_process_item(source, raw_items, repeat)
+    mixed = generate_mixed_items(items_per_source, seed=seed)
+    results["push_worker/mixed"] = bench_push_worker(mixed, push_latency_ms / 1000.0)
+    # zahnaerzte_hh yields thousands of items from one page: push throughput is the ceiling.
+    fast = list(generate_items("zahnaerzte_hh", items_per_source, seed=seed))
+    for n in push_concurrency:
+        results[f"push_worker/zahnaerzte_hh/n{n}"] = bench_push_worker(fast, push_latency_ms / 1000.0, n)
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_rev": _git_rev(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "items_per_source": items_per_source,
+            "push_latency_ms": push_latency_ms,
+            "seed": seed,
+            "repeat": repeat,
+            "push_concurrency": list(push_concurrency),
+        },
+        "benchmarks": results,
+    }
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Return human-readable regressions where items/sec fell by more than max_regression."""
+    regressions = []
+    base = baseline.get("benchmarks", {})
+    for name, res in current.get("benchmarks", {}).items():
+        old = base.get(name, {}).get("items_per_sec")
+        new = res.get("items_per_sec")
+        if not old or not new:
+            continue
+        change = (new - old) / old
+        if change < -max_regression:
+            regressions.append(f"{name}: {old:,.0f} -> {new:,.0f} items/s ({change * 100.0:+.1f}%)")
+    return regressions
+
+
+def _print_table(report: dict) -> None:
+    print(f"{'benchmark':<50}{'items/s':>12}{'p50 us':>10}{'p99 us':>10}{'peak KiB':>11}")
+    for name, res in report["benchmarks"].items():
+        print(
+            f"{name:<50}{res['items_per_sec'] or 0:>12,.0f}{res['p50_us']:>10.1f}"
+            f"{res['p99_us']:>10.1f}{res['peak_mem_kib']:>11,.0f}"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000, help="synthetic items per source")
+    parser.add_argument("--push-latency-ms", type=float, default=50.0, help="fake dataset round-trip time")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per benchmark (best is kept)")
+    parser.add_argument(
+        "--push-concurrency", default="1,2,4,8", help="comma-separated APIFY_PUSH_CONCURRENCY values to compare"
+    )
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    parser.add_argument("--baseline", help="previous JSON results to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="allowed items/sec drop (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    push_concurrency = tuple(int(n) for n in args.push_concurrency.split(",") if n.strip())
+    report = run_suite(
+        args.items, args.push_latency_ms, seed=args.seed, repeat=args.repeat, push_concurrency=push_concurrency
+    )
+    _print_table(report)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(report, baseline, args.max_regression)
+        if regressions:
+            print("Regressions beyond threshold:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions beyond {args.max_regression * 100.0:.0f}% vs {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,121 @@
+"""
+raw_source_fields inline vs in the side store (RAW_FIELDS_STORE).
+
+    python -m benchmarks.bench_raw_fields [--items 5000] [--push-latency-ms 20]
+        [--output storage/benchmarks/raw_fields.json]
+
+Records come from the synthetic items of all five spiders. Per store
+("inline", "local"):
+
+- rows: dataset bytes per record as pushed (encoded JSON) and in total, and the
+  compressed side-store shards that hold the raw fields instead, with the
+  process_item CPU the store adds per record (hashing + shard line, on the
+  reactor; compression runs on the store's writer thread).
+- pipeline: the push_worker benchmark of bench_pipeline (process_item -> push
+  worker -> fake dataset client with a fixed round trip), which reports
+  batches, uploaded bytes and items/s.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+DEFAULT_OUTPUT = os.path.join("storage", "benchmarks", "raw_fields.json")
+STORES = ("inline", "local")
+
+
+def bench_rows(store_name: str, items: list[dict], directory: str) -> dict:
+    from tests.fakes import FakeStats, fake_spider
+    from sven_scraping_projects.dataset_push import encode_record
+    from sven_scraping_projects.pipelines import _to_apify_dataset_record
+    from sven_scraping_projects.raw_fields_store import REF_FIELD, RawFieldsStore
+
+    spider = fake_spider("benchmark", {"RAW_FIELDS_STORE": store_name, "RAW_FIELDS_DIR": directory})
+    store = RawFieldsStore.from_settings(spider.crawler.settings, spider, stats=FakeStats())
+    records = [_to_apify_dataset_record(dict(item)) for item in items]
+    started = time.process_time()
+    if store is not None:
+        for rec in records:
+            rec[REF_FIELD] = store.put(rec.pop("raw_source_fields"))
+    put_s = time.process_time() - started
+    row_bytes = sum(len(encode_record(rec).payload) for rec in records)
+    side_bytes = 0
+    if store is not None:
+        store.close()
+        side_bytes = store.stored_bytes
+    n = len(records)
+    return {
+        "records": n,
+        "row_bytes": row_bytes,
+        "row_bytes_per_record": round(row_bytes / n, 1),
+        "side_store_bytes": side_bytes,
+        "side_store_shards": store.shards if store is not None else 0,
+        "put_us_per_record": round(put_s * 1e6 / n, 2),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000, help="synthetic items per source")
+    parser.add_argument("--push-latency-ms", type=float, default=20.0, help="fake dataset round trip")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    args = parser.parse_args(argv)
+
+    from benchmarks.bench_pipeline import _git_rev, bench_push_worker
+    from benchmarks.synthetic_items import generate_mixed_items
+    from sven_scraping_projects.raw_fields_store import zstandard
+
+    items = generate_mixed_items(args.items, seed=args.seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in STORES:
+            results[f"rows/{name}"] = bench_rows(name, items, os.path.join(tmp, "rows", name))
+        for name in STORES:
+            settings = {"RAW_FIELDS_STORE": name, "RAW_FIELDS_DIR": os.path.join(tmp, "pipeline", name)}
+            results[f"pipeline/{name}"] = bench_push_worker(items, args.push_latency_ms / 1000.0, settings=settings)
+
+    print(f"{'benchmark':<18}{'row B/rec':>11}{'rows MiB':>10}{'side MiB':>10}{'put us':>8}")
+    for name in STORES:
+        res = results[f"rows/{name}"]
+        print(
+            f"{'rows/' + name:<18}{res['row_bytes_per_record']:>11,.0f}{res['row_bytes'] / 2**20:>10.2f}"
+            f"{res['side_store_bytes'] / 2**20:>10.2f}{res['put_us_per_record']:>8.2f}"
+        )
+    print(f"{'benchmark':<18}{'items/s':>11}{'p50 ms':>10}{'MiB up':>10}{'batches':>8}")
+    for name in STORES:
+        res = results[f"pipeline/{name}"]
+        print(
+            f"{'pipeline/' + name:<18}{res['items_per_sec'] or 0:>11,.0f}{res['p50_us'] / 1000:>10.1f}"
+            f"{res['bytes_uploaded'] / 2**20:>10.2f}{res['batches']:>8}"
+        )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_rev": _git_rev(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "items_per_source": args.items,
+            "push_latency_ms": args.push_latency_ms,
+            "codec": "zstd" if zstandard is not None else "gzip",
+        },
+        "benchmarks": results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
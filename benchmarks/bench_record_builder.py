@@ -0,0 +1,45 @@
+"""
+Micro-benchmark: fused record builder vs. the original five-stage chain
+(kept as a reference in tests/staged_record_builder.py).
+
+    python -m benchmarks.bench_record_builder [--items 20000] [--repeat 5]
+
+Reports items/sec per source for both paths (best of --repeat runs).
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from benchmarks.synthetic_items import SOURCES, generate_items
+from sven_scraping_projects.pipelines import _to_apify_dataset_record
+from tests.staged_record_builder import to_apify_dataset_record_staged
+
+
+def _items_per_sec(fn, items, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - start)
+    return len(items) / best if best > 0 else float("inf")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=20000, help="items per source")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'source':<26}{'staged items/s':>16}{'fused items/s':>16}{'speedup':>10}")
+    for source in SOURCES:
+        items = list(generate_items(source, args.items))
+        staged = _items_per_sec(to_apify_dataset_record_staged, items, args.repeat)
+        fused = _items_per_sec(_to_apify_dataset_record, items, args.repeat)
+        print(f"{source:<26}{staged:>16,.0f}{fused:>16,.0f}{fused / staged:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Write-once record encoding vs encoding in the API client.
+
+    python -m benchmarks.bench_serialization [--items 5000] [--repeat 5] [--push-latency-ms 20]
+        [--output storage/benchmarks/serialization.json]
+
+Records are built from the synthetic items of all five spiders
+(_to_apify_dataset_record). Per APIFY_PUSH_ENCODER value, two measurements:
+
+- encode: the JSON work each record costs on its way to the dataset, split by
+  thread, in microseconds of CPU per record. "reactor" is process_item:
+  journaling the record in the push ledger (canonical JSON, the same for all
+  encoders) plus, for "json"/"orjson", encoding the record once. "push" is the
+  push thread: ByteBatcher sizing, the ledger's record IDs for the commit and
+  the batch payload the client sends. For "client" that is json.dumps of the
+  batch, as ApifyClient does; otherwise it is the records' bytes joined and
+  the str -> UTF-8 round trip of push_items(str).
+- pipeline: the push_worker benchmark of bench_pipeline (process_item ->
+  push worker -> fake dataset client, no ledger) with that encoder.
+
+Every push-thread microsecond holds the GIL that the crawl's parsing needs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+DEFAULT_OUTPUT = os.path.join("storage", "benchmarks", "serialization.json")
+ENCODERS = ("client", "json", "orjson")
+BATCH_BYTES = 1024 * 1024
+
+
+def _records(items_per_source: int, seed: int) -> list[dict]:
+    from benchmarks.synthetic_items import generate_mixed_items
+    from sven_scraping_projects.pipelines import _to_apify_dataset_record
+
+    return [_to_apify_dataset_record(item) for item in generate_mixed_items(items_per_source, seed=seed)]
+
+
+def _batches(records: list, sizes: list[int]) -> list[list]:
+    out, batch, size = [], [], 0
+    for record, n in zip(records, sizes):
+        if batch and size + n > BATCH_BYTES:
+            out.append(batch)
+            batch, size = [], 0
+        batch.append(record)
+        size += n
+    if batch:
+        out.append(batch)
+    return out
+
+
+def bench_encode(encoder_name: str, records: list[dict], repeat: int) -> dict:
+    from sven_scraping_projects.dataset_push import encode_record, join_payload, record_bytes, record_encoder
+    from sven_scraping_projects.push_ledger import _digest, canonical_json, record_id
+
+    encoder = record_encoder(encoder_name)
+    best = None
+    for _ in range(max(1, repeat)):
+        started = time.process_time()
+        queued = []
+        for rec in records:
+            if encoder is not None:
+                rec = encode_record(rec, encoder)
+            rid = _digest(canonical_json(rec))  # PushLedger.accept
+            if hasattr(rec, "rid"):
+                rec.rid = rid
+            queued.append(rec)
+        reactor_s = time.process_time() - started
+
+        started = time.process_time()
+        sizes = [record_bytes(rec) for rec in queued]  # ByteBatcher.add
+        payload_bytes = 0
+        for batch in _batches(queued, sizes):
+            [record_id(rec) for rec in batch]  # PushLedger.uncommitted
+            if encoder is None:
+                data = json.dumps(batch, ensure_ascii=False, allow_nan=False, default=str).encode("utf-8")
+            else:
+                data = join_payload(batch).decode("utf-8").encode("utf-8")
+            payload_bytes += len(data)
+        push_s = time.process_time() - started
+        if best is None or reactor_s + push_s < best[0] + best[1]:
+            best = (reactor_s, push_s, payload_bytes)
+    reactor_s, push_s, payload_bytes = best
+    n = len(records)
+    return {
+        "records": n,
+        "reactor_us_per_record": round(reactor_s * 1e6 / n, 2),
+        "push_us_per_record": round(push_s * 1e6 / n, 2),
+        "total_us_per_record": round((reactor_s + push_s) * 1e6 / n, 2),
+        "payload_bytes": payload_bytes,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000, help="synthetic items per source")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of the encode benchmark (best is reported)")
+    parser.add_argument("--push-latency-ms", type=float, default=20.0, help="fake dataset round trip")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    args = parser.parse_args(argv)
+
+    from benchmarks.bench_pipeline import _git_rev, bench_push_worker
+    from benchmarks.synthetic_items import generate_mixed_items
+    from sven_scraping_projects.dataset_push import orjson
+
+    encoders = [e for e in ENCODERS if e != "orjson" or orjson is not None]
+    records = _records(args.items, args.seed)
+    items = generate_mixed_items(args.items, seed=args.seed)
+    results = {}
+    for name in encoders:
+        results[f"encode/{name}"] = bench_encode(name, records, args.repeat)
+    for name in encoders:
+        results[f"pipeline/{name}"] = bench_push_worker(
+            items, args.push_latency_ms / 1000.0, settings={"APIFY_PUSH_ENCODER": name}
+        )
+
+    print(f"{'benchmark':<20}{'reactor us':>12}{'push us':>10}{'total us':>10}{'payload MiB':>13}")
+    for name in encoders:
+        res = results[f"encode/{name}"]
+        print(
+            f"{'encode/' + name:<20}{res['reactor_us_per_record']:>12.2f}{res['push_us_per_record']:>10.2f}"
+            f"{res['total_us_per_record']:>10.2f}{res['payload_bytes'] / 2**20:>13.2f}"
+        )
+    print(f"{'benchmark':<20}{'items/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'batches':>13}")
+    for name in encoders:
+        res = results[f"pipeline/{name}"]
+        print(
+            f"{'pipeline/' + name:<20}{res['items_per_sec'] or 0:>12,.0f}{res['p50_us'] / 1000:>10.1f}"
+            f"{res['p99_us'] / 1000:>10.1f}{res['batches']:>13}"
+        )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_rev": _git_rev(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "items_per_source": args.items,
+            "records": len(records),
+            "repeat": args.repeat,
+            "push_latency_ms": args.push_latency_ms,
+            "orjson": getattr(orjson, "__version__", None),
+        },
+        "benchmarks": results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,216 @@
+"""
+Streaming sitemap reader vs the DOM-based extraction it replaced.
+
+    python -m benchmarks.bench_sitemap [--urls 100000] [--repeat 3]
+        [--output storage/benchmarks/sitemap.json]
+
+A urlset of --urls profile URLs (with lastmod, plus ~5% image/PDF entries the
+spiders drop) is generated as plain XML and as .xml.gz. Implementations:
+
+- legacy_asklepios: the old AsklepiosSpider._extract_sitemap_locs (gunzip the
+  whole body, decode to str, parsel Selector, list of <loc>) plus its
+  extension filter
+- legacy_kvhh: the old KvhhSpider.parse_sitemap (response.xpath over the
+  XmlResponse, list of <loc>) plus its prefix filter; plain XML only, since
+  the response body is already decompressed there
+- streaming: SitemapReader with the same filters
+
+Each (implementation, format) pair runs in its own interpreter so that peak
+RSS can be compared: the peak is reset (/proc/self/clear_refs) after the body
+is built, and the reported figure is the growth above the RSS at that point.
+lxml allocates outside the Python heap, so tracemalloc would miss most of it.
+"first URL" is the time until the first filtered URL is available to the
+callback, i.e. when the first request could be scheduled.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+DEFAULT_OUTPUT = os.path.join("storage", "benchmarks", "sitemap.json")
+IMPLEMENTATIONS = ("legacy_asklepios", "legacy_kvhh", "streaming")
+FORMATS = ("xml", "gz")
+PREFIX = "https://www.kvhh.net/de/arztsuche/"
+SKIPPED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".pdf", ".xml", ".gz")
+
+
+def build_sitemap(urls: int) -> bytes:
+    rows = []
+    for n in range(urls):
+        if n % 20 == 19:
+            loc = f"https://www.kvhh.net/media/anhang-{n}.pdf"
+        else:
+            loc = f"{PREFIX}net-kvhh-physician-{n * 7919 % 1_000_003}-dr-med-beispiel-{n}"
+        rows.append(f"<url><loc>{loc}</loc><lastmod>2025-{n % 12 + 1:02d}-{n % 28 + 1:02d}</lastmod></url>")
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">' + "".join(rows) + "</urlset>"
+    ).encode()
+
+
+def _legacy_asklepios(body: bytes, url: str):
+    from io import BytesIO
+
+    from parsel import Selector
+
+    # Verbatim logic of the old AsklepiosSpider._extract_sitemap_locs and its filter loop.
+    if url.endswith(".gz"):
+        try:
+            body = gzip.GzipFile(fileobj=BytesIO(body)).read()
+        except Exception:
+            pass
+    text = body.decode("utf-8", errors="replace")
+    sel = Selector(text=text)
+    locs = [u.strip() for u in sel.xpath("//*[local-name()='loc']/text()").getall() if u and u.strip()]
+    for u in locs:
+        if any(u.lower().endswith(ext) for ext in SKIPPED_EXTENSIONS):
+            continue
+        yield u
+
+
+def _legacy_kvhh(body: bytes, url: str):
+    from scrapy.http import XmlResponse
+
+    response = XmlResponse(url=url, body=body, encoding="utf-8")
+    locs = response.xpath("//*[local-name()='loc']/text()").getall()
+    yield from [u.strip() for u in locs if u and u.strip().startswith(PREFIX)]
+
+
+def _streaming(body: bytes, url: str):
+    from sven_scraping_projects.utils.sitemap import SitemapReader
+
+    for entry in SitemapReader(body, prefixes=(PREFIX,), exclude_extensions=SKIPPED_EXTENSIONS):
+        yield entry.loc
+
+
+def _rss_kib(field: str) -> int:
+    with open("/proc/self/status", encoding="ascii") as fh:
+        for line in fh:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def run_one(impl: str, fmt: str, urls: int, repeat: int) -> dict:
+    """One implementation on one format, in this process."""
+    # Import everything up front so module loading is not counted as parse memory.
+    import parsel  # noqa: F401
+    import scrapy.http  # noqa: F401
+
+    import sven_scraping_projects.utils.sitemap  # noqa: F401
+
+    fn = {"legacy_asklepios": _legacy_asklepios, "legacy_kvhh": _legacy_kvhh, "streaming": _streaming}[impl]
+    plain = build_sitemap(urls)
+    body = gzip.compress(plain, mtime=0) if fmt == "gz" else plain
+    url = "https://www.kvhh.net/de/sitemap.xml" + (".gz" if fmt == "gz" else "")
+    del plain
+
+    best = first_best = None
+    peak_kib = None
+    count = 0
+    for _ in range(repeat):
+        try:
+            with open("/proc/self/clear_refs", "w", encoding="ascii") as fh:
+                fh.write("5")
+            base_kib = _rss_kib("VmRSS")
+        except OSError:
+            base_kib = None
+        started = time.perf_counter()
+        first = None
+        count = 0
+        for _loc in fn(body, url):
+            if first is None:
+                first = time.perf_counter() - started
+            count += 1
+        elapsed = time.perf_counter() - started
+        if base_kib is not None and peak_kib is None:
+            # First run only: later runs reuse memory the allocator kept from the first.
+            peak_kib = _rss_kib("VmHWM") - base_kib
+        best = elapsed if best is None else min(best, elapsed)
+        first_best = first if first_best is None else min(first_best, first)
+    return {
+        "body_bytes": len(body),
+        "urls_kept": count,
+        "elapsed_s": round(best, 4),
+        "urls_per_sec": round(count / best, 1) if best else None,
+        "first_url_ms": round((first_best or 0.0) * 1000.0, 2),
+        "peak_rss_growth_kib": peak_kib,
+    }
+
+
+def _run_in_subprocess(impl: str, fmt: str, args) -> dict:
+    cmd = [
+        sys.executable,
+        "-m",
+        "benchmarks.bench_sitemap",
+        "--worker",
+        f"{impl}:{fmt}",
+        "--urls",
+        str(args.urls),
+        "--repeat",
+        str(args.repeat),
+    ]
+    out = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--urls", type=int, default=100_000, help="URLs in the generated sitemap")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per implementation (best is reported)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        impl, fmt = args.worker.split(":")
+        print(json.dumps(run_one(impl, fmt, args.urls, args.repeat)), flush=True)
+        return 0
+
+    from benchmarks.bench_pipeline import _git_rev
+
+    results = {}
+    for fmt in FORMATS:
+        for impl in IMPLEMENTATIONS:
+            if impl == "legacy_kvhh" and fmt == "gz":
+                continue
+            results[f"{impl}/{fmt}"] = _run_in_subprocess(impl, fmt, args)
+
+    print(f"{'benchmark':<24}{'body MiB':>9}{'urls/s':>11}{'total ms':>10}{'first URL ms':>14}{'peak RSS MiB':>14}")
+    for name, res in results.items():
+        peak = res["peak_rss_growth_kib"]
+        print(
+            f"{name:<24}{res['body_bytes'] / 2**20:>9.2f}{res['urls_per_sec'] or 0:>11,.0f}"
+            f"{res['elapsed_s'] * 1000:>10.1f}{res['first_url_ms']:>14.2f}"
+            f"{(peak / 1024 if peak is not None else float('nan')):>14.1f}"
+        )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_rev": _git_rev(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "urls": args.urls,
+            "repeat": args.repeat,
+        },
+        "benchmarks": results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,7 @@
+"""
+Local HTTP stand-in for the five scraped sites.
+
+fixtures.py renders discovery and detail pages with the same markup the spiders'
+selectors expect, server.py serves them (with injectable latency and 503/429
+errors) and handler.py routes the spiders' real https:// URLs to the local server.
+"""
@@ -0,0 +1,272 @@
+"""
+Fixture pages for the stand-in server, rendered from synthetic items.
+
+Each site's discovery endpoint and detail pages use the markup the matching
+spider's selectors expect, so a crawl against the stand-in yields roughly one
+item per synthetic record. Pages are keyed by "host/path" (query strings are
+ignored) and rendered once up front so serving them costs nothing measurable.
+"""
+
+from __future__ import annotations
+
+import gzip
+import html
+import json
+import random
+from typing import NamedTuple
+from urllib.parse import unquote, urlsplit
+
+from benchmarks.synthetic_items import generate_items
+
+HTML = "text/html; charset=utf-8"
+XML = "application/xml; charset=utf-8"
+JSON = "application/json; charset=utf-8"
+GZIP = "application/x-gzip"
+
+# Asklepios spreads profile URLs across several gzipped child sitemaps.
+ASKLEPIOS_CHILD_SITEMAPS = 4
+# Profiles per apothekenfinder result page.
+APOTHEKEN_PAGE_SIZE = 20
+
+
+class Page(NamedTuple):
+    content_type: str
+    body: bytes
+
+
+def page_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.hostname}{unquote(parts.path) or '/'}"
+
+
+def _e(value) -> str:
+    return html.escape("" if value is None else str(value))
+
+
+def _doc(body: str, head: str = "") -> bytes:
+    return f"<!DOCTYPE html><html><head><meta charset=\"utf-8\">{head}</head><body>{body}</body></html>".encode("utf-8")
+
+
+def _split(value) -> list[str]:
+    return [p.strip() for p in str(value or "").split(",") if p.strip()]
+
+
+def _urlset(urls: list[str]) -> bytes:
+    locs = "".join(f"<url><loc>{_e(u)}</loc><lastmod>2026-01-15</lastmod></url>" for u in urls)
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{locs}</urlset>'
+    ).encode("utf-8")
+
+
+def _sitemapindex(urls: list[str]) -> bytes:
+    locs = "".join(f"<sitemap><loc>{_e(u)}</loc></sitemap>" for u in urls)
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{locs}</sitemapindex>'
+    ).encode("utf-8")
+
+
+# ---------------------------------------------------------------------------
+# Per-site renderers
+# ---------------------------------------------------------------------------
+
+
+def _uke_profile(item: dict) -> bytes:
+    def contact(label: str, value: str) -> str:
+        return f'<div class="contact-label">{label}</div><div><span>{_e(value)}</span></div>'
+
+    def data_block(label: str, values: list[str]) -> str:
+        rows = "".join(f'<div class="contact-data">{_e(v)}</div>' for v in values)
+        return f"<div>{label}</div><div><div>{rows}</div></div>"
+
+    def spans(values: list[str]) -> str:
+        return "<ul>" + "".join(f"<li><span>{_e(v)}</span></li>" for v in values) + "</ul>"
+
+    body = (
+        '<div class="profile-header">'
+        f'<div class="name">\n  {_e(item["name"])}\n</div>'
+        f'<div class="title">{_e(item["job_title"])}</div>'
+        f'<div class="department">{_e(item["department"])}</div>'
+        "</div>"
+        '<ul class="description">' + "".join(f"<li>{_e(s)}</li>" for s in _split(item["specialties"])) + "</ul>"
+        f'<div class="main-contact-container "><ul><li>{_e(item["work_area"])}</li></ul></div>'
+        + contact("Telefon", item["telephone"])
+        + contact("Telefax", item["fax"])
+        + contact("E-Mail", item["email"])
+        + data_block("Standort", [item["location"]])
+        + data_block("Sprachen", _split(item["languages"]))
+        + "<h2>Fachgebiete</h2>" + spans(_split(item["areas_of_expertise"]))
+        + "<h2>Tätigkeitsschwerpunkte</h2>" + spans(_split(item["areas_of_activity"]))
+    )
+    return _doc(body, head=f"<title>{_e(item['name'])} | UKE</title>")
+
+
+def _uke(items: list[dict]) -> dict[str, Page]:
+    pages = {}
+    hits = []
+    for item in items:
+        hits.append({"url": item["url"], "title": f"UKE - Arztprofil {item['name']}"})
+        pages[page_key(item["url"])] = Page(HTML, _uke_profile(item))
+    search = {"response": {"numFound": len(hits), "hits": hits}}
+    pages["www.uke.de/searchadapter/search"] = Page(JSON, json.dumps(search, ensure_ascii=False).encode("utf-8"))
+    return pages
+
+
+def _apotheke_listing(item: dict) -> str:
+    def row(label: str, value_html: str) -> str:
+        return f"<div><label>{label}</label></div><div><span>{value_html}</span></div>"
+
+    path = urlsplit(item["url"]).path
+    return (
+        '<div class="searchhit">'
+        '<div class="searchhit-icon searchhit-icon-site"></div>'
+        f'<h3><a href="{_e(path)}">{_e(item["name"])}</a></h3>'
+        + row("Anschrift", _e(item["address"]))
+        + row("Telefon", _e(item["phone"]))
+        + row("Fax", _e(item["fax"]))
+        + row("E-Mail", f'<a href="mailto:{_e(item["email"])}">{_e(item["email"])}</a>')
+        + row("Internet", f'<a href="{_e(item["website"])}">{_e(item["website"])}</a>')
+        + "</div>"
+    )
+
+
+def _apothekerkammer(items: list[dict]) -> dict[str, Page]:
+    pages = {}
+    chunks = [items[i : i + APOTHEKEN_PAGE_SIZE] for i in range(0, len(items), APOTHEKEN_PAGE_SIZE)] or [[]]
+    for n, chunk in enumerate(chunks, start=1):
+        path = "/apothekenfinder/" if n == 1 else f"/apothekenfinder/page/{n}/"
+        pagination = ""
+        if n < len(chunks):
+            pagination = f'<a class="next page-numbers" href="/apothekenfinder/page/{n + 1}/">Weiter</a>'
+        body = (
+            '<div class="container mt-3">'
+            + "".join(f'<div class="row">{_apotheke_listing(item)}</div>' for item in chunk)
+            + f'</div><nav class="pagination">{pagination}</nav>'
+        )
+        pages[f"portal.apothekerkammer-hamburg.de{path}"] = Page(HTML, _doc(body))
+    return pages
+
+
+def _asklepios_clinic(block: str) -> str:
+    fields = dict(line.split(": ", 1) for line in block.split("\n") if ": " in line)
+    return (
+        '<article data-test-id="facility-teaser">'
+        f'<h3>{_e(fields.get("clinic_type"))}</h3>'
+        f'<p class="text-[14px] truncate ...">{_e(fields.get("clinic_name"))}</p>'
+        f'<div><svg aria-label="Adresse"></svg><p>{_e(fields.get("clinic_address"))}</p></div>'
+        f'<div><svg aria-label="Telefonnummer"></svg><p>{_e(fields.get("clinic_phone"))}</p></div>'
+        "</article>"
+    )
+
+
+def _asklepios_profile(item: dict) -> bytes:
+    def row(label: str, value) -> str:
+        return f"<div><span>{label}</span><span>{_e(value)}</span></div>" if value else ""
+
+    highlights = "".join(f"<p>{_e(h)}</p>" for h in _split(item["career_highlights"]))
+    clinics = "".join(_asklepios_clinic(c) for c in (item["clinic_1"], item["clinic_2"]) if c)
+    body = (
+        f"<h1>{_e(item['name'])}</h1>"
+        + row("Position", item["position"])
+        + row("Zuständigkeitsbereich", item["area_of_responsibility"])
+        + row("Facharzt", item["specialty"])
+        + row("Einrichtung", item["einrichtung"])
+        + f'<div class="contact"><svg aria-label="Telefonnummer"></svg>{_e(item["phone"])}</div>'
+        + f'<div class="contact"><svg aria-label="Faxnummer"></svg><span>{_e(item["fax"])}</span></div>'
+        + '<div aria-labelledby="accordion-Höhepunkte der beruflichen Laufbahn-0-heading">'
+        + f"{highlights}</div>"
+        + clinics
+    )
+    return _doc(body, head=f'<meta property="og:image" content="{_e(item["img_url"])}">')
+
+
+def _asklepios(items: list[dict]) -> dict[str, Page]:
+    pages = {}
+    base = "https://www.asklepios.com"
+    children: list[list[str]] = [[] for _ in range(ASKLEPIOS_CHILD_SITEMAPS)]
+    for i, item in enumerate(items):
+        pages[page_key(item["url"])] = Page(HTML, _asklepios_profile(item))
+        children[i % ASKLEPIOS_CHILD_SITEMAPS].append(item["url"])
+        # Assets and non-profile pages the spider has to filter or skip.
+        if i % 10 == 0:
+            children[i % ASKLEPIOS_CHILD_SITEMAPS].append(item["img_url"])
+    children[0].append(f"{base}/hamburg/kontakt")
+    pages["www.asklepios.com/hamburg/kontakt"] = Page(HTML, _doc("<div>Kontakt</div>"))
+
+    child_urls = []
+    for n, urls in enumerate(children, start=1):
+        url = f"{base}/sitemap-profile-{n}.xml.gz"
+        child_urls.append(url)
+        pages[page_key(url)] = Page(GZIP, gzip.compress(_urlset(urls), mtime=0))
+    pages["www.asklepios.com/sitemap-index.xml"] = Page(XML, _sitemapindex(child_urls))
+    return pages
+
+
+def _kvhh_profile(item: dict) -> bytes:
+    def dl_row(label: str, value: str | None, br: bool = False) -> str:
+        if not value:
+            return ""
+        inner = "<br>".join(_e(v) for v in _split(value)) if br else _e(value)
+        return f"<dt>{label}</dt><dd>{inner}</dd>"
+
+    contact = f'<a href="tel:{_e(item["phone"]).replace(" ", "")}">{_e(item["phone"])}</a>'
+    if item["email"]:
+        contact += f'<a href="mailto:{_e(item["email"])}">{_e(item["email"])}</a>'
+    body = (
+        f"<h1>{_e(item['name'])}</h1>"
+        f'<div class="contact">{contact}</div>'
+        "<dl>"
+        + dl_row("Fachgebiet", item["specialization"])
+        + dl_row("Fremdsprachen", item["languages"], br=True)
+        + dl_row("Leistungen", item["main_areas_of_activity"], br=True)
+        + "</dl>"
+    )
+    return _doc(body)
+
+
+def _kvhh(items: list[dict]) -> dict[str, Page]:
+    pages = {}
+    urls = []
+    for item in items:
+        urls.append(item["url"])
+        pages[page_key(item["url"])] = Page(HTML, _kvhh_profile(item))
+    # Non-profile sitemap entries the spider filters by prefix.
+    urls.extend(f"https://www.kvhh.net/de/presse/meldung-{n}.html" for n in range(max(1, len(items) // 5)))
+    pages["www.kvhh.net/de/sitemap.xml"] = Page(XML, _urlset(urls))
+    return pages
+
+
+def _zahnaerzte(items: list[dict], seed: int) -> dict[str, Page]:
+    rng = random.Random(seed)
+    records = []
+    for i, item in enumerate(items):
+        records.append({
+            "detailLink": urlsplit(item["url"]).path,
+            "label": item["name"],
+            "firstname": item["first_name"],
+            "lastname": item["last_name"],
+            "academic_title": item["title"],
+            "title": item["practice_name"],
+            "street": item["street"],
+            "zip": item["zip"],
+            "city": item["city"],
+            "phone": item["phone"],
+            "internet": (item["website"] or "").replace("https://", ""),
+            "owner": 0 if item["practice_relation"] == "employed" else rng.randint(1, 9),
+            "expertise": [{"label": s} for s in _split(item["specialization"])],
+        })
+    data = html.escape(json.dumps(records, ensure_ascii=False), quote=True)
+    body = f'<div class="dentist-search" data-filter-data="{data}"></div>'
+    return {"www.zahnaerzte-hh.de/zahnaerzte-portal/zahnaerzte/zahnarztsuche": Page(HTML, _doc(body))}
+
+
+def build_pages(profiles: int, *, seed: int = 0) -> dict[str, Page]:
+    """Render every site's pages for `profiles` synthetic records per site."""
+    pages: dict[str, Page] = {}
+    pages.update(_uke(list(generate_items("uke", profiles, seed=seed, with_source=False))))
+    pages.update(_apothekerkammer(list(generate_items("apothekerkammer-hamburg", profiles, seed=seed, with_source=False))))
+    pages.update(_asklepios(list(generate_items("asklepios", profiles, seed=seed, with_source=False))))
+    pages.update(_kvhh(list(generate_items("kvhh", profiles, seed=seed, with_source=False))))
+    pages.update(_zahnaerzte(list(generate_items("zahnaerzte_hh", profiles, seed=seed, with_source=False)), seed))
+    return pages
@@ -0,0 +1,38 @@
+"""
+Download handler that sends every http/https request to the stand-in server.
+
+Enabled by the crawl benchmark through DOWNLOAD_HANDLERS together with
+STANDIN_BASE_URL. https://www.kvhh.net/de/sitemap.xml is fetched as
+<STANDIN_BASE_URL>/www.kvhh.net/de/sitemap.xml and the response is handed back
+under the original URL, so spiders, middlewares and dupefilters see the real
+site URLs and nothing about the crawl path changes except the network.
+"""
+
+from __future__ import annotations
+
+from urllib.parse import urlsplit
+
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from scrapy.exceptions import NotConfigured
+
+
+def standin_url(base_url: str, url: str) -> str:
+    parts = urlsplit(url)
+    local = f"{base_url.rstrip('/')}/{parts.hostname}{parts.path or '/'}"
+    return f"{local}?{parts.query}" if parts.query else local
+
+
+class StandInDownloadHandler(HTTP11DownloadHandler):
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        self.base_url = crawler.settings.get("STANDIN_BASE_URL")
+        if not self.base_url:
+            raise NotConfigured("STANDIN_BASE_URL is not set")
+
+    async def download_request(self, request):
+        local_request = request.replace(url=standin_url(self.base_url, request.url))
+        response = await super().download_request(local_request)
+        # The transfer time lands on the copy's meta; latency-driven components read the original.
+        if "download_latency" in local_request.meta:
+            request.meta["download_latency"] = local_request.meta["download_latency"]
+        return response.replace(url=request.url, request=request)
@@ -0,0 +1,189 @@
+"""
+Threaded HTTP server that serves the fixture pages for all five sites.
+
+    python -m benchmarks.standin.server [--port 8765] [--profiles 200]
+        [--latency-ms 20] [--jitter-ms 10] [--error-rate-503 0.02] [--error-rate-429 0.01]
+
+Requests arrive as http://127.0.0.1:<port>/<original-host>/<original-path>?<query>
+(see handler.py). Every response is delayed by latency +/- jitter; a seeded
+share of requests is answered with 503 or 429 (with Retry-After) instead of
+the page so the spiders' retry paths are exercised. Unknown paths return 404.
+Pages carry an ETag and a Last-Modified header; a request whose
+If-None-Match matches the ETag gets an empty 304, as Apache does.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from benchmarks.standin.fixtures import Page, build_pages
+
+
+# Fixture pages never change while the server runs.
+LAST_MODIFIED = "Tue, 27 Jan 2026 06:05:36 GMT"
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+@dataclass
+class FaultProfile:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate_503: float = 0.0
+    error_rate_429: float = 0.0
+    seed: int = 0
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Crawls open many keep-alive connections at once.
+    request_queue_size = 512
+
+    def __init__(self, address, pages: dict[str, Page], faults: FaultProfile):
+        super().__init__(address, _Handler)
+        self.pages = pages
+        self.faults = faults
+        self._rng = random.Random(faults.seed)
+        self._lock = threading.Lock()
+        self.counters = {
+            "requests": 0,
+            "ok": 0,
+            "not_modified": 0,
+            "not_found": 0,
+            "status_503": 0,
+            "status_429": 0,
+        }
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.counters[key] += 1
+
+    def draw(self) -> tuple[float, int | None]:
+        """Return (delay seconds, injected error status or None) for one request."""
+        f = self.faults
+        with self._lock:
+            delay = max(0.0, f.latency_ms + self._rng.uniform(-f.jitter_ms, f.jitter_ms)) / 1000.0
+            roll = self._rng.random()
+        if roll < f.error_rate_503:
+            return delay, 503
+        if roll < f.error_rate_503 + f.error_rate_429:
+            return delay, 429
+        return delay, None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: StandInServer
+
+    def log_message(self, format, *args):  # noqa: A002 - BaseHTTPRequestHandler signature
+        pass
+
+    def _send(self, status: int, content_type: str, body: bytes, extra_headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (extra_headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.count("requests")
+        delay, error = self.server.draw()
+        if delay:
+            time.sleep(delay)
+        if error is not None:
+            self.server.count(f"status_{error}")
+            self._send(error, "text/plain", b"stand-in: injected error", {"Retry-After": "1"})
+            return
+        key = unquote(urlsplit(self.path).path).lstrip("/")
+        page = self.server.pages.get(key)
+        if page is None and not key.endswith("/"):
+            page = self.server.pages.get(key + "/")
+        if page is None:
+            self.server.count("not_found")
+            self._send(404, "text/plain", b"stand-in: no fixture")
+            return
+        validators = {"ETag": _etag(page.body), "Last-Modified": LAST_MODIFIED}
+        if self.headers.get("If-None-Match") == validators["ETag"]:
+            self.server.count("not_modified")
+            self._send(304, page.content_type, b"", validators)
+            return
+        self.server.count("ok")
+        self._send(200, page.content_type, page.body, validators)
+
+    do_HEAD = do_GET
+
+
+def make_server(
+    profiles: int,
+    faults: FaultProfile | None = None,
+    *,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    seed: int = 0,
+) -> StandInServer:
+    return StandInServer((host, port), build_pages(profiles, seed=seed), faults or FaultProfile(seed=seed))
+
+
+def serve_in_process(profiles: int, faults: FaultProfile, seed: int, port_conn) -> None:
+    """Process target: build the server, report its port through `port_conn`, serve until killed."""
+    server = make_server(profiles, faults, seed=seed)
+    port_conn.send(server.server_address[1])
+    port_conn.close()
+    server.serve_forever(poll_interval=0.2)
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added delay per response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="uniform +/- jitter around --latency-ms")
+    parser.add_argument("--error-rate-503", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--error-rate-429", type=float, default=0.0, help="share of requests answered with 429")
+
+
+def fault_profile_from_args(args, seed: int = 0) -> FaultProfile:
+    return FaultProfile(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate_503=args.error_rate_503,
+        error_rate_429=args.error_rate_429,
+        seed=seed,
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--profiles", type=int, default=200, help="synthetic profiles per site")
+    parser.add_argument("--seed", type=int, default=0)
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = make_server(args.profiles, fault_profile_from_args(args, args.seed), host=args.host, port=args.port, seed=args.seed)
+    print(f"Stand-in serving {len(server.pages)} pages on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
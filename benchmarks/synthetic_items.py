@@ -0,0 +1,196 @@
+"""
+Realistic synthetic items for each spider, shaped exactly like the dicts the spiders yield.
+
+Used by the benchmarks in this directory and by equivalence tests. Generation is
+deterministic for a given seed so runs are comparable.
+"""
+
+from __future__ import annotations
+
+import random
+from typing import Callable, Iterator
+
+SOURCES: tuple[str, ...] = ("uke", "apothekerkammer-hamburg", "asklepios", "kvhh", "zahnaerzte_hh")
+
+_FIRST_NAMES = ("Anna", "Jan", "Maria", "Lukas", "Sophie", "Felix", "Lea", "Jonas", "Marie", "Paul", "Hanna-Lena")
+_LAST_NAMES = ("Schmidt", "Müller", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker", "Schulz", "von Hoff")
+_TITLES = ("", "Dr.", "Dr. med.", "Prof. Dr. med.", "PD Dr. med.", "Dr. med. dent.", "Dipl.-Psych.")
+_SPECIALTIES = (
+    "Allgemeinmedizin",
+    "Innere Medizin",
+    "Kardiologie",
+    "Orthopädie und Unfallchirurgie",
+    "Neurologie",
+    "Psychotherapie",
+    "Kinder- und Jugendmedizin",
+    "Implantologie",
+    "Kieferorthopädie",
+)
+_LANGUAGES = ("Deutsch", "Englisch", "Französisch", "Türkisch", "Polnisch", "Russisch")
+_STREETS = ("Martinistraße", "Lübecker Straße", "Eppendorfer Baum", "Mönckebergstraße", "Rübenkamp")
+
+
+def _person(rng: random.Random) -> tuple[str, str, str]:
+    return rng.choice(_TITLES), rng.choice(_FIRST_NAMES), rng.choice(_LAST_NAMES)
+
+
+def _phone(rng: random.Random) -> str:
+    return f"040 {rng.randint(100, 999)} {rng.randint(1000, 99999)}"
+
+
+def _uke(rng: random.Random, i: int) -> dict:
+    title, first, last = _person(rng)
+    name = " ".join(p for p in (title, first, last) if p)
+    return {
+        "title": title,
+        "first_name": first,
+        "last_name": last,
+        "name": name,
+        "job_title": rng.choice(("Oberarzt", "Chefärztin", "Assistenzarzt", "Fachärztin")),
+        "department": f"Klinik und Poliklinik für {rng.choice(_SPECIALTIES)}",
+        "specialties": ", ".join(rng.sample(_SPECIALTIES, 3)),
+        "work_area": f"Gebäude O{rng.randint(1, 70)}, Martinistraße 52, 20246 Hamburg",
+        "telephone": _phone(rng),
+        "fax": _phone(rng),
+        "email": f"{first[0].lower()}.{last.lower()}@uke.de",
+        "location": f"Gebäude O{rng.randint(1, 70)}",
+        "languages": ", ".join(rng.sample(_LANGUAGES, 2)),
+        "areas_of_expertise": ", ".join(rng.sample(_SPECIALTIES, 2)),
+        "areas_of_activity": ", ".join(rng.sample(_SPECIALTIES, 2)),
+        "url": f"https://www.uke.de/kliniken-institute/profil/{i}.html",
+    }
+
+
+def _apothekerkammer(rng: random.Random, i: int) -> dict:
+    street = rng.choice(_STREETS)
+    return {
+        "name": f"{rng.choice(('Apotheke am Markt', 'Rats-Apotheke', 'Elbe-Apotheke'))} {i}",
+        "address": f"{street} {rng.randint(1, 200)}, 2{rng.randint(1000, 2999)} Hamburg",
+        "phone": _phone(rng),
+        "fax": _phone(rng),
+        "email": f"info{i}@apotheke.example",
+        "website": f"https://apotheke{i}.example",
+        "url": f"https://portal.apothekerkammer-hamburg.de/apotheke/{i}/",
+    }
+
+
+def _asklepios(rng: random.Random, i: int) -> dict:
+    title, first, last = _person(rng)
+    clinics = [
+        (
+            f"clinic_name: Asklepios Klinik {rng.choice(('Altona', 'Barmbek', 'Nord', 'St. Georg'))}\n"
+            f"clinic_type: {rng.choice(('Klinik', 'MVZ'))}\n"
+            f"clinic_address: {rng.choice(_STREETS)} {rng.randint(1, 99)}, 22{rng.randint(100, 999)} Hamburg\n"
+            f"clinic_phone: {_phone(rng)}"
+        )
+        for _ in range(rng.randint(0, 2))
+    ]
+    highlights = ", ".join(
+        f"{rng.randint(1990, 2024)}: {rng.choice(('Facharzt', 'Oberarzt', 'Promotion', 'Habilitation'))} "
+        f"am {rng.choice(('UKE', 'Charité', 'LMU München', 'Asklepios Klinik Nord'))}"
+        for _ in range(rng.randint(2, 12))
+    )
+    return {
+        "url": f"https://www.asklepios.com/hamburg/experten/profil/{first.lower()}-{last.lower()}-{i}",
+        "title": title,
+        "first_name": first,
+        "last_name": last,
+        "name": " ".join(p for p in (title, first, last) if p),
+        "position": rng.choice(("Chefarzt", "Leitender Oberarzt", "Oberärztin", "")),
+        "area_of_responsibility": rng.choice(("Endoprothetik", "Wirbelsäulenchirurgie", "")),
+        "specialty": rng.choice(_SPECIALTIES),
+        "einrichtung": f"Abteilung für {rng.choice(_SPECIALTIES)}",
+        "phone": _phone(rng),
+        "fax": _phone(rng),
+        "career_highlights": highlights,
+        "clinic_1": clinics[0] if len(clinics) > 0 else None,
+        "clinic_2": clinics[1] if len(clinics) > 1 else None,
+        "img_url": f"https://www.asklepios.com/images/{i}.jpg",
+        "llm_content": "",
+        "field_membership": "",
+    }
+
+
+def _kvhh(rng: random.Random, i: int) -> dict:
+    title, first, last = _person(rng)
+    specialty = rng.choice(_SPECIALTIES + (None,))
+    return {
+        "url": f"https://www.kvhh.net/de/medicalregister/net-kvhh-physician-{i}.html",
+        "title": title,
+        "first_name": first,
+        "last_name": last,
+        "name": " ".join(p for p in (title, first, last) if p),
+        "position": specialty,
+        "area_of_work": specialty,
+        "department": specialty,
+        "phone": _phone(rng),
+        "email": f"praxis{i}@kvhh.example" if rng.random() < 0.6 else "",
+        "languages": ", ".join(rng.sample(_LANGUAGES, rng.randint(0, 3))) or None,
+        "specialization": specialty,
+        "main_areas_of_activity": ", ".join(rng.sample(_SPECIALTIES, rng.randint(0, 4))) or None,
+        "llm_content": "",
+        "field_membership": "",
+    }
+
+
+def _zahnaerzte(rng: random.Random, i: int) -> dict:
+    title, first, last = _person(rng)
+    specialization = ", ".join(rng.sample(_SPECIALTIES[-3:], rng.randint(0, 2)))
+    street = f"{rng.choice(_STREETS)} {rng.randint(1, 200)}"
+    zip_code = rng.choice((f"2{rng.randint(1000, 2999)}", 22000 + rng.randint(0, 999)))
+    practice = f"Zahnarztpraxis {last}"
+    return {
+        "url": f"https://www.zahnaerzte-hh.de/zahnaerzte-portal/zahnarzt/{i}",
+        "title": title,
+        "first_name": first,
+        "last_name": last,
+        "name": " ".join(p for p in (title, first, last) if p),
+        "position": specialization,
+        "area_of_work": specialization,
+        "department": practice,
+        "phone": _phone(rng),
+        "email": "",
+        "address": f"{street}, {zip_code} Hamburg",
+        "street": street,
+        "zip": zip_code,
+        "city": "Hamburg",
+        "practice_name": practice,
+        "practice_relation": rng.choice(("owner", "employed")),
+        "website": f"https://praxis-{last.lower()}.example" if rng.random() < 0.5 else "",
+        "specialization": specialization,
+        "main_areas_of_activity": specialization,
+        "llm_content": "",
+        "field_membership": "",
+    }
+
+
+_GENERATORS: dict[str, Callable[[random.Random, int], dict]] = {
+    "uke": _uke,
+    "apothekerkammer-hamburg": _apothekerkammer,
+    "asklepios": _asklepios,
+    "kvhh": _kvhh,
+    "zahnaerzte_hh": _zahnaerzte,
+}
+
+
+def generate_items(source: str, count: int, *, seed: int = 0, with_source: bool = True) -> Iterator[dict]:
+    """
+    Yield `count` items shaped like `source`'s spider output.
+
+    with_source=True adds the `source` key the pipeline sets in process_item().
+    """
+    rng = random.Random(f"{source}:{seed}")
+    gen = _GENERATORS[source]
+    for i in range(count):
+        item = gen(rng, i)
+        if with_source:
+            item["source"] = source
+        yield item
+
+
+def generate_mixed_items(count_per_source: int, *, seed: int = 0) -> list[dict]:
+    """Items from all five spiders, in per-source runs (the order a sequential crawl produces)."""
+    out: list[dict] = []
+    for source in SOURCES:
+        out.extend(generate_items(source, count_per_source, seed=seed))
+    return out
@@ -6,79 +6,358 @@ import signal
 import threading
 import concurrent.futures
 import copy
+from sven_scraping_projects.startup_timing import StartupTimer
+
+# Started before the Apify SDK and Scrapy imports; main() reports the phases in a BOOT line.
+_startup = StartupTimer()
+
 from apify import Actor, Configuration
+from scrapy import signals
 from scrapy.crawler import CrawlerRunner
 from scrapy.utils.project import get_project_settings
-from twisted.internet import reactor
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import DeferredList, inlineCallbacks
 from twisted.python.failure import Failure
-from sven_scraping_projects.apify_runtime import set_actor_loop
-
-
-@inlineCallbacks
-def run_spiders(spider_names, settings, log_fn=None):
-    """Run multiple spiders sequentially. All results are pushed to the same Apify dataset."""
-    for i, name in enumerate(spider_names):
-        # Persist scheduler/dupefilter state per spider so Apify migrations (SIGTERM)
-        # can restart the container and continue the crawl instead of losing progress.
-        #
-        # NOTE: Each spider gets its own JOBDIR to avoid cross-spider state collisions.
-        jobdir_root = os.environ.get("SCRAPY_JOBDIR_ROOT") or os.path.join("storage", "scrapy_jobdir")
-        jobdir = os.path.join(jobdir_root, name)
-        # Scrapy's Settings.copy() performs a deepcopy. We intentionally store a live asyncio
-        # event loop in settings (APIFY_ACTOR_LOOP) so pipelines can run Actor SDK coroutines
-        # on a shared background loop. Event loops (and related asyncio internals) are not
-        # deepcopy/pickle-safe, so we must temporarily strip them before copying.
+from sven_scraping_projects.apify_runtime import set_actor_loop, set_sampling_profiler
+from sven_scraping_projects.memory_accounting import MB, format_boundary, get_memory_ledger
+
+_startup.mark("imports")
+
+
+def spider_jobdir(name: str) -> str:
+    """The spider's JOBDIR: scheduler state, and in process mode the parent's push ledger."""
+    jobdir_root = os.environ.get("SCRAPY_JOBDIR_ROOT") or os.path.join("storage", "scrapy_jobdir")
+    return os.path.join(jobdir_root, name)
+
+
+def _spider_settings(settings, name):
+    """Return an isolated settings copy for one spider with its own JOBDIR."""
+    # Persist scheduler/dupefilter state per spider so Apify migrations (SIGTERM)
+    # can restart the container and continue the crawl instead of losing progress.
+    #
+    # NOTE: Each spider gets its own JOBDIR to avoid cross-spider state collisions.
+    jobdir = spider_jobdir(name)
+    # Scrapy's Settings.copy() performs a deepcopy. We intentionally store a live asyncio
+    # event loop in settings (APIFY_ACTOR_LOOP) so pipelines can run Actor SDK coroutines
+    # on a shared background loop. Event loops (and related asyncio internals) are not
+    # deepcopy/pickle-safe, so we must temporarily strip them before copying.
+    actor_loop = None
+    try:
+        actor_loop = settings.get("APIFY_ACTOR_LOOP")
+    except Exception:
         actor_loop = None
-        try:
-            actor_loop = settings.get("APIFY_ACTOR_LOOP")
-        except Exception:
-            actor_loop = None
 
+    try:
+        if actor_loop is not None:
+            settings.set("APIFY_ACTOR_LOOP", None, priority="cmdline")
+        spider_settings = settings.copy()
+    except Exception:
+        # Best-effort diagnostics: pinpoint which value breaks deepcopy to avoid future regressions.
+        suspects = []
         try:
-            if actor_loop is not None:
-                settings.set("APIFY_ACTOR_LOOP", None, priority="cmdline")
-            spider_settings = settings.copy()
+            for k in list(settings.keys()):
+                try:
+                    copy.deepcopy(settings.get(k))
+                except Exception:
+                    suspects.append(k)
         except Exception:
-            # Best-effort diagnostics: pinpoint which value breaks deepcopy to avoid future regressions.
-            suspects = []
+            pass
+        raise RuntimeError(
+            "Failed to copy Scrapy settings (deepcopy). "
+            + (f"Non-deepcopyable keys: {suspects!r}" if suspects else "")
+        )
+    finally:
+        if actor_loop is not None:
             try:
-                for k in list(settings.keys()):
-                    try:
-                        copy.deepcopy(settings.get(k))
-                    except Exception:
-                        suspects.append(k)
+                settings.set("APIFY_ACTOR_LOOP", actor_loop, priority="cmdline")
             except Exception:
                 pass
-            raise RuntimeError(
-                "Failed to copy Scrapy settings (deepcopy). "
-                + (f"Non-deepcopyable keys: {suspects!r}" if suspects else "")
-            )
-        finally:
-            if actor_loop is not None:
-                try:
-                    settings.set("APIFY_ACTOR_LOOP", actor_loop, priority="cmdline")
-                except Exception:
-                    pass
 
-        if actor_loop is not None:
-            spider_settings.set("APIFY_ACTOR_LOOP", actor_loop, priority="cmdline")
-        spider_settings.set("JOBDIR", jobdir, priority="cmdline")
-        spider_settings.set("SCHEDULER_PERSIST", True, priority="cmdline")
+    if actor_loop is not None:
+        spider_settings.set("APIFY_ACTOR_LOOP", actor_loop, priority="cmdline")
+    spider_settings.set("JOBDIR", jobdir, priority="cmdline")
+    spider_settings.set("SCHEDULER_PERSIST", True, priority="cmdline")
+    return spider_settings
 
-        runner = CrawlerRunner(spider_settings)
+
+# "process" is handled by src/process_runner.py (one worker process per spider), not run_spiders().
+EXECUTION_MODES = ("sequential", "concurrent", "process")
+_REACTOR_EXECUTION_MODES = ("sequential", "concurrent")
+
+# "threaded": Twisted's EPollReactor in the main thread, Apify SDK on the apify-actor-loop thread.
+# "single": AsyncioSelectorReactor running on the Apify SDK's own loop; pushes are awaited there.
+EVENT_LOOP_MODES = ("threaded", "single")
+_ASYNCIO_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
+
+
+def _install_reactor(event_loop_mode, loop, settings):
+    """Install the Twisted reactor for `event_loop_mode` and return it (must run before any reactor import)."""
+    if event_loop_mode == "single":
+        from twisted.internet import asyncioreactor
+
+        # Scrapy looks the reactor's loop up as the current event loop.
+        asyncio.set_event_loop(loop)
+        asyncioreactor.install(eventloop=loop)
+        settings.set("TWISTED_REACTOR", _ASYNCIO_REACTOR, priority="cmdline")
+        settings.set("APIFY_EVENT_LOOP_MODE", "single", priority="cmdline")
+    from twisted.internet import reactor
+
+    return reactor
+
+
+@inlineCallbacks
+def run_spiders(spider_names, settings, log_fn=None, mode="sequential", on_first_request=None):
+    """Run multiple spiders. All results are pushed to the same Apify dataset.
+
+    mode="sequential" runs one spider after another. mode="concurrent" starts all
+    spiders in the same reactor; each keeps its own JOBDIR and settings copy, and
+    CONCURRENT_REQUESTS_GLOBAL caps the total number of in-flight requests.
+    on_first_request(spider_name) is called once, when the run's first request
+    reaches the downloader.
+    """
+    from twisted.internet import reactor
+
+    if mode not in _REACTOR_EXECUTION_MODES:
+        raise ValueError(f"Unknown execution mode {mode!r}; expected one of {_REACTOR_EXECUTION_MODES!r}")
+
+    first_request = {"pending": on_first_request is not None}
+
+    def _crawl(runner, name):
+        crawler = runner.create_crawler(name)
+        if first_request["pending"]:
+
+            def _reached(request, spider):
+                if first_request["pending"]:
+                    first_request["pending"] = False
+                    on_first_request(name)
+
+            crawler.signals.connect(_reached, signal=signals.request_reached_downloader, weak=False)
+        return runner.crawl(crawler)
+
+    # Memory samples at spider boundaries; growth from one to the next was left behind by a spider.
+    ledger = get_memory_ledger() if settings.getbool("MEMORY_ACCOUNTING_ENABLED") else None
+    leak_threshold = settings.getfloat("MEMORY_LEAK_THRESHOLD_MB", 64.0) * MB
+
+    def _memory_boundary(label):
+        if ledger is None:
+            return
+        entry = ledger.boundary(label)
+        if log_fn:
+            flag = " - not released, possible leak" if entry.delta > leak_threshold else ""
+            log_fn(format_boundary(entry) + flag)
+
+    _memory_boundary("before first scraper")
+
+    if mode == "concurrent":
+        crawls = []
+        for name in spider_names:
+            runner = CrawlerRunner(_spider_settings(settings, name))
+            d = _crawl(runner, name)
+
+            def _finished(result, name=name):
+                if log_fn:
+                    outcome = "failed" if isinstance(result, Failure) else "crawl completed"
+                    log_fn(f"Scraper '{name}' finished ({outcome})")
+                return result
+
+            d.addBoth(_finished)
+            crawls.append(d)
+        if log_fn:
+            log_fn(f"Started {len(spider_names)} scrapers concurrently: {list(spider_names)}")
+        # Let every spider finish (or be interrupted) before surfacing the first failure,
+        # so one broken source does not cut the others short mid-crawl.
+        results = yield DeferredList(crawls, consumeErrors=True)
+        del crawls
+        _memory_boundary("after all scrapers")
+        failures = [result for ok, result in results if not ok]
+        if failures:
+            failures[0].raiseException()
+        reactor.stop()
+        return
+
+    for i, name in enumerate(spider_names):
+        runner = CrawlerRunner(_spider_settings(settings, name))
         if log_fn:
             log_fn(f"Scraper {i + 1}/{len(spider_names)} ready: starting '{name}'")
-        yield runner.crawl(name)
+        yield _crawl(runner, name)
         if log_fn:
             log_fn(f"Scraper '{name}' finished (crawl completed, next will start if any)")
+        del runner
+        _memory_boundary(f"after '{name}'")
     reactor.stop()
 
+
+# Default key-value store record written by the optional entity-resolution stage.
+ENTITY_CLUSTERS_KEY = "ENTITY_CLUSTERS"
+
+
+async def _resolve_dataset_entities(actor):
+    """Cluster the run's dataset records across sources and store cluster IDs + summary."""
+    from sven_scraping_projects.entity_resolution import record_key, resolve
+
+    dataset = await actor.open_dataset()
+    records = [item async for item in dataset.iterate_items()]
+    result = await asyncio.to_thread(resolve, records)
+    await actor.set_value(
+        ENTITY_CLUSTERS_KEY,
+        {
+            "stats": result.stats,
+            "clusters": result.clusters,
+            # Dataset rows are already pushed; cluster_id per record is keyed by "source|source_url".
+            "record_clusters": {record_key(r): cid for r, cid in zip(records, result.cluster_ids)},
+        },
+    )
+    return result.stats
+
+
+# Key-value store records written by the optional sampling profiler: PROFILE-<spider>, PROFILE-run.
+PROFILE_KEY_PREFIX = "PROFILE-"
+
+
+def _profile_settings(profile_input, settings):
+    """Map Actor input `profile: {"mode": "sample", "interval_ms": 5, "tracemalloc": true}` onto settings.
+
+    Returns True when the sampling profiler was switched on.
+    """
+    if not isinstance(profile_input, dict):
+        return False
+    if profile_input.get("tracemalloc"):
+        settings.set("MEMORY_TRACEMALLOC", True, priority="cmdline")
+    if str(profile_input.get("mode") or "").lower() != "sample":
+        return False
+    interval_ms = profile_input.get("interval_ms", 5)
+    if not isinstance(interval_ms, (int, float)) or interval_ms <= 0:
+        interval_ms = 5
+    settings.set("SAMPLING_PROFILER_INTERVAL_MS", float(interval_ms), priority="cmdline")
+    if "include_idle" in profile_input:
+        settings.set("SAMPLING_PROFILER_INCLUDE_IDLE", bool(profile_input["include_idle"]), priority="cmdline")
+    return True
+
+
+def _incremental_settings(incremental_input, settings, kv_available=False):
+    """Map Actor input `incremental: true` or `{"policy": "skip", "ttl_days": 7, "store": "local"}` onto settings.
+
+    The state goes to the named key-value store by default when the run has an Apify token
+    (`kv_available`), since local storage does not survive between platform runs.
+    Returns True when incremental recrawl was switched on.
+    """
+    if isinstance(incremental_input, bool) or incremental_input is None:
+        incremental_input = {"enabled": bool(incremental_input)}
+    if not isinstance(incremental_input, dict) or not incremental_input.get("enabled", True):
+        return False
+    settings.set("RECRAWL_ENABLED", True, priority="cmdline")
+    policy = str(incremental_input.get("policy") or "").lower()
+    if policy in ("reemit", "skip"):
+        settings.set("RECRAWL_POLICY", policy, priority="cmdline")
+    ttl_days = incremental_input.get("ttl_days")
+    if isinstance(ttl_days, (int, float)) and not isinstance(ttl_days, bool) and ttl_days > 0:
+        settings.set("RECRAWL_TTL_DAYS", float(ttl_days), priority="cmdline")
+    store = str(incremental_input.get("store") or ("kv" if kv_available else "local")).lower()
+    if store in ("kv", "local"):
+        settings.set("RECRAWL_STORE", store, priority="cmdline")
+    return True
+
+
+def _conditional_get_settings(conditional_input, settings, kv_available=False):
+    """Map Actor input `conditional_get: true` or `{"max_age_days": 14, "store": "local"}` onto settings.
+
+    Like `incremental`, the validators go to the named key-value store by default when the run
+    has an Apify token. Returns True when conditional GETs were switched on.
+    """
+    if isinstance(conditional_input, bool) or conditional_input is None:
+        conditional_input = {"enabled": bool(conditional_input)}
+    if not isinstance(conditional_input, dict) or not conditional_input.get("enabled", True):
+        return False
+    settings.set("CONDITIONAL_GET_ENABLED", True, priority="cmdline")
+    max_age_days = conditional_input.get("max_age_days")
+    if isinstance(max_age_days, (int, float)) and not isinstance(max_age_days, bool) and max_age_days > 0:
+        settings.set("CONDITIONAL_GET_MAX_AGE_DAYS", float(max_age_days), priority="cmdline")
+    store = str(conditional_input.get("store") or ("kv" if kv_available else "local")).lower()
+    if store in ("kv", "local"):
+        settings.set("CONDITIONAL_GET_STORE", store, priority="cmdline")
+    return True
+
+
+def _http_cache_settings(cache_input, settings):
+    """Map Actor input `http_cache: "record"` or `{"mode": "replay", "dir": "...", "codec": "zlib"}` onto settings.
+
+    Replay answers every request from the recorded cache, drops uncached ones and turns off the
+    incremental recrawl and conditional GETs, which would otherwise skip or revalidate pages
+    that are meant to be parsed again. Returns the mode, or None when the cache stays off.
+    """
+    if isinstance(cache_input, str):
+        cache_input = {"mode": cache_input}
+    if not isinstance(cache_input, dict):
+        return None
+    mode = str(cache_input.get("mode") or "").lower()
+    if mode not in ("record", "replay"):
+        return None
+    settings.set("HTTPCACHE_ENABLED", True, priority="cmdline")
+    settings.set("HTTPCACHE_MODE", mode, priority="cmdline")
+    if cache_input.get("dir"):
+        settings.set("HTTPCACHE_DIR", str(cache_input["dir"]), priority="cmdline")
+    codec = str(cache_input.get("codec") or "").lower()
+    if codec in ("auto", "zstd", "zlib"):
+        settings.set("HTTPCACHE_CODEC", codec, priority="cmdline")
+    if mode == "replay":
+        settings.set("HTTPCACHE_IGNORE_MISSING", True, priority="cmdline")
+        settings.set("RECRAWL_ENABLED", False, priority="cmdline")
+        settings.set("CONDITIONAL_GET_ENABLED", False, priority="cmdline")
+    return mode
+
+
+def _raw_fields_settings(raw_input, settings, kv_available=False):
+    """Map Actor input `raw_source_fields: "kv"|"local"|"inline"` or `{"store": "local", "dir": "...", "codec": ...}`.
+
+    `true` picks the named key-value store when the run has an Apify token, else local shards, as
+    `incremental` does. Returns the side store, or None when raw_source_fields stay in the rows.
+    """
+    if isinstance(raw_input, bool) or raw_input is None:
+        raw_input = {"store": ("kv" if kv_available else "local") if raw_input else "inline"}
+    elif isinstance(raw_input, str):
+        raw_input = {"store": raw_input}
+    if not isinstance(raw_input, dict):
+        return None
+    store = str(raw_input.get("store") or ("kv" if kv_available else "local")).lower()
+    if store not in ("kv", "local"):
+        return None
+    settings.set("RAW_FIELDS_STORE", store, priority="cmdline")
+    if raw_input.get("dir"):
+        settings.set("RAW_FIELDS_DIR", str(raw_input["dir"]), priority="cmdline")
+    codec = str(raw_input.get("codec") or "").lower()
+    if codec in ("auto", "zstd", "gzip"):
+        settings.set("RAW_FIELDS_CODEC", codec, priority="cmdline")
+    return store
+
+
+def _store_profiles(profiler, directory, actor=None, run_on_actor_loop=None):
+    """Write the whole-run profile and copy this run's collapsed-stack files to the key-value store."""
+    from sven_scraping_projects.sampling_profiler import RUN_LABEL, write_collapsed
+
+    paths = [write_collapsed(profiler.stop(), directory, RUN_LABEL)]
+    # Per-spider files were written by SamplingProfilerExtension (in worker processes, too).
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith(".collapsed") and path not in paths and os.path.getmtime(path) >= profiler.started_at:
+            paths.append(path)
+    if actor is None:
+        return paths
+
+    async def upload():
+        for path in paths:
+            with open(path, encoding="utf-8") as fh:
+                key = PROFILE_KEY_PREFIX + os.path.basename(path)[: -len(".collapsed")]
+                await actor.set_value(key, fh.read(), content_type="text/plain")
+
+    run_on_actor_loop(upload(), timeout=120)
+    return paths
+
+
 def main():
 
     logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
     log = logging.getLogger(__name__)
     received_sigterm = {"value": False}
+    sigterm_event = threading.Event()
 
     print(f"BOOT: src.main from={__file__}", flush=True)
     # Deploy marker: if you don't see this line in Apify logs, you're not running the latest build.
@@ -91,16 +370,20 @@ def main():
     except Exception as e:
         print(f"BOOT: could not import sven_scraping_projects: {e!r}", flush=True)
 
-    # Run all Apify SDK async calls on a single dedicated asyncio loop.
-    # Scrapy/Twisted reactor runs in the main thread; we keep the asyncio loop alive in a background thread.
+    # Run all Apify SDK async calls on a single dedicated asyncio loop. Actor.init() runs on it here in
+    # the main thread; once the input has been read, the loop is handed over either to the
+    # apify-actor-loop thread (event_loop "threaded", the default; the Scrapy/Twisted reactor keeps the
+    # main thread) or to Twisted's AsyncioSelectorReactor (event_loop "single").
     actor_loop = asyncio.new_event_loop()
-    actor_loop_thread = threading.Thread(target=actor_loop.run_forever, name="apify-actor-loop", daemon=True)
-    actor_loop_thread.start()
+    actor_loop_thread = None
     set_actor_loop(actor_loop)
 
     def _run_on_actor_loop(coro, *, timeout: float | None = None):
-        fut: concurrent.futures.Future = asyncio.run_coroutine_threadsafe(coro, actor_loop)
-        return fut.result(timeout=timeout)
+        if actor_loop_thread is not None:
+            fut: concurrent.futures.Future = asyncio.run_coroutine_threadsafe(coro, actor_loop)
+            return fut.result(timeout=timeout)
+        # Before the handover, or in single event loop mode once the reactor has stopped.
+        return actor_loop.run_until_complete(asyncio.wait_for(coro, timeout))
 
     # We do not rely on platform events (MIGRATING/PERSIST_STATE listeners).
     # Explicitly disable the events websocket to avoid noisy shutdown errors.
@@ -117,6 +400,7 @@ def main():
         actor_initialized = True
     except Exception as e:
         log.exception("Apify Actor.init() / Actor.get_input() failed; falling back to env. Error: %s", e)
+    _startup.mark("actor_init")
 
     if actor_initialized:
         try:
@@ -202,12 +486,122 @@ def main():
             actor.log.warning(f"Failed applying CLOSESPIDER_* settings from input: {e}")
         else:
             log.warning("Failed applying CLOSESPIDER_* settings from input: %s", e)
-    
+
+    # Execution mode: "sequential" (default) or "concurrent" (all spiders share one reactor).
+    execution_mode = "sequential"
+    event_loop_mode = "threaded"
+    entity_resolution = False
+    try:
+        requested_mode = input_data.get("execution_mode") or os.environ.get("APIFY_EXECUTION_MODE")
+        if requested_mode:
+            requested_mode = str(requested_mode).strip().lower()
+            if requested_mode in EXECUTION_MODES:
+                execution_mode = requested_mode
+            else:
+                log.warning("Unknown execution_mode %r; using sequential.", requested_mode)
+
+        requested_loop = input_data.get("event_loop") or os.environ.get("APIFY_EVENT_LOOP_MODE")
+        if requested_loop:
+            requested_loop = str(requested_loop).strip().lower()
+            if requested_loop not in EVENT_LOOP_MODES:
+                log.warning("Unknown event_loop %r; using threaded.", requested_loop)
+            elif requested_loop == "single" and execution_mode == "process":
+                # Worker processes hand records to the parent's pusher thread; nothing to share a loop with.
+                log.warning("event_loop 'single' does not apply to execution_mode 'process'; using threaded.")
+            else:
+                event_loop_mode = requested_loop
+
+        max_concurrent_requests_total = input_data.get("max_concurrent_requests_total")
+        if isinstance(max_concurrent_requests_total, int) and max_concurrent_requests_total > 0:
+            settings.set("CONCURRENT_REQUESTS_GLOBAL", max_concurrent_requests_total, priority="cmdline")
+
+        push_concurrency = input_data.get("push_concurrency")
+        if isinstance(push_concurrency, int) and push_concurrency > 0:
+            settings.set("APIFY_PUSH_CONCURRENCY", push_concurrency, priority="cmdline")
+
+        entity_resolution = bool(input_data.get("entity_resolution"))
+
+        duplicate_key_policy = input_data.get("duplicate_key_policy")
+        if duplicate_key_policy in ("count", "drop", "merge"):
+            settings.set("APIFY_DUPLICATE_KEY_POLICY", duplicate_key_policy, priority="cmdline")
+
+        _profile_settings(input_data.get("profile"), settings)
+        kv_available = actor_initialized and bool(os.environ.get("APIFY_TOKEN") or os.environ.get("APIFY_API_TOKEN"))
+        if _incremental_settings(input_data.get("incremental"), settings, kv_available):
+            msg = (
+                f"Incremental recrawl: policy={settings.get('RECRAWL_POLICY')} "
+                f"ttl_days={settings.getfloat('RECRAWL_TTL_DAYS'):g} store={settings.get('RECRAWL_STORE')}"
+            )
+            if actor_initialized:
+                actor.log.info(msg)
+            else:
+                log.info(msg)
+        if _conditional_get_settings(input_data.get("conditional_get"), settings, kv_available):
+            msg = (
+                f"Conditional GET: max_age_days={settings.getfloat('CONDITIONAL_GET_MAX_AGE_DAYS'):g} "
+                f"store={settings.get('CONDITIONAL_GET_STORE')}"
+            )
+            if actor_initialized:
+                actor.log.info(msg)
+            else:
+                log.info(msg)
+        raw_fields_store = _raw_fields_settings(input_data.get("raw_source_fields"), settings, kv_available)
+        if raw_fields_store:
+            location = settings.get("RAW_FIELDS_KV_STORE_NAME" if raw_fields_store == "kv" else "RAW_FIELDS_DIR")
+            msg = f"raw_source_fields: side store {raw_fields_store} ({location}), rows keep raw_source_ref"
+            if actor_initialized:
+                actor.log.info(msg)
+            else:
+                log.info(msg)
+        # After `incremental`/`conditional_get`: replay switches both off again.
+        http_cache_mode = _http_cache_settings(input_data.get("http_cache"), settings)
+        if http_cache_mode:
+            msg = f"HTTP cache: {http_cache_mode} in {settings.get('HTTPCACHE_DIR')}"
+            if actor_initialized:
+                actor.log.info(msg)
+            else:
+                log.info(msg)
+    except Exception as e:
+        log.warning("Failed applying execution mode from input: %s", e)
+
+    if event_loop_mode == "threaded":
+        actor_loop_thread = threading.Thread(target=actor_loop.run_forever, name="apify-actor-loop", daemon=True)
+        actor_loop_thread.start()
+    reactor = _install_reactor(event_loop_mode, actor_loop, settings)
+    _startup.mark("settings")
+
+    # Stack-sampling profiler over the whole run (reactor, apify-actor-loop and push threads).
+    profiler = None
+    if settings.getfloat("SAMPLING_PROFILER_INTERVAL_MS") > 0:
+        from sven_scraping_projects.sampling_profiler import SamplingProfiler
+
+        profiler = SamplingProfiler.from_settings(settings)
+        profiler.start()
+        set_sampling_profiler(profiler)
+        if actor_initialized:
+            actor.log.info(f"Sampling profiler started (every {profiler.interval_s * 1000.0:g} ms)")
+        else:
+            log.info("Sampling profiler started (every %g ms)", profiler.interval_s * 1000.0)
+    if actor_initialized:
+        actor.log.info(
+            f"Execution mode: {execution_mode}, event loop: {event_loop_mode} "
+            f"(CONCURRENT_REQUESTS_GLOBAL={settings.getint('CONCURRENT_REQUESTS_GLOBAL')})"
+        )
+    else:
+        log.info(
+            "Execution mode: %s, event loop: %s (CONCURRENT_REQUESTS_GLOBAL=%s)",
+            execution_mode,
+            event_loop_mode,
+            settings.getint("CONCURRENT_REQUESTS_GLOBAL"),
+        )
+
     # Best-effort graceful shutdown on SIGTERM (Apify migrations / preemption).
     # Scrapy + Twisted will still be interrupted, but this increases the chance
     # pipelines flush and stats are emitted before the container is stopped.
     def _handle_sigterm(signum, frame):
         received_sigterm["value"] = True
+        # Process mode: the worker loop forwards SIGTERM to every spider process.
+        sigterm_event.set()
         try:
             if actor_initialized:
                 Actor.log.warning("Received SIGTERM (likely migration). Attempting graceful shutdown...")
@@ -239,34 +633,63 @@ def main():
         else:
             log.info(msg)
 
-    d = run_spiders(spider_names, settings, log_fn=_log)
-
     had_error = {"value": False}
 
-    def _on_error(f: Failure):
-        had_error["value"] = True
-        tb = f.getTraceback()
-        if actor_initialized:
-            actor.log.error(f"Spider crashed:\n{tb}")
-        else:
-            log.error("Spider crashed:\n%s", tb)
-        try:
-            if reactor.running:
-                reactor.stop()
-        except Exception:
-            pass
-        return f
+    def _report_startup(spider_name=None):
+        if spider_name is None:
+            print(f"BOOT: startup {_startup.format()} (first requests are made by the worker processes)", flush=True)
+            return
+        _startup.mark("first_request")
+        print(f"BOOT: startup {_startup.format()} (first request: '{spider_name}')", flush=True)
+
+    if execution_mode == "process":
+        from src.process_runner import run_spider_processes
+
+        _report_startup()
+
+        outcome = run_spider_processes(
+            spider_names,
+            settings,
+            stop_event=sigterm_event,
+            log_fn=_log,
+            apify_available=actor_initialized,
+        )
+        _log(f"Worker processes finished; parent received {outcome.records_received} records")
+        if outcome.interrupted:
+            received_sigterm["value"] = True
+        if outcome.failed_spiders:
+            had_error["value"] = True
+            if actor_initialized:
+                actor.log.error(f"Worker processes failed: {list(outcome.failed_spiders)}")
+            else:
+                log.error("Worker processes failed: %s", list(outcome.failed_spiders))
+    else:
+        d = run_spiders(spider_names, settings, log_fn=_log, mode=execution_mode, on_first_request=_report_startup)
 
-    d.addErrback(_on_error)
+        def _on_error(f: Failure):
+            had_error["value"] = True
+            tb = f.getTraceback()
+            if actor_initialized:
+                actor.log.error(f"Spider crashed:\n{tb}")
+            else:
+                log.error("Spider crashed:\n%s", tb)
+            try:
+                if reactor.running:
+                    reactor.stop()
+            except Exception:
+                pass
+            return f
 
-    if actor_initialized:
-        actor.log.info('Running Twisted reactor...')
-    else:
-        log.info('Running Twisted reactor...')
-    # Twisted installs its own signal handlers by default, which can override our SIGTERM handler.
-    # On Apify, SIGTERM commonly indicates migration/preemption; we must detect it and exit with
-    # a non-zero code to allow the platform to restart/resume from JOBDIR state.
-    reactor.run(installSignalHandlers=False)
+        d.addErrback(_on_error)
+
+        if actor_initialized:
+            actor.log.info('Running Twisted reactor...')
+        else:
+            log.info('Running Twisted reactor...')
+        # Twisted installs its own signal handlers by default, which can override our SIGTERM handler.
+        # On Apify, SIGTERM commonly indicates migration/preemption; we must detect it and exit with
+        # a non-zero code to allow the platform to restart/resume from JOBDIR state.
+        reactor.run(installSignalHandlers=False)
     
     exit_code = 0
     # IMPORTANT: Apify migrations deliver SIGTERM. We persist crawl state via JOBDIR and
@@ -289,6 +712,27 @@ def main():
             actor.log.info(f"Spiders {spider_names} completed successfully")
         else:
             log.info("Spiders %s completed successfully", spider_names)
+        if entity_resolution and actor_initialized:
+            try:
+                stats = _run_on_actor_loop(_resolve_dataset_entities(actor), timeout=600)
+                actor.log.info(f"Entity resolution stored in {ENTITY_CLUSTERS_KEY}: {stats}")
+            except Exception as e:
+                # Post-processing only; the crawl itself succeeded.
+                actor.log.warning(f"Entity resolution failed (ignored): {e!r}")
+    if profiler is not None:
+        # Also on SIGTERM: a profile of the run up to the migration is still worth keeping.
+        try:
+            paths = _store_profiles(
+                profiler,
+                settings.get("SAMPLING_PROFILER_DIR"),
+                actor if actor_initialized else None,
+                _run_on_actor_loop,
+            )
+            _log(f"Sampling profiles stored: {[os.path.basename(p) for p in paths]}")
+        except Exception as e:
+            log.warning("Could not store sampling profiles (ignored): %r", e)
+        finally:
+            set_sampling_profiler(None)
     try:
         if actor_initialized and not received_sigterm["value"]:
             try:
@@ -314,7 +758,8 @@ def main():
                     pass
 
             try:
-                actor_loop_thread.join(timeout=15)
+                if actor_loop_thread is not None:
+                    actor_loop_thread.join(timeout=15)
             except Exception:
                 pass
         finally:
@@ -0,0 +1,327 @@
+"""
+Process-per-spider execution mode.
+
+Each selected spider runs in its own worker process (own Twisted reactor, own JOBDIR)
+so CPU-heavy parsing in one source cannot starve the others. Workers do not talk to
+the Apify dataset themselves: ApifyPipeline forwards finished records over a pipe
+(see apify_runtime.RecordSink) and a single pusher thread in the parent re-batches
+and pushes them, so dataset IDs and batching stay in one place.
+
+Workers keep no push ledger, since only the parent knows when a record was
+pushed. The parent opens one per spider in the spider's JOBDIR, where the
+threaded modes keep theirs: a record is journaled when it arrives from the pipe
+and committed once pushed. After a migration, the parent skips records committed
+before it and replays the rest, as ApifyPipeline does in the other modes. The
+ledger of a worker that exited cleanly is removed. Records still in a worker's
+pipe buffer when the worker is killed (after _SIGTERM_GRACE_S) never reach the
+journal; they come back only if Scrapy crawls their request again.
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import wait
+
+from scrapy.settings import SETTINGS_PRIORITIES
+
+from sven_scraping_projects.apify_runtime import get_actor_loop
+
+
+log = logging.getLogger(__name__)
+
+# Workers are started with "spawn": the parent already runs the apify-actor-loop thread,
+# and forking a process with live threads (and an installed epoll reactor) is unsafe.
+_MP_CONTEXT = "spawn"
+
+_JOIN_POLL_INTERVAL_S = 0.5
+_SIGTERM_GRACE_S = 60
+
+
+@dataclass
+class ProcessRunOutcome:
+    interrupted: bool = False
+    failed_spiders: tuple[str, ...] = ()
+    records_received: int = 0
+
+
+def _cmdline_overrides(settings) -> dict:
+    """Settings applied by main() from Actor input; re-applied in every worker."""
+    out = {}
+    for key in list(settings.keys()):
+        if key == "APIFY_ACTOR_LOOP":
+            continue
+        if settings.getpriority(key) == SETTINGS_PRIORITIES["cmdline"]:
+            out[key] = settings.get(key)
+    return out
+
+
+def _spider_process_main(name: str, settings_overrides: dict, conn) -> None:
+    """Worker entry point: run one spider in this process, forwarding records to the parent."""
+    # Install the SIGTERM handler before the heavy imports so an early migration still
+    # ends the worker with 143 instead of the default (unhandled) -15.
+    received_sigterm = {"value": False}
+    had_error = {"value": False}
+    reactor_ref = []
+
+    def _handle_sigterm(signum, frame):
+        received_sigterm["value"] = True
+        if reactor_ref:
+            try:
+                reactor_ref[0].callFromThread(reactor_ref[0].stop)
+            except Exception:
+                pass
+
+    try:
+        signal.signal(signal.SIGTERM, _handle_sigterm)
+    except Exception:
+        pass
+
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
+    worker_log = logging.getLogger(f"{__name__}.{name}")
+
+    from scrapy.utils.project import get_project_settings
+    from twisted.internet import reactor
+
+    from sven_scraping_projects.apify_runtime import RecordSink, set_record_sink
+    from src.main import run_spiders
+
+    reactor_ref.append(reactor)
+    if received_sigterm["value"]:
+        raise SystemExit(143)
+
+    sink = RecordSink(conn)
+    set_record_sink(sink)
+
+    settings = get_project_settings()
+    settings.setdict(settings_overrides, priority="cmdline")
+
+    def _on_error(f):
+        had_error["value"] = True
+        worker_log.error("Spider '%s' crashed:\n%s", name, f.getTraceback())
+        try:
+            if reactor.running:
+                reactor.stop()
+        except Exception:
+            pass
+
+    d = run_spiders([name], settings, log_fn=worker_log.info)
+    d.addErrback(_on_error)
+    reactor.run(installSignalHandlers=False)
+
+    try:
+        sink.close()
+    except Exception:
+        pass
+    set_record_sink(None)
+
+    if received_sigterm["value"]:
+        raise SystemExit(143)
+    raise SystemExit(1 if had_error["value"] else 0)
+
+
+class _SourceBatch(list):
+    """A batch of one spider's records; PushEngine hands it back to the push function as is."""
+
+    __slots__ = ("source",)
+
+    def __init__(self, records, source: str):
+        super().__init__(records)
+        self.source = source
+
+
+class _ParentDatasetPusher:
+    """Reads record chunks from all worker pipes and pushes them in dataset-sized batches."""
+
+    def __init__(self, conns: dict, *, apify_available: bool, settings=None):
+        # Imported lazily: pipelines pulls in the Apify SDK/client at module level.
+        from sven_scraping_projects.dataset_push import BatchSizeController, PushEngine
+        from sven_scraping_projects.pipelines import ApifyPipeline, open_push_ledger
+        from src.main import spider_jobdir
+
+        self._conns = dict(conns)
+        # One writer per spider, so records a failed push buffered are retried under its ledger.
+        self._writers = {
+            source: ApifyPipeline.dataset_writer(settings, apify_available=apify_available)
+            for source in self._conns.values()
+        }
+        self._ledgers = {}
+        if apify_available and settings is not None:
+            for source in self._conns.values():
+                ledger = open_push_ledger(spider_jobdir(source), settings)
+                if ledger is not None:
+                    self._ledgers[source] = ledger
+        # One byte target shared by all sources: it tracks the API's latency, not a spider's.
+        self._sizer = BatchSizeController.from_settings(settings)
+        # One lane per spider: batches from different workers push in parallel.
+        self._engine = PushEngine(
+            self._push,
+            max_in_flight=settings.getint("APIFY_PUSH_CONCURRENCY", 4) if settings is not None else 4,
+            preserve_order=settings.getbool("APIFY_PUSH_PRESERVE_ORDER", False) if settings is not None else False,
+            name="parent-dataset-push",
+            controller=self._sizer,
+        )
+        self.records_received = 0
+        self.error: Exception | None = None
+
+    def _push(self, batch: _SourceBatch, mode: str) -> None:
+        self._writers[batch.source].push_batch(batch, mode=mode, ledger=self._ledgers.get(batch.source))
+
+    def _batcher(self, batchers: dict, source: str):
+        from sven_scraping_projects.dataset_push import ByteBatcher
+
+        batcher = batchers.get(source)
+        if batcher is None:
+            writer = self._writers[source]
+            batcher = batchers[source] = ByteBatcher(
+                self._sizer,
+                max_items=writer.push_max_batch_items,
+                flush_interval_s=writer.push_flush_interval_s,
+            )
+        return batcher
+
+    def run(self) -> None:
+        from sven_scraping_projects.dataset_push import iter_batches
+
+        engine = self._engine
+        batchers = {}
+        try:
+            for source, ledger in self._ledgers.items():
+                # Accepted before the migration but never committed: push them first.
+                batcher = self._batcher(batchers, source)
+                for rec in ledger.replay:
+                    for records, nbytes, _reason in batcher.add(rec):
+                        engine.submit(source, _SourceBatch(records, source), mode="process", nbytes=nbytes)
+                ledger.replay = []
+
+            while self._conns:
+                for conn in wait(list(self._conns), timeout=0.25):
+                    try:
+                        chunk = conn.recv()
+                    except (EOFError, OSError):
+                        self._conns.pop(conn, None)
+                        continue
+                    self.records_received += len(chunk)
+                    source = self._conns[conn]
+                    if not self._writers[source].apify_available:
+                        continue
+                    batcher = self._batcher(batchers, source)
+                    ledger = self._ledgers.get(source)
+                    for rec in chunk:
+                        # Journaled before it is batched; committed or replayed records are skipped.
+                        if ledger is not None and not ledger.accept(rec):
+                            continue
+                        for records, nbytes, _reason in batcher.add(rec):
+                            engine.submit(source, _SourceBatch(records, source), mode="process", nbytes=nbytes)
+
+                for source, batcher in batchers.items():
+                    if batcher.due():
+                        records, nbytes, _reason = batcher.take("interval")
+                        engine.submit(source, _SourceBatch(records, source), mode="process", nbytes=nbytes)
+
+            for source, batcher in batchers.items():
+                tail = batcher.take("final")
+                if tail is not None:
+                    engine.submit(source, _SourceBatch(tail[0], source), mode="process", nbytes=tail[1])
+            engine.drain()
+            # Records that failed to push were buffered by their writer; retry once more.
+            for source, writer in self._writers.items():
+                for records, _nbytes, _reason in iter_batches(
+                    writer.take_buffered(), self._sizer, max_items=writer.push_max_batch_items, reason="overflow"
+                ):
+                    writer.push_batch(records, mode="overflow", ledger=self._ledgers.get(source))
+        except Exception as e:
+            self.error = e
+            log.error("Parent dataset pusher crashed: %r", e)
+        finally:
+            engine.close()
+            for ledger in self._ledgers.values():
+                ledger.close()
+        log.info(
+            "Parent dataset pusher: %d batches, %d records, %d bytes pushed (batch target %d bytes)",
+            engine.batches,
+            engine.items,
+            engine.bytes,
+            self._sizer.target,
+        )
+
+    def discard_ledgers(self, sources) -> None:
+        """Remove the push ledgers of spiders that finished (closed, nothing left pending)."""
+        for source in sources:
+            ledger = self._ledgers.get(source)
+            if ledger is not None and ledger.discard():
+                log.info("Spider '%s' finished; push ledger removed", source)
+
+
+def run_spider_processes(spider_names, settings, *, stop_event: threading.Event, log_fn=None,
+                         apify_available: bool = True) -> ProcessRunOutcome:
+    """
+    Start one worker process per spider and block until all have exited.
+
+    stop_event is set by main()'s SIGTERM handler; the signal is then forwarded to
+    every worker so each one persists its JOBDIR and exits with 143.
+    """
+    ctx = multiprocessing.get_context(_MP_CONTEXT)
+    overrides = _cmdline_overrides(settings)
+
+    procs = {}
+    parent_conns = {}
+    for name in spider_names:
+        parent_conn, child_conn = ctx.Pipe(duplex=False)
+        proc = ctx.Process(
+            target=_spider_process_main,
+            args=(name, overrides, child_conn),
+            name=f"spider-{name}",
+        )
+        proc.start()
+        # The parent must drop its copy of the write end so EOF is seen when the worker exits.
+        child_conn.close()
+        procs[name] = proc
+        parent_conns[parent_conn] = name
+        if log_fn:
+            log_fn(f"Started worker process for '{name}' (pid={proc.pid})")
+
+    pusher = _ParentDatasetPusher(parent_conns, apify_available=apify_available, settings=settings)
+    pusher_thread = threading.Thread(target=pusher.run, name="dataset-pusher", daemon=True)
+    pusher_thread.start()
+
+    forwarded_at = None
+    pending = dict(procs)
+    while pending:
+        if stop_event.is_set() and forwarded_at is None:
+            forwarded_at = time.monotonic()
+            for proc in pending.values():
+                try:
+                    os.kill(proc.pid, signal.SIGTERM)
+                except Exception:
+                    pass
+        if forwarded_at is not None and time.monotonic() - forwarded_at > _SIGTERM_GRACE_S:
+            for proc in pending.values():
+                proc.kill()
+        time.sleep(_JOIN_POLL_INTERVAL_S)
+        for name, proc in list(pending.items()):
+            if proc.exitcode is not None:
+                proc.join()
+                pending.pop(name)
+                if log_fn:
+                    log_fn(f"Worker '{name}' exited with code {proc.exitcode}")
+
+    pusher_thread.join(timeout=600)
+    if pusher_thread.is_alive():
+        log.error("Parent dataset pusher did not finish within 600s")
+
+    sigterm_codes = (143, -signal.SIGTERM)
+    interrupted = stop_event.is_set() or any(p.exitcode in sigterm_codes for p in procs.values())
+    failed = tuple(name for name, p in procs.items() if p.exitcode not in (0,) + sigterm_codes)
+    if not pusher_thread.is_alive():
+        pusher.discard_ledgers(name for name, p in procs.items() if p.exitcode == 0)
+    if pusher.error is not None or pusher_thread.is_alive():
+        failed = failed + ("<dataset-pusher>",)
+    return ProcessRunOutcome(
+        interrupted=interrupted,
+        failed_spiders=failed,
+        records_received=pusher.records_received,
+    )
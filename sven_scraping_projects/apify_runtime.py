@@ -18,3 +18,56 @@ def get_actor_loop() -> Any | None:
     with _lock:
         return _actor_loop
 
+
+
+class RecordSink:
+    """
+    Forwards finished dataset records from a spider worker process to the parent.
+
+    Used by the process-per-spider execution mode (src/process_runner.py): the
+    pipeline in each worker sends chunks here instead of pushing to the dataset,
+    and a single pusher in the parent owns batching and the dataset client.
+    """
+
+    def __init__(self, conn: Any):
+        self._conn = conn
+        self._send_lock = threading.Lock()
+
+    def send(self, chunk: list[dict]) -> None:
+        # Pipeline push worker and close_spider's overflow flush may send concurrently.
+        with self._send_lock:
+            self._conn.send(chunk)
+
+    def close(self) -> None:
+        with self._send_lock:
+            self._conn.close()
+
+
+_record_sink: RecordSink | None = None
+
+
+def set_record_sink(sink: RecordSink | None) -> None:
+    global _record_sink
+    with _lock:
+        _record_sink = sink
+
+
+def get_record_sink() -> RecordSink | None:
+    with _lock:
+        return _record_sink
+
+
+# Process-wide stack-sampling profiler (sampling_profiler.py): started by src/main.py from
+# Actor input, or by SamplingProfilerExtension in process-mode workers.
+_sampling_profiler: Any | None = None
+
+
+def set_sampling_profiler(profiler: Any | None) -> None:
+    global _sampling_profiler
+    with _lock:
+        _sampling_profiler = profiler
+
+
+def get_sampling_profiler() -> Any | None:
+    with _lock:
+        return _sampling_profiler
@@ -0,0 +1,140 @@
+"""
+Per-callback latency and CPU profile of a crawl.
+
+For every callback (keyed by qualified name, e.g. `AsklepiosSpider.parse_profile`)
+CallbackProfile keeps bounded log-bucket histograms of:
+
+- total_ms: request scheduled -> response downloaded (scheduler + slot + network),
+- slot_wait_ms: time spent queued in the download slot (delay / concurrency limit),
+- download_ms: the transfer itself, as Scrapy measures it (`download_latency`),
+- parse_cpu_ms: CPU time of the reactor thread spent inside the callback,
+
+plus response, item and request counts. Where a slow crawl spends its time
+(scheduler, slot, network or parser) can be read straight off the p50/p90/p99
+that publish() writes to the crawl stats. CallbackProfileMiddleware
+(middlewares.py) does the measuring.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+
+STATS_PREFIX = "callback_profile"
+METRICS = ("total_ms", "slot_wait_ms", "download_ms", "parse_cpu_ms")
+PERCENTILES = (50, 90, 99)
+# Bucket bounds grow by 2**(1/8) (~9% apart): percentiles are accurate to one bucket.
+_BUCKET_BASE = 2 ** 0.125
+_LOG_BASE = math.log(_BUCKET_BASE)
+_MIN_VALUE = 0.001
+
+
+class LogHistogram:
+    """Streaming histogram with geometric buckets; memory stays bounded whatever the crawl size."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        value = max(float(value), 0.0)
+        index = math.ceil(math.log(max(value, _MIN_VALUE)) / _LOG_BASE)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the pct-th value (never above the max seen)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(pct / 100.0 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(_BUCKET_BASE**index, self.max)
+        return self.max
+
+
+@dataclass
+class CallbackStats:
+    responses: int = 0
+    items: int = 0
+    requests: int = 0
+    histograms: dict[str, LogHistogram] = field(default_factory=lambda: {m: LogHistogram() for m in METRICS})
+
+
+def callback_name(request, spider=None) -> str:
+    """'AsklepiosSpider.parse_profile' for a bound method; Scrapy's default callback is spider.parse."""
+    callback = getattr(request, "callback", None)
+    if callback is None:
+        callback = getattr(spider, "parse", None)
+        if callback is None:
+            return "parse"
+    func = getattr(callback, "__func__", callback)
+    return getattr(func, "__qualname__", None) or getattr(func, "__name__", None) or repr(callback)
+
+
+class CallbackProfile:
+    def __init__(self):
+        self.callbacks: dict[str, CallbackStats] = {}
+
+    def _entry(self, name: str) -> CallbackStats:
+        entry = self.callbacks.get(name)
+        if entry is None:
+            entry = self.callbacks[name] = CallbackStats()
+        return entry
+
+    def add_download(self, name: str, *, total_ms=None, slot_wait_ms=None, download_ms=None) -> None:
+        hist = self._entry(name).histograms
+        if total_ms is not None:
+            hist["total_ms"].add(total_ms)
+        if slot_wait_ms is not None:
+            hist["slot_wait_ms"].add(slot_wait_ms)
+        if download_ms is not None:
+            hist["download_ms"].add(download_ms)
+
+    def add_parse(self, name: str, *, cpu_ms: float, items: int, requests: int) -> None:
+        entry = self._entry(name)
+        entry.responses += 1
+        entry.items += items
+        entry.requests += requests
+        entry.histograms["parse_cpu_ms"].add(cpu_ms)
+
+    def publish(self, stats) -> None:
+        """Write counts and p50/p90/p99/max per callback and metric to crawl stats."""
+        for name, entry in self.callbacks.items():
+            prefix = f"{STATS_PREFIX}/{name}"
+            stats.set_value(f"{prefix}/responses", entry.responses)
+            stats.set_value(f"{prefix}/items", entry.items)
+            stats.set_value(f"{prefix}/requests", entry.requests)
+            for metric, hist in entry.histograms.items():
+                if not hist.count:
+                    continue
+                for pct in PERCENTILES:
+                    stats.set_value(f"{prefix}/{metric}/p{pct}", round(hist.percentile(pct), 3))
+                stats.set_value(f"{prefix}/{metric}/max", round(hist.max, 3))
+                if metric == "parse_cpu_ms":
+                    stats.set_value(f"{prefix}/parse_cpu_s_total", round(hist.total / 1000.0, 3))
+
+    def summary(self) -> str:
+        """One compact segment per callback for the run summary log line, busiest parser first."""
+        parts = []
+        ordered = sorted(
+            self.callbacks.items(), key=lambda kv: kv[1].histograms["parse_cpu_ms"].total, reverse=True
+        )
+        for name, entry in ordered:
+            hist = entry.histograms
+            metrics = " ".join(
+                f"{metric[:-3]}={'/'.join(f'{hist[metric].percentile(p):.1f}' for p in PERCENTILES)}"
+                for metric in METRICS
+                if hist[metric].count
+            )
+            parts.append(f"{name}[n={entry.responses} items={entry.items} {metrics}]")
+        return " ".join(parts)
@@ -0,0 +1,623 @@
+"""
+Dataset push batching and concurrency, used by ApifyPipeline and the process-mode parent pusher.
+
+One HTTP round trip per batch caps push throughput at batch_size / latency.
+PushEngine keeps up to `max_in_flight` batches running on a thread pool
+instead, and reports queue depth, push latency and uploaded bytes through
+Scrapy stats. AsyncPushEngine does the same with asyncio tasks for the single
+event loop mode (APIFY_EVENT_LOOP_MODE=single), where the reactor itself runs
+on the Actor SDK's loop and a push is just an awaited request.
+
+Record sizes vary a lot between sources (an Asklepios row with career
+highlights is several times an apothekerkammer row), so batches are cut by
+serialized bytes rather than item count: ByteBatcher accumulates records up
+to the target set by BatchSizeController, which grows the target while pushes
+come back fast and halves it when they turn slow, always staying under the
+platform's per-request payload limit.
+
+Each record is encoded to JSON once, in process_item, as an EncodedRecord.
+ByteBatcher sizes it from those bytes, SpillQueue writes them as they are, and
+a batch goes to the API client as the records' bytes joined into one JSON
+array string, which the client sends without encoding it again. orjson is
+used when it is installed (APIFY_PUSH_ENCODER); both encoders write the same
+bytes.
+
+Ordering, per source:
+- Batches are started in submit order and acknowledged (counted in the
+  batches/items stats) strictly in submit order, even when a later batch's
+  request finishes first.
+- With preserve_order=True a source never has more than one batch in flight,
+  so its rows land in the dataset in the order they were yielded. Different
+  sources still push in parallel.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder writes the same bytes, only slower
+    orjson = None
+
+STATS_PREFIX = "pipeline/push"
+# Upper bounds (ms) of the push latency histogram buckets; the last bucket is open-ended.
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Upper bounds (KiB) of the batch payload size histogram buckets.
+BATCH_KIB_BUCKETS = (64, 256, 1024, 4096, 9216)
+
+# The Apify API rejects dataset pushes over 9 MB; keep a margin for request overhead.
+DEFAULT_MAX_PAYLOAD_BYTES = 9 * 1024 * 1024
+PAYLOAD_SAFETY_MARGIN = 0.05
+
+
+def _bucket(value: float, bounds: tuple, unit: str) -> str:
+    for bound in bounds:
+        if value <= bound:
+            return f"le_{bound}{unit}"
+    return f"gt_{bounds[-1]}{unit}"
+
+
+def latency_bucket(ms: float) -> str:
+    return _bucket(ms, LATENCY_BUCKETS_MS, "")
+
+
+ENCODERS = ("auto", "orjson", "json", "client")
+
+
+def _json_encode(record) -> bytes:
+    # Lone surrogates (from \ud800-style escapes in source JSON) become JSON escapes again.
+    return json.dumps(record, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=str).encode(
+        "utf-8", "backslashreplace"
+    )
+
+
+def _orjson_encode(record) -> bytes:
+    try:
+        return orjson.dumps(record, default=str)
+    except orjson.JSONEncodeError:
+        return _json_encode(record)
+
+
+def record_encoder(name: str = "auto"):
+    """The encoder for APIFY_PUSH_ENCODER, or None for "client" (records stay dicts, the client encodes)."""
+    if name not in ENCODERS:
+        raise ValueError(f"APIFY_PUSH_ENCODER must be one of {ENCODERS!r}, not {name!r}")
+    if name == "client":
+        return None
+    if name == "orjson" and orjson is None:
+        raise ValueError("APIFY_PUSH_ENCODER=orjson needs the orjson package")
+    return _orjson_encode if name != "json" and orjson is not None else _json_encode
+
+
+class EncodedRecord(dict):
+    """
+    A dataset record and its JSON (UTF-8, compact separators), encoded once.
+
+    Still a dict, so dedupe, the ledger and Actor.push_data use it unchanged;
+    it must not be modified after encoding. In process mode only the bytes
+    cross the pipe to the parent.
+    """
+
+    __slots__ = ("payload", "rid")
+
+    def __init__(self, record: dict, payload: bytes):
+        super().__init__(record)
+        self.payload = payload
+        # Content ID, cached by push_ledger.record_id().
+        self.rid: int | None = None
+
+    @classmethod
+    def from_payload(cls, payload: bytes) -> "EncodedRecord":
+        if orjson is not None:
+            try:
+                return cls(orjson.loads(payload), payload)
+            except orjson.JSONDecodeError:  # escaped lone surrogates, which orjson refuses
+                pass
+        return cls(json.loads(payload), payload)
+
+    def __reduce__(self):
+        return EncodedRecord.from_payload, (self.payload,)
+
+
+def encode_record(record: dict, encoder=_json_encode) -> EncodedRecord:
+    return EncodedRecord(record, encoder(record))
+
+
+def join_payload(chunk: list) -> bytes:
+    """`chunk` as one JSON array, from the records' own bytes; plain dicts are encoded here."""
+    return b"[" + b", ".join(r.payload if r.__class__ is EncodedRecord else _json_encode(r) for r in chunk) + b"]"
+
+
+def record_bytes(record: dict) -> int:
+    """Serialized size of one record: its encoded bytes, or as the Apify client would encode it."""
+    if record.__class__ is EncodedRecord:
+        return len(record.payload)
+    return len(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+
+
+def payload_bytes(chunk: list[dict]) -> int:
+    """Size of `chunk` as the dataset API receives it (UTF-8 JSON array)."""
+    if chunk and all(r.__class__ is EncodedRecord for r in chunk):
+        return _array_bytes(sum(len(r.payload) for r in chunk), len(chunk))
+    return len(json.dumps(chunk, ensure_ascii=False).encode("utf-8"))
+
+
+def _array_bytes(item_bytes: int, count: int) -> int:
+    # json.dumps(list): "[" + items joined by ", " + "]"
+    return item_bytes + max(0, count - 1) * 2 + 2
+
+
+class BatchSizeController:
+    """
+    Target payload size for push batches, adapted to observed push latency.
+
+    Pushes that were cut by size and finished under `target_latency_ms` grow the
+    target by 25%; ones that took more than twice as long halve it. Small
+    batches (interval or final flushes) say little about what size costs and
+    are ignored. The target stays within [min_bytes, limit], where limit is the
+    platform payload limit minus PAYLOAD_SAFETY_MARGIN.
+    """
+
+    GROW = 1.25
+    SHRINK = 0.5
+
+    def __init__(
+        self,
+        *,
+        initial_bytes: int = 1024 * 1024,
+        min_bytes: int = 64 * 1024,
+        max_payload_bytes: int = DEFAULT_MAX_PAYLOAD_BYTES,
+        target_latency_ms: float = 1000.0,
+        stats=None,
+    ):
+        self.limit = int(max_payload_bytes * (1.0 - PAYLOAD_SAFETY_MARGIN))
+        self.min_bytes = max(1, min(int(min_bytes), self.limit))
+        self.target_latency_ms = float(target_latency_ms)
+        self._stats = stats
+        self._lock = threading.Lock()
+        self.target = self._clamp(initial_bytes)
+        self._publish()
+
+    @classmethod
+    def from_settings(cls, settings, stats=None) -> "BatchSizeController":
+        if settings is None:
+            return cls(stats=stats)
+        return cls(
+            initial_bytes=settings.getint("APIFY_PUSH_BATCH_BYTES", 1024 * 1024),
+            min_bytes=settings.getint("APIFY_PUSH_MIN_BATCH_BYTES", 64 * 1024),
+            max_payload_bytes=settings.getint("APIFY_PUSH_MAX_PAYLOAD_BYTES", DEFAULT_MAX_PAYLOAD_BYTES),
+            target_latency_ms=settings.getfloat("APIFY_PUSH_TARGET_LATENCY_MS", 1000.0),
+            stats=stats,
+        )
+
+    def _clamp(self, value) -> int:
+        return max(self.min_bytes, min(self.limit, int(value)))
+
+    def _publish(self) -> None:
+        if self._stats is not None:
+            self._stats.set_value(f"{STATS_PREFIX}/batch_bytes_target", self.target)
+            self._stats.max_value(f"{STATS_PREFIX}/batch_bytes_target_max", self.target)
+            self._stats.min_value(f"{STATS_PREFIX}/batch_bytes_target_min", self.target)
+
+    def observe(self, latency_ms: float, nbytes: int) -> None:
+        with self._lock:
+            if nbytes < self.target * 0.5:
+                return
+            if latency_ms > 2.0 * self.target_latency_ms:
+                new = self._clamp(self.target * self.SHRINK)
+            elif latency_ms < self.target_latency_ms:
+                new = self._clamp(self.target * self.GROW)
+            else:
+                return
+            if new != self.target:
+                self.target = new
+                self._publish()
+
+
+class ByteBatcher:
+    """
+    Accumulates records into batches bounded by the controller's byte target.
+
+    add() returns the batches that became ready as (records, payload_bytes,
+    flush_reason) tuples; reasons are "bytes", "items", "oversized" (a single
+    record above the payload limit, sent alone so the API error names it),
+    and, from take(), whatever the caller passes ("interval", "final", ...).
+    """
+
+    def __init__(self, controller: BatchSizeController, *, max_items: int = 5000,
+                 flush_interval_s: float = 2.0, stats=None):
+        self.controller = controller
+        self.max_items = max(1, int(max_items))
+        self.flush_interval_s = flush_interval_s
+        self._stats = stats
+        self._records: list = []
+        self._bytes = 0
+        self._last_flush = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _stat_inc(self, key: str, count=1) -> None:
+        if self._stats is not None:
+            self._stats.inc_value(f"{STATS_PREFIX}/{key}", count)
+
+    def _emit(self, reason: str):
+        records, nbytes = self._records, _array_bytes(self._bytes, len(self._records))
+        self._records, self._bytes = [], 0
+        self._last_flush = time.monotonic()
+        self._stat_inc(f"flush_reason/{reason}")
+        self._stat_inc(f"batch_bytes/{_bucket(nbytes / 1024.0, BATCH_KIB_BUCKETS, 'k')}")
+        if self._stats is not None:
+            self._stats.max_value(f"{STATS_PREFIX}/batch_items_max", len(records))
+            self._stats.max_value(f"{STATS_PREFIX}/batch_bytes_max", nbytes)
+        return records, nbytes, reason
+
+    def add(self, record: dict, size: int | None = None) -> list:
+        size = record_bytes(record) if size is None else size
+        ready = []
+        if _array_bytes(size, 1) > self.controller.limit:
+            if self._records:
+                ready.append(self._emit("bytes"))
+            self._records, self._bytes = [record], size
+            self._stat_inc("oversized_records")
+            ready.append(self._emit("oversized"))
+            return ready
+        if self._records and _array_bytes(self._bytes + size, len(self._records) + 1) > self.controller.target:
+            ready.append(self._emit("bytes"))
+        self._records.append(record)
+        self._bytes += size
+        if len(self._records) >= self.max_items:
+            ready.append(self._emit("items"))
+        return ready
+
+    def due(self, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return bool(self._records) and (now - self._last_flush) >= self.flush_interval_s
+
+    def take(self, reason: str):
+        """Emit whatever is buffered (or None when empty)."""
+        return self._emit(reason) if self._records else None
+
+
+def iter_batches(records: list, controller: BatchSizeController, *, max_items: int = 5000,
+                 reason: str = "final", stats=None):
+    """Split a list of records into byte-bounded batches (records, payload_bytes, reason)."""
+    batcher = ByteBatcher(controller, max_items=max_items, stats=stats)
+    for record in records:
+        yield from batcher.add(record)
+    tail = batcher.take(reason)
+    if tail is not None:
+        yield tail
+
+
+class _Batch:
+    __slots__ = ("source", "size", "future", "on_acked")
+
+    def __init__(self, source: str, size: int, future: Future, on_acked):
+        self.source = source
+        self.size = size
+        self.future = future
+        self.on_acked = on_acked
+
+
+class _PushEngineBase:
+    """
+    What PushEngine and AsyncPushEngine share: the in-flight count, per-source
+    lanes and their acknowledgements, the first push error, and stats.
+    """
+
+    def __init__(
+        self,
+        push_fn,
+        *,
+        max_in_flight: int = 4,
+        preserve_order: bool = False,
+        stats=None,
+        controller: BatchSizeController | None = None,
+    ):
+        self._push_fn = push_fn
+        self._controller = controller
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.preserve_order = bool(preserve_order)
+        self._stats = stats
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._lanes: dict[str, deque[_Batch]] = {}
+        self._error: BaseException | None = None
+        self.batches = 0
+        self.items = 0
+        self.bytes = 0
+
+    # -- stats ---------------------------------------------------------------
+
+    def _stat_inc(self, key: str, count=1) -> None:
+        if self._stats is not None:
+            self._stats.inc_value(f"{STATS_PREFIX}/{key}", count)
+
+    def _stat_max(self, key: str, value) -> None:
+        if self._stats is not None:
+            self._stats.max_value(f"{STATS_PREFIX}/{key}", value)
+
+    def record_queue_depth(self, depth: int) -> None:
+        """Called by the batching thread with the size of the queue it drains."""
+        if self._stats is not None:
+            with self._cond:
+                self._stats.set_value(f"{STATS_PREFIX}/queue_depth", depth)
+                self._stat_max("queue_depth_max", depth)
+
+    # -- lanes ---------------------------------------------------------------
+
+    def _lane_busy(self, source: str) -> bool:
+        return self.preserve_order and any(not b.future.done() for b in self._lanes.get(source, ()))
+
+    def _finished(self, batch: _Batch) -> None:
+        callbacks = []
+        with self._cond:
+            self._in_flight -= 1
+            err = batch.future.exception()
+            if err is not None:
+                if self._error is None:
+                    self._error = err
+                self._stat_inc("errors")
+            else:
+                latency_ms, size = batch.future.result()
+                self.bytes += size
+                self._stat_inc("bytes", size)
+                self._stat_inc(f"latency_ms/{latency_bucket(latency_ms)}")
+                self._stat_max("latency_ms_max", round(latency_ms, 1))
+            # Acknowledge the contiguous run of finished batches at the head of this source's lane.
+            lane = self._lanes.get(batch.source)
+            while lane and lane[0].future.done() and lane[0].future.exception() is None:
+                head = lane.popleft()
+                self.batches += 1
+                self.items += head.size
+                self._stat_inc("batches")
+                self._stat_inc("items", head.size)
+                if head.on_acked is not None:
+                    callbacks.append(head.on_acked)
+            self._cond.notify_all()
+        # Callbacks of different threads may interleave; acknowledgements must tolerate that
+        # (SpillQueue.ack ignores positions older than the one it has).
+        for callback in callbacks:
+            callback()
+
+
+class PushEngine(_PushEngineBase):
+    """
+    Runs `push_fn(chunk, mode)` for up to `max_in_flight` batches concurrently.
+
+    submit() blocks while the engine is full, so the caller's queue backs up
+    (and spills, in ApifyPipeline) exactly as it did with a single inline push.
+    The first push error is re-raised from the next submit() or drain().
+    """
+
+    def __init__(
+        self,
+        push_fn: Callable[[list, str], None],
+        *,
+        max_in_flight: int = 4,
+        preserve_order: bool = False,
+        stats=None,
+        name: str = "dataset-push",
+        controller: BatchSizeController | None = None,
+    ):
+        super().__init__(
+            push_fn, max_in_flight=max_in_flight, preserve_order=preserve_order, stats=stats, controller=controller
+        )
+        self._pool = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix=name)
+
+    # -- push ----------------------------------------------------------------
+
+    def submit(self, source: str, chunk: list, *, mode: str = "streaming", nbytes: int | None = None,
+               on_acked: Callable[[], None] | None = None) -> None:
+        """
+        Queue `chunk` for pushing. `on_acked` runs once this batch and every
+        earlier batch of the same source have been pushed.
+        """
+        if not chunk:
+            return
+        with self._cond:
+            while self._error is None and (self._in_flight >= self.max_in_flight or self._lane_busy(source)):
+                self._cond.wait()
+            if self._error is not None:
+                raise self._error
+            self._in_flight += 1
+            self._stat_max("in_flight_max", self._in_flight)
+            future = self._pool.submit(self._run, chunk, mode, nbytes)
+            batch = _Batch(source, len(chunk), future, on_acked)
+            self._lanes.setdefault(source, deque()).append(batch)
+        future.add_done_callback(lambda f, b=batch: self._finished(b))
+
+    def _run(self, chunk: list, mode: str, nbytes: int | None) -> tuple[float, int]:
+        size = payload_bytes(chunk) if nbytes is None else nbytes
+        started = time.perf_counter()
+        self._push_fn(chunk, mode)
+        latency_ms = (time.perf_counter() - started) * 1000.0
+        if self._controller is not None:
+            self._controller.observe(latency_ms, size)
+        return latency_ms, size
+
+    def drain(self, timeout: float | None = None) -> None:
+        """Wait until no batch is in flight; re-raise the first push error."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._in_flight and self._error is None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"{self._in_flight} dataset push batches still in flight after {timeout}s")
+                self._cond.wait(remaining)
+            if self._error is not None:
+                raise self._error
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+class AsyncPushEngine(_PushEngineBase):
+    """
+    PushEngine for the single event loop mode: `push_fn(chunk, mode)` is a
+    coroutine function, and each batch runs as a task on `loop` (the loop the
+    AsyncioSelectorReactor runs on).
+
+    Ordering, acknowledgements and stats are shared with PushEngine (_PushEngineBase).
+    submit() never blocks, since it is called from the reactor; batches beyond
+    `max_in_flight` wait in a FIFO. Their records count in `pending_items`, so
+    PushBackpressure sees them, and they are started as earlier batches finish.
+    The first push error is re-raised from the next submit() or drain().
+    """
+
+    def __init__(self, push_fn, *, loop: asyncio.AbstractEventLoop, max_in_flight: int = 4,
+                 preserve_order: bool = False, stats=None, controller: BatchSizeController | None = None):
+        # No pool: the base's Condition only guards bookkeeping here (one thread).
+        super().__init__(
+            push_fn, max_in_flight=max_in_flight, preserve_order=preserve_order, stats=stats, controller=controller
+        )
+        self.loop = loop
+        self._pending: deque = deque()
+        self._idle: asyncio.Future | None = None
+        self.pending_items = 0
+
+    def submit(self, source: str, chunk: list, *, mode: str = "streaming", nbytes: int | None = None,
+               on_acked: Callable[[], None] | None = None) -> None:
+        if self._error is not None:
+            raise self._error
+        if not chunk:
+            return
+        self._pending.append((source, chunk, mode, nbytes, on_acked))
+        self.pending_items += len(chunk)
+        self._start_pending()
+
+    def _start_pending(self) -> None:
+        index = 0
+        while index < len(self._pending) and self._in_flight < self.max_in_flight and self._error is None:
+            source, chunk, mode, nbytes, on_acked = self._pending[index]
+            if self._lane_busy(source):
+                # Other sources may overtake; this one keeps its order.
+                index += 1
+                continue
+            del self._pending[index]
+            self.pending_items -= len(chunk)
+            self._in_flight += 1
+            self._stat_max("in_flight_max", self._in_flight)
+            task = self.loop.create_task(self._run(chunk, mode, nbytes))
+            batch = _Batch(source, len(chunk), task, on_acked)
+            self._lanes.setdefault(source, deque()).append(batch)
+            task.add_done_callback(lambda t, b=batch: self._finished(b))
+
+    async def _run(self, chunk: list, mode: str, nbytes: int | None) -> tuple[float, int]:
+        size = payload_bytes(chunk) if nbytes is None else nbytes
+        started = time.perf_counter()
+        await self._push_fn(chunk, mode)
+        latency_ms = (time.perf_counter() - started) * 1000.0
+        if self._controller is not None:
+            self._controller.observe(latency_ms, size)
+        return latency_ms, size
+
+    def _finished(self, batch: _Batch) -> None:
+        if batch.future.cancelled():
+            # Loop shut down mid-push (SIGTERM): the push ledger replays the batch on resume.
+            self._in_flight -= 1
+            return
+        super()._finished(batch)
+        self._start_pending()
+        if self._idle is not None and not self._idle.done() and (self._error is not None or not self._busy()):
+            self._idle.set_result(None)
+
+    def _busy(self) -> bool:
+        return bool(self._in_flight or self._pending)
+
+    async def drain(self, timeout: float | None = None) -> None:
+        """Wait until every submitted batch was pushed; re-raise the first push error."""
+        if self._busy() and self._error is None:
+            self._idle = self.loop.create_future()
+            try:
+                await asyncio.wait_for(asyncio.shield(self._idle), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(
+                    f"{self._in_flight} dataset push batches in flight, {len(self._pending)} queued after {timeout}s"
+                ) from None
+            finally:
+                self._idle = None
+        if self._error is not None:
+            raise self._error
+
+    def close(self) -> None:
+        self._pending.clear()
+        self.pending_items = 0
+
+
+class PushBackpressure:
+    """
+    High/low watermark switch between the push backlog and the crawl.
+
+    check() is called with the current backlog (records queued, spilled or
+    buffered but not pushed yet). At or above `high_items` it calls pause(); once
+    paused, it calls resume() when the backlog is at or below `low_items`. The
+    gap between the two keeps the engine from flapping. Pause counts and
+    durations go to pipeline/push/backpressure/* stats.
+    """
+
+    def __init__(
+        self,
+        pause: Callable[[], None],
+        resume: Callable[[], None],
+        *,
+        high_items: int = 20000,
+        low_items: int = 5000,
+        stats=None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.high_items = max(1, int(high_items))
+        self.low_items = max(0, min(int(low_items), self.high_items - 1))
+        self._pause = pause
+        self._resume = resume
+        self._stats = stats
+        self._clock = clock
+        self._paused_at: float | None = None
+        self.pauses = 0
+        self.paused_seconds = 0.0
+
+    @classmethod
+    def from_settings(cls, settings, pause, resume, stats=None) -> "PushBackpressure":
+        return cls(
+            pause,
+            resume,
+            high_items=settings.getint("APIFY_PUSH_BACKPRESSURE_HIGH_ITEMS", 20000),
+            low_items=settings.getint("APIFY_PUSH_BACKPRESSURE_LOW_ITEMS", 5000),
+            stats=stats,
+        )
+
+    @property
+    def paused(self) -> bool:
+        return self._paused_at is not None
+
+    def check(self, backlog: int) -> None:
+        if self._paused_at is None:
+            if backlog >= self.high_items:
+                self._paused_at = self._clock()
+                self.pauses += 1
+                if self._stats is not None:
+                    self._stats.inc_value(f"{STATS_PREFIX}/backpressure/pauses")
+                    self._stats.max_value(f"{STATS_PREFIX}/backpressure/backlog_max", backlog)
+                self._pause()
+        elif backlog <= self.low_items:
+            self.release()
+
+    def release(self) -> None:
+        """Resume (if paused) and account the pause; also used on shutdown."""
+        if self._paused_at is None:
+            return
+        duration = self._clock() - self._paused_at
+        self._paused_at = None
+        self.paused_seconds += duration
+        if self._stats is not None:
+            self._stats.set_value(f"{STATS_PREFIX}/backpressure/paused_seconds", round(self.paused_seconds, 3))
+            self._stats.max_value(f"{STATS_PREFIX}/backpressure/pause_seconds_max", round(duration, 3))
+        self._resume()
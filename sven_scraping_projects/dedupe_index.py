@@ -0,0 +1,309 @@
+"""
+Compact duplicate-key index for ApifyPipeline.
+
+Keys (source_url) are reduced to 64-bit BLAKE2b hashes and kept either in a
+sorted array("Q") (exact up to hash collisions, ~8 bytes per key) or in a
+Bloom filter sized for an expected key count and false-positive rate (fewer
+bytes per key, but a new key is occasionally reported as seen).
+
+With a directory (the spider's JOBDIR) the index survives a migration restart:
+every new hash is appended to <name>.log as it is added, and close() writes
+the whole index to <name>.bin and truncates the log. Loading reads the .bin
+snapshot and replays the log. The log is flushed in batches (on each merge of
+the sorted index, every _LOG_FLUSH_EVERY hashes, and at close), so a crash
+loses at most the hashes added since the last flush; those keys count as new
+once more after the restart.
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import math
+import os
+import struct
+import sys
+from array import array
+
+_HASH = struct.Struct("<Q")
+_BLOOM_HEADER = struct.Struct("<4sQQ")
+_BLOOM_MAGIC = b"BLM1"
+_LOG_FLUSH_EVERY = 4096
+# A 64-bit hash as a Python int (most hashes need all 64 bits), as held in SortedHashIndex._recent.
+_HASH_INT_BYTES = sys.getsizeof(1 << 63)
+
+
+def key_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class _PersistentIndex:
+    """Shared .bin snapshot + append-only .log handling."""
+
+    def __init__(self, directory: str | None, name: str):
+        self._log = None
+        self._unflushed = 0
+        self._bin_path = self._log_path = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._bin_path = os.path.join(directory, f"{name}.bin")
+            self._log_path = os.path.join(directory, f"{name}.log")
+
+    def _load(self) -> int:
+        """Load the snapshot and replay the log; returns the number of keys recovered."""
+        if self._bin_path is None:
+            return 0
+        try:
+            with open(self._bin_path, "rb") as fh:
+                self._load_snapshot(fh.read())
+        except FileNotFoundError:
+            pass
+        try:
+            with open(self._log_path, "rb") as fh:
+                data = fh.read()
+        except FileNotFoundError:
+            data = b""
+        # A torn trailing hash (crash mid-write) is ignored.
+        usable = len(data) - len(data) % _HASH.size
+        self._replay(_hash_array(data[:usable]))
+        self._log = open(self._log_path, "ab")
+        if usable != len(data):
+            self._log.truncate(usable)
+        return len(self)
+
+    def _append_log(self, h: int) -> None:
+        if self._log is not None:
+            self._log.write(_HASH.pack(h))
+            self._unflushed += 1
+            if self._unflushed >= _LOG_FLUSH_EVERY:
+                self._flush_log()
+
+    def _flush_log(self) -> None:
+        if self._log is not None and self._unflushed:
+            self._log.flush()
+            self._unflushed = 0
+
+    def close(self) -> None:
+        if self._bin_path is None or self._log is None:
+            return
+        tmp = self._bin_path + ".tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(self._snapshot())
+        os.replace(tmp, self._bin_path)
+        self._log.truncate(0)
+        self._log.close()
+        self._log = None
+
+    # Implemented by subclasses.
+    def _load_snapshot(self, data: bytes) -> None:
+        raise NotImplementedError
+
+    def _snapshot(self) -> bytes:
+        raise NotImplementedError
+
+    def _replay(self, hashes) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+def _hash_array(data: bytes) -> array:
+    """Little-endian uint64 bytes -> array("Q")."""
+    out = array("Q")
+    out.frombytes(data)
+    if sys.byteorder == "big":
+        out.byteswap()
+    return out
+
+
+class SortedHashIndex(_PersistentIndex):
+    """
+    Sorted array of 64-bit key hashes.
+
+    New hashes go to a small set and are merged into the sorted array once the
+    set holds max(merge_every, 1/32 of the array), so merges stay geometric and
+    the set never costs much more than the array; lookups are a bisect plus a
+    set probe.
+    """
+
+    kind = "sorted"
+
+    def __init__(self, directory: str | None = None, *, name: str = "keys", merge_every: int = 4096):
+        super().__init__(directory, name)
+        self._sorted = array("Q")
+        self._recent: set[int] = set()
+        self._merge_every = max(1, merge_every)
+        self.recovered = self._load()
+
+    def _load_snapshot(self, data: bytes) -> None:
+        self._sorted = _hash_array(data[: len(data) - len(data) % 8])
+
+    def _snapshot(self) -> bytes:
+        self._merge()
+        out = array("Q", self._sorted)
+        if sys.byteorder == "big":
+            out.byteswap()
+        return out.tobytes()
+
+    def _replay(self, hashes) -> None:
+        self._recent.update(hashes)
+        self._merge()
+
+    def _merge(self) -> None:
+        self._flush_log()
+        if not self._recent:
+            return
+        fresh = sorted(self._recent)
+        self._recent.clear()
+        # Linear merge of the two sorted runs into a new array: the runs of old hashes
+        # between two fresh ones are copied as bytes, never turned into Python ints.
+        old = self._sorted
+        view = memoryview(old).cast("B")
+        merged = array("Q")
+        start = 0
+        for h in fresh:
+            i = bisect.bisect_left(old, h, start)
+            if i < len(old) and old[i] == h:
+                # Replayed from a log that a crash kept after the snapshot.
+                continue
+            merged.frombytes(view[start * 8 : i * 8])
+            merged.append(h)
+            start = i
+        merged.frombytes(view[start * 8 :])
+        view.release()
+        self._sorted = merged
+
+    def _in_sorted(self, h: int) -> bool:
+        i = bisect.bisect_left(self._sorted, h)
+        return i < len(self._sorted) and self._sorted[i] == h
+
+    def contains_hash(self, h: int) -> bool:
+        return h in self._recent or self._in_sorted(h)
+
+    def add_hash(self, h: int) -> bool:
+        """Add a hash; returns False if it was already present."""
+        if self.contains_hash(h):
+            return False
+        self._recent.add(h)
+        self._append_log(h)
+        if len(self._recent) >= max(self._merge_every, len(self._sorted) >> 5):
+            self._merge()
+        return True
+
+    def add(self, key: str) -> bool:
+        return self.add_hash(key_hash(key))
+
+    def __contains__(self, key: str) -> bool:
+        return self.contains_hash(key_hash(key))
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._recent)
+
+    def memory_bytes(self) -> int:
+        # The array is 8 bytes per hash; a set entry costs its slot plus an int object.
+        return sys.getsizeof(self._sorted) + sys.getsizeof(self._recent) + _HASH_INT_BYTES * len(self._recent)
+
+
+class BloomHashIndex(_PersistentIndex):
+    """
+    Bloom filter over 64-bit key hashes (double hashing on the two 32-bit halves).
+
+    Sized for `capacity` keys at `fp_rate`; past capacity the false-positive
+    rate rises, which `saturated` reports.
+    """
+
+    kind = "bloom"
+
+    def __init__(
+        self,
+        directory: str | None = None,
+        *,
+        name: str = "keys",
+        capacity: int = 1_000_000,
+        fp_rate: float = 0.001,
+    ):
+        super().__init__(directory, name)
+        capacity = max(1, int(capacity))
+        fp_rate = min(max(float(fp_rate), 1e-9), 0.5)
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self._bits_count = max(64, int(math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))))
+        self._hashes = max(1, int(round(self._bits_count / capacity * math.log(2))))
+        self._bits = bytearray((self._bits_count + 7) // 8)
+        self._count = 0
+        self.recovered = self._load()
+
+    def _positions(self, h: int):
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        m = self._bits_count
+        return [(h1 + i * h2) % m for i in range(self._hashes)]
+
+    def contains_hash(self, h: int) -> bool:
+        bits = self._bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(h))
+
+    def add_hash(self, h: int) -> bool:
+        bits = self._bits
+        new = False
+        for p in self._positions(h):
+            mask = 1 << (p & 7)
+            if not bits[p >> 3] & mask:
+                bits[p >> 3] |= mask
+                new = True
+        if new:
+            self._count += 1
+            self._append_log(h)
+        return new
+
+    def add(self, key: str) -> bool:
+        return self.add_hash(key_hash(key))
+
+    def __contains__(self, key: str) -> bool:
+        return self.contains_hash(key_hash(key))
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def saturated(self) -> bool:
+        return self._count > self.capacity
+
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+    def _load_snapshot(self, data: bytes) -> None:
+        if len(data) < _BLOOM_HEADER.size:
+            return
+        magic, bits_count, count = _BLOOM_HEADER.unpack_from(data)
+        body = data[_BLOOM_HEADER.size :]
+        # A snapshot taken with other sizing is ignored; the log alone is replayed.
+        if magic == _BLOOM_MAGIC and bits_count == self._bits_count and len(body) == len(self._bits):
+            self._bits = bytearray(body)
+            self._count = count
+
+    def _snapshot(self) -> bytes:
+        return _BLOOM_HEADER.pack(_BLOOM_MAGIC, self._bits_count, self._count) + bytes(self._bits)
+
+    def _replay(self, hashes) -> None:
+        log, self._log = self._log, None
+        for h in hashes:
+            self.add_hash(h)
+        self._log = log
+
+
+def open_key_index(
+    directory: str | None,
+    *,
+    kind: str = "sorted",
+    name: str = "keys",
+    capacity: int = 1_000_000,
+    fp_rate: float = 0.001,
+):
+    """Build the index selected by APIFY_DEDUPE_INDEX ("sorted" or "bloom")."""
+    if kind == "bloom":
+        return BloomHashIndex(directory, name=name, capacity=capacity, fp_rate=fp_rate)
+    if kind == "sorted":
+        return SortedHashIndex(directory, name=name)
+    raise ValueError(f"Unknown duplicate key index {kind!r}; expected 'sorted' or 'bloom'")
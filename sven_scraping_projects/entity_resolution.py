@@ -0,0 +1,310 @@
+"""
+Cross-source entity resolution for person records (kvhh, uke, asklepios, ...).
+
+The same physician often appears in several sources. Instead of comparing
+every pair of records, records are grouped into blocks by canonical keys and
+only pairs that share a block are scored:
+
+- name:   normalised last name + first-name initial
+- postal: postal code + last-name initial (a postal code alone spans hundreds
+          of practices)
+- email:  email domain, unless it is a free-mail domain
+- phone:  phone number digits (national form)
+
+Blocks larger than `max_block_size` (a hospital switchboard, a clinic-wide
+email domain) say little about identity and are skipped. Matching pairs are
+joined with union-find; every record gets a `cluster_id` derived from the
+smallest member key, so IDs are stable across runs with the same members.
+
+    python -m sven_scraping_projects.entity_resolution dataset.json \\
+        [--output clustered.jsonl] [--summary clusters.json] [--threshold 0.6]
+
+The input is a dataset export (JSON array or JSON lines).
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+import time
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+DEFAULT_THRESHOLD = 0.6
+DEFAULT_MAX_BLOCK_SIZE = 200
+
+FREEMAIL_DOMAINS = frozenset(
+    {
+        "gmail.com",
+        "googlemail.com",
+        "gmx.de",
+        "gmx.net",
+        "web.de",
+        "t-online.de",
+        "yahoo.de",
+        "yahoo.com",
+        "hotmail.com",
+        "hotmail.de",
+        "outlook.com",
+        "outlook.de",
+        "icloud.com",
+        "aol.com",
+        "freenet.de",
+        "posteo.de",
+        "mail.de",
+    }
+)
+
+_TRANSLIT = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+_NON_LETTERS = re.compile(r"[^a-z]+")
+_PHONE_SPLIT = re.compile(r"[,;]|\b(?:und|oder)\b")
+_DIGITS = re.compile(r"\D+")
+
+
+def normalize_name(value: str) -> str:
+    """'Müller-Lüdenscheidt' -> 'muellerluedenscheidt'."""
+    if not value:
+        return ""
+    s = value.casefold().translate(_TRANSLIT)
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return _NON_LETTERS.sub("", s)
+
+
+def phone_numbers(value: str) -> frozenset[str]:
+    """National-form digit strings of every number in a phone field ('+49 40 123' -> '040123')."""
+    if not value:
+        return frozenset()
+    out = set()
+    for part in _PHONE_SPLIT.split(value):
+        digits = _DIGITS.sub("", part)
+        if part.strip().startswith("+"):
+            digits = "0" + digits[2:] if digits.startswith("49") else "00" + digits
+        elif digits.startswith("0049"):
+            digits = "0" + digits[4:]
+        if len(digits) >= 6:
+            out.add(digits)
+    return frozenset(out)
+
+
+def email_address(value: str) -> str:
+    if not value:
+        return ""
+    first = re.split(r"[,;\s]+", value.strip())[0].casefold()
+    return first.removeprefix("mailto:") if "@" in first else ""
+
+
+@dataclass(frozen=True, slots=True)
+class _Features:
+    last: str
+    first: str
+    postal: str
+    email: str
+    domain: str
+    phones: frozenset
+
+
+def _features(record: dict) -> _Features:
+    email = email_address(record.get("email") or "")
+    postal = re.sub(r"\D", "", record.get("postal_code") or "")
+    return _Features(
+        last=normalize_name(record.get("last_name") or ""),
+        first=normalize_name(record.get("first_name") or ""),
+        postal=postal if len(postal) == 5 else "",
+        email=email,
+        domain=email.rpartition("@")[2],
+        phones=phone_numbers(record.get("phone") or record.get("telephone") or ""),
+    )
+
+
+def _block_keys(f: _Features):
+    if f.last:
+        yield "n:" + f.last + ":" + f.first[:1]
+        if f.postal:
+            yield "p:" + f.postal + ":" + f.last[:1]
+    if f.domain and f.domain not in FREEMAIL_DOMAINS:
+        yield "e:" + f.domain
+    for phone in f.phones:
+        yield "t:" + phone
+
+
+def score_pair(a: _Features, b: _Features) -> float:
+    """Evidence that two person records describe the same individual (roughly 0..1)."""
+    score = 0.0
+    if a.last and b.last:
+        if a.last == b.last:
+            score += 0.35
+        elif not (a.last in b.last or b.last in a.last):
+            # Double names ("Meyer-Stein" vs "Meyer") still count as compatible.
+            score -= 0.5
+    if a.first and b.first:
+        if a.first == b.first:
+            score += 0.2
+        elif a.first[0] == b.first[0] and (len(a.first) == 1 or len(b.first) == 1):
+            score += 0.1
+        elif a.first[0] != b.first[0]:
+            score -= 0.3
+    # A shared email domain only puts records in one block; a clinic domain is no evidence.
+    if a.email and a.email == b.email:
+        score += 0.35
+    if a.phones and b.phones:
+        score += 0.3 if not a.phones.isdisjoint(b.phones) else -0.1
+    if a.postal and b.postal:
+        score += 0.15 if a.postal == b.postal else -0.1
+    return score
+
+
+class _UnionFind:
+    __slots__ = ("parent",)
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            if ra < rb:
+                self.parent[rb] = ra
+            else:
+                self.parent[ra] = rb
+
+
+@dataclass
+class Resolution:
+    cluster_ids: list[str]
+    clusters: list[dict]
+    stats: dict = field(default_factory=dict)
+
+
+def record_key(record: dict) -> str:
+    return f"{record.get('source') or ''}|{record.get('source_url') or record.get('url') or ''}"
+
+
+def cluster_id_for(member_keys) -> str:
+    return "c" + hashlib.blake2b(min(member_keys).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def resolve(
+    records: list[dict],
+    *,
+    threshold: float = DEFAULT_THRESHOLD,
+    max_block_size: int = DEFAULT_MAX_BLOCK_SIZE,
+) -> Resolution:
+    """Cluster person records; non-person records each form their own cluster."""
+    started = time.perf_counter()
+    n = len(records)
+    features: list[_Features | None] = [None] * n
+    blocks: dict[str, list[int]] = defaultdict(list)
+    for i, record in enumerate(records):
+        if (record.get("entity_type") or "person") != "person":
+            continue
+        f = _features(record)
+        features[i] = f
+        for key in _block_keys(f):
+            blocks[key].append(i)
+
+    uf = _UnionFind(n)
+    scored: set[tuple[int, int]] = set()
+    pairs_scored = matches = skipped_blocks = 0
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        if len(members) > max_block_size:
+            skipped_blocks += 1
+            continue
+        for x, i in enumerate(members):
+            fi = features[i]
+            for j in members[x + 1 :]:
+                pair = (i, j)
+                if pair in scored:
+                    continue
+                scored.add(pair)
+                pairs_scored += 1
+                if score_pair(fi, features[j]) >= threshold:
+                    matches += 1
+                    uf.union(i, j)
+
+    groups: dict[int, list[int]] = defaultdict(list)
+    for i in range(n):
+        groups[uf.find(i)].append(i)
+
+    keys = [record_key(r) for r in records]
+    cluster_ids = [""] * n
+    clusters = []
+    for members in groups.values():
+        cid = cluster_id_for(keys[i] for i in members)
+        for i in members:
+            cluster_ids[i] = cid
+        if len(members) > 1:
+            clusters.append(_summary(cid, [records[i] for i in members]))
+    clusters.sort(key=lambda c: (-c["size"], c["cluster_id"]))
+
+    stats = {
+        "records": n,
+        "blocks": len(blocks),
+        "blocks_skipped": skipped_blocks,
+        "pairs_scored": pairs_scored,
+        "matches": matches,
+        "clusters": len(groups),
+        "multi_record_clusters": len(clusters),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    return Resolution(cluster_ids=cluster_ids, clusters=clusters, stats=stats)
+
+
+def _summary(cid: str, members: list[dict]) -> dict:
+    names = [m.get("display_name") or m.get("name") or "" for m in members]
+    return {
+        "cluster_id": cid,
+        "size": len(members),
+        "display_name": max(names, key=len),
+        "sources": sorted({m.get("source") or "" for m in members}),
+        "members": [
+            {"source": m.get("source") or "", "source_url": m.get("source_url") or m.get("url") or ""} for m in members
+        ],
+    }
+
+
+def _read_records(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as fh:
+        text = fh.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="dataset export: JSON array or JSON lines")
+    parser.add_argument("--output", help="write records with cluster_id as JSON lines")
+    parser.add_argument("--summary", help="write the multi-record cluster summary as JSON")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--max-block-size", type=int, default=DEFAULT_MAX_BLOCK_SIZE)
+    args = parser.parse_args(argv)
+
+    records = _read_records(args.input)
+    result = resolve(records, threshold=args.threshold, max_block_size=args.max_block_size)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            for record, cid in zip(records, result.cluster_ids):
+                fh.write(json.dumps({**record, "cluster_id": cid}, ensure_ascii=False) + "\n")
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as fh:
+            json.dump({"stats": result.stats, "clusters": result.clusters}, fh, ensure_ascii=False, indent=2)
+    print(json.dumps(result.stats), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,285 @@
+"""
+Single-file HTTP cache storage for HttpCacheMiddleware: record in production runs, replay offline.
+
+Scrapy's FilesystemCacheStorage writes eight files per response, and DBM
+storage does not travel between machines. PackedCacheStorage keeps one
+append-only file per spider, <HTTPCACHE_DIR>/<spider>.httpcache, keyed by
+request fingerprint:
+
+    b"SHC1"                                      file magic
+    record*                                      ">BB20sdI" kind, codec, fingerprint, stored_at,
+                                                 payload length, then the payload
+    index record, trailer                        written at close_spider
+
+A response record's payload is ">HHI" status, URL length, header length,
+then the URL, the raw headers and the body, compressed as one unit with zstd
+(when the optional `zstandard` package is installed) or zlib. The codec is
+stored per record, so a file recorded with zstd reads wherever `zstandard`
+is available and a zlib file reads everywhere. The index record maps
+fingerprints to (offset, length); the 12-byte trailer points at it. Opening
+a file without a valid trailer (the run was killed) rebuilds the index by
+scanning the records and drops a torn last record.
+
+HTTPCACHE_MODE decides what the storage does:
+
+- "record": never answer from the cache, store every response. A production
+  run fetches everything as usual and leaves the cache behind.
+- "replay": answer from the cache, store nothing. With
+  HTTPCACHE_IGNORE_MISSING, uncached requests are dropped instead of going
+  out, so the spiders re-parse a recorded run without network access.
+- "": both, as Scrapy's own storages do.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import struct
+import time
+import zlib
+
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+
+try:
+    import zstandard
+except ImportError:  # optional; records are written with zlib instead
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+MODES = ("record", "replay", "")
+CODECS = ("auto", "zstd", "zlib")
+FILE_SUFFIX = ".httpcache"
+
+_MAGIC = b"SHC1"
+_TRAILER = struct.Struct(">Q4s")
+_TRAILER_MAGIC = b"SHCX"
+_RECORD = struct.Struct(">BB20sdI")
+_PAYLOAD = struct.Struct(">HHI")
+_INDEX_ENTRY = struct.Struct(">20sQI")
+_KIND_RESPONSE = 1
+_KIND_INDEX = 2
+_CODEC_NONE = 0
+_CODEC_ZLIB = 1
+_CODEC_ZSTD = 2
+
+
+class CacheFormatError(ValueError):
+    pass
+
+
+def _compressor(codec: str):
+    """(codec id, compress function) for HTTPCACHE_CODEC."""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown HTTPCACHE_CODEC {codec!r}; expected one of {CODECS!r}")
+    if codec == "zstd" and zstandard is None:
+        raise ValueError("HTTPCACHE_CODEC=zstd needs the zstandard package")
+    if codec != "zlib" and zstandard is not None:
+        return _CODEC_ZSTD, zstandard.ZstdCompressor(level=3).compress
+    return _CODEC_ZLIB, lambda data: zlib.compress(data, 6)
+
+
+def _decompress(codec: int, data: bytes) -> bytes:
+    if codec == _CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == _CODEC_ZSTD:
+        if zstandard is None:
+            raise CacheFormatError("record is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == _CODEC_NONE:
+        return data
+    raise CacheFormatError(f"unknown codec {codec}")
+
+
+class PackedCache:
+    """One cache file: fingerprint -> response, with the index kept in memory."""
+
+    def __init__(self, path: str, *, writable: bool = True, codec: str = "auto"):
+        self.path = path
+        self.writable = writable
+        self.codec_id, self._compress = _compressor(codec)
+        self.index: dict[bytes, tuple[int, int]] = {}
+        self.recovered = False
+        if writable:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._fh = open(path, "a+b")
+        else:
+            self._fh = open(path, "rb")
+        self._dirty = False
+        self._load()
+
+    # -- index ---------------------------------------------------------------
+
+    def _load(self) -> None:
+        fh = self._fh
+        size = fh.seek(0, os.SEEK_END)
+        if size == 0:
+            if self.writable:
+                fh.write(_MAGIC)
+            self._end = len(_MAGIC) if self.writable else 0
+            return
+        fh.seek(0)
+        if fh.read(len(_MAGIC)) != _MAGIC:
+            raise CacheFormatError(f"{self.path} is not a packed HTTP cache")
+        end = self._load_index(size)
+        if end is None:
+            end = self._scan(size)
+            self.recovered = True
+            logger.warning("HTTP cache %s had no index; recovered %d responses by scanning", self.path, len(self.index))
+        self._end = end
+        if self.writable:
+            # New records go over the old index, which is written again at close.
+            fh.truncate(end)
+
+    def _load_index(self, size: int) -> int | None:
+        """Read the index the trailer points at; returns where it starts, or None."""
+        if size < len(_MAGIC) + _RECORD.size + _TRAILER.size:
+            return None
+        fh = self._fh
+        fh.seek(size - _TRAILER.size)
+        offset, magic = _TRAILER.unpack(fh.read(_TRAILER.size))
+        if magic != _TRAILER_MAGIC or not len(_MAGIC) <= offset <= size - _TRAILER.size - _RECORD.size:
+            return None
+        fh.seek(offset)
+        kind, _codec, _fp, _at, length = _RECORD.unpack(fh.read(_RECORD.size))
+        data = fh.read(length)
+        if kind != _KIND_INDEX or len(data) != length or length % _INDEX_ENTRY.size:
+            return None
+        for fp, rec_offset, rec_length in _INDEX_ENTRY.iter_unpack(data):
+            self.index[fp] = (rec_offset, rec_length)
+        return offset
+
+    def _scan(self, size: int) -> int:
+        """Index every complete response record; returns the end of the last one."""
+        fh = self._fh
+        pos = len(_MAGIC)
+        fh.seek(pos)
+        while pos + _RECORD.size <= size:
+            kind, _codec, fp, _at, length = _RECORD.unpack(fh.read(_RECORD.size))
+            if kind not in (_KIND_RESPONSE, _KIND_INDEX) or pos + _RECORD.size + length > size:
+                break
+            if kind == _KIND_RESPONSE:
+                self.index[fp] = (pos, _RECORD.size + length)
+            pos += _RECORD.size + length
+            fh.seek(pos)
+        return pos
+
+    # -- records -------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, fingerprint: bytes) -> bool:
+        return fingerprint in self.index
+
+    def put(self, fingerprint: bytes, url: str, status: int, headers: bytes, body: bytes, now=None) -> None:
+        url_b = url.encode("utf-8")
+        payload = self._compress(b"".join((_PAYLOAD.pack(status, len(url_b), len(headers)), url_b, headers, body)))
+        record = _RECORD.pack(
+            _KIND_RESPONSE, self.codec_id, fingerprint, time.time() if now is None else now, len(payload)
+        )
+        self._fh.write(record)
+        self._fh.write(payload)
+        self.index[fingerprint] = (self._end, len(record) + len(payload))
+        self._end += len(record) + len(payload)
+        self._dirty = True
+
+    def get(self, fingerprint: bytes) -> tuple[float, str, int, bytes, bytes] | None:
+        """(stored_at, url, status, raw headers, body) for a fingerprint, or None."""
+        where = self.index.get(fingerprint)
+        if where is None:
+            return None
+        if self._dirty:
+            self._fh.flush()
+            self._dirty = False
+        data = os.pread(self._fh.fileno(), where[1], where[0])
+        _kind, codec, _fp, stored_at, length = _RECORD.unpack_from(data)
+        plain = _decompress(codec, data[_RECORD.size : _RECORD.size + length])
+        status, n_url, n_headers = _PAYLOAD.unpack_from(plain)
+        pos = _PAYLOAD.size
+        url = plain[pos : pos + n_url].decode("utf-8")
+        pos += n_url
+        return stored_at, url, status, plain[pos : pos + n_headers], plain[pos + n_headers :]
+
+    def close(self) -> int:
+        """Write the index and trailer (when writable); returns the file size."""
+        fh = self._fh
+        if self.writable:
+            entries = b"".join(_INDEX_ENTRY.pack(fp, *where) for fp, where in self.index.items())
+            fh.seek(self._end)
+            fh.write(_RECORD.pack(_KIND_INDEX, _CODEC_NONE, bytes(20), time.time(), len(entries)))
+            fh.write(entries)
+            fh.write(_TRAILER.pack(self._end, _TRAILER_MAGIC))
+            fh.flush()
+            os.fsync(fh.fileno())
+        size = fh.seek(0, os.SEEK_END)
+        fh.close()
+        return size
+
+
+class PackedCacheStorage:
+    """HTTPCACHE_STORAGE backend over PackedCache; see the module docstring for HTTPCACHE_MODE."""
+
+    def __init__(self, settings):
+        self.cachedir = settings.get("HTTPCACHE_DIR")
+        self.expiration_secs = settings.getint("HTTPCACHE_EXPIRATION_SECS")
+        self.mode = settings.get("HTTPCACHE_MODE", "") or ""
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown HTTPCACHE_MODE {self.mode!r}; expected one of {MODES!r}")
+        self.codec = settings.get("HTTPCACHE_CODEC", "auto")
+        self.cache: PackedCache | None = None
+        self.hits = self.stored = 0
+
+    def open_spider(self, spider) -> None:
+        self._fingerprinter = spider.crawler.request_fingerprinter
+        path = os.path.join(self.cachedir, f"{spider.name}{FILE_SUFFIX}")
+        if self.mode == "replay" and not os.path.exists(path):
+            spider.logger.warning("HTTP cache: nothing recorded for %s at %s", spider.name, path)
+            return
+        self.cache = PackedCache(path, writable=self.mode != "replay", codec=self.codec)
+        spider.logger.info(
+            "HTTP cache (%s): %d responses in %s", self.mode or "read/write", len(self.cache), path
+        )
+
+    def close_spider(self, spider) -> None:
+        if self.cache is None:
+            return
+        size = self.cache.close()
+        spider.logger.info(
+            "HTTP cache (%s): %d hits, %d stored, %d responses in %s (%.1f MiB)",
+            self.mode or "read/write",
+            self.hits,
+            self.stored,
+            len(self.cache),
+            self.cache.path,
+            size / 2**20,
+        )
+
+    def retrieve_response(self, spider, request):
+        if self.cache is None or self.mode == "record":
+            return None
+        found = self.cache.get(self._fingerprinter.fingerprint(request))
+        if found is None:
+            return None
+        stored_at, url, status, raw_headers, body = found
+        if 0 < self.expiration_secs < time.time() - stored_at:
+            return None
+        self.hits += 1
+        request.meta["cache_timestamp"] = stored_at
+        headers = Headers(headers_raw_to_dict(raw_headers))
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, status=status, headers=headers, body=body, request=request)
+
+    def store_response(self, spider, request, response) -> None:
+        if self.cache is None or self.mode == "replay":
+            return
+        self.stored += 1
+        self.cache.put(
+            self._fingerprinter.fingerprint(request),
+            response.url,
+            response.status,
+            headers_dict_to_raw(response.headers) or b"",
+            response.body,
+        )
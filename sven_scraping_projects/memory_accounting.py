@@ -0,0 +1,186 @@
+"""
+Memory accounting for crawls that share one process.
+
+src/main.py runs up to five crawlers one after another in one process. The
+pipelines hold per-spider state: the `items` overflow buffer, the duplicate-key
+indexes and the batches waiting to be pushed. Any of that still reachable
+after close_spider stays in memory for the rest of the run.
+
+MemoryAccountingExtension (middlewares.py) builds one SpiderMemory per crawl:
+
+- RSS at spider_opened, at every LOGSTATS_INTERVAL tick, and at spider_closed
+  after a full gc.collect() (pipelines have run close_spider by then),
+- with MEMORY_TRACEMALLOC, Python heap figures too: traced peak, traced
+  memory retained at close, and the top allocation sites by growth since
+  spider_opened.
+
+RSS rarely shrinks, because pymalloc keeps its arenas. Retained memory
+is therefore taken from tracemalloc when it is on, and from RSS only
+otherwise.
+
+MemoryLedger adds the boundaries in run_spiders(): a sample after each
+crawl, once the crawler itself has been dropped. Growth from one boundary to
+the next is memory the finished spider left behind.
+"""
+
+from __future__ import annotations
+
+import gc
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+
+STATS_PREFIX = "memory"
+MB = 1024 * 1024
+# Allocation sites from these files are the accounting itself, not the crawl.
+_IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>")
+
+
+def rss_bytes() -> int:
+    """Current resident set size (falls back to the process peak without procfs)."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass(frozen=True)
+class MemorySample:
+    rss: int
+    # Python heap traced by tracemalloc; None when tracing is off.
+    traced: int | None = None
+
+
+def take_sample(*, collect: bool = False) -> MemorySample:
+    if collect:
+        gc.collect()
+    traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+    return MemorySample(rss_bytes(), traced)
+
+
+def top_allocation_sites(before, after, limit: int = 10) -> list[str]:
+    """'file:line +N KiB (+M blocks)' for the `limit` sites that grew most between two snapshots."""
+    ignore = [tracemalloc.Filter(False, name) for name in _IGNORED_FILES]
+    diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+    sites = []
+    for stat in diff:
+        if stat.size_diff <= 0:
+            continue
+        frame = stat.traceback[0]
+        sites.append(
+            f"{os.path.basename(frame.filename)}:{frame.lineno} "
+            f"+{stat.size_diff / 1024:.0f} KiB (+{stat.count_diff} blocks)"
+        )
+        if len(sites) >= limit:
+            break
+    return sites
+
+
+@dataclass
+class SpiderMemory:
+    name: str
+    start: MemorySample
+    peak_rss: int = 0
+    ticks: int = 0
+    end: MemorySample | None = None
+    traced_peak: int | None = None
+    top_sites: list[str] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.peak_rss = max(self.peak_rss, self.start.rss)
+
+    def observe(self, sample: MemorySample) -> None:
+        self.ticks += 1
+        self.peak_rss = max(self.peak_rss, sample.rss)
+
+    def close(self, sample: MemorySample, *, traced_peak=None, top_sites=()) -> None:
+        self.observe(sample)
+        self.end = sample
+        self.traced_peak = traced_peak
+        self.top_sites = list(top_sites)
+
+    @property
+    def retained(self) -> int:
+        """Memory still held after close_spider, relative to spider_opened."""
+        if self.end is None:
+            return 0
+        if self.start.traced is not None and self.end.traced is not None:
+            return self.end.traced - self.start.traced
+        return self.end.rss - self.start.rss
+
+    def publish(self, stats, spider=None) -> None:
+        stats.set_value(f"{STATS_PREFIX}/rss_start_mb", round(self.start.rss / MB, 1), spider=spider)
+        stats.set_value(f"{STATS_PREFIX}/rss_peak_mb", round(self.peak_rss / MB, 1), spider=spider)
+        if self.end is not None:
+            stats.set_value(f"{STATS_PREFIX}/rss_end_mb", round(self.end.rss / MB, 1), spider=spider)
+            stats.set_value(f"{STATS_PREFIX}/retained_mb", round(self.retained / MB, 1), spider=spider)
+        if self.traced_peak is not None:
+            stats.set_value(f"{STATS_PREFIX}/traced_peak_mb", round(self.traced_peak / MB, 1), spider=spider)
+        if self.top_sites:
+            stats.set_value(f"{STATS_PREFIX}/top_sites", self.top_sites, spider=spider)
+
+    def summary(self) -> str:
+        parts = [f"start={self.start.rss / MB:.0f}", f"peak={self.peak_rss / MB:.0f}"]
+        if self.end is not None:
+            parts.append(f"end={self.end.rss / MB:.0f}")
+            parts.append(f"retained={self.retained / MB:+.1f}")
+        if self.traced_peak is not None:
+            parts.append(f"heap_peak={self.traced_peak / MB:.0f}")
+        return " ".join(parts)
+
+
+@dataclass(frozen=True)
+class Boundary:
+    label: str
+    sample: MemorySample
+    # Growth since the previous boundary / since the first one.
+    delta: int
+    total_delta: int
+    at: float
+
+
+class MemoryLedger:
+    """Process-wide samples at spider boundaries (after gc, once the crawler is gone)."""
+
+    def __init__(self):
+        self.boundaries: list[Boundary] = []
+        self._lock = threading.Lock()
+
+    def boundary(self, label: str) -> Boundary:
+        sample = take_sample(collect=True)
+        with self._lock:
+            first = self.boundaries[0].sample if self.boundaries else sample
+            prev = self.boundaries[-1].sample if self.boundaries else sample
+            entry = Boundary(label, sample, _growth(prev, sample), _growth(first, sample), time.time())
+            self.boundaries.append(entry)
+        return entry
+
+
+def _growth(before: MemorySample, after: MemorySample) -> int:
+    if before.traced is not None and after.traced is not None:
+        return after.traced - before.traced
+    return after.rss - before.rss
+
+
+def format_boundary(entry: Boundary) -> str:
+    heap = f" heap={entry.sample.traced / MB:.1f} MB" if entry.sample.traced is not None else ""
+    return (
+        f"Memory {entry.label}: rss={entry.sample.rss / MB:.1f} MB{heap} "
+        f"({entry.delta / MB:+.1f} MB since previous boundary, {entry.total_delta / MB:+.1f} MB since first)"
+    )
+
+
+_ledger: MemoryLedger | None = None
+_ledger_lock = threading.Lock()
+
+
+def get_memory_ledger() -> MemoryLedger:
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = MemoryLedger()
+        return _ledger
@@ -5,10 +5,49 @@
 
 from __future__ import annotations
 
+import os
+import time
+import tracemalloc
 from dataclasses import dataclass
+from inspect import isasyncgenfunction
 
-from scrapy import signals
-from scrapy.exceptions import IgnoreRequest
+from scrapy import Request, signals
+from scrapy.core.downloader import Downloader
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet import error as twisted_error
+from twisted.internet.defer import DeferredSemaphore
+from twisted.internet.task import LoopingCall
+from twisted.internet.threads import deferToThread
+
+from sven_scraping_projects.apify_runtime import get_sampling_profiler, set_sampling_profiler
+from sven_scraping_projects.callback_profile import CallbackProfile, callback_name
+from sven_scraping_projects.memory_accounting import MB, SpiderMemory, take_sample, top_allocation_sites
+from sven_scraping_projects.recrawl_state import (
+    POLICIES as RECRAWL_POLICIES,
+    RECRAWL_URL_META,
+    SITEMAP_LASTMOD_META,
+    STATS_PREFIX as RECRAWL_STATS_PREFIX,
+    KeyValueStoreState,
+    LocalStateFile,
+    RecrawlStore,
+)
+from sven_scraping_projects.sampling_profiler import SamplingProfiler, write_collapsed
+from sven_scraping_projects.slot_control import (
+    STATS_PREFIX as ADAPTIVE_STATS_PREFIX,
+    THROTTLE_STATUSES,
+    SlotController,
+    retry_after_seconds,
+)
+from sven_scraping_projects.validator_store import (
+    CONDITIONAL_META,
+    DONT_REVALIDATE_META,
+    REVALIDATED_FLAG,
+    STATS_PREFIX as CONDITIONAL_STATS_PREFIX,
+    ValidatorStore,
+)
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
@@ -142,6 +181,231 @@ class HttpStatusLoggingMiddleware:
         return response
 
 
+# One semaphore per configured cap, shared by every crawler in this process. Crawlers started
+# concurrently by src/main.py share one reactor, so a Twisted DeferredSemaphore is enough.
+_global_request_semaphores: dict[int, DeferredSemaphore] = {}
+
+
+def _get_global_request_semaphore(limit: int) -> DeferredSemaphore:
+    sem = _global_request_semaphores.get(limit)
+    if sem is None:
+        sem = DeferredSemaphore(limit)
+        _global_request_semaphores[limit] = sem
+    return sem
+
+
+class _GlobalLimitHandlers:
+    """
+    The downloader's DownloadHandlers, with a process-wide token held around each download.
+
+    Everything but the download itself is passed through to the wrapped object.
+    """
+
+    def __init__(self, handlers, semaphore: DeferredSemaphore, stats=None):
+        self._handlers = handlers
+        self._semaphore = semaphore
+        self._stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self._handlers, name)
+
+    def _count_wait(self) -> None:
+        if self._semaphore.tokens <= 0 and self._stats is not None:
+            self._stats.inc_value("global_concurrency/waited")
+
+    async def download_request_async(self, request):
+        self._count_wait()
+        await maybe_deferred_to_future(self._semaphore.acquire())
+        try:
+            return await self._handlers.download_request_async(request)
+        finally:
+            self._semaphore.release()
+
+    def download_request(self, request, spider=None):
+        # Scrapy < 2.13: Downloader._download calls this and expects a Deferred.
+        self._count_wait()
+        return self._semaphore.run(self._handlers.download_request, request, spider)
+
+
+class GlobalLimitDownloader(Downloader):
+    """
+    Downloader capping in-flight requests across all crawlers in the process (DOWNLOADER setting).
+
+    Per-spider CONCURRENT_REQUESTS / CONCURRENT_REQUESTS_PER_DOMAIN / DOWNLOAD_DELAY
+    still apply; this adds a process-wide ceiling (CONCURRENT_REQUESTS_GLOBAL) so
+    concurrent spiders cannot jointly exceed it. The token is taken once the
+    request's download slot has let it through (delay waited out, slot concurrency
+    available), right before the download handler runs, and released when the
+    handler returns. A request waiting on its slot therefore holds no token, and
+    cache hits and other middleware short-circuits never take one.
+    """
+
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        limit = crawler.settings.getint("CONCURRENT_REQUESTS_GLOBAL", 0)
+        if limit > 0:
+            self.handlers = _GlobalLimitHandlers(self.handlers, _get_global_request_semaphore(limit), crawler.stats)
+
+
+_TIMEOUT_ERRORS = (TimeoutError, twisted_error.TimeoutError, twisted_error.TCPTimedOutError)
+
+
+class AdaptiveConcurrencyMiddleware:
+    """
+    Downloader middleware that tunes each download slot's concurrency and delay live.
+
+    One SlotController (slot_control.py) per slot sees every downloaded response
+    and every download timeout, and the result is written back to Scrapy's
+    downloader slot. The spider's CONCURRENT_REQUESTS_PER_DOMAIN / DOWNLOAD_DELAY
+    are only the starting point; ADAPTIVE_CONCURRENCY_MIN/MAX and
+    ADAPTIVE_CONCURRENCY_MIN_DELAY/MAX_DELAY bound it per spider. A numeric
+    Retry-After on the response that triggers a back-off pauses the slot once
+    for that long. When AutoThrottle is
+    enabled too it keeps ownership of the delay and only concurrency is
+    adapted here.
+
+    Installed above RetryMiddleware so throttling statuses are seen before they
+    turn into retries; cached responses never reach a slot and are ignored.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ADAPTIVE_CONCURRENCY_ENABLED", False):
+            raise NotConfigured
+        self.crawler = crawler
+        self.stats = crawler.stats
+        ceiling = settings.getint("ADAPTIVE_CONCURRENCY_MAX", 0)
+        total = settings.getint("CONCURRENT_REQUESTS", 0)
+        if total > 0:
+            # A slot can never have more in flight than the whole spider.
+            ceiling = min(ceiling, total) if ceiling > 0 else total
+        self._limits = {
+            "min_concurrency": settings.getint("ADAPTIVE_CONCURRENCY_MIN", 1),
+            "max_concurrency": ceiling if ceiling > 0 else settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN", 8),
+            "min_delay": settings.getfloat("ADAPTIVE_CONCURRENCY_MIN_DELAY", 0.0),
+            "max_delay": settings.getfloat("ADAPTIVE_CONCURRENCY_MAX_DELAY", 30.0),
+            "window": settings.getint("ADAPTIVE_CONCURRENCY_WINDOW", 20),
+            "backoff": settings.getfloat("ADAPTIVE_CONCURRENCY_BACKOFF", 0.5),
+            "error_rate": settings.getfloat("ADAPTIVE_CONCURRENCY_ERROR_RATE", 0.1),
+            "latency_factor": settings.getfloat("ADAPTIVE_CONCURRENCY_LATENCY_FACTOR", 2.0),
+        }
+        self._control_delay = not settings.getbool("AUTOTHROTTLE_ENABLED", False)
+        self._respect_retry_after = settings.getbool("ADAPTIVE_CONCURRENCY_RESPECT_RETRY_AFTER", True)
+        self._controllers: dict[str, SlotController] = {}
+        # Slots paused for a Retry-After: key -> pending reactor call that ends the pause.
+        self._holds: dict = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        mw = cls(crawler)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def _slot(self, request):
+        key = request.meta.get("download_slot")
+        engine = getattr(self.crawler, "engine", None)
+        if key is None or engine is None:
+            return None, None
+        return key, engine.downloader.slots.get(key)
+
+    def _controller(self, key, slot) -> SlotController:
+        ctrl = self._controllers.get(key)
+        if ctrl is None:
+            ctrl = SlotController(concurrency=slot.concurrency, delay=slot.delay, **self._limits)
+            self._controllers[key] = ctrl
+        return ctrl
+
+    def _apply(self, key, slot, ctrl, adjustment, spider) -> None:
+        # Also re-applies state to slots the downloader garbage-collected and recreated.
+        slot.concurrency = ctrl.concurrency
+        if self._control_delay and key not in self._holds:
+            slot.delay = ctrl.delay
+        if adjustment is None:
+            return
+        self.stats.inc_value(
+            f"{ADAPTIVE_STATS_PREFIX}/increases" if adjustment.reason == "increase" else f"{ADAPTIVE_STATS_PREFIX}/decreases"
+        )
+        if spider is not None:
+            spider.logger.debug(
+                "Adaptive concurrency: slot=%s %s -> concurrency=%d delay=%.2fs (p50=%.0fms p90=%.0fms)",
+                key,
+                adjustment.reason,
+                adjustment.concurrency,
+                slot.delay,
+                ctrl.last_p50 * 1000.0,
+                ctrl.last_p90 * 1000.0,
+            )
+
+    def _hold(self, key, slot, seconds: float) -> None:
+        # Retry-After asks for one pause, not a slower steady state: stretch the slot's
+        # delay for that long, then hand it back to the controller.
+        from twisted.internet import reactor
+
+        seconds = min(seconds, self._limits["max_delay"])
+        if not (self._control_delay and self._respect_retry_after) or key in self._holds or seconds <= slot.delay:
+            return
+        self.stats.inc_value(f"{ADAPTIVE_STATS_PREFIX}/retry_after_holds")
+        slot.delay = seconds
+        self._holds[key] = reactor.callLater(seconds, self._release_hold, key, slot)
+
+    def _release_hold(self, key, slot) -> None:
+        self._holds.pop(key, None)
+        ctrl = self._controllers.get(key)
+        if ctrl is not None:
+            slot.delay = ctrl.delay
+
+    def process_response(self, request, response, spider=None):
+        key, slot = self._slot(request)
+        if slot is None or "cached" in response.flags:
+            return response
+        status = response.status
+        ctrl = self._controller(key, slot)
+        adjustment = ctrl.observe(status, request.meta.get("download_latency"))
+        self._apply(key, slot, ctrl, adjustment, spider)
+        if status in THROTTLE_STATUSES:
+            self.stats.inc_value(f"{ADAPTIVE_STATS_PREFIX}/throttled")
+            # Only when the slot is congested; a stray 503 with Retry-After is not worth a pause.
+            retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+            if retry_after and adjustment is not None and adjustment.reason != "increase":
+                self._hold(key, slot, retry_after)
+        return response
+
+    def process_exception(self, request, exception, spider=None):
+        if isinstance(exception, _TIMEOUT_ERRORS):
+            key, slot = self._slot(request)
+            if slot is not None:
+                self.stats.inc_value(f"{ADAPTIVE_STATS_PREFIX}/timeouts")
+                ctrl = self._controller(key, slot)
+                self._apply(key, slot, ctrl, ctrl.timeout(), spider)
+        return None
+
+    def spider_closed(self, spider, reason):
+        for call in self._holds.values():
+            if call.active():
+                call.cancel()
+        self._holds.clear()
+        for key, ctrl in self._controllers.items():
+            prefix = f"{ADAPTIVE_STATS_PREFIX}/slots/{key}"
+            self.stats.set_value(f"{prefix}/concurrency", ctrl.concurrency)
+            self.stats.set_value(f"{prefix}/concurrency_max", ctrl.max_seen)
+            self.stats.set_value(f"{prefix}/delay", round(ctrl.delay, 3))
+            self.stats.set_value(f"{prefix}/latency_p50_ms", round(ctrl.last_p50 * 1000.0, 1))
+            spider.logger.info(
+                "Adaptive concurrency: slot=%s final concurrency=%d (max %d, bounds %d-%d) delay=%.2fs "
+                "increases=%d decreases=%d throttled=%d timeouts=%d",
+                key,
+                ctrl.concurrency,
+                ctrl.max_seen,
+                ctrl.min_concurrency,
+                ctrl.max_concurrency,
+                ctrl.delay,
+                ctrl.increases,
+                ctrl.decreases,
+                ctrl.throttled,
+                ctrl.timeouts,
+            )
+
+
 class Non200ResponseGuardSpiderMiddleware:
     """
     Spider middleware that prevents callbacks from parsing non-200 responses.
@@ -149,6 +413,8 @@ class Non200ResponseGuardSpiderMiddleware:
     deterministic.
 
     Spiders can override via `allow_parse_httpstatus_list = {codes}`.
+    A 304 answered by ConditionalGetMiddleware arrives here as the stored 200
+    (flag "revalidated") and is parsed like any other page.
     """
 
     @classmethod
@@ -168,7 +434,426 @@ class Non200ResponseGuardSpiderMiddleware:
         raise IgnoreRequest(f"Skipping parse for status={status} url={response.url}")
 
 
+class CallbackProfileMiddleware:
+    """
+    Spider middleware recording per-callback latency and parse CPU (callback_profile.py).
+
+    Installed closest to the spider, so process_spider_output sees the
+    callback's own output: the reactor thread's CPU time is taken around each
+    step of it, which is the callback's work without the middlewares and
+    pipelines that consume its output. Async-generator callbacks are counted
+    but not timed, since their awaits may run unrelated reactor work.
+
+    Download-side timings come from signals: request_scheduled and
+    request_reached_downloader stamp the request, response_downloaded splits
+    the time since into slot wait and transfer. The profile is published to
+    stats at spider close and exposed as `spider.callback_profile` so that
+    RunValidationExtension can put it on the run summary line.
+    """
+
+    SCHEDULED_KEY = "_profile_scheduled_at"
+    REACHED_KEY = "_profile_reached_downloader_at"
+
+    def __init__(self, crawler):
+        if not crawler.settings.getbool("CALLBACK_PROFILE_ENABLED", False):
+            raise NotConfigured
+        self.stats = crawler.stats
+        self.profile = CallbackProfile()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        mw = cls(crawler)
+        crawler.signals.connect(mw.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(mw.request_scheduled, signal=signals.request_scheduled)
+        crawler.signals.connect(mw.request_reached_downloader, signal=signals.request_reached_downloader)
+        crawler.signals.connect(mw.response_downloaded, signal=signals.response_downloaded)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def spider_opened(self, spider):
+        spider.callback_profile = self.profile
+
+    def request_scheduled(self, request, spider):
+        request.meta[self.SCHEDULED_KEY] = time.monotonic()
+
+    def request_reached_downloader(self, request, spider):
+        request.meta[self.REACHED_KEY] = time.monotonic()
+
+    def response_downloaded(self, response, request, spider):
+        now = time.monotonic()
+        scheduled = request.meta.get(self.SCHEDULED_KEY)
+        reached = request.meta.get(self.REACHED_KEY)
+        download = request.meta.get("download_latency")
+        slot_wait = None
+        if reached is not None and download is not None:
+            slot_wait = max(0.0, now - reached - download) * 1000.0
+        self.profile.add_download(
+            callback_name(request, spider),
+            total_ms=(now - scheduled) * 1000.0 if scheduled is not None else None,
+            slot_wait_ms=slot_wait,
+            download_ms=download * 1000.0 if download is not None else None,
+        )
+
+    async def process_spider_output(self, response, result, spider=None):
+        request = response.request
+        name = callback_name(request, spider)
+        # Scrapy wraps a sync callback's generator without awaiting between steps, so the
+        # thread's CPU time around each step is the callback's own work.
+        timed = not isasyncgenfunction(getattr(request, "callback", None))
+        items = requests = 0
+        cpu = 0.0
+        try:
+            while True:
+                started = time.thread_time()
+                try:
+                    out = await result.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    cpu += time.thread_time() - started
+                if isinstance(out, Request):
+                    requests += 1
+                else:
+                    items += 1
+                yield out
+        finally:
+            self.profile.add_parse(name, cpu_ms=cpu * 1000.0 if timed else 0.0, items=items, requests=requests)
+
+    def spider_closed(self, spider, reason):
+        self.profile.publish(self.stats)
+
+
+def _run_state_backend(settings, spider, prefix: str, kv_key: str, suffix: str, **kv_kwargs):
+    """
+    Where state that must outlive the run goes: the `kv_key` record of the named key-value store
+    <prefix>_KV_STORE_NAME when <prefix>_STORE is "kv" (and a token is set), else
+    <prefix>_STATE_DIR/<spider><suffix>.
+    """
+    if settings.get(f"{prefix}_STORE", "local") == "kv":
+        token = os.environ.get("APIFY_TOKEN") or os.environ.get("APIFY_API_TOKEN")
+        if token:
+            return KeyValueStoreState(settings.get(f"{prefix}_KV_STORE_NAME"), kv_key, token, **kv_kwargs)
+        spider.logger.warning("%s_STORE=kv but no APIFY_TOKEN; using a local file", prefix)
+    return LocalStateFile(os.path.join(settings.get(f"{prefix}_STATE_DIR"), f"{spider.name}{suffix}"))
+
+
+class IncrementalRecrawlMiddleware:
+    """
+    Spider middleware that skips sitemap pages unchanged since an earlier run (recrawl_state.py).
+
+    Spiders mark their sitemap requests with `meta["sitemap_lastmod"]`. For
+    those, process_spider_output asks the RecrawlStore whether the URL must be
+    fetched; if not, the request is dropped and, under RECRAWL_POLICY "reemit",
+    the page's stored items are yielded in its place. Responses to requests
+    that went out are recorded with the items their callback produced.
+    The store is loaded at spider open and saved at spider close, off the
+    reactor thread.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool("RECRAWL_ENABLED", False):
+            raise NotConfigured
+        self.settings = settings
+        self.stats = crawler.stats
+        self.policy = settings.get("RECRAWL_POLICY", "reemit")
+        if self.policy not in RECRAWL_POLICIES:
+            raise NotConfigured(f"Unknown RECRAWL_POLICY {self.policy!r}")
+        self.ttl_s = settings.getfloat("RECRAWL_TTL_DAYS", 14) * 86400.0
+        self.store: RecrawlStore | None = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        mw = cls(crawler)
+        crawler.signals.connect(mw.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def _open_store(self, spider) -> RecrawlStore:
+        backend = _run_state_backend(self.settings, spider, "RECRAWL", f"RECRAWL-{spider.name}", ".ndjson.gz")
+        store = RecrawlStore(backend, policy=self.policy, ttl_s=self.ttl_s)
+        store.load()
+        return store
+
+    def spider_opened(self, spider):
+        def opened(store):
+            self.store = store
+            self.stats.set_value(f"{RECRAWL_STATS_PREFIX}/entries_loaded", len(store.entries), spider=spider)
+            spider.logger.info(
+                "Recrawl: %d known URLs from %s (policy=%s, ttl=%.1f days)",
+                len(store.entries),
+                store.backend,
+                self.policy,
+                self.ttl_s / 86400.0,
+            )
+
+        def failed(failure):
+            # Without the state every page is fetched, as before.
+            spider.logger.warning("Recrawl: cannot open state, fetching everything: %s", failure.getErrorMessage())
+
+        return deferToThread(self._open_store, spider).addCallbacks(opened, failed)
+
+    def spider_closed(self, spider, reason):
+        store = self.store
+        if store is None:
+            return None
+
+        def saved(size):
+            self.stats.set_value(f"{RECRAWL_STATS_PREFIX}/entries", len(store.entries), spider=spider)
+            self.stats.set_value(f"{RECRAWL_STATS_PREFIX}/state_bytes", size, spider=spider)
+            spider.logger.info("Recrawl: saved %d URLs (%d bytes) to %s", len(store.entries), size, store.backend)
+
+        def failed(failure):
+            spider.logger.error("Recrawl: could not save state to %s: %s", store.backend, failure.getErrorMessage())
+
+        return deferToThread(store.save).addCallbacks(saved, failed)
+
+    def _sitemap_request(self, request, store: RecrawlStore, spider):
+        url = request.url
+        reason = store.fetch_reason(url, request.meta.get(SITEMAP_LASTMOD_META))
+        if reason is not None:
+            self.stats.inc_value(f"{RECRAWL_STATS_PREFIX}/fetch/{reason}", spider=spider)
+            request.meta[RECRAWL_URL_META] = url
+            return [request]
+        self.stats.inc_value(f"{RECRAWL_STATS_PREFIX}/unchanged", spider=spider)
+        if self.policy != "reemit":
+            return []
+        items = store.stored_items(url)
+        self.stats.inc_value(f"{RECRAWL_STATS_PREFIX}/items_reemitted", len(items), spider=spider)
+        return items
+
+    async def process_spider_output(self, response, result, spider=None):
+        store = self.store
+        url = response.meta.get(RECRAWL_URL_META) if store is not None else None
+        items = [] if url is not None else None
+        async for out in result:
+            if isinstance(out, Request):
+                if store is not None and SITEMAP_LASTMOD_META in out.meta and RECRAWL_URL_META not in out.meta:
+                    for kept in self._sitemap_request(out, store, spider):
+                        yield kept
+                    continue
+            elif items is not None:
+                # A copy: pipelines may change the item before this callback is done.
+                items.append(ItemAdapter(out).asdict())
+            yield out
+        if url is not None and response.status == 200:
+            changed = store.update(url, response.meta.get(SITEMAP_LASTMOD_META), response.body, items)
+            key = "content_changed" if changed else "content_unchanged"
+            self.stats.inc_value(f"{RECRAWL_STATS_PREFIX}/{key}", spider=spider)
+
+
+class ConditionalGetMiddleware:
+    """
+    Downloader middleware that revalidates pages fetched in earlier runs (validator_store.py).
+
+    For a GET whose URL has a stored entry, process_request adds
+    If-None-Match / If-Modified-Since. A 304 is replaced by the stored body
+    as a 200 response flagged "revalidated", the way HttpCacheMiddleware does,
+    so callbacks and Non200ResponseGuardSpiderMiddleware see a normal page.
+    A 304 we cannot answer (validators the spider set itself) is requested
+    again without validators. 200 responses update the store. It sits
+    between MetaRefresh (580) and HttpCompression (590), so stored bodies are
+    already decompressed and the request still goes through retries.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool("CONDITIONAL_GET_ENABLED", False):
+            raise NotConfigured
+        self.settings = settings
+        self.stats = crawler.stats
+        self.max_age_s = settings.getfloat("CONDITIONAL_GET_MAX_AGE_DAYS", 30) * 86400.0
+        self.max_body_bytes = settings.getint("CONDITIONAL_GET_MAX_BODY_BYTES", 4 * 1024 * 1024)
+        self.store: ValidatorStore | None = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        mw = cls(crawler)
+        crawler.signals.connect(mw.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def _open_store(self, spider) -> ValidatorStore:
+        backend = _run_state_backend(
+            self.settings,
+            spider,
+            "CONDITIONAL_GET",
+            f"VALIDATORS-{spider.name}",
+            ".bin",
+            content_type="application/octet-stream",
+        )
+        store = ValidatorStore(backend, max_age_s=self.max_age_s, max_body_bytes=self.max_body_bytes)
+        store.load()
+        return store
+
+    def spider_opened(self, spider):
+        def opened(store):
+            self.store = store
+            self.stats.set_value(f"{CONDITIONAL_STATS_PREFIX}/entries_loaded", len(store.entries), spider=spider)
+            spider.logger.info("Conditional GET: %d known URLs from %s", len(store.entries), store.backend)
+
+        def failed(failure):
+            spider.logger.warning(
+                "Conditional GET: cannot open state, fetching unconditionally: %s", failure.getErrorMessage()
+            )
+
+        return deferToThread(self._open_store, spider).addCallbacks(opened, failed)
+
+    def spider_closed(self, spider, reason):
+        store = self.store
+        if store is None:
+            return None
+
+        def saved(size):
+            self.stats.set_value(f"{CONDITIONAL_STATS_PREFIX}/entries", len(store.entries), spider=spider)
+            self.stats.set_value(f"{CONDITIONAL_STATS_PREFIX}/state_bytes", size, spider=spider)
+            spider.logger.info(
+                "Conditional GET: saved %d URLs (%d bytes) to %s", len(store.entries), size, store.backend
+            )
+
+        def failed(failure):
+            spider.logger.error(
+                "Conditional GET: could not save state to %s: %s", store.backend, failure.getErrorMessage()
+            )
+
+        return deferToThread(store.save).addCallbacks(saved, failed)
+
+    def process_request(self, request, spider=None):
+        store = self.store
+        if store is None or request.method != "GET" or request.meta.get(DONT_REVALIDATE_META):
+            return None
+        entry = store.get(request.url)
+        if entry is None:
+            return None
+        if entry.etag:
+            request.headers[b"If-None-Match"] = entry.etag
+        if entry.last_modified:
+            request.headers[b"If-Modified-Since"] = entry.last_modified
+        request.meta[CONDITIONAL_META] = True
+        self.stats.inc_value(f"{CONDITIONAL_STATS_PREFIX}/requests", spider=spider)
+        return None
+
+    def process_response(self, request, response, spider=None):
+        store = self.store
+        if store is None or request.method != "GET":
+            return response
+        if response.status == 304:
+            entry = store.get(request.url) if request.meta.get(CONDITIONAL_META) else None
+            if entry is None:
+                if request.meta.get(DONT_REVALIDATE_META):
+                    return response
+                # Validators we did not set and have no body for: ask again, unconditionally.
+                self.stats.inc_value(f"{CONDITIONAL_STATS_PREFIX}/unusable_304", spider=spider)
+                retry = request.replace(dont_filter=True)
+                retry.headers.pop(b"If-None-Match", None)
+                retry.headers.pop(b"If-Modified-Since", None)
+                retry.meta[DONT_REVALIDATE_META] = True
+                return retry
+            store.touch(request.url, response.headers)
+            body = entry.body()
+            headers = Headers(response.headers)
+            for name in (b"Content-Encoding", b"Content-Length", b"Transfer-Encoding"):
+                headers.pop(name, None)
+            if entry.content_type:
+                headers[b"Content-Type"] = entry.content_type
+            respcls = responsetypes.from_args(headers=headers, url=request.url, body=body)
+            self.stats.inc_value(f"{CONDITIONAL_STATS_PREFIX}/not_modified", spider=spider)
+            self.stats.inc_value(f"{CONDITIONAL_STATS_PREFIX}/bytes_saved", len(body), spider=spider)
+            return respcls(
+                url=request.url,
+                status=200,
+                headers=headers,
+                body=body,
+                flags=response.flags + [REVALIDATED_FLAG],
+                request=request,
+                certificate=response.certificate,
+                ip_address=response.ip_address,
+                protocol=response.protocol,
+            )
+        if response.status == 200:
+            if request.meta.get(CONDITIONAL_META):
+                self.stats.inc_value(f"{CONDITIONAL_STATS_PREFIX}/modified", spider=spider)
+            if store.put(request.url, response.headers, response.body):
+                self.stats.inc_value(f"{CONDITIONAL_STATS_PREFIX}/stored", spider=spider)
+        return response
+
+
 @dataclass
+class MemoryAccountingExtension:
+    """
+    Per-spider RSS / Python heap accounting and leak flagging (memory_accounting.py).
+
+    Samples at spider_opened, every LOGSTATS_INTERVAL and at spider_closed
+    (after gc, so pipeline state not released by close_spider shows up as
+    retained). Retained growth above MEMORY_LEAK_THRESHOLD_MB is logged as a
+    suspected leak. The report is exposed as `spider.memory_report` for
+    RunValidationExtension's summary line, so this extension must be ordered
+    before it in EXTENSIONS. With spiders running concurrently, the figures
+    cover the whole process.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.stats = crawler.stats
+        self.interval = settings.getfloat("LOGSTATS_INTERVAL", 60.0)
+        self.threshold = settings.getfloat("MEMORY_LEAK_THRESHOLD_MB", 64.0) * MB
+        self.tracemalloc_frames = settings.getint("MEMORY_TRACEMALLOC_FRAMES", 1)
+        self.trace = settings.getbool("MEMORY_TRACEMALLOC", False)
+        self.top_sites = settings.getint("MEMORY_TOP_SITES", 10)
+        self.report: SpiderMemory | None = None
+        self._snapshot = None
+        self._task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("MEMORY_ACCOUNTING_ENABLED"):
+            raise NotConfigured
+        ext = cls(crawler)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        if self.trace and not tracemalloc.is_tracing():
+            # Left running for the following spiders, so their baselines are comparable.
+            tracemalloc.start(max(1, self.tracemalloc_frames))
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            self._snapshot = tracemalloc.take_snapshot()
+        self.report = SpiderMemory(spider.name, take_sample())
+        spider.memory_report = self.report
+        if self.interval > 0:
+            self._task = LoopingCall(self._tick)
+            self._task.start(self.interval, now=False)
+
+    def _tick(self):
+        self.report.observe(take_sample())
+
+    def spider_closed(self, spider, reason):
+        if self._task is not None and self._task.running:
+            self._task.stop()
+        report = self.report
+        if report is None:
+            return
+        traced_peak = sites = None
+        sample = take_sample(collect=True)
+        if tracemalloc.is_tracing():
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            if self._snapshot is not None:
+                sites = top_allocation_sites(self._snapshot, tracemalloc.take_snapshot(), self.top_sites)
+            self._snapshot = None
+        report.close(sample, traced_peak=traced_peak, top_sites=sites or ())
+        report.publish(self.stats, spider)
+        if report.retained > self.threshold:
+            self.stats.set_value("memory/leak_suspected", True, spider=spider)
+            spider.logger.warning(
+                "Memory not released after close_spider: %+.1f MB retained (threshold %.0f MB)%s",
+                report.retained / MB,
+                self.threshold / MB,
+                f"; top allocation sites: {report.top_sites[:5]}" if report.top_sites else "",
+            )
+
+
 class _SpiderRunCounters:
     responses: int = 0
     items: int = 0
@@ -249,8 +934,13 @@ class RunValidationExtension:
         if sitemap_cov is not None:
             self.stats.set_value("run_validation/sitemap_coverage", sitemap_cov, spider=spider)
 
+        # Filled by CallbackProfileMiddleware / MemoryAccountingExtension when enabled.
+        profile = getattr(spider, "callback_profile", None)
+        callbacks = profile.summary() if profile is not None else ""
+        memory = getattr(spider, "memory_report", None)
+
         spider.logger.info(
-            "Run summary: responses=%d items=%d non_200=%d 404=%d (rate=%.2f%%) items/100=%.2f%s reason=%s",
+            "Run summary: responses=%d items=%d non_200=%d 404=%d (rate=%.2f%%) items/100=%.2f%s reason=%s%s%s",
             responses,
             items,
             self._counters.non_200,
@@ -263,6 +953,8 @@ class RunValidationExtension:
                 else ""
             ),
             reason,
+            f" memory(MB): {memory.summary()}" if memory is not None else "",
+            f" callbacks(ms p50/p90/p99): {callbacks}" if callbacks else "",
         )
 
         failures = []
@@ -282,3 +974,58 @@ class RunValidationExtension:
             self.stats.set_value("validation_failed", True, spider=spider)
             self.stats.set_value("validation_failed_reason", msg, spider=spider)
             spider.logger.error(msg)
+
+
+class SamplingProfilerExtension:
+    """
+    Writes one collapsed-stack profile per spider (sampling_profiler.py).
+
+    src/main.py starts the process-wide sampler from Actor input; this
+    extension only opens a segment at spider_opened and writes it out at
+    spider_closed. Process-mode workers inherit SAMPLING_PROFILER_INTERVAL_MS
+    and start their own sampler here.
+    """
+
+    STATS_PREFIX = "sampling_profiler"
+
+    def __init__(self, crawler, profiler: SamplingProfiler):
+        self.stats = crawler.stats
+        self.profiler = profiler
+        self.directory = crawler.settings.get("SAMPLING_PROFILER_DIR") or os.path.join("storage", "profiles")
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if crawler.settings.getfloat("SAMPLING_PROFILER_INTERVAL_MS", 0) <= 0:
+            raise NotConfigured
+        profiler = get_sampling_profiler()
+        if profiler is None:
+            profiler = SamplingProfiler.from_settings(crawler.settings)
+            profiler.start()
+            set_sampling_profiler(profiler)
+        ext = cls(crawler, profiler)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        self.profiler.begin(spider.name)
+
+    def spider_closed(self, spider, reason):
+        counts = self.profiler.end(spider.name)
+        try:
+            path = write_collapsed(counts, self.directory, spider.name)
+        except OSError as e:
+            spider.logger.warning("Sampling profile could not be written: %r", e)
+            return
+        samples = sum(counts.values())
+        self.stats.set_value(f"{self.STATS_PREFIX}/samples", samples, spider=spider)
+        self.stats.set_value(f"{self.STATS_PREFIX}/stacks", len(counts), spider=spider)
+        self.stats.set_value(f"{self.STATS_PREFIX}/overhead", round(self.profiler.overhead(), 4), spider=spider)
+        self.stats.set_value(f"{self.STATS_PREFIX}/path", path, spider=spider)
+        spider.logger.info(
+            "Sampling profile: %d thread samples, %d distinct stacks, sampler overhead %.2f%% -> %s",
+            samples,
+            len(counts),
+            self.profiler.overhead() * 100.0,
+            path,
+        )
@@ -3,13 +3,34 @@ import json
 import queue
 import threading
 import os
+import shutil
+import tempfile
 import concurrent.futures
+from dataclasses import dataclass
 from itemadapter import ItemAdapter
+from scrapy import signals
 from twisted.internet import reactor
 
 from apify import Actor
-from apify_client import ApifyClient
-from sven_scraping_projects.apify_runtime import get_actor_loop
+from apify_client import ApifyClient, ApifyClientAsync
+from sven_scraping_projects.apify_runtime import get_actor_loop, get_record_sink
+from sven_scraping_projects.dataset_push import (
+    AsyncPushEngine,
+    BatchSizeController,
+    ByteBatcher,
+    EncodedRecord,
+    PushBackpressure,
+    PushEngine,
+    encode_record,
+    iter_batches,
+    join_payload,
+    record_encoder,
+)
+from sven_scraping_projects.dedupe_index import SortedHashIndex, key_hash, open_key_index
+from sven_scraping_projects.push_ledger import PushLedger, record_id
+from sven_scraping_projects.raw_fields_store import REF_FIELD, RawFieldsStore
+from sven_scraping_projects.utils.name_parsing import split_academic_titles, strip_salutation
+from sven_scraping_projects.spill_queue import SpillQueue
 
 
 def _normalize_for_dataset(obj):
@@ -64,63 +85,14 @@ def _collapse_ws(value: str) -> str:
     return " ".join((value or "").split())
 
 
-# Longest match first — German academic / professional prefixes often stacked
-# (e.g. "Prof. Dr. med.").
-_ACADEMIC_TITLE_PREFIXES: tuple[str, ...] = (
-    "Prof. Dr. med. dent.",
-    "Prof. Dr. med.",
-    "Prof. Dr.",
-    "PD Dr. med. dent.",
-    "PD Dr. med.",
-    "PD Dr.",
-    "Univ.-Prof. Dr. med.",
-    "Univ.-Prof. Dr.",
-    "apl. Prof. Dr. med.",
-    "apl. Prof. Dr.",
-    "Dr. med. dent.",
-    "Dr. med.",
-    "Dr.",
-    "Dipl.-Psych.",
-    "Med. pract.",
-)
-
-
 def _strip_leading_frau_herr(s: str) -> str:
-    s = _collapse_ws(s)
-    low = s.lower()
-    if low.startswith("frau "):
-        return _collapse_ws(s[5:])
-    if low.startswith("herr "):
-        return _collapse_ws(s[5:])
-    return s
-
-
-def _strip_one_academic_title_left(s: str) -> tuple[str | None, str]:
-    """If s starts with a known title prefix, return (title, remainder). Else (None, s)."""
-    s = _collapse_ws(s)
-    if not s:
-        return None, s
-    for prefix in _ACADEMIC_TITLE_PREFIXES:
-        if not s.startswith(prefix):
-            continue
-        if len(s) == len(prefix):
-            return prefix, ""
-        nxt = s[len(prefix) : len(prefix) + 1]
-        if nxt.isspace() or nxt in ",;":
-            rest = _collapse_ws(s[len(prefix) :].lstrip(" ,;"))
-            return prefix, rest
-    return None, s
+    return strip_salutation(_collapse_ws(s))
 
 
 def _extract_academic_titles_left(s: str) -> tuple[list[str], str]:
-    titles: list[str] = []
-    rest = _collapse_ws(s)
-    while rest:
-        t, rest = _strip_one_academic_title_left(rest)
-        if t is None:
-            break
-        titles.append(t)
-    return titles, rest
+    # Single trie scan with an LRU cache (utils/name_parsing); the same raw names recur a lot.
+    titles, rest = split_academic_titles(s)
+    return list(titles), rest
 
 
 def _dedupe_titles_preserve_order(titles: list[str]) -> list[str]:
@@ -218,317 +190,342 @@ def _normalize_academic_titles_for_person(
     return display_out, fn, ln, name_title_out, job_title_out
 
 
-def _canonicalize_item(item_dict):
-    """
-    Map spider-specific keys into a canonical schema.
-
-    - Keeps provenance (`source`, `source_url`)
-    - Merges synonymous fields (phone/telephone, website/internet, specialty variants, etc.)
-    - Preserves original payload in `raw_source_fields` for auditability
-    """
-    source = (item_dict.get("source") or "").strip()
+# ---------------------------------------------------------------------------
+# Fused single-pass record builder
+#
+# Reads each source key once and writes the final string-typed record directly.
+# It replaced a chain of five stages (canonicalize, flatten, normalize, legacy
+# aliases, stringify) that copied the whole dict each time; that chain lives on in
+# tests/staged_record_builder.py, and test_record_builder checks both agree.
+# Source-specific canonicalization is a declarative field map per source.
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class _SourceFieldMap:
+    """Declarative mapping from spider item keys to canonical dataset fields."""
+
+    # canonical scalar -> item keys, first non-empty wins
+    scalars: tuple[tuple[str, tuple[str, ...]], ...]
+    # canonical list -> item keys split on commas and concatenated; the optional third
+    # element names an already-resolved canonical scalar that is prepended
+    lists: tuple[tuple[str, tuple[str, ...], str | None], ...]
+    # canonical scalar -> item keys that replace it when non-empty; the optional third
+    # element names a list field rebuilt from the replacement value
+    scalar_overrides: tuple[tuple[str, tuple[str, ...], str | None], ...] = ()
+    # canonical scalar -> item keys used only when the scalar is still empty
+    scalar_fallbacks: tuple[tuple[str, tuple[str, ...]], ...] = ()
+    # canonical list -> item key whose split value replaces the list; when the flag is
+    # True the replacement only happens if the item value is truthy
+    list_replacements: tuple[tuple[str, str, bool], ...] = ()
+    default_entity_type: str = "person"
+
+
+_COMMON_SCALAR_FIELDS: tuple[tuple[str, tuple[str, ...]], ...] = (
+    ("source_url", ("url", "source_url")),
+    ("display_name", ("display_name", "name")),
+    ("name_title", ("name_title",)),
+    ("first_name", ("first_name",)),
+    ("last_name", ("last_name",)),
+    ("phone", ("phone", "telephone")),
+    ("fax", ("fax",)),
+    ("email", ("email",)),
+    ("website_url", ("website", "internet", "website_url")),
+    ("address_freeform", ("address", "address_freeform")),
+    ("street", ("street",)),
+    ("postal_code", ("postal_code", "zip")),
+    ("city", ("city",)),
+    ("location_freeform", ("location", "location_freeform")),
+    ("job_title", ("job_title", "position")),
+    ("department_or_unit", ("department_or_unit", "department", "einrichtung")),
+    ("practice_name", ("practice_name",)),
+    ("practice_relation", ("practice_relation",)),
+    ("primary_specialty", ("primary_specialty", "specialty")),
+    ("responsibility_area", ("responsibility_area", "area_of_responsibility")),
+    ("image_url", ("image_url", "img_url")),
+    ("career_highlights", ("career_highlights",)),
+    ("llm_content", ("llm_content",)),
+    ("entity_type", ("entity_type",)),
+)
 
-    # Basic identity / provenance
-    source_url = _first_non_empty(item_dict.get("url"), item_dict.get("source_url"))
-    display_name = _first_non_empty(item_dict.get("display_name"), item_dict.get("name"))
-
-    # IMPORTANT: spiders use `title` inconsistently (e.g. UKE uses it as job title/role).
-    # `name_title` should be an academic/prefix-like title when we actually have it.
-    name_title = _first_non_empty(item_dict.get("name_title"))
-    first_name = _first_non_empty(item_dict.get("first_name"))
-    last_name = _first_non_empty(item_dict.get("last_name"))
-
-    # Contact
-    phone = _first_non_empty(item_dict.get("phone"), item_dict.get("telephone"))
-    fax = _first_non_empty(item_dict.get("fax"))
-    email = _first_non_empty(item_dict.get("email"))
-    website_url = _first_non_empty(item_dict.get("website"), item_dict.get("internet"), item_dict.get("website_url"))
-
-    # Location
-    address_freeform = _first_non_empty(item_dict.get("address"), item_dict.get("address_freeform"))
-    street = _first_non_empty(item_dict.get("street"))
-    postal_code = _first_non_empty(item_dict.get("postal_code"), item_dict.get("zip"))
-    city = _first_non_empty(item_dict.get("city"))
-    location_freeform = _first_non_empty(item_dict.get("location"), item_dict.get("location_freeform"))
-
-    # Role / org
-    # Canonical "position" field (most important for downstream): always map to job_title.
-    job_title = _first_non_empty(item_dict.get("job_title"), item_dict.get("position"))
-    department_or_unit = _first_non_empty(
-        item_dict.get("department_or_unit"),
-        item_dict.get("department"),
-        item_dict.get("einrichtung"),
-    )
-    practice_name = _first_non_empty(item_dict.get("practice_name"))
-    practice_relation = _first_non_empty(item_dict.get("practice_relation"))
-
-    # Domain fields (specialty / expertise / services)
-    primary_specialty = _first_non_empty(item_dict.get("primary_specialty"), item_dict.get("specialty"))
-    responsibility_area = _first_non_empty(
-        item_dict.get("responsibility_area"),
-        item_dict.get("area_of_responsibility"),
-    )
+_COMMON_LIST_FIELDS: tuple[tuple[str, tuple[str, ...], str | None], ...] = (
+    ("specialties", ("specialization", "specialties", "areas_of_expertise"), "primary_specialty"),
+    ("services_or_focus_areas", ("services_or_focus_areas", "main_areas_of_activity", "areas_of_activity"), None),
+    ("languages", ("languages",), None),
+    ("memberships", ("memberships", "field_membership"), None),
+)
 
-    # Collect specialties-like signals into a list (deduped, stable order)
-    specialties_list = []
-    for v in (
-        primary_specialty,
-        item_dict.get("specialization"),
-        item_dict.get("specialties"),
-        item_dict.get("areas_of_expertise"),
-    ):
-        specialties_list.extend(_split_csvish(v))
-    # Some spiders misuse position/area_of_work as specialty labels; normalize per source below.
-
-    services_or_focus = []
-    for v in (
-        item_dict.get("services_or_focus_areas"),
-        item_dict.get("main_areas_of_activity"),
-        item_dict.get("areas_of_activity"),
-    ):
-        services_or_focus.extend(_split_csvish(v))
-
-    languages = _split_csvish(item_dict.get("languages"))
-
-    # Extras
-    image_url = _first_non_empty(item_dict.get("image_url"), item_dict.get("img_url"))
-    career_highlights = _first_non_empty(item_dict.get("career_highlights"))
-    llm_content = _first_non_empty(item_dict.get("llm_content"))
-
-    memberships = []
-    memberships.extend(_split_csvish(item_dict.get("memberships")))
-    memberships.extend(_split_csvish(item_dict.get("field_membership")))
-
-    affiliated_facilities = []
-    if item_dict.get("affiliated_facilities"):
-        affiliated_facilities.extend(_split_csvish(item_dict.get("affiliated_facilities")))
-    else:
-        # Asklepios legacy: clinic_1/clinic_2 are multi-line strings; keep as-is entries.
-        for k in ("clinic_1", "clinic_2"):
-            v = item_dict.get(k)
-            if isinstance(v, str) and v.strip():
-                affiliated_facilities.append(v.strip())
-
-    # Source-specific fixes to prevent semantic mixing
-    if source == "kvhh":
-        # kvhh sets multiple synonymous keys to the same Fachgebiet.
-        kvhh_specialty = _first_non_empty(
-            item_dict.get("specialization"),
-            item_dict.get("position"),
-            item_dict.get("area_of_work"),
-            item_dict.get("department"),
-        )
-        if kvhh_specialty:
-            primary_specialty = kvhh_specialty
-            specialties_list = _split_csvish(kvhh_specialty)
-        # kvhh "Leistungen" are services/focus areas
-        services_or_focus = _split_csvish(item_dict.get("main_areas_of_activity"))
-
-    if source == "zahnaerzte_hh":
-        # specialization is effectively their main specialty list.
-        if not primary_specialty:
-            primary_specialty = _first_non_empty(item_dict.get("specialization"))
-        if item_dict.get("specialization"):
-            specialties_list = _split_csvish(item_dict.get("specialization"))
-        # They also set position/area_of_work/main_areas_of_activity to same value; treat as specialty list already.
-        if not services_or_focus:
-            services_or_focus = _split_csvish(item_dict.get("main_areas_of_activity"))
-
-    if source == "uke":
-        # UKE `title` is the role/position shown on profile pages (not academic title).
-        if not job_title:
-            job_title = _first_non_empty(item_dict.get("title"))
-        # UKE work_area is usually contact/location-like; do NOT treat as specialty.
-        # Keep it as department/unit if department missing, else preserve in raw.
-        if not department_or_unit:
-            department_or_unit = _first_non_empty(item_dict.get("work_area"))
-
-    if source == "asklepios":
-        # Asklepios specialty is the medical specialty; position is job title.
-        if not primary_specialty:
-            primary_specialty = _first_non_empty(item_dict.get("specialty"))
-
-    # Deduplicate list fields while preserving order
-    def _dedupe(seq):
-        seen = set()
-        out = []
-        for x in seq:
-            x = (x or "").strip() if isinstance(x, str) else str(x).strip()
-            if not x or x in seen:
+_SOURCE_FIELD_MAPS: dict[str, _SourceFieldMap] = {
+    "kvhh": _SourceFieldMap(
+        scalars=_COMMON_SCALAR_FIELDS,
+        lists=_COMMON_LIST_FIELDS,
+        # kvhh sets several synonymous keys to the same Fachgebiet; "Leistungen" are services.
+        scalar_overrides=(
+            ("primary_specialty", ("specialization", "position", "area_of_work", "department"), "specialties"),
+        ),
+        list_replacements=(("services_or_focus_areas", "main_areas_of_activity", False),),
+    ),
+    "zahnaerzte_hh": _SourceFieldMap(
+        scalars=_COMMON_SCALAR_FIELDS,
+        lists=_COMMON_LIST_FIELDS,
+        scalar_fallbacks=(("primary_specialty", ("specialization",)),),
+        list_replacements=(("specialties", "specialization", True),),
+    ),
+    "uke": _SourceFieldMap(
+        scalars=_COMMON_SCALAR_FIELDS,
+        lists=_COMMON_LIST_FIELDS,
+        # UKE `title` is the role on the profile page; work_area is a contact/location block.
+        scalar_fallbacks=(("job_title", ("title",)), ("department_or_unit", ("work_area",))),
+    ),
+    "asklepios": _SourceFieldMap(
+        scalars=_COMMON_SCALAR_FIELDS,
+        lists=_COMMON_LIST_FIELDS,
+        scalar_fallbacks=(("primary_specialty", ("specialty",)),),
+    ),
+    "apothekerkammer-hamburg": _SourceFieldMap(
+        scalars=_COMMON_SCALAR_FIELDS,
+        lists=_COMMON_LIST_FIELDS,
+        default_entity_type="organization",
+    ),
+}
+
+_DEFAULT_FIELD_MAP = _SourceFieldMap(scalars=_COMMON_SCALAR_FIELDS, lists=_COMMON_LIST_FIELDS)
+
+
+def _flat_dataset_value(v):
+    """_flatten_for_apify_dataset_schema + _normalize_for_dataset for one canonical value."""
+    if v is None:
+        return ""
+    if isinstance(v, (str, int, float, bool)):
+        return v
+    if isinstance(v, list):
+        parts = []
+        for x in v:
+            if x is None:
                 continue
-            seen.add(x)
-            out.append(x)
-        return out
+            s = str(x).strip()
+            if s:
+                parts.append(s)
+        return ", ".join(parts)
+    if isinstance(v, dict):
+        return json.dumps(_normalize_for_dataset(v), ensure_ascii=False)
+    return str(v)
+
+
+def _dataset_str(flat):
+    """_stringify_apify_dataset_record for one already-flattened value."""
+    if isinstance(flat, str):
+        return flat
+    if isinstance(flat, bool):
+        return "true" if flat else "false"
+    return str(flat)
+
+
+def _raw_source_fields_json(item_dict: dict) -> str:
+    for v in item_dict.values():
+        if v is None or not isinstance(v, (str, int, float, bool)):
+            return json.dumps(_normalize_for_dataset(item_dict), ensure_ascii=False)
+    # Fast path: flat item of JSON scalars, normalisation would be an identity copy.
+    return json.dumps(item_dict, ensure_ascii=False)
+
+
+class _RecordBuilder:
+    """Builds the final string-typed dataset record for one source in a single pass."""
+
+    __slots__ = (
+        "_scalars",
+        "_lists",
+        "_scalar_overrides",
+        "_scalar_fallbacks",
+        "_list_replacements",
+        "_default_entity_type",
+    )
 
-    specialties = _dedupe(specialties_list)
-    services_or_focus_areas = _dedupe(services_or_focus)
-    languages = _dedupe(languages)
-    memberships = _dedupe(memberships)
-    affiliated_facilities = _dedupe(affiliated_facilities)
-
-    # Entity type inference (minimal, consistent with current sources)
-    entity_type = _first_non_empty(item_dict.get("entity_type"))
-    if not entity_type:
-        if source in {"apothekerkammer-hamburg"}:
-            entity_type = "organization"
+    def __init__(self, field_map: _SourceFieldMap):
+        self._scalars = field_map.scalars
+        self._lists = field_map.lists
+        self._scalar_overrides = field_map.scalar_overrides
+        self._scalar_fallbacks = field_map.scalar_fallbacks
+        self._list_replacements = field_map.list_replacements
+        self._default_entity_type = field_map.default_entity_type
+
+    def build(self, item_dict: dict, source: str) -> dict:
+        get = item_dict.get
+        c = {}
+        for out_key, keys in self._scalars:
+            value = ""
+            for k in keys:
+                v = get(k)
+                if v is None:
+                    continue
+                if isinstance(v, str):
+                    v = v.strip()
+                    if not v:
+                        continue
+                value = v
+                break
+            c[out_key] = value
+
+        lists = {}
+        for out_key, keys, lead in self._lists:
+            parts = _split_csvish(c[lead]) if lead is not None else []
+            for k in keys:
+                v = get(k)
+                if v is not None:
+                    parts.extend(_split_csvish(v))
+            lists[out_key] = parts
+
+        affiliated = get("affiliated_facilities")
+        if affiliated:
+            lists["affiliated_facilities"] = _split_csvish(affiliated)
         else:
-            entity_type = "person"
-
-    # Strip Dr./Prof./… from person names; keep titles in name_title and surface
-    # them in job_title for Apify table views (Position column).
-    if entity_type == "person":
-        display_name, first_name, last_name, name_title, job_title = _normalize_academic_titles_for_person(
-            display_name,
-            first_name,
-            last_name,
-            name_title,
-            job_title,
-        )
+            # Asklepios legacy: clinic_1/clinic_2 are multi-line strings; keep as-is entries.
+            facilities = []
+            for k in ("clinic_1", "clinic_2"):
+                v = get(k)
+                if isinstance(v, str) and v.strip():
+                    facilities.append(v.strip())
+            lists["affiliated_facilities"] = facilities
+
+        for out_key, keys, list_key in self._scalar_overrides:
+            value = _first_non_empty(*(get(k) for k in keys))
+            if value:
+                c[out_key] = value
+                if list_key is not None:
+                    lists[list_key] = _split_csvish(value)
+        for out_key, keys in self._scalar_fallbacks:
+            if not c[out_key]:
+                c[out_key] = _first_non_empty(*(get(k) for k in keys))
+        for list_key, item_key, only_if_truthy in self._list_replacements:
+            v = get(item_key)
+            if v or not only_if_truthy:
+                lists[list_key] = _split_csvish(v)
+
+        c["entity_type"] = c["entity_type"] or self._default_entity_type
+        if c["entity_type"] == "person":
+            (
+                c["display_name"],
+                c["first_name"],
+                c["last_name"],
+                c["name_title"],
+                c["job_title"],
+            ) = _normalize_academic_titles_for_person(
+                c["display_name"],
+                c["first_name"],
+                c["last_name"],
+                c["name_title"],
+                c["job_title"],
+            )
 
-    canonical = {
-        # Provenance
-        "source": source,
-        "source_url": source_url,
-
-        # Entity
-        "entity_type": entity_type,
-        "display_name": display_name,
-        "name_title": name_title,
-        "first_name": first_name,
-        "last_name": last_name,
-
-        # Contact
-        "phone": phone,
-        "fax": fax,
-        "email": email,
-        "website_url": website_url,
-
-        # Location
-        "address_freeform": address_freeform,
-        "street": street,
-        "postal_code": postal_code,
-        "city": city,
-        "location_freeform": location_freeform,
-
-        # Org/role
-        "job_title": job_title,
-        "department_or_unit": department_or_unit,
-        "practice_name": practice_name,
-        "practice_relation": practice_relation,
-
-        # Domain
-        "primary_specialty": primary_specialty,
-        "specialties": specialties,
-        "services_or_focus_areas": services_or_focus_areas,
-        "responsibility_area": responsibility_area,
-        "languages": languages,
-        "memberships": memberships,
-
-        # Extras
-        "image_url": image_url,
-        "career_highlights": career_highlights,
-        "affiliated_facilities": affiliated_facilities,
-        "llm_content": llm_content,
-
-        # Audit / debugging escape hatch
-        "raw_source_fields": dict(item_dict),
-    }
-
-    # Drop empty-string-only keys? Keep as-is: dataset consumers may prefer stable keys.
-    return canonical
-
-
-def _flatten_for_apify_dataset_schema(item):
-    """
-    Apify dataset schema in .actor/actor.json types several keys as `string`
-    (e.g. specialties, languages). Arrays and nested objects fail validation.
+        # _split_csvish already yields stripped, non-empty strings, so joining the
+        # order-preserving dedupe is exactly what the flatten stage produced.
+        for list_key, parts in lists.items():
+            c[list_key] = ", ".join(dict.fromkeys(parts))
+
+        out = {"source": source}
+        for key in _CANONICAL_OUTPUT_KEYS:
+            v = c[key]
+            out[key] = v if v.__class__ is str else _dataset_str(_flat_dataset_value(v))
+        out["raw_source_fields"] = _raw_source_fields_json(item_dict)
+        # Legacy / overview view aliases (_add_legacy_dataset_aliases)
+        for alias, key in _LEGACY_ALIAS_KEYS:
+            v = c[key]
+            out[alias] = v if v.__class__ is str else _dataset_str(_flat_dataset_value(v) or "")
+        return out
 
-    - list -> comma-separated string
-    - dict (e.g. raw_source_fields) -> JSON string
-    """
-    out = {}
-    for k, v in item.items():
-        if k == "raw_source_fields" and isinstance(v, dict):
-            out[k] = json.dumps(_normalize_for_dataset(v), ensure_ascii=False)
-        elif isinstance(v, list):
-            parts = []
-            for x in v:
-                if x is None:
-                    continue
-                s = str(x).strip()
-                if s:
-                    parts.append(s)
-            out[k] = ", ".join(parts)
-        elif isinstance(v, dict):
-            out[k] = json.dumps(_normalize_for_dataset(v), ensure_ascii=False)
-        else:
-            out[k] = v
-    return out
 
+# Output order of _canonicalize_item() (after `source`, before `raw_source_fields`).
+_CANONICAL_OUTPUT_KEYS: tuple[str, ...] = (
+    "source_url",
+    "entity_type",
+    "display_name",
+    "name_title",
+    "first_name",
+    "last_name",
+    "phone",
+    "fax",
+    "email",
+    "website_url",
+    "address_freeform",
+    "street",
+    "postal_code",
+    "city",
+    "location_freeform",
+    "job_title",
+    "department_or_unit",
+    "practice_name",
+    "practice_relation",
+    "primary_specialty",
+    "specialties",
+    "services_or_focus_areas",
+    "responsibility_area",
+    "languages",
+    "memberships",
+    "image_url",
+    "career_highlights",
+    "affiliated_facilities",
+    "llm_content",
+)
 
-def _add_legacy_dataset_aliases(rec):
-    """
-    Original actor schema + UI views expect name, url, telephone alongside
-    canonical keys. Duplicate here so validation and table views stay populated.
-    """
-    if not isinstance(rec, dict):
-        return rec
-    out = dict(rec)
-    # Legacy / overview view fields (same semantics as canonical)
-    if "name" not in out or out.get("name") == "":
-        out["name"] = out.get("display_name") or ""
-    if "url" not in out or out.get("url") == "":
-        out["url"] = out.get("source_url") or ""
-    if "telephone" not in out or out.get("telephone") == "":
-        out["telephone"] = out.get("phone") or ""
-    if "title" not in out or out.get("title") == "":
-        out["title"] = out.get("name_title") or ""
-    if "department" not in out or out.get("department") == "":
-        out["department"] = out.get("department_or_unit") or ""
-    if "work_area" not in out or out.get("work_area") == "":
-        out["work_area"] = out.get("location_freeform") or ""
-    if "location" not in out or out.get("location") == "":
-        out["location"] = out.get("location_freeform") or ""
-    if "areas_of_expertise" not in out or out.get("areas_of_expertise") == "":
-        out["areas_of_expertise"] = out.get("specialties") or ""
-    if "areas_of_activity" not in out or out.get("areas_of_activity") == "":
-        out["areas_of_activity"] = out.get("services_or_focus_areas") or ""
-    if "website" not in out or out.get("website") == "":
-        out["website"] = out.get("website_url") or ""
-    if "address" not in out or out.get("address") == "":
-        out["address"] = out.get("address_freeform") or ""
-    return out
+# Order and sources of _add_legacy_dataset_aliases().
+_LEGACY_ALIAS_KEYS: tuple[tuple[str, str], ...] = (
+    ("name", "display_name"),
+    ("url", "source_url"),
+    ("telephone", "phone"),
+    ("title", "name_title"),
+    ("department", "department_or_unit"),
+    ("work_area", "location_freeform"),
+    ("location", "location_freeform"),
+    ("areas_of_expertise", "specialties"),
+    ("areas_of_activity", "services_or_focus_areas"),
+    ("website", "website_url"),
+    ("address", "address_freeform"),
+)
 
 
-def _stringify_apify_dataset_record(rec):
-    """
-    Apify dataset validation expects string-typed fields (see .actor/actor.json).
-    Spiders sometimes yield ints (e.g. PLZ as number from JSON); _normalize_for_dataset
-    preserves int/float/bool, which still fails schema validation.
-    """
-    if not isinstance(rec, dict):
-        return rec
-    out = {}
-    for k, v in rec.items():
-        if v is None:
-            out[k] = ""
-        elif isinstance(v, str):
-            out[k] = v
-        elif isinstance(v, bool):
-            out[k] = "true" if v else "false"
-        elif isinstance(v, (int, float)):
-            out[k] = str(v)
-        else:
-            out[k] = str(v)
-    return out
+_RECORD_BUILDERS: dict[str, _RecordBuilder] = {
+    source: _RecordBuilder(field_map) for source, field_map in _SOURCE_FIELD_MAPS.items()
+}
+_DEFAULT_RECORD_BUILDER = _RecordBuilder(_DEFAULT_FIELD_MAP)
 
 
 def _to_apify_dataset_record(item_dict: dict) -> dict:
-    canonical = _canonicalize_item(item_dict)
-    flattened = _flatten_for_apify_dataset_schema(canonical)
-    normalized = _normalize_for_dataset(flattened)
-    with_aliases = _add_legacy_dataset_aliases(normalized)
-    return _stringify_apify_dataset_record(with_aliases)
+    source = (item_dict.get("source") or "").strip()
+    builder = _RECORD_BUILDERS.get(source, _DEFAULT_RECORD_BUILDER)
+    return builder.build(item_dict, source)
+
+
+def _single_loop_mode(settings) -> bool:
+    """APIFY_EVENT_LOOP_MODE=single and the reactor is Twisted's AsyncioSelectorReactor (src/main.py)."""
+    if settings is None or (settings.get("APIFY_EVENT_LOOP_MODE") or "threaded").strip().lower() != "single":
+        return False
+    from scrapy.utils.reactor import is_asyncio_reactor_installed
+
+    return is_asyncio_reactor_installed()
+
+
+def open_push_ledger(jobdir: str, settings, stats=None) -> PushLedger | None:
+    """The push ledger in `jobdir`/push_ledger, or None when it is disabled or cannot be opened."""
+    if not jobdir or not settings.getbool("APIFY_PUSH_LEDGER_ENABLED", True):
+        return None
+    directory = os.path.join(jobdir, "push_ledger")
+    try:
+        ledger = PushLedger(
+            directory,
+            journal_segment_bytes=settings.getint("APIFY_PUSH_LEDGER_SEGMENT_BYTES", 16 * 1024 * 1024),
+            stats=stats,
+        )
+    except OSError as e:
+        Actor.log.warning("ApifyPipeline: Cannot open push ledger in %s; pushing without it: %r", directory, e)
+        return None
+    if ledger.recovered_committed or ledger.replay:
+        Actor.log.info(
+            "ApifyPipeline: Push ledger resumed in %s (%d records committed earlier, %d to replay)",
+            directory,
+            ledger.recovered_committed,
+            len(ledger.replay),
+        )
+    return ledger
 
 
 class ApifyPipeline:
@@ -542,17 +539,47 @@ class ApifyPipeline:
         self._push_worker = None
         self._push_worker_stop = None
         self._push_worker_err = None
-        self._push_batch_size = 500
+        # Upper bound on records per push; batches are normally cut by bytes (see _push_batch_sizer).
+        self._push_max_batch_items = 5000
         self._push_flush_interval_s = 2.0
-        self._seen_keys = set()
+        self._push_batch_sizer = BatchSizeController()
+        self._push_concurrency = 4
+        self._push_preserve_order = False
+        self._push_engine = None
+        self._push_queue_max_items = 5000
+        self._spill = None
+        self._spill_is_temporary = False
+        self._ledger = None
+        self._backpressure = None
+        self._backpressure_poll = None
+        # 64-bit hashes of source_url (see dedupe_index); persisted in JOBDIR by open_spider.
+        self._seen_keys = SortedHashIndex()
+        self._seen_versions = None
+        self._duplicate_key_policy = "count"
         self._duplicate_key_count = 0
         self._actor_loop = None
-
-    def _push_chunk(self, chunk, *, mode: str, progress: tuple[int, int] | None = None) -> None:
+        self._record_sink = None
+        # Single event loop mode: batches are cut on the reactor and pushed by AsyncPushEngine.
+        self._single_loop = False
+        self._batcher = None
+        self._flush_timer = None
+        self._apify_dataset_async = None
+        self._spider_name = None
+        # Records are encoded to JSON once, in process_item (None: the API client encodes them).
+        self._encoder = record_encoder()
+        # RAW_FIELDS_STORE: raw_source_fields go to a side store, rows keep a reference.
+        self._raw_store = None
+
+    def _push_chunk(self, chunk, *, mode: str, progress: tuple[int, int] | None = None) -> bool:
+        """Push one batch. Returns False when the batch was buffered in self.items instead."""
         if not chunk:
-            return
+            return True
+        if self._record_sink is not None:
+            # Process-per-spider mode: the parent process owns the dataset push.
+            self._record_sink.send(chunk)
+            return True
         if self._apify_dataset is not None:
-            self._apify_dataset.push_items(chunk)
+            self._apify_dataset.push_items(self._push_payload(chunk))
             if progress is not None:
                 done, total = progress
                 Actor.log.info(
@@ -567,12 +594,12 @@ class ApifyPipeline:
                     len(chunk),
                     mode,
                 )
-            return
+            return True
 
         push_data = getattr(Actor, "push_data", None)
         if not callable(push_data):
             self.items.extend(chunk)
-            return
+            return False
         try:
             res = push_data(chunk)
             if asyncio.iscoroutine(res):
@@ -589,7 +616,7 @@ class ApifyPipeline:
                         asyncio.run(res)
                     except RuntimeError:
                         self.items.extend(chunk)
-                        return
+                        return False
             if progress is not None:
                 done, total = progress
                 Actor.log.info(
@@ -604,6 +631,7 @@ class ApifyPipeline:
                     len(chunk),
                     mode,
                 )
+            return True
         except Exception as e:
             if mode == "overflow":
                 raise
@@ -616,7 +644,406 @@ class ApifyPipeline:
             except Exception:
                 pass
             self.items.extend(chunk)
-    
+            return False
+
+    def _push_payload(self, chunk) -> str:
+        """The batch as the JSON array string push_items() sends as-is, joined from the records' own JSON."""
+        if self._encoder is None:
+            return json.dumps(chunk, ensure_ascii=False, allow_nan=False, default=str)
+        return join_payload(chunk).decode("utf-8")
+
+    async def _push_chunk_async(self, chunk, *, mode: str) -> bool:
+        """_push_chunk for the single event loop mode: awaited on the reactor's loop, no thread hop."""
+        if self._apify_dataset_async is not None:
+            # Built off the reactor: encoding (or even joining) a multi-MB batch stalls it.
+            payload = await asyncio.to_thread(self._push_payload, chunk)
+            await self._apify_dataset_async.push_items(payload)
+            Actor.log.info("ApifyPipeline: Pushed %d items (%s, HTTP async)", len(chunk), mode)
+            return True
+        try:
+            await Actor.push_data(chunk)
+        except Exception as e:
+            if mode == "overflow":
+                raise
+            Actor.log.warning("ApifyPipeline: Actor.push_data failed, buffering %d items: %r", len(chunk), e)
+            self.items.extend(chunk)
+            return False
+        Actor.log.info("ApifyPipeline: Pushed %d items (%s, Actor.push_data)", len(chunk), mode)
+        return True
+
+    async def _push_and_commit_async(self, chunk, *, mode: str) -> None:
+        ledger = self._ledger
+        if ledger is None:
+            await self._push_chunk_async(chunk, mode=mode)
+            return
+        chunk, ids = ledger.uncommitted(chunk)
+        if not chunk:
+            return
+        try:
+            pushed = await self._push_chunk_async(chunk, mode=mode)
+        except BaseException:
+            ledger.release(ids)
+            raise
+        if pushed:
+            # The commit marker is fsynced; keep that disk wait off the reactor.
+            await asyncio.to_thread(ledger.commit, ids)
+        else:
+            ledger.release(ids)
+
+    def _push_and_commit(self, chunk, *, mode: str, progress: tuple[int, int] | None = None) -> bool:
+        return self._push_with_ledger(self._ledger, chunk, mode=mode, progress=progress)
+
+    def _push_with_ledger(self, ledger, chunk, *, mode: str, progress: tuple[int, int] | None = None) -> bool:
+        if ledger is None:
+            return self._push_chunk(chunk, mode=mode, progress=progress)
+        # Spilled records recovered after a restart may already have been replayed: committed,
+        # or in flight in another batch. Either way this copy is dropped.
+        chunk, ids = ledger.uncommitted(chunk)
+        if not chunk:
+            return True
+        try:
+            pushed = self._push_chunk(chunk, mode=mode, progress=progress)
+        except BaseException:
+            ledger.release(ids)
+            raise
+        if pushed:
+            ledger.commit(ids)
+        else:
+            ledger.release(ids)
+        return pushed
+
+    # -- dataset writer: pushing for a process that runs no spider (process mode's parent) --
+
+    @classmethod
+    def dataset_writer(cls, settings=None, *, apify_available: bool = True) -> "ApifyPipeline":
+        """A pipeline that only pushes the batches handed to push_batch()."""
+        writer = cls()
+        writer._apify_available = apify_available
+        writer._actor_loop = get_actor_loop()
+        writer._open_dataset_client()
+        if settings is not None:
+            writer._push_max_batch_items = settings.getint("APIFY_PUSH_MAX_BATCH_ITEMS", writer._push_max_batch_items)
+        return writer
+
+    @property
+    def apify_available(self) -> bool:
+        return self._apify_available
+
+    @property
+    def push_max_batch_items(self) -> int:
+        return self._push_max_batch_items
+
+    @property
+    def push_flush_interval_s(self) -> float:
+        return self._push_flush_interval_s
+
+    def push_batch(self, chunk, *, mode: str, ledger: PushLedger | None = None) -> bool:
+        """
+        Push one batch of dataset records. With `ledger`, records it committed or
+        has in flight are dropped and the rest are committed once pushed. Returns
+        False when the batch was buffered for take_buffered() instead.
+        """
+        return self._push_with_ledger(ledger, chunk, mode=mode)
+
+    def take_buffered(self) -> list:
+        """Records buffered by failed pushes, for one more attempt; the buffer is emptied."""
+        items, self.items = self.items, []
+        return items
+
+    def _open_dataset_client(self) -> None:
+        # Prefer pushing through the HTTP API client rather than Actor.push_data().
+        # Actor SDK uses an async event/websocket manager; calling Actor.push_data()
+        # from background threads can race with Actor.exit() and yield shutdown errors.
+        self._apify_client = None
+        self._apify_dataset = None
+        if not self._apify_available or self._record_sink is not None:
+            return
+        token = os.environ.get("APIFY_TOKEN") or os.environ.get("APIFY_API_TOKEN")
+        dataset_id = os.environ.get("ACTOR_DEFAULT_DATASET_ID") or os.environ.get("APIFY_DEFAULT_DATASET_ID")
+        if token and dataset_id and self._single_loop:
+            try:
+                self._apify_dataset_async = ApifyClientAsync(token).dataset(dataset_id)
+                Actor.log.info("ApifyPipeline: Using ApifyClientAsync dataset push (dataset=%s)", dataset_id)
+            except Exception as e:
+                Actor.log.warning("ApifyPipeline: Failed to init ApifyClientAsync; will fall back. Error: %r", e)
+        elif token and dataset_id:
+            try:
+                self._apify_client = ApifyClient(token)
+                self._apify_dataset = self._apify_client.dataset(dataset_id)
+                Actor.log.info("ApifyPipeline: Using ApifyClient HTTP dataset push (dataset=%s)", dataset_id)
+            except Exception as e:
+                Actor.log.warning("ApifyPipeline: Failed to init ApifyClient; will fall back. Error: %r", e)
+
+    def _open_spill(self, spider, settings, stats) -> None:
+        # Overflow lives under the spider's JOBDIR so it survives a migration restart;
+        # runs without a JOBDIR still get bounded memory from a throwaway directory.
+        jobdir = None
+        segment_bytes = 8 * 1024 * 1024
+        if settings is not None:
+            jobdir = settings.get("JOBDIR")
+            segment_bytes = settings.getint("APIFY_PUSH_SPILL_SEGMENT_BYTES", segment_bytes)
+        if jobdir:
+            directory = os.path.join(jobdir, "push_spill")
+            self._spill_is_temporary = False
+        else:
+            directory = tempfile.mkdtemp(prefix=f"push-spill-{spider.name}-")
+            self._spill_is_temporary = True
+        try:
+            self._spill = SpillQueue(directory, segment_bytes=segment_bytes, stats=stats)
+        except OSError as e:
+            self._spill = None
+            Actor.log.warning("ApifyPipeline: Cannot open spill queue in %s; overflow stays in memory: %r", directory, e)
+            return
+        if self._spill.recovered_records:
+            Actor.log.info(
+                "ApifyPipeline: Resuming %d spilled records from a previous run (%s)",
+                self._spill.recovered_records,
+                directory,
+            )
+
+    def _open_key_index(self, spider, settings, stats) -> None:
+        kind = "sorted"
+        capacity = 1_000_000
+        fp_rate = 0.001
+        jobdir = None
+        if settings is not None:
+            jobdir = settings.get("JOBDIR")
+            policy = (settings.get("APIFY_DUPLICATE_KEY_POLICY") or "count").strip().lower()
+            if policy not in ("count", "drop", "merge"):
+                raise ValueError(f"APIFY_DUPLICATE_KEY_POLICY must be count, drop or merge, not {policy!r}")
+            self._duplicate_key_policy = policy
+            kind = (settings.get("APIFY_DEDUPE_INDEX") or kind).strip().lower()
+            capacity = settings.getint("APIFY_DEDUPE_BLOOM_CAPACITY", capacity)
+            fp_rate = settings.getfloat("APIFY_DEDUPE_BLOOM_FP_RATE", fp_rate)
+        directory = os.path.join(jobdir, "dedupe_keys") if jobdir else None
+        try:
+            self._seen_keys = open_key_index(directory, kind=kind, name="keys", capacity=capacity, fp_rate=fp_rate)
+            if self._duplicate_key_policy == "merge":
+                # Content IDs of every record pushed, to tell a changed duplicate from a repeat.
+                self._seen_versions = open_key_index(
+                    directory, kind=kind, name="versions", capacity=capacity, fp_rate=fp_rate
+                )
+        except OSError as e:
+            Actor.log.warning(
+                "ApifyPipeline: Cannot persist duplicate keys in %s; keeping them in memory: %r", directory, e
+            )
+            self._seen_keys = open_key_index(None, kind=kind, capacity=capacity, fp_rate=fp_rate)
+            if self._duplicate_key_policy == "merge":
+                self._seen_versions = open_key_index(None, kind=kind, capacity=capacity, fp_rate=fp_rate)
+        if self._seen_keys.recovered:
+            Actor.log.info(
+                "ApifyPipeline: Restored %d duplicate keys from a previous run (%s index)",
+                self._seen_keys.recovered,
+                self._seen_keys.kind,
+            )
+        if stats is not None:
+            stats.set_value("pipeline/dedupe/index", self._seen_keys.kind)
+            stats.set_value("pipeline/dedupe/keys_recovered", self._seen_keys.recovered)
+
+    def _close_key_index(self, stats) -> None:
+        if stats is not None:
+            stats.set_value("pipeline/dedupe/keys", len(self._seen_keys))
+            stats.set_value("pipeline/dedupe/index_bytes", self._seen_keys.memory_bytes())
+            if getattr(self._seen_keys, "saturated", False):
+                stats.set_value("pipeline/dedupe/bloom_saturated", True)
+        for index in (self._seen_keys, self._seen_versions):
+            if index is not None:
+                index.close()
+
+    def _push_backlog(self) -> int:
+        """Records accepted but not handed to the push engine yet."""
+        backlog = len(self.items)
+        if self._batcher is not None:
+            backlog += len(self._batcher) + self._push_engine.pending_items
+        if self._push_queue is not None:
+            backlog += self._push_queue.qsize()
+        if self._spill is not None:
+            backlog += len(self._spill)
+        return backlog
+
+    def _open_backpressure(self, crawler, settings, stats) -> None:
+        # When pushes fall behind, stop scheduling new downloads instead of letting the
+        # backlog (and the spill directory) grow; requests already in flight still finish.
+        engine = getattr(crawler, "engine", None)
+        if engine is None or settings is None or not settings.getbool("APIFY_PUSH_BACKPRESSURE_ENABLED", True):
+            return
+        from twisted.internet.task import LoopingCall
+
+        def _pause():
+            engine.pause()
+            self._backpressure_poll.start(0.5, now=False)
+            Actor.log.warning(
+                "ApifyPipeline: Push backlog reached %d records; pausing downloads until it drops to %d",
+                self._backpressure.high_items,
+                self._backpressure.low_items,
+            )
+
+        def _resume():
+            if self._backpressure_poll.running:
+                self._backpressure_poll.stop()
+            # Public API only: the engine picks up the next request on its next heartbeat
+            # (at most 5 s later), which is small next to a pause that drained a backlog.
+            engine.unpause()
+            Actor.log.info(
+                "ApifyPipeline: Push backlog down to %d records; resuming downloads (paused %.1fs in total)",
+                self._push_backlog(),
+                self._backpressure.paused_seconds,
+            )
+
+        self._backpressure = PushBackpressure.from_settings(settings, _pause, _resume, stats=stats)
+        self._backpressure_poll = LoopingCall(lambda: self._backpressure.check(self._push_backlog()))
+
+    def _open_ledger(self, spider, settings, stats) -> None:
+        # The ledger needs a JOBDIR to survive restarts. In process mode the child only hands
+        # records to the parent, which keeps the ledger in this JOBDIR (process_runner).
+        if settings is None or self._record_sink is not None:
+            return
+        self._ledger = open_push_ledger(settings.get("JOBDIR"), settings, stats)
+        if self._ledger is None:
+            return
+        crawler_signals = getattr(getattr(spider, "crawler", None), "signals", None)
+        if crawler_signals is not None:
+            crawler_signals.connect(self._discard_ledger, signal=signals.spider_closed)
+
+    def _discard_ledger(self, spider, reason) -> None:
+        # spider_closed fires after close_spider pushed everything and closed the ledger (only
+        # the signal carries the reason). A finished run has nothing left to resume; keeping
+        # its committed IDs would only grow committed.bin from run to run.
+        if reason == "finished" and self._ledger is not None and self._ledger.discard():
+            Actor.log.info("ApifyPipeline: Spider %s finished; push ledger removed", spider.name)
+
+    def _open_raw_store(self, spider, settings, stats) -> None:
+        self._raw_store = None
+        if settings is None:
+            return
+        try:
+            self._raw_store = RawFieldsStore.from_settings(settings, spider, stats=stats)
+        except ValueError:
+            raise
+        except Exception as e:
+            # Keeping raw_source_fields in the rows loses nothing but the savings.
+            Actor.log.warning("ApifyPipeline: Cannot open the raw_source_fields store; keeping them inline: %r", e)
+            return
+        if self._raw_store is not None:
+            Actor.log.info("ApifyPipeline: raw_source_fields go to %s", self._raw_store.location)
+
+    def _close_raw_store(self) -> None:
+        store, self._raw_store = self._raw_store, None
+        if store is None:
+            return
+        store.close()
+        Actor.log.info(
+            "ApifyPipeline: Stored %d raw_source_fields payloads in %d shards (%.1f MiB -> %.1f MiB) in %s",
+            store.records,
+            store.shards,
+            store.raw_bytes / 2**20,
+            store.stored_bytes / 2**20,
+            store.location,
+        )
+
+    def _enqueue(self, rec) -> None:
+        if self._encoder is not None and rec.__class__ is not EncodedRecord:
+            # Replayed from the ledger journal.
+            rec = encode_record(rec, self._encoder)
+        if self._batcher is not None:
+            for chunk, nbytes, _reason in self._batcher.add(rec):
+                self._push_engine.submit(self._spider_name, chunk, mode="streaming", nbytes=nbytes)
+            return
+        # Best-effort streaming push. If the queue is full (temporary API slowdown), spill to
+        # disk; once records are on disk, newer ones follow them until the worker catches up.
+        spill = self._spill
+        if spill is not None and spill.has_unread():
+            spill.append(rec)
+            return
+        try:
+            self._push_queue.put_nowait(rec)
+        except queue.Full:
+            if spill is not None:
+                spill.append(rec)
+            else:
+                self.items.append(rec)
+
+    def _submit_spilled(self, spider, batcher) -> None:
+        # Keep scrape order: whatever the batcher holds came from the queue, before the spill.
+        tail = batcher.take("spill")
+        if tail is not None:
+            self._push_engine.submit(spider.name, tail[0], mode="streaming", nbytes=tail[1])
+        records, nbytes, position = self._spill.read(
+            max_bytes=self._push_batch_sizer.target, max_items=self._push_max_batch_items
+        )
+        if records:
+            self._push_engine.submit(
+                spider.name,
+                records,
+                mode="spill",
+                nbytes=nbytes,
+                on_acked=lambda spill=self._spill, position=position: spill.ack(position),
+            )
+
+    def _open_single_loop_push(self, spider, crawler, settings) -> None:
+        # APIFY_EVENT_LOOP_MODE=single (src/main.py): the reactor runs on the Actor SDK's asyncio
+        # loop, so batches are cut here and pushed as tasks on that loop. No push thread, queue or
+        # spill directory: PushBackpressure alone bounds the backlog, and the ledger covers restarts.
+        stats = getattr(crawler, "stats", None)
+        self._spider_name = spider.name
+        self._push_engine = AsyncPushEngine(
+            lambda chunk, mode: self._push_and_commit_async(chunk, mode=mode),
+            loop=self._actor_loop or asyncio.get_event_loop(),
+            max_in_flight=self._push_concurrency,
+            preserve_order=self._push_preserve_order,
+            stats=stats,
+            controller=self._push_batch_sizer,
+        )
+        self._batcher = ByteBatcher(
+            self._push_batch_sizer,
+            max_items=self._push_max_batch_items,
+            flush_interval_s=self._push_flush_interval_s,
+            stats=stats,
+        )
+        self._open_ledger(spider, settings, stats)
+        self._open_backpressure(crawler, settings, stats)
+        if self._ledger is not None:
+            for rec in self._ledger.replay:
+                self._enqueue(rec)
+            self._ledger.replay = []
+        self._flush_timer = reactor.callLater(self._push_flush_interval_s, self._flush_due)
+
+    def _flush_due(self) -> None:
+        if self._batcher is None:
+            return
+        if self._batcher.due():
+            chunk, nbytes, _reason = self._batcher.take("interval")
+            self._push_engine.submit(self._spider_name, chunk, mode="streaming", nbytes=nbytes)
+        self._flush_timer = reactor.callLater(self._push_flush_interval_s, self._flush_due)
+
+    async def _close_single_loop_push(self, spider) -> None:
+        if self._flush_timer is not None and self._flush_timer.active():
+            self._flush_timer.cancel()
+        batcher, self._batcher = self._batcher, None
+        engine = self._push_engine
+        stats = getattr(getattr(spider, "crawler", None), "stats", None)
+        try:
+            tail = batcher.take("final")
+            if tail is not None:
+                engine.submit(spider.name, tail[0], mode="streaming", nbytes=tail[1])
+            await engine.drain(timeout=7200)
+            # Batches that Actor.push_data failed on were buffered; one more attempt, errors surface.
+            overflow, self.items = self.items, []
+            for chunk, nbytes, _reason in iter_batches(
+                overflow, self._push_batch_sizer, max_items=self._push_max_batch_items, reason="overflow", stats=stats
+            ):
+                engine.submit(spider.name, chunk, mode="overflow", nbytes=nbytes)
+            await engine.drain(timeout=7200)
+            if self._ledger is not None:
+                self._ledger.close()
+            await asyncio.to_thread(self._close_raw_store)
+        except Exception as e:
+            Actor.log.error(f"ApifyPipeline: Error pushing items to dataset: {e}")
+            raise
+        finally:
+            engine.close()
+        Actor.log.info(f"ApifyPipeline: Spider {spider.name} closed")
+
     def open_spider(self, spider):
         # Check if Apify Actor is available
         try:
@@ -635,75 +1062,107 @@ class ApifyPipeline:
             logging.warning('ApifyPipeline: Apify Actor not available, items will be collected but not pushed')
         
         self.items = []
-
-        # Prefer pushing through the HTTP API client rather than Actor.push_data().
-        # Actor SDK uses an async event/websocket manager; calling Actor.push_data()
-        # from background threads can race with Actor.exit() and yield shutdown errors.
-        self._apify_client = None
-        self._apify_dataset = None
-        if self._apify_available:
-            token = os.environ.get("APIFY_TOKEN") or os.environ.get("APIFY_API_TOKEN")
-            dataset_id = os.environ.get("ACTOR_DEFAULT_DATASET_ID") or os.environ.get("APIFY_DEFAULT_DATASET_ID")
-            if token and dataset_id:
-                try:
-                    self._apify_client = ApifyClient(token)
-                    self._apify_dataset = self._apify_client.dataset(dataset_id)
-                    Actor.log.info("ApifyPipeline: Using ApifyClient HTTP dataset push (dataset=%s)", dataset_id)
-                except Exception as e:
-                    Actor.log.warning("ApifyPipeline: Failed to init ApifyClient; will fall back. Error: %r", e)
+        crawler = getattr(spider, "crawler", None)
+        settings = getattr(crawler, "settings", None)
+        self._open_key_index(spider, settings, getattr(crawler, "stats", None))
+
+        self._record_sink = get_record_sink()
+        if self._record_sink is not None:
+            Actor.log.info("ApifyPipeline: Forwarding records to the parent process dataset writer")
+        self._single_loop = self._record_sink is None and _single_loop_mode(settings)
+        self._open_dataset_client()
+
+        if settings is not None:
+            self._push_concurrency = settings.getint("APIFY_PUSH_CONCURRENCY", self._push_concurrency)
+            self._push_preserve_order = settings.getbool("APIFY_PUSH_PRESERVE_ORDER", self._push_preserve_order)
+            self._push_max_batch_items = settings.getint("APIFY_PUSH_MAX_BATCH_ITEMS", self._push_max_batch_items)
+            self._push_queue_max_items = settings.getint("APIFY_PUSH_QUEUE_MAX_ITEMS", self._push_queue_max_items)
+            self._encoder = record_encoder((settings.get("APIFY_PUSH_ENCODER") or "auto").strip().lower())
+        self._open_raw_store(spider, settings, getattr(crawler, "stats", None))
+        self._push_batch_sizer = BatchSizeController.from_settings(settings, stats=getattr(crawler, "stats", None))
 
         # On Apify, push incrementally during the crawl so platform migrations (SIGTERM)
         # don't interrupt a single large final push in close_spider.
-        if self._apify_available:
-            self._push_queue = queue.Queue(maxsize=5000)
+        if self._apify_available and self._single_loop:
+            self._open_single_loop_push(spider, crawler, settings)
+        elif self._apify_available:
+            # Several batches in flight at once: one slow HTTP round trip no longer stalls the queue.
+            self._push_engine = PushEngine(
+                lambda chunk, mode: self._push_and_commit(chunk, mode=mode),
+                max_in_flight=self._push_concurrency,
+                preserve_order=self._push_preserve_order,
+                stats=getattr(crawler, "stats", None),
+                controller=self._push_batch_sizer,
+            )
+            self._push_queue = queue.Queue(maxsize=self._push_queue_max_items)
+            self._open_spill(spider, settings, getattr(crawler, "stats", None))
+            self._open_ledger(spider, settings, getattr(crawler, "stats", None))
+            self._open_backpressure(crawler, settings, getattr(crawler, "stats", None))
+            if self._ledger is not None:
+                # Accepted before the restart but never committed: push them first.
+                for rec in self._ledger.replay:
+                    self._enqueue(rec)
+                self._ledger.replay = []
             self._push_worker_stop = threading.Event()
             self._push_worker_err = []
 
             def _worker():
                 err = None
+                engine = self._push_engine
+                spill = self._spill
+                batcher = ByteBatcher(
+                    self._push_batch_sizer,
+                    max_items=self._push_max_batch_items,
+                    flush_interval_s=self._push_flush_interval_s,
+                    stats=getattr(crawler, "stats", None),
+                )
                 try:
-                    import time
-
-                    batch = []
-                    last_flush = time.monotonic()
-
                     while True:
-                        if self._push_worker_stop.is_set() and self._push_queue.empty():
+                        spilled = spill is not None and spill.has_unread()
+                        if self._push_worker_stop.is_set() and self._push_queue.empty() and not spilled:
                             break
 
+                        ready = []
                         try:
-                            rec = self._push_queue.get(timeout=0.25)
-                            batch.append(rec)
+                            # Records on disk are newer than the queue's; only wait when there are none.
+                            if spilled:
+                                rec = self._push_queue.get_nowait()
+                            else:
+                                rec = self._push_queue.get(timeout=0.25)
                             # Mark done immediately; the worker owns the batch.
                             self._push_queue.task_done()
+                            ready = batcher.add(rec)
                         except queue.Empty:
-                            rec = None
-
-                        now = time.monotonic()
-                        if len(batch) >= self._push_batch_size:
-                            chunk = batch
-                            batch = []
-                            self._push_chunk(chunk, mode="streaming")
-                            last_flush = now
-                        elif batch and (now - last_flush) >= self._push_flush_interval_s:
-                            chunk = batch
-                            batch = []
-                            self._push_chunk(chunk, mode="streaming")
-                            last_flush = now
+                            if spilled:
+                                self._submit_spilled(spider, batcher)
+                        if batcher.due():
+                            ready.append(batcher.take("interval"))
+
+                        for chunk, nbytes, _reason in ready:
+                            engine.record_queue_depth(self._push_queue.qsize())
+                            engine.submit(spider.name, chunk, mode="streaming", nbytes=nbytes)
 
                     # Final flush on shutdown
-                    if batch:
-                        self._push_chunk(batch, mode="streaming")
+                    tail = batcher.take("final")
+                    if tail is not None:
+                        engine.submit(spider.name, tail[0], mode="streaming", nbytes=tail[1])
+                    engine.drain()
                 except Exception as e:
                     err = e
                     try:
                         Actor.log.error(f"ApifyPipeline: Push worker crashed: {e!r}")
                     except Exception:
                         pass
+                finally:
+                    engine.close()
+                    if spill is not None:
+                        spill.close()
+                        if self._spill_is_temporary:
+                            shutil.rmtree(spill.directory, ignore_errors=True)
                 if err is not None:
                     self._push_worker_err.append(err)
 
-            self._push_worker = threading.Thread(target=_worker, daemon=True)
+            self._push_worker = threading.Thread(target=_worker, name="apify-push-worker", daemon=True)
             self._push_worker.start()
     
     def process_item(self, item, spider):
@@ -719,28 +1178,44 @@ class ApifyPipeline:
         # Add source so we can identify which spider produced each record
         item_dict['source'] = spider.name
         rec = _to_apify_dataset_record(item_dict)
-
-        # Best-effort duplicate detection (do not drop records; only track + log).
-        # Key selection: prefer canonical source_url (also duplicated into legacy url).
+        raw = None
+        if self._raw_store is not None:
+            raw = rec.pop("raw_source_fields")
+            rec[REF_FIELD] = self._raw_store.reference(raw)
+
+        # Duplicate detection by canonical source_url (also duplicated into legacy url).
+        # APIFY_DUPLICATE_KEY_POLICY: count (track + push), drop, or merge (push a duplicate
+        # only when its content differs from every version pushed before).
         key = (rec.get("source_url") or rec.get("url") or "").strip()
         if key:
-            if key in self._seen_keys:
+            policy = self._duplicate_key_policy
+            new_version = policy == "merge" and self._seen_versions.add_hash(record_id(rec))
+            if not self._seen_keys.add_hash(key_hash(key)):
                 self._duplicate_key_count += 1
-                try:
+                stats = getattr(getattr(spider, "crawler", None), "stats", None)
+                if stats is not None:
                     # Scrapy 2.11+ deprecates passing `spider=` to StatsCollector methods.
-                    spider.crawler.stats.inc_value("pipeline/duplicate_key_count")
-                except Exception:
-                    pass
-            else:
-                self._seen_keys.add(key)
-
-        if self._apify_available and self._push_queue is not None:
-            # Best-effort streaming push. If the queue is full (temporary API slowdown),
-            # fall back to in-memory buffer so we don't drop data.
-            try:
-                self._push_queue.put_nowait(rec)
-            except queue.Full:
-                self.items.append(rec)
+                    stats.inc_value("pipeline/duplicate_key_count")
+                if policy == "drop" or (policy == "merge" and not new_version):
+                    if stats is not None:
+                        stats.inc_value("pipeline/duplicate_key_dropped")
+                    return item
+                if policy == "merge" and stats is not None:
+                    stats.inc_value("pipeline/duplicate_key_updated")
+
+        if raw is not None:
+            # Only rows that are kept; a dropped duplicate's raw fields are not stored.
+            self._raw_store.put(raw)
+
+        if self._apify_available and (self._push_queue is not None or self._batcher is not None):
+            if self._encoder is not None:
+                rec = encode_record(rec, self._encoder)
+            # Already committed in an earlier run (or queued in this one): don't push it again.
+            if self._ledger is not None and not self._ledger.accept(rec):
+                return item
+            self._enqueue(rec)
+            if self._backpressure is not None:
+                self._backpressure.check(self._push_backlog())
         else:
             self.items.append(rec)
 
@@ -752,6 +1227,11 @@ class ApifyPipeline:
         from twisted.internet.defer import Deferred
         from twisted.python.failure import Failure
 
+        # No more items arrive; persist the duplicate-key index for a resumed run.
+        self._close_key_index(getattr(getattr(spider, "crawler", None), "stats", None))
+        if self._backpressure is not None:
+            self._backpressure.release()
+
         # Surface run-level validation failures as a hard error so scheduled runs fail loudly.
         try:
             if spider.crawler.stats.get_value("validation_failed"):
@@ -763,6 +1243,16 @@ class ApifyPipeline:
             # If stats are unavailable, continue with push rather than crash.
             pass
 
+        if self._batcher is not None:
+            Actor.log.info(
+                "ApifyPipeline: Finalizing push for spider %s (batched=%d + queued=%d + overflow=%d)...",
+                spider.name,
+                len(self._batcher),
+                self._push_engine.pending_items,
+                len(self.items),
+            )
+            return Deferred.fromFuture(self._push_engine.loop.create_task(self._close_single_loop_push(spider)))
+
         d = Deferred()
         done_called = []
         timeout_handle_ref = []
@@ -800,15 +1290,17 @@ class ApifyPipeline:
                 items_to_push = list(self.items)
                 self.items = []
                 if items_to_push:
-                    BATCH_SIZE = self._push_batch_size
                     total = len(items_to_push)
-                    for i in range(0, total, BATCH_SIZE):
-                        chunk = items_to_push[i : i + BATCH_SIZE]
-                        self._push_chunk(
-                            chunk,
-                            mode="overflow",
-                            progress=(min(i + BATCH_SIZE, total), total),
-                        )
+                    done = 0
+                    for chunk, _nbytes, _reason in iter_batches(
+                        items_to_push,
+                        self._push_batch_sizer,
+                        max_items=self._push_max_batch_items,
+                        reason="overflow",
+                        stats=getattr(getattr(spider, "crawler", None), "stats", None),
+                    ):
+                        done += len(chunk)
+                        self._push_and_commit(chunk, mode="overflow", progress=(done, total))
 
                 # Wait for streaming worker to finish flushing.
                 if self._push_worker is not None:
@@ -819,6 +1311,10 @@ class ApifyPipeline:
                             "aborting shutdown to avoid partial pushes during Actor exit."
                         )
 
+                if self._ledger is not None:
+                    self._ledger.close()
+                self._close_raw_store()
+
                 # Surface any worker errors.
                 if self._push_worker_err:
                     raise self._push_worker_err[0]
@@ -831,6 +1327,7 @@ class ApifyPipeline:
         if not self._apify_available:
             # Local / non-Apify runs: nothing to push.
             import logging
+            self._close_raw_store()
             if self.items:
                 logging.warning(
                     f'ApifyPipeline: {len(self.items)} items collected but Apify Actor not available'
@@ -838,10 +1335,11 @@ class ApifyPipeline:
             return
 
         Actor.log.info(
-            "ApifyPipeline: Finalizing push for spider %s (streaming flush + overflow=%d)...",
+            "ApifyPipeline: Finalizing push for spider %s (streaming flush + spilled=%d + overflow=%d)...",
             spider.name,
+            len(self._spill) if self._spill is not None else 0,
             len(self.items),
         )
-        thread = threading.Thread(target=run_push_in_thread, daemon=True)
+        thread = threading.Thread(target=run_push_in_thread, name="apify-push-final", daemon=True)
         thread.start()
         return d
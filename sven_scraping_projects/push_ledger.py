@@ -0,0 +1,293 @@
+"""
+Persistent push ledger for ApifyPipeline, kept in the spider's JOBDIR.
+
+JOBDIR lets Scrapy resume its scheduler after a platform migration, but on its
+own it does not remember which records already reached the dataset. The
+ledger closes that gap with two append-only files:
+
+- journal-NNNNNN.ndjson: write-ahead log. Every accepted record is written
+  as "<record id>\\t<json>" before it is queued for the push.
+- committed.bin: batch commit markers. Once a push succeeded, one marker with
+  the batch's record IDs is appended (8 bytes per record).
+
+A record ID is the 64-bit BLAKE2b digest of the record's canonical JSON, so a
+re-crawled profile that produces the same record gets the same ID. On restart
+the committed IDs are loaded, records with a committed ID are skipped, and
+journaled records that never committed are replayed. Journal segments are
+deleted once every record in them has committed.
+
+A record replayed from the journal can also sit in the push spill, so two
+copies may be in flight at once. uncommitted() reserves the IDs of the batch it
+returns until commit() or release(), and drops records whose ID is reserved by
+another batch. The ledger only matters while the run can still be resumed:
+after a spider finished cleanly with nothing pending, discard() removes the
+directory, so committed.bin does not grow across runs.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import struct
+import threading
+
+JOURNAL_NAME = "journal-{:06d}.ndjson"
+_JOURNAL_RE = re.compile(r"^journal-(\d{6})\.ndjson$")
+COMMITTED_FILE = "committed.bin"
+STATS_PREFIX = "pipeline/ledger"
+
+# Commit marker: magic, record count, then `count` big-endian uint64 record IDs.
+_MARKER_MAGIC = b"LC"
+_MARKER_HEADER = struct.Struct(">2sI")
+
+
+def canonical_json(record: dict) -> bytes:
+    return json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def record_id(record: dict) -> int:
+    """Content-addressed 64-bit record ID (cached on a dataset_push.EncodedRecord)."""
+    rid = getattr(record, "rid", None)
+    if rid is None:
+        rid = _digest(canonical_json(record))
+        if hasattr(record, "rid"):
+            record.rid = rid
+    return rid
+
+
+def _digest(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class PushLedger:
+    """
+    Tracks accepted (journaled) and committed records for one spider.
+
+    accept() is called from the reactor thread, uncommitted(), commit() and
+    release() from push threads; all take the ledger lock.
+    """
+
+    def __init__(self, directory: str, *, journal_segment_bytes: int = 16 * 1024 * 1024, stats=None):
+        self.directory = directory
+        self.journal_segment_bytes = max(1, int(journal_segment_bytes))
+        self._stats = stats
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        self._committed: set[int] = set()
+        self._load_committed()
+        # record id -> journal segment, for records accepted but not committed yet.
+        self._pending: dict[int, int] = {}
+        self._outstanding: dict[int, int] = {}
+        # IDs of batches between uncommitted() and commit()/release().
+        self._inflight: set[int] = set()
+        self.closed = False
+
+        old_segments = self._journal_segments()
+        self.replay = self._load_uncommitted(old_segments)
+        self._segment = (old_segments[-1] + 1) if old_segments else 1
+        self._journal = open(self._journal_path(self._segment), "ab")
+        self._journal_offset = 0
+        # Carry the uncommitted records into the new journal, then drop the old segments.
+        for rid, line in self.replay:
+            self._write_journal(rid, line)
+        self._journal.flush()
+        for n in old_segments:
+            self._remove_journal(n)
+        self.replay = [json.loads(line) for _, line in self.replay]
+
+        self.recovered_committed = len(self._committed)
+        if self.recovered_committed:
+            self._stat_set("committed_recovered", self.recovered_committed)
+        if self.replay:
+            self._stat_inc("replayed", len(self.replay))
+
+    # -- files ---------------------------------------------------------------
+
+    def _journal_path(self, segment: int) -> str:
+        return os.path.join(self.directory, JOURNAL_NAME.format(segment))
+
+    def _journal_segments(self) -> list[int]:
+        out = []
+        for name in os.listdir(self.directory):
+            m = _JOURNAL_RE.match(name)
+            if m:
+                out.append(int(m.group(1)))
+        return sorted(out)
+
+    def _remove_journal(self, segment: int) -> None:
+        try:
+            os.remove(self._journal_path(segment))
+        except FileNotFoundError:
+            pass
+
+    def _load_committed(self) -> None:
+        path = os.path.join(self.directory, COMMITTED_FILE)
+        try:
+            with open(path, "rb") as fh:
+                data = fh.read()
+        except FileNotFoundError:
+            data = b""
+        pos = 0
+        while pos + _MARKER_HEADER.size <= len(data):
+            magic, count = _MARKER_HEADER.unpack_from(data, pos)
+            end = pos + _MARKER_HEADER.size + 8 * count
+            if magic != _MARKER_MAGIC or end > len(data):
+                break
+            self._committed.update(struct.unpack_from(f">{count}Q", data, pos + _MARKER_HEADER.size))
+            pos = end
+        if pos != len(data):
+            # A crash mid-commit leaves a torn marker; that batch counts as uncommitted.
+            with open(path, "rb+") as fh:
+                fh.truncate(pos)
+        self._commits = open(path, "ab")
+
+    def _load_uncommitted(self, segments: list[int]) -> list[tuple[int, bytes]]:
+        out = []
+        seen = set()
+        for n in segments:
+            with open(self._journal_path(n), "rb") as fh:
+                for raw in fh:
+                    if not raw.endswith(b"\n"):
+                        break
+                    rid_hex, _, line = raw.rstrip(b"\n").partition(b"\t")
+                    try:
+                        rid = int(rid_hex, 16)
+                    except ValueError:
+                        continue
+                    if rid in self._committed or rid in seen:
+                        continue
+                    seen.add(rid)
+                    out.append((rid, line))
+        return out
+
+    def _write_journal(self, rid: int, line: bytes) -> None:
+        entry = b"%016x\t%s\n" % (rid, line)
+        if self._journal_offset and self._journal_offset + len(entry) > self.journal_segment_bytes:
+            self._journal.close()
+            if not self._outstanding.get(self._segment):
+                self._remove_journal(self._segment)
+            self._segment += 1
+            self._journal = open(self._journal_path(self._segment), "ab")
+            self._journal_offset = 0
+        self._journal.write(entry)
+        self._journal_offset += len(entry)
+        self._pending[rid] = self._segment
+        self._outstanding[self._segment] = self._outstanding.get(self._segment, 0) + 1
+
+    def _stat_inc(self, key: str, count=1) -> None:
+        if self._stats is not None:
+            self._stats.inc_value(f"{STATS_PREFIX}/{key}", count)
+
+    def _stat_set(self, key: str, value) -> None:
+        if self._stats is not None:
+            self._stats.set_value(f"{STATS_PREFIX}/{key}", value)
+
+    # -- ledger --------------------------------------------------------------
+
+    def accept(self, record: dict) -> bool:
+        """
+        Journal a record before it is queued. Returns False (and journals
+        nothing) when a record with the same ID is already committed or pending.
+        """
+        line = canonical_json(record)
+        rid = _digest(line)
+        if hasattr(record, "rid"):
+            record.rid = rid
+        with self._lock:
+            if rid in self._committed:
+                self._stat_inc("skipped_committed")
+                return False
+            if rid in self._pending:
+                self._stat_inc("skipped_pending")
+                return False
+            self._write_journal(rid, line)
+            self._journal.flush()
+        self._stat_inc("accepted")
+        return True
+
+    def uncommitted(self, records: list) -> tuple[list, list[int]]:
+        """
+        Drop records committed meanwhile (e.g. spill recovered after a replay) or
+        in flight in another batch; return (records, ids) and reserve the ids
+        until commit() or release().
+        """
+        ids = [record_id(r) for r in records]
+        keep, keep_ids = [], []
+        skipped_committed = skipped_inflight = 0
+        with self._lock:
+            committed, inflight = self._committed, self._inflight
+            for r, rid in zip(records, ids):
+                if rid in committed:
+                    skipped_committed += 1
+                elif rid in inflight:
+                    skipped_inflight += 1
+                else:
+                    inflight.add(rid)
+                    keep.append(r)
+                    keep_ids.append(rid)
+        if skipped_committed:
+            self._stat_inc("skipped_committed", skipped_committed)
+        if skipped_inflight:
+            self._stat_inc("skipped_inflight", skipped_inflight)
+        return keep, keep_ids
+
+    def release(self, ids: list[int]) -> None:
+        """Drop the reservation of a batch that was not pushed; its records stay pending."""
+        with self._lock:
+            self._inflight.difference_update(ids)
+
+    def commit(self, ids: list[int]) -> None:
+        """Append a commit marker for a pushed batch."""
+        if not ids:
+            return
+        marker = _MARKER_HEADER.pack(_MARKER_MAGIC, len(ids)) + struct.pack(f">{len(ids)}Q", *ids)
+        with self._lock:
+            self._commits.write(marker)
+            self._commits.flush()
+            os.fsync(self._commits.fileno())
+            self._committed.update(ids)
+            self._inflight.difference_update(ids)
+            for rid in ids:
+                segment = self._pending.pop(rid, None)
+                if segment is None:
+                    continue
+                left = self._outstanding[segment] - 1
+                if left:
+                    self._outstanding[segment] = left
+                    continue
+                del self._outstanding[segment]
+                if segment != self._segment:
+                    self._remove_journal(segment)
+        self._stat_inc("committed", len(ids))
+        self._stat_inc("commit_markers")
+
+    def __len__(self) -> int:
+        """Records accepted but not committed yet."""
+        with self._lock:
+            return len(self._pending)
+
+    def close(self) -> None:
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._journal.close()
+            self._commits.close()
+            if not self._pending:
+                self._remove_journal(self._segment)
+
+    def discard(self) -> bool:
+        """
+        Remove the ledger directory after close() once nothing is pending (a
+        finished run has nothing left to resume). Returns whether it was removed.
+        """
+        with self._lock:
+            if not self.closed or self._pending:
+                return False
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._stat_inc("discarded")
+        return True
@@ -0,0 +1,229 @@
+"""
+Side store for raw_source_fields: the scraped item behind each dataset row, kept out of the row.
+
+Every dataset record carries raw_source_fields, a JSON copy of the whole
+scraped item, which is close to half of what is pushed and stored. With
+RAW_FIELDS_STORE "local" or "kv", ApifyPipeline hands that JSON to a
+RawFieldsStore and the row keeps a reference instead:
+
+    "raw_source_ref": "<location>#<id>"
+
+id is the BLAKE2b-64 of the raw JSON (16 hex digits) and location is
+"local:<RAW_FIELDS_DIR>" or "kv:<RAW_FIELDS_KV_STORE_NAME>". The reference
+depends on the content only, so a row's push_ledger.record_id(), the "merge"
+duplicate policy and recrawl re-emits behave as before, across runs and
+restarts. A payload seen twice in a run is stored once.
+
+Payloads are collected into NDJSON shards, one line each:
+
+    {"id":"<id>","raw_source_fields":{...}}
+
+A shard is cut once it holds RAW_FIELDS_SHARD_BYTES of JSON, and at spider
+close. A background thread compresses it (zstd with the optional `zstandard`
+package, else gzip) and writes it to RAW_FIELDS_DIR/<key>, or as the <key>
+record of the named key-value store, which outlives the run. Keys are
+<spider>-<run>-<attempt>-<n>.ndjson.zst (or .gz): <run> is the Actor run ID
+or the UTC start time, and <attempt> is random per process, because a run
+resumed after a migration keeps its run ID and restarts <n> at 0; without it,
+the resumed process would overwrite the shards written before the migration.
+read_shard() turns a shard back into {id: raw fields}.
+
+Shards are written when full and at spider close, which a platform migration
+goes through. A run killed outright loses the payloads of its open shard,
+although rows referencing them may already be in the dataset.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from sven_scraping_projects.recrawl_state import LocalStateFile
+
+try:
+    import zstandard
+except ImportError:  # optional; shards are gzip-compressed instead
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+STORES = ("inline", "local", "kv")
+CODECS = ("auto", "zstd", "gzip")
+REF_FIELD = "raw_source_ref"
+STATS_PREFIX = "pipeline/raw_fields"
+# Shards compressed or uploading at once; put() waits beyond that.
+_MAX_PENDING_SHARDS = 2
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _codec(codec: str):
+    """(file suffix, content type, compress function) for RAW_FIELDS_CODEC."""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown RAW_FIELDS_CODEC {codec!r}; expected one of {CODECS!r}")
+    if codec == "zstd" and zstandard is None:
+        raise ValueError("RAW_FIELDS_CODEC=zstd needs the zstandard package")
+    if codec != "gzip" and zstandard is not None:
+        return ".ndjson.zst", "application/zstd", zstandard.ZstdCompressor(level=3).compress
+    return ".ndjson.gz", "application/gzip", lambda data: gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def read_shard(data: bytes) -> dict[str, dict]:
+    """A shard as written (zstd or gzip) -> {id: raw_source_fields}."""
+    if data[:4] == _ZSTD_MAGIC:
+        if zstandard is None:
+            raise ValueError("shard is zstd-compressed; install zstandard to read it")
+        data = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    elif data[:2] == _GZIP_MAGIC:
+        data = gzip.decompress(data)
+    out = {}
+    for line in data.split(b"\n"):
+        if line:
+            entry = json.loads(line)
+            out[entry["id"]] = entry["raw_source_fields"]
+    return out
+
+
+def _encode(raw_json: str) -> bytes:
+    return raw_json.encode("utf-8", "backslashreplace")
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=8).digest()
+
+
+class LocalShards:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.location = f"local:{directory}"
+
+    def write(self, key: str, data: bytes, content_type: str) -> None:
+        LocalStateFile(os.path.join(self.directory, key)).write(data)
+
+
+class KeyValueShards:
+    """Shards as records of a named Apify key-value store, through the blocking API client."""
+
+    def __init__(self, store_name: str, token: str):
+        from apify_client import ApifyClient
+
+        client = ApifyClient(token)
+        store_id = client.key_value_stores().get_or_create(name=store_name)["id"]
+        self._store = client.key_value_store(store_id)
+        self.location = f"kv:{store_name}"
+
+    def write(self, key: str, data: bytes, content_type: str) -> None:
+        self._store.set_record(key, data, content_type=content_type)
+
+
+class RawFieldsStore:
+    def __init__(
+        self, backend, shard_prefix: str, *, shard_bytes: int = 4 * 1024 * 1024, codec: str = "auto", stats=None
+    ):
+        self.backend = backend
+        self.location = backend.location
+        self.shard_prefix = shard_prefix
+        self.shard_bytes = max(1, int(shard_bytes))
+        self._suffix, self._content_type, self._compress = _codec(codec)
+        self._stats = stats
+        self._lines: list[bytes] = []
+        self._size = 0
+        self._seen: set[int] = set()
+        self._pending: list[Future] = []
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="raw-fields")
+        self.shards = 0
+        self.records = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    @classmethod
+    def from_settings(cls, settings, spider, stats=None) -> "RawFieldsStore | None":
+        """The store for RAW_FIELDS_STORE, or None when raw_source_fields stay in the rows ("inline")."""
+        store = (settings.get("RAW_FIELDS_STORE") or "inline").strip().lower()
+        if store not in STORES:
+            raise ValueError(f"Unknown RAW_FIELDS_STORE {store!r}; expected one of {STORES!r}")
+        if store == "inline":
+            return None
+        backend = None
+        if store == "kv":
+            token = os.environ.get("APIFY_TOKEN") or os.environ.get("APIFY_API_TOKEN")
+            if token:
+                backend = KeyValueShards(settings.get("RAW_FIELDS_KV_STORE_NAME"), token)
+            else:
+                logger.warning("RAW_FIELDS_STORE=kv but no APIFY_TOKEN; using RAW_FIELDS_DIR")
+        if backend is None:
+            backend = LocalShards(settings.get("RAW_FIELDS_DIR"))
+        run = os.environ.get("ACTOR_RUN_ID") or time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        return cls(
+            backend,
+            f"{spider.name}-{run}-{uuid.uuid4().hex[:8]}",
+            shard_bytes=settings.getint("RAW_FIELDS_SHARD_BYTES", 4 * 1024 * 1024),
+            codec=(settings.get("RAW_FIELDS_CODEC") or "auto").strip().lower(),
+            stats=stats,
+        )
+
+    def reference(self, raw_json: str) -> str:
+        """The reference put() returns for `raw_json`, without storing anything."""
+        return f"{self.location}#{_digest(_encode(raw_json)).hex()}"
+
+    def put(self, raw_json: str) -> str:
+        """Store one raw_source_fields JSON string; returns the reference that replaces it in the row."""
+        data = _encode(raw_json)
+        digest = _digest(data)
+        key = int.from_bytes(digest, "big")
+        ref = f"{self.location}#{digest.hex()}"
+        if key in self._seen:
+            self._inc("duplicates")
+            return ref
+        self._seen.add(key)
+        line = b'{"id":"' + digest.hex().encode("ascii") + b'","raw_source_fields":' + data + b"}\n"
+        self._lines.append(line)
+        self._size += len(line)
+        self.records += 1
+        self.raw_bytes += len(data)
+        if self._size >= self.shard_bytes:
+            self.flush()
+        return ref
+
+    def flush(self) -> None:
+        """Hand the open shard to the writer thread."""
+        if not self._lines:
+            return
+        key = f"{self.shard_prefix}-{self.shards:05d}{self._suffix}"
+        data = b"".join(self._lines)
+        self._lines, self._size = [], 0
+        self.shards += 1
+        # One writer thread, so shards finish in order; collect errors early, cap what is held.
+        while self._pending and (self._pending[0].done() or len(self._pending) >= _MAX_PENDING_SHARDS):
+            self._pending.pop(0).result()
+        self._pending.append(self._writer.submit(self._write, key, data))
+
+    def _write(self, key: str, data: bytes) -> None:
+        payload = self._compress(data)
+        self.backend.write(key, payload, self._content_type)
+        self.stored_bytes += len(payload)
+        self._inc("shards")
+        self._inc("bytes_stored", len(payload))
+
+    def _inc(self, name: str, count: int = 1) -> None:
+        if self._stats is not None:
+            self._stats.inc_value(f"{STATS_PREFIX}/{name}", count)
+
+    def close(self) -> None:
+        """Write the last shard and wait for all of them; a failed write is raised here."""
+        try:
+            self.flush()
+            for future in self._pending:
+                future.result()
+        finally:
+            self._pending = []
+            self._writer.shutdown(wait=True)
+        if self._stats is not None:
+            self._stats.set_value(f"{STATS_PREFIX}/records", self.records)
+            self._stats.set_value(f"{STATS_PREFIX}/bytes", self.raw_bytes)
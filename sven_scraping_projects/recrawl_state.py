@@ -0,0 +1,219 @@
+"""
+Per-URL recrawl state for sitemap-driven spiders (KVHH, Asklepios).
+
+Both spiders used to fetch every profile in the sitemap on every scheduled
+run, although most profiles do not change from one night to the next. With
+RECRAWL_ENABLED, IncrementalRecrawlMiddleware (middlewares.py) consults a
+RecrawlStore before a sitemap request goes out. For each URL the store keeps:
+
+- lastmod: the sitemap <lastmod> seen when the page was last fetched,
+- content_hash: 64-bit BLAKE2b of the response body,
+- record_id: push_ledger.record_id() of the last item the page produced,
+- fetched_at: when it was fetched (epoch seconds),
+- items: the items themselves, as JSON, when RECRAWL_POLICY is "reemit".
+
+A URL is fetched when it is new, when its sitemap lastmod differs from the
+stored one, or when its entry is older than the TTL. The TTL is spread
+by up to 25% per URL so that pages first seen in the same run do not all
+expire on the same night. For sitemaps without a <lastmod> the TTL alone
+decides. Everything else is unchanged. Under "reemit" the stored items are
+yielded again without a request, so every run's dataset is still complete.
+Under "skip" nothing is yielded. An entry without stored items (written under
+"skip", or a page that failed) is fetched again under "reemit".
+
+The state is one gzip-compressed NDJSON document per spider. It is loaded at
+spider open and written back at spider close, either to a local file
+(RECRAWL_STORE "local", RECRAWL_STATE_DIR) or to a named Apify key-value
+store that outlives the run (RECRAWL_STORE "kv", RECRAWL_KV_STORE_NAME).
+Entries not refreshed for three TTLs (URLs that left the sitemap) are
+dropped on save.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+import zlib
+
+from sven_scraping_projects.push_ledger import record_id
+
+logger = logging.getLogger(__name__)
+
+# Request.meta key the spiders set on sitemap requests (value: the entry's lastmod, or None).
+SITEMAP_LASTMOD_META = "sitemap_lastmod"
+# Set by the middleware on requests it let through: the URL the entry is stored under.
+RECRAWL_URL_META = "recrawl_url"
+
+POLICIES = ("reemit", "skip")
+STATS_PREFIX = "recrawl"
+FORMAT_VERSION = 1
+_TTL_SPREAD = 0.25
+_PRUNE_AFTER_TTLS = 3
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+
+class RecrawlEntry:
+    __slots__ = ("lastmod", "content_hash", "record_id", "fetched_at", "items")
+
+    def __init__(self, lastmod, content_hash, record_id, fetched_at, items=None):
+        self.lastmod: str | None = lastmod
+        self.content_hash: str | None = content_hash
+        self.record_id: int | None = record_id
+        self.fetched_at: float = fetched_at
+        # Items as a JSON array string; None when not stored.
+        self.items: str | None = items
+
+
+class LocalStateFile:
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self) -> bytes | None:
+        try:
+            with open(self.path, "rb") as fh:
+                return fh.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, data: bytes) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.path)
+
+    def __str__(self) -> str:
+        return self.path
+
+
+class KeyValueStoreState:
+    """One record in a named Apify key-value store, through the blocking API client."""
+
+    def __init__(self, store_name: str, key: str, token: str, *, content_type: str = "application/gzip"):
+        from apify_client import ApifyClient
+
+        self.store_name = store_name
+        self.key = key
+        # Anything but JSON/text comes back from get_record as bytes.
+        self.content_type = content_type
+        client = ApifyClient(token)
+        store_id = client.key_value_stores().get_or_create(name=store_name)["id"]
+        self._store = client.key_value_store(store_id)
+
+    def read(self) -> bytes | None:
+        record = self._store.get_record(self.key)
+        if record is None:
+            return None
+        value = record["value"]
+        return value if isinstance(value, bytes) else None
+
+    def write(self, data: bytes) -> None:
+        self._store.set_record(self.key, data, content_type=self.content_type)
+
+    def __str__(self) -> str:
+        return f"kv:{self.store_name}/{self.key}"
+
+
+class RecrawlStore:
+    def __init__(self, backend, *, policy: str = "reemit", ttl_s: float = 14 * 86400.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown recrawl policy {policy!r}; expected one of {POLICIES!r}")
+        self.backend = backend
+        self.policy = policy
+        self.ttl_s = float(ttl_s)
+        self.entries: dict[str, RecrawlEntry] = {}
+
+    # -- persistence ---------------------------------------------------------
+
+    def load(self) -> int:
+        """Read the stored state; returns the number of entries. A corrupt document starts empty."""
+        data = self.backend.read()
+        self.entries = {}
+        if not data:
+            return 0
+        try:
+            lines = gzip.decompress(data).split(b"\n")
+            header = json.loads(lines[0])
+            if header.get("version") != FORMAT_VERSION:
+                logger.warning("Recrawl state %s has version %r; starting empty", self.backend, header.get("version"))
+                return 0
+            for line in lines[1:]:
+                if line:
+                    url, lastmod, chash, rid, fetched_at, items = json.loads(line)
+                    self.entries[url] = RecrawlEntry(lastmod, chash, rid, fetched_at, items)
+        except (OSError, EOFError, ValueError, TypeError) as exc:
+            logger.warning("Recrawl state %s is unreadable (%r); starting empty", self.backend, exc)
+            self.entries = {}
+        return len(self.entries)
+
+    def dumps(self, now: float | None = None) -> bytes:
+        """The state as stored, without entries older than three TTLs."""
+        now = time.time() if now is None else now
+        cutoff = now - _PRUNE_AFTER_TTLS * self.ttl_s
+        lines = [json.dumps({"version": FORMAT_VERSION, "saved_at": now})]
+        for url, e in self.entries.items():
+            if e.fetched_at >= cutoff:
+                lines.append(
+                    json.dumps(
+                        [url, e.lastmod, e.content_hash, e.record_id, e.fetched_at, e.items],
+                        ensure_ascii=False,
+                        separators=(",", ":"),
+                    )
+                )
+        return gzip.compress("\n".join(lines).encode("utf-8"), compresslevel=6, mtime=0)
+
+    def save(self, now: float | None = None) -> int:
+        data = self.dumps(now)
+        self.backend.write(data)
+        return len(data)
+
+    # -- decisions -----------------------------------------------------------
+
+    def _ttl_for(self, url: str) -> float:
+        spread = (zlib.crc32(url.encode("utf-8")) & 0xFFFFFFFF) / 2**32
+        return self.ttl_s * (1.0 - _TTL_SPREAD * spread)
+
+    def fetch_reason(self, url: str, lastmod: str | None, now: float | None = None) -> str | None:
+        """Why `url` must be fetched ("new", "changed", "expired", "no_items"), or None if it is unchanged."""
+        entry = self.entries.get(url)
+        if entry is None:
+            return "new"
+        if lastmod and lastmod != entry.lastmod:
+            return "changed"
+        now = time.time() if now is None else now
+        if now - entry.fetched_at >= self._ttl_for(url):
+            return "expired"
+        if self.policy == "reemit" and entry.items is None:
+            return "no_items"
+        return None
+
+    def stored_items(self, url: str) -> list[dict]:
+        entry = self.entries.get(url)
+        if entry is None or not entry.items:
+            return []
+        return json.loads(entry.items)
+
+    def update(self, url: str, lastmod: str | None, body: bytes, items: list[dict], now: float | None = None):
+        """Record a fetched page and the items it produced; returns True if the body changed since last time."""
+        chash = content_hash(body)
+        previous = self.entries.get(url)
+        stored = None
+        if self.policy == "reemit":
+            stored = json.dumps(items, ensure_ascii=False, separators=(",", ":"), default=str)
+        self.entries[url] = RecrawlEntry(
+            lastmod,
+            chash,
+            record_id(items[-1]) if items else None,
+            time.time() if now is None else now,
+            stored,
+        )
+        return previous is None or previous.content_hash != chash
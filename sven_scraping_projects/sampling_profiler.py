@@ -0,0 +1,174 @@
+"""
+Low-overhead stack-sampling profiler for production runs.
+
+A daemon thread wakes every `interval_ms`, reads the current Python stack of
+every other thread (sys._current_frames()) and counts it as one collapsed
+stack: "thread;outer frame;...;leaf frame". The format is the one
+flamegraph.pl, speedscope and inferno read. The main thread, which runs the
+Twisted reactor, is labelled "reactor". The other threads keep their names
+("apify-actor-loop", "apify-push-worker", the "dataset-push" pool), with
+pool suffixes such as "_3" stripped so workers of one pool merge.
+
+Python cannot tell whether a thread is on a CPU. Samples whose leaf frame
+is a known blocking wait (idle reactor poll, Condition.wait, queue get, an
+idle pool worker) are counted as idle and dropped unless `include_idle` is
+set. What remains approximates where CPU goes.
+
+Samples go to the whole-run profile and to every open segment.
+SamplingProfilerExtension (middlewares.py) opens one segment per spider.
+When spiders run concurrently their segments overlap, and each holds the
+samples of the shared reactor for that time.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+import threading
+import time
+
+RUN_LABEL = "run"
+# Label of the main thread: the Twisted reactor runs there (src/main.py, process workers).
+MAIN_THREAD_LABEL = "reactor"
+MAX_DEPTH = 128
+# (file name, function) of leaf frames that mean "this thread is blocked, not running".
+IDLE_LEAVES = frozenset(
+    {
+        ("threading.py", "wait"),
+        ("threading.py", "_wait_for_tstate_lock"),
+        ("queue.py", "get"),
+        ("selectors.py", "select"),
+        ("thread.py", "_worker"),
+        ("epollreactor.py", "doPoll"),
+        ("pollreactor.py", "doPoll"),
+        ("selectreactor.py", "doSelect"),
+    }
+)
+_POOL_SUFFIX = re.compile(r"_\d+$")
+
+
+def thread_label(thread_name: str | None, is_main: bool = False) -> str:
+    if is_main:
+        return MAIN_THREAD_LABEL
+    return _POOL_SUFFIX.sub("", thread_name or "thread").replace(";", ":").replace(" ", "_")
+
+
+def format_collapsed(counts: dict[str, int]) -> str:
+    """One 'stack count' line per stack, heaviest first."""
+    return "".join(f"{stack} {n}\n" for stack, n in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])))
+
+
+def write_collapsed(counts: dict[str, int], directory: str, label: str) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{label}.collapsed")
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(format_collapsed(counts))
+    return path
+
+
+class SamplingProfiler:
+    def __init__(self, *, interval_ms: float = 5.0, include_idle: bool = False):
+        self.interval_s = max(float(interval_ms), 0.5) / 1000.0
+        self.include_idle = bool(include_idle)
+        self.started_at: float | None = None
+        self.samples = 0
+        self.idle_samples = 0
+        # Wall time the sampler itself spent walking stacks (its overhead).
+        self.sampling_s = 0.0
+        self._run: dict[str, int] = {}
+        self._segments: dict[str, dict[str, int]] = {}
+        self._labels: dict = {}
+        # (thread label, code objects) -> collapsed stack string; a crawl repeats few stacks.
+        self._stacks: dict = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @classmethod
+    def from_settings(cls, settings) -> "SamplingProfiler":
+        return cls(
+            interval_ms=settings.getfloat("SAMPLING_PROFILER_INTERVAL_MS", 5.0),
+            include_idle=settings.getbool("SAMPLING_PROFILER_INCLUDE_IDLE", False),
+        )
+
+    # -- lifecycle -------------------------------------------------------------
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._loop, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> dict[str, int]:
+        """Stop sampling; returns the whole-run profile."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        with self._lock:
+            return dict(self._run)
+
+    def begin(self, label: str) -> None:
+        with self._lock:
+            self._segments.setdefault(label, {})
+
+    def end(self, label: str) -> dict[str, int]:
+        with self._lock:
+            return self._segments.pop(label, {})
+
+    # -- sampling ----------------------------------------------------------------
+
+    def _loop(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            started = time.perf_counter()
+            self.sample(skip=own)
+            self.sampling_s += time.perf_counter() - started
+
+    def _frame_label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            short = os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+            name = getattr(code, "co_qualname", code.co_name)
+            label = self._labels[code] = f"{name} ({short}:{code.co_firstlineno})".replace(";", ":")
+        return label
+
+    def sample(self, skip: int | None = None) -> None:
+        """Take one sample of every thread except `skip`."""
+        frames = sys._current_frames()
+        threads = {t.ident: t for t in threading.enumerate()}
+        main_ident = threading.main_thread().ident
+        stacks = []
+        for ident, frame in frames.items():
+            if ident == skip:
+                continue
+            code = frame.f_code
+            if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                self.idle_samples += 1
+                continue
+            codes = []
+            while frame is not None and len(codes) < MAX_DEPTH:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            thread = threads.get(ident)
+            key = (thread_label(thread.name if thread else None, ident == main_ident), tuple(codes))
+            stack = self._stacks.get(key)
+            if stack is None:
+                names = [self._frame_label(code) for code in reversed(codes)]
+                stack = self._stacks[key] = ";".join([key[0], *names])
+            stacks.append(stack)
+        del frames
+        with self._lock:
+            self.samples += 1
+            for stack in stacks:
+                self._run[stack] = self._run.get(stack, 0) + 1
+                for segment in self._segments.values():
+                    segment[stack] = segment.get(stack, 0) + 1
+
+    def overhead(self) -> float:
+        """Share of wall time the sampler spent sampling since start()."""
+        if not self.started_at:
+            return 0.0
+        return self.sampling_s / max(time.time() - self.started_at, 1e-9)
@@ -11,6 +11,8 @@ BOT_NAME = "sven_scraping_projects"
 
 SPIDER_MODULES = ["sven_scraping_projects.spiders"]
 NEWSPIDER_MODULE = "sven_scraping_projects.spiders"
+# Imports only the spiders a run crawls (spider_loader.py) instead of every module above.
+SPIDER_LOADER_CLASS = "sven_scraping_projects.spider_loader.LazySpiderLoader"
 
 ADDONS = {}
 
@@ -27,6 +29,11 @@ if sys.platform.startswith("linux"):
 else:
     TWISTED_REACTOR = "twisted.internet.selectreactor.SelectReactor"
 
+# "threaded" (default): the reactor above in the main thread, Apify SDK calls on a separate
+# asyncio loop thread. "single" (Actor input `event_loop`): src/main.py installs the
+# AsyncioSelectorReactor on the SDK's loop instead, and ApifyPipeline awaits pushes there.
+APIFY_EVENT_LOOP_MODE = "threaded"
+
 # Emit progress logs frequently so Apify runs don't look "stuck" during long downloads.
 LOGSTATS_INTERVAL = 10
 TELNETCONSOLE_ENABLED = False
@@ -42,6 +49,33 @@ CONCURRENT_REQUESTS = 128
 CONCURRENT_REQUESTS_PER_DOMAIN = 64
 DOWNLOAD_DELAY = 0
 
+# Process-wide cap on in-flight requests across all crawlers (relevant when src/main.py
+# runs spiders concurrently). Enforced by GlobalLimitDownloader, which takes a token only when a
+# request leaves its download slot for the network; 0 disables.
+CONCURRENT_REQUESTS_GLOBAL = 256
+DOWNLOADER = "sven_scraping_projects.middlewares.GlobalLimitDownloader"
+
+# Live per-slot concurrency/delay control (AdaptiveConcurrencyMiddleware). The spider's
+# CONCURRENT_REQUESTS_PER_DOMAIN / DOWNLOAD_DELAY are the starting point. A window of
+# ADAPTIVE_CONCURRENCY_WINDOW responses with more than ADAPTIVE_CONCURRENCY_ERROR_RATE
+# throttling statuses (403/429/503/504) or timeouts, or with rising p90 latency, halves
+# concurrency; a clean window adds one. Spiders override the bounds.
+# ADAPTIVE_CONCURRENCY_MAX = 0 means "up to CONCURRENT_REQUESTS".
+# Off by default: it has not run against the live sites yet. Enable it per spider (in its
+# custom_settings) once the adaptive_concurrency/* stats of a real run support it.
+ADAPTIVE_CONCURRENCY_ENABLED = False
+ADAPTIVE_CONCURRENCY_MIN = 1
+ADAPTIVE_CONCURRENCY_MAX = 0
+ADAPTIVE_CONCURRENCY_MIN_DELAY = 0.0
+ADAPTIVE_CONCURRENCY_MAX_DELAY = 30.0
+ADAPTIVE_CONCURRENCY_WINDOW = 20
+ADAPTIVE_CONCURRENCY_BACKOFF = 0.5
+ADAPTIVE_CONCURRENCY_ERROR_RATE = 0.1
+# On a back-off, a numeric Retry-After pauses the slot once for that long.
+ADAPTIVE_CONCURRENCY_RESPECT_RETRY_AFTER = True
+# p90 latency above this multiple of the slot's baseline p50 counts as congestion.
+ADAPTIVE_CONCURRENCY_LATENCY_FACTOR = 2.0
+
 
 # Disable cookies (enabled by default)
 #
@@ -74,6 +108,10 @@ COOKIES_ENABLED = False
 DOWNLOADER_MIDDLEWARES = {
     # Log non-200 responses globally; keep default middlewares in place.
     "sven_scraping_projects.middlewares.HttpStatusLoggingMiddleware": 550,
+    # Revalidates pages from earlier runs (CONDITIONAL_GET_ENABLED); sees bodies after HttpCompression (590).
+    "sven_scraping_projects.middlewares.ConditionalGetMiddleware": 585,
+    # Per-slot AIMD concurrency/delay control; must see 429/503 before RetryMiddleware (550).
+    "sven_scraping_projects.middlewares.AdaptiveConcurrencyMiddleware": 940,
 }
 
 # Enable or disable spider middlewares
@@ -81,14 +119,65 @@ DOWNLOADER_MIDDLEWARES = {
 SPIDER_MIDDLEWARES = {
     # Prevent parsing of non-200 responses across all spiders (unless explicitly allowed).
     "sven_scraping_projects.middlewares.Non200ResponseGuardSpiderMiddleware": 543,
+    # Skips sitemap pages unchanged since an earlier run (RECRAWL_ENABLED); sees the callback's output.
+    "sven_scraping_projects.middlewares.IncrementalRecrawlMiddleware": 900,
+    # Per-callback latency/parse-CPU histograms; closest to the spider so it times only the callback.
+    "sven_scraping_projects.middlewares.CallbackProfileMiddleware": 1000,
 }
 
+# Per-callback p50/p90/p99 of scheduled->downloaded latency, download-slot wait, transfer
+# time and parse CPU, in the crawl stats (callback_profile/*) and the run summary line.
+CALLBACK_PROFILE_ENABLED = True
+
 # Extensions (run-level validation and summaries; class lives in middlewares.py
 # so Docker images always include it with the rest of the package)
 EXTENSIONS = {
+    # Before RunValidationExtension so the run summary line can include it.
+    "sven_scraping_projects.middlewares.MemoryAccountingExtension": 490,
     "sven_scraping_projects.middlewares.RunValidationExtension": 500,
+    "sven_scraping_projects.middlewares.SamplingProfilerExtension": 510,
+}
+
+# Scrapy imports every component listed in these dicts (including ones set to None in
+# EXTENSIONS / DOWNLOADER_MIDDLEWARES) before it can raise NotConfigured. Components this
+# project never uses are dropped from the *_BASE dicts instead, which keeps their imports out
+# of startup: aiohttp for RemoteControl (~125 ms; it would also start its HTTP server under the
+# asyncio reactor, APIFY_EVENT_LOOP_MODE=single), twisted.conch for the telnet console and
+# tldextract for cookies (~45 ms; COOKIES_ENABLED is off, see above). A spider that needs one
+# of them back must restore its *_BASE entry.
+from scrapy.settings import default_settings
+
+EXTENSIONS_BASE = {
+    path: order
+    for path, order in default_settings.EXTENSIONS_BASE.items()
+    if path not in ("scrapy.extensions.remote_control.RemoteControl", "scrapy.extensions.telnet.TelnetConsole")
+}
+DOWNLOADER_MIDDLEWARES_BASE = {
+    path: order
+    for path, order in default_settings.DOWNLOADER_MIDDLEWARES_BASE.items()
+    if path != "scrapy.downloadermiddlewares.cookies.CookiesMiddleware"
 }
 
+# Stack-sampling profiler (sampling_profiler.py), normally switched on from Actor input
+# `profile: {"mode": "sample", "interval_ms": 5}`; 0 disables. One collapsed-stack file per
+# spider (flamegraph.pl / speedscope format) goes to SAMPLING_PROFILER_DIR, and src/main.py
+# copies them to the key-value store as PROFILE-<spider>. Samples blocked in a known wait
+# (idle reactor, queue get, ...) are dropped unless SAMPLING_PROFILER_INCLUDE_IDLE is set.
+SAMPLING_PROFILER_INTERVAL_MS = 0
+SAMPLING_PROFILER_DIR = "storage/profiles"
+SAMPLING_PROFILER_INCLUDE_IDLE = False
+
+# Per-spider memory accounting (MemoryAccountingExtension): RSS at spider open/close and every
+# LOGSTATS_INTERVAL, plus samples at each spider boundary in src/main.py run_spiders().
+# Memory still held after close_spider above MEMORY_LEAK_THRESHOLD_MB is flagged.
+# MEMORY_TRACEMALLOC (Actor input `profile: {"tracemalloc": true}`) adds Python heap figures
+# and the top allocation sites, at a noticeable CPU cost; off by default.
+MEMORY_ACCOUNTING_ENABLED = True
+MEMORY_LEAK_THRESHOLD_MB = 64
+MEMORY_TRACEMALLOC = False
+MEMORY_TRACEMALLOC_FRAMES = 1
+MEMORY_TOP_SITES = 10
+
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
 #EXTENSIONS = {
@@ -101,6 +190,84 @@ ITEM_PIPELINES = {
     "sven_scraping_projects.pipelines.ApifyPipeline": 300,
 }
 
+# ApifyPipeline dataset pushes: number of batches in flight at once, and whether each
+# source's batches must land in the dataset in yield order (one batch in flight per source).
+APIFY_PUSH_CONCURRENCY = 4
+APIFY_PUSH_PRESERVE_ORDER = False
+# Push batches are cut by serialized size: they start at APIFY_PUSH_BATCH_BYTES, grow while
+# pushes return within APIFY_PUSH_TARGET_LATENCY_MS, halve when they take twice that, and stay
+# under the API's 9 MB request limit (APIFY_PUSH_MAX_PAYLOAD_BYTES, minus a 5% margin).
+APIFY_PUSH_BATCH_BYTES = 1024 * 1024
+APIFY_PUSH_MIN_BATCH_BYTES = 64 * 1024
+APIFY_PUSH_MAX_PAYLOAD_BYTES = 9 * 1024 * 1024
+APIFY_PUSH_TARGET_LATENCY_MS = 1000
+APIFY_PUSH_MAX_BATCH_ITEMS = 5000
+# Each record is encoded to JSON once, in process_item; batches are those bytes joined, and the
+# API client sends them without encoding again. "auto" uses orjson when it is installed (same
+# bytes as "json", the stdlib encoder); "client" keeps the old path, where the client encodes.
+APIFY_PUSH_ENCODER = "auto"
+# Records waiting for the push worker are held in memory up to APIFY_PUSH_QUEUE_MAX_ITEMS;
+# beyond that they spill to append-only segment files under <JOBDIR>/push_spill, which the
+# worker drains during the crawl and which survive a migration restart.
+APIFY_PUSH_QUEUE_MAX_ITEMS = 5000
+APIFY_PUSH_SPILL_SEGMENT_BYTES = 8 * 1024 * 1024
+# raw_source_fields (the JSON copy of the scraped item in every row) stay in the row with "inline".
+# With "local"/"kv" (Actor input `raw_source_fields`) they go to compressed NDJSON shards in
+# RAW_FIELDS_DIR or in the named key-value store RAW_FIELDS_KV_STORE_NAME, keyed by content hash,
+# and the row carries `raw_source_ref` instead (raw_fields_store.py). Shards are cut every
+# RAW_FIELDS_SHARD_BYTES of JSON and compressed with zstd (optional `zstandard`), else gzip.
+RAW_FIELDS_STORE = "inline"
+RAW_FIELDS_DIR = "storage/raw_source_fields"
+RAW_FIELDS_KV_STORE_NAME = "sven-raw-source-fields"
+RAW_FIELDS_SHARD_BYTES = 4 * 1024 * 1024
+RAW_FIELDS_CODEC = "auto"
+
+# Backpressure: when the push backlog (queued + spilled records) reaches HIGH, the pipeline
+# pauses the engine's downloads; it resumes once the backlog is down to LOW.
+APIFY_PUSH_BACKPRESSURE_ENABLED = True
+APIFY_PUSH_BACKPRESSURE_HIGH_ITEMS = 20000
+APIFY_PUSH_BACKPRESSURE_LOW_ITEMS = 5000
+
+# Push ledger in <JOBDIR>/push_ledger: records are journaled before they are queued and
+# marked committed after their batch was pushed. After a migration restart, committed
+# records (same content ID) are skipped and uncommitted ones are replayed.
+APIFY_PUSH_LEDGER_ENABLED = True
+APIFY_PUSH_LEDGER_SEGMENT_BYTES = 16 * 1024 * 1024
+
+# Duplicate records by source_url. The index keeps 64-bit key hashes in <JOBDIR>/dedupe_keys,
+# so a resumed crawl still recognises records pushed before a migration.
+#   policy: "count" (push, count in pipeline/duplicate_key_count), "drop" (do not push),
+#           "merge" (push a duplicate only if its content differs from versions already pushed)
+#   index:  "sorted" (exact, ~8 bytes per key) or "bloom" (sized by capacity + false-positive rate)
+APIFY_DUPLICATE_KEY_POLICY = "count"
+APIFY_DEDUPE_INDEX = "sorted"
+APIFY_DEDUPE_BLOOM_CAPACITY = 1_000_000
+APIFY_DEDUPE_BLOOM_FP_RATE = 0.001
+
+# Incremental recrawl (recrawl_state.py) for spiders that tag sitemap requests with their
+# <lastmod> (KVHH, Asklepios); switched on from Actor input `incremental`. A URL is fetched when
+# it is new, its lastmod moved or its entry is older than RECRAWL_TTL_DAYS. Unchanged pages are
+# either re-emitted from the stored items ("reemit", the dataset stays complete) or left out
+# ("skip"). The state lives in RECRAWL_STATE_DIR ("local") or in the named key-value store
+# RECRAWL_KV_STORE_NAME ("kv"), which outlives the run.
+RECRAWL_ENABLED = False
+RECRAWL_POLICY = "reemit"
+RECRAWL_TTL_DAYS = 14
+RECRAWL_STORE = "local"
+RECRAWL_STATE_DIR = "storage/recrawl"
+RECRAWL_KV_STORE_NAME = "sven-recrawl-state"
+
+# Conditional GETs (validator_store.py), switched on from Actor input `conditional_get`. The
+# ETag/Last-Modified and body of each 200 response are kept per URL; the next run sends
+# If-None-Match/If-Modified-Since and a 304 is answered with the stored body. Entries unseen for
+# CONDITIONAL_GET_MAX_AGE_DAYS are dropped; larger bodies are not stored. Storage as for RECRAWL_*.
+CONDITIONAL_GET_ENABLED = False
+CONDITIONAL_GET_MAX_AGE_DAYS = 30
+CONDITIONAL_GET_MAX_BODY_BYTES = 4 * 1024 * 1024
+CONDITIONAL_GET_STORE = "local"
+CONDITIONAL_GET_STATE_DIR = "storage/http_validators"
+CONDITIONAL_GET_KV_STORE_NAME = "sven-http-validators"
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
 #AUTOTHROTTLE_ENABLED = True
@@ -114,13 +281,19 @@ ITEM_PIPELINES = {
 # Enable showing throttling stats for every response received:
 #AUTOTHROTTLE_DEBUG = False
 
-# Enable and configure HTTP caching (disabled by default)
+# HTTP caching (disabled by default), switched on from Actor input `http_cache: "record"|"replay"`.
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
-#HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = "httpcache"
-#HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+# PackedCacheStorage (http_cache.py) keeps one compressed, indexed file per spider in HTTPCACHE_DIR
+# (zstd with the optional `zstandard` package, else zlib). "record" stores every response and
+# never answers from the cache; "replay" answers from the cache and stores nothing, so a recorded
+# run can be re-parsed offline after an extractor change; "" does both.
+HTTPCACHE_ENABLED = False
+HTTPCACHE_EXPIRATION_SECS = 0
+HTTPCACHE_DIR = "storage/httpcache"
+HTTPCACHE_IGNORE_HTTP_CODES = [429, 500, 502, 503, 504]
+HTTPCACHE_STORAGE = "sven_scraping_projects.http_cache.PackedCacheStorage"
+HTTPCACHE_MODE = "record"
+HTTPCACHE_CODEC = "auto"
 
 # Set settings whose default value is deprecated to a future-proof value
 FEED_EXPORT_ENCODING = "utf-8"
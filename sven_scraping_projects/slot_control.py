@@ -0,0 +1,204 @@
+"""
+Live per-download-slot concurrency and delay control (additive increase, multiplicative decrease).
+
+The spiders start from hand-picked CONCURRENT_REQUESTS_PER_DOMAIN and
+DOWNLOAD_DELAY values. SlotController moves a slot away from that starting
+point while the crawl runs:
+
+- Congestion is one of two things. Either more than `error_rate` of a
+  window's responses were throttling statuses (403, 429, 503, 504) or
+  download timeouts, or the window's p90 latency is more than
+  `latency_factor` times the slot's baseline (the lowest window p50 seen
+  recently). On congestion, concurrency is multiplied by `backoff`. Once
+  concurrency is at the floor, the delay doubles instead.
+- After a window of `window` responses without congestion, the delay is
+  halved first, down to `min_delay`. Then concurrency grows by `increase`,
+  up to the ceiling.
+
+Responses to requests sent before a decrease still carry the old load, so
+the next `window` responses after a decrease are not evaluated. That is one
+decrease per round trip, as in TCP.
+
+The controller is pure bookkeeping. AdaptiveConcurrencyMiddleware (middlewares.py)
+feeds it responses and timeouts and applies the result to Scrapy's downloader
+slots.
+"""
+
+from __future__ import annotations
+
+import math
+from collections import deque
+from typing import NamedTuple
+
+STATS_PREFIX = "adaptive_concurrency"
+# Responses that mean "slow down" rather than "this URL is broken".
+THROTTLE_STATUSES = frozenset({403, 429, 503, 504})
+# Window p50s kept for the latency baseline; old ones age out so the baseline can rise.
+BASELINE_WINDOWS = 8
+# Latency growth below this is jitter, not queueing (matters for sub-10 ms baselines).
+LATENCY_SLACK_S = 0.05
+
+
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile of an ascending sequence (0.0 when empty)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return float(sorted_values[min(rank, len(sorted_values)) - 1])
+
+
+def retry_after_seconds(value) -> float | None:
+    """Parse a numeric Retry-After header (HTTP dates are ignored)."""
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode("latin-1", errors="ignore")
+    try:
+        seconds = float(str(value).strip())
+    except ValueError:
+        return None
+    return seconds if seconds >= 0 else None
+
+
+class Adjustment(NamedTuple):
+    reason: str
+    concurrency: int
+    delay: float
+
+
+class SlotController:
+    """AIMD state of one download slot. Call observe()/timeout(); apply the returned Adjustment."""
+
+    def __init__(
+        self,
+        *,
+        concurrency: int,
+        delay: float = 0.0,
+        min_concurrency: int = 1,
+        max_concurrency: int = 64,
+        min_delay: float = 0.0,
+        max_delay: float = 30.0,
+        window: int = 20,
+        increase: float = 1.0,
+        backoff: float = 0.5,
+        error_rate: float = 0.1,
+        latency_factor: float = 2.0,
+    ):
+        self.min_concurrency = max(1, int(min_concurrency))
+        self.max_concurrency = max(self.min_concurrency, int(max_concurrency))
+        self.min_delay = max(0.0, float(min_delay))
+        self.max_delay = max(self.min_delay, float(max_delay))
+        self.window = max(1, int(window))
+        self.increase = max(0.0, float(increase))
+        self.backoff = min(max(float(backoff), 0.05), 0.95)
+        # Errors tolerated per window before backing off; a stray 503 is not congestion.
+        self.max_errors = int(max(0.0, float(error_rate)) * self.window)
+        self.latency_factor = float(latency_factor)
+
+        self._concurrency = float(self._clamp_concurrency(concurrency))
+        self.delay = self._clamp_delay(delay)
+        self._latencies: list[float] = []
+        self._errors = 0
+        self._responses = 0
+        # Responses still ignored after a decrease (they were sent at the old rate).
+        self._cooldown = 0
+        self._window_p50s: deque[float] = deque(maxlen=BASELINE_WINDOWS)
+
+        self.increases = 0
+        self.decreases = 0
+        self.throttled = 0
+        self.timeouts = 0
+        self.max_seen = self.concurrency
+        self.last_p50 = 0.0
+        self.last_p90 = 0.0
+
+    @property
+    def concurrency(self) -> int:
+        return int(self._concurrency)
+
+    @property
+    def baseline(self) -> float:
+        return min(self._window_p50s) if self._window_p50s else 0.0
+
+    def _clamp_concurrency(self, value) -> float:
+        return float(min(self.max_concurrency, max(self.min_concurrency, value)))
+
+    def _clamp_delay(self, value) -> float:
+        return min(self.max_delay, max(self.min_delay, float(value)))
+
+    def observe(self, status: int, latency: float | None = None) -> Adjustment | None:
+        """Account one response; returns an Adjustment when concurrency or delay changed."""
+        throttled = status in THROTTLE_STATUSES
+        if throttled:
+            self.throttled += 1
+        if self._cooldown:
+            self._cooldown -= 1
+            return None
+        self._responses += 1
+        if throttled:
+            return self._error("status")
+        if latency is not None and 200 <= status < 300:
+            self._latencies.append(float(latency))
+        if self._responses >= self.window:
+            return self._close_window()
+        return None
+
+    def timeout(self) -> Adjustment | None:
+        self.timeouts += 1
+        if self._cooldown:
+            self._cooldown -= 1
+            return None
+        self._responses += 1
+        return self._error("timeout")
+
+    def _error(self, reason: str) -> Adjustment | None:
+        self._errors += 1
+        if self._errors > self.max_errors:
+            return self._decrease(reason)
+        if self._responses >= self.window:
+            return self._close_window()
+        return None
+
+    def _reset_window(self) -> None:
+        self._latencies = []
+        self._errors = 0
+        self._responses = 0
+
+    def _decrease(self, reason: str) -> Adjustment | None:
+        self._reset_window()
+        self._cooldown = self.window
+        old = (self.concurrency, self.delay)
+        if self.concurrency > self.min_concurrency:
+            self._concurrency = self._clamp_concurrency(math.floor(self._concurrency * self.backoff))
+        else:
+            self.delay = self._clamp_delay(max(self.delay * 2.0, 0.1))
+        if (self.concurrency, self.delay) == old:
+            return None
+        self.decreases += 1
+        return Adjustment(reason, self.concurrency, self.delay)
+
+    def _close_window(self) -> Adjustment | None:
+        latencies = sorted(self._latencies)
+        self._reset_window()
+        if latencies:
+            self.last_p50 = percentile(latencies, 50)
+            self.last_p90 = percentile(latencies, 90)
+            baseline = self.baseline
+            self._window_p50s.append(self.last_p50)
+            if (
+                baseline
+                and self.latency_factor > 0
+                and self.last_p90 > max(self.latency_factor * baseline, baseline + LATENCY_SLACK_S)
+            ):
+                # Queueing at the server: latency grows before errors do.
+                return self._decrease("latency")
+
+        if self.delay > self.min_delay:
+            self.delay = self._clamp_delay(self.delay / 2.0 if self.delay / 2.0 >= 0.01 else self.min_delay)
+        elif self.concurrency < self.max_concurrency:
+            self._concurrency = self._clamp_concurrency(self._concurrency + self.increase)
+        else:
+            return None
+        self.increases += 1
+        self.max_seen = max(self.max_seen, self.concurrency)
+        return Adjustment("increase", self.concurrency, self.delay)
@@ -0,0 +1,129 @@
+"""
+Spider loader that imports only the spiders a run asks for.
+
+Scrapy's SpiderLoader imports every module under SPIDER_MODULES when a
+CrawlerRunner is created (once per spider in src/main.py), even if the run
+crawls a single site. LazySpiderLoader reads the spider modules' source
+instead: a class-level `name = "..."` maps a spider name to its module
+without importing it. load(name) then imports that one module.
+
+A spider whose name is not a plain string literal is not found by the scan.
+load() then falls back to importing everything, as SpiderLoader does, and so
+do find_by_request() and list() after such a fallback.
+"""
+
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import os
+import re
+from collections import defaultdict
+
+from scrapy.spiderloader import SpiderLoader
+
+# A top-level class statement, and a `name = "..."` (optionally annotated) line in its body.
+_CLASS = re.compile(r"class\s+\w+")
+_NAME = re.compile(r"name\s*(?::[^=]+)?=\s*(['\"])([^'\"\\\n]+)\1\s*(?:#.*)?$")
+
+
+def _module_files(module_name: str):
+    """(module name, source path) for `module_name` and, for a package, every module below it."""
+    spec = importlib.util.find_spec(module_name)
+    if spec is None:
+        return
+    if spec.submodule_search_locations is None:
+        if spec.origin and spec.origin.endswith(".py"):
+            yield module_name, spec.origin
+        return
+    for root_dir in spec.submodule_search_locations:
+        for dirpath, dirnames, filenames in os.walk(root_dir):
+            dirnames[:] = sorted(d for d in dirnames if os.path.isfile(os.path.join(dirpath, d, "__init__.py")))
+            rel = os.path.relpath(dirpath, root_dir)
+            package = module_name if rel == "." else f"{module_name}.{rel.replace(os.sep, '.')}"
+            for filename in sorted(filenames):
+                if not filename.endswith(".py"):
+                    continue
+                stem = filename[:-3]
+                yield (package if stem == "__init__" else f"{package}.{stem}"), os.path.join(dirpath, filename)
+
+
+def _declared_names(path: str) -> list[str]:
+    """
+    String literals assigned to `name` directly in the body of the module's
+    top-level classes. A line scan rather than ast.parse: parsing every
+    spider module costs more than importing them.
+    """
+    try:
+        with open(path, encoding="utf-8") as fh:
+            lines = fh.read().splitlines()
+    except (OSError, UnicodeDecodeError):
+        return []
+    names = []
+    in_class = False
+    body_indent = None
+    for line in lines:
+        stripped = line.lstrip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        indent = line[: len(line) - len(stripped)]
+        if not indent:
+            in_class = bool(_CLASS.match(stripped))
+            body_indent = None
+            continue
+        if not in_class:
+            continue
+        if body_indent is None:
+            body_indent = indent
+        if indent == body_indent:
+            match = _NAME.match(stripped)
+            if match:
+                names.append(match.group(2))
+    return names
+
+
+def spider_index(spider_modules) -> dict[str, str]:
+    """Spider name -> module name, from the source of SPIDER_MODULES (nothing is imported)."""
+    index: dict[str, str] = {}
+    for module_name in spider_modules:
+        for name, path in _module_files(module_name):
+            for spider_name in _declared_names(path):
+                index.setdefault(spider_name, name)
+    return index
+
+
+class LazySpiderLoader(SpiderLoader):
+    def __init__(self, settings):
+        self.spider_modules = settings.getlist("SPIDER_MODULES")
+        self.warn_only = settings.getbool("SPIDER_LOADER_WARN_ONLY")
+        self._spiders = {}
+        self._found = defaultdict(list)
+        self._index = spider_index(self.spider_modules)
+        self._all_loaded = False
+
+    def load(self, spider_name: str):
+        if spider_name not in self._spiders and not self._all_loaded:
+            module_name = self._index.get(spider_name)
+            if module_name is not None:
+                self._load_spiders(importlib.import_module(module_name))
+            if spider_name not in self._spiders:
+                self._load_all()
+        return super().load(spider_name)
+
+    def _load_all(self) -> None:
+        if self._all_loaded:
+            return
+        # Start over so spiders loaded one by one are not reported as duplicates.
+        self._spiders = {}
+        self._found = defaultdict(list)
+        self._load_all_spiders()
+        self._all_loaded = True
+
+    def list(self) -> list[str]:
+        if self._all_loaded:
+            return super().list()
+        return list(self._index)
+
+    def find_by_request(self, request) -> list[str]:
+        self._load_all()
+        return super().find_by_request(request)
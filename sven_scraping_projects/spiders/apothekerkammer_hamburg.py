@@ -43,6 +43,11 @@ class ApothekerkammerHamburgSpider(Spider):
             errback=self.errback_http,
         )
 
+    async def start(self):
+        # Scrapy >= 2.13 entry point; start_requests() is kept for older Scrapy versions.
+        for request in self.start_requests():
+            yield request
+
     # ------------------------
     # Helper extraction methods
     # ------------------------
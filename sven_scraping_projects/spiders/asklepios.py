@@ -5,14 +5,15 @@
 # concurrency, delay, AutoThrottle, and retries to avoid rate limiting and
 # server overload.
 
-import gzip
-from io import BytesIO
-
 from scrapy import Spider
 from scrapy.http import Request
-from parsel import Selector
 
+from sven_scraping_projects.recrawl_state import SITEMAP_LASTMOD_META
 from sven_scraping_projects.utils.name_parsing import parse_person_name
+from sven_scraping_projects.utils.sitemap import SitemapReader
+
+# Sitemap entries that are never profile pages.
+SKIPPED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".pdf", ".xml", ".gz")
 
 
 class AsklepiosSpider(Spider):
@@ -33,6 +34,12 @@ class AsklepiosSpider(Spider):
         "AUTOTHROTTLE_MAX_DELAY": 30.0,
         "AUTOTHROTTLE_TARGET_CONCURRENCY": 2.0,
         "AUTOTHROTTLE_DEBUG": False,
+        # Bounds for AdaptiveConcurrencyMiddleware once ADAPTIVE_CONCURRENCY_ENABLED is set
+        # for this spider (with AutoThrottle on, it adapts concurrency only).
+        "ADAPTIVE_CONCURRENCY_MIN": 1,
+        "ADAPTIVE_CONCURRENCY_MAX": 16,
+        "ADAPTIVE_CONCURRENCY_MIN_DELAY": 0.25,
+        "ADAPTIVE_CONCURRENCY_MAX_DELAY": 30.0,
         "USER_AGENT": (
             "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
             "(KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36"
@@ -76,68 +83,41 @@ class AsklepiosSpider(Spider):
             callback=self.parse_sitemap_index,
         )
 
-    @staticmethod
-    def _extract_sitemap_locs(response):
-        """
-        Extract <loc> URLs from a sitemap or sitemap index.
-        Handles plain XML and .xml.gz responses.
-        """
-        body = response.body or b""
-        # Some sitemaps are served as .gz or with gzip content.
-        if response.url.endswith(".gz"):
-            try:
-                body = gzip.GzipFile(fileobj=BytesIO(body)).read()
-            except Exception:
-                # Fall back to raw body; selector will likely yield nothing.
-                pass
-
-        text = None
-        try:
-            text = body.decode("utf-8", errors="replace")
-        except Exception:
-            text = (response.text or "")
-
-        sel = Selector(text=text)
-        return [u.strip() for u in sel.xpath("//*[local-name()='loc']/text()").getall() if u and u.strip()]
+    async def start(self):
+        # Scrapy >= 2.13 entry point; start_requests() is kept for older Scrapy versions.
+        for request in self.start_requests():
+            yield request
 
     def parse_sitemap_index(self, response):
-        sitemap_urls = self._extract_sitemap_locs(response)
-        self.logger.info("Asklepios sitemap-index: found %d sitemap URLs", len(sitemap_urls))
+        # Child sitemap requests are yielded while the index is still being parsed.
         # Be permissive: follow all sitemap URLs; filtering by a specific naming convention is brittle.
-        for url in sitemap_urls:
-            yield Request(url, callback=self.parse_profile_sitemap)
+        sitemap = SitemapReader(response.body)
+        for entry in sitemap:
+            yield Request(entry.loc, callback=self.parse_profile_sitemap)
+        self.logger.info("Asklepios sitemap-index: found %d sitemap URLs", sitemap.yielded)
 
     def parse_profile_sitemap(self, response):
-        locs = self._extract_sitemap_locs(response)
-        if not locs:
-            self.logger.warning("Asklepios sitemap: no <loc> found for %s", response.url)
-            return
-
-        # Track coverage for validation.
-        self.sitemap_locs_total = int(getattr(self, "sitemap_locs_total", 0) or 0) + len(locs)
-
-        scheduled = 0
-        for url in locs:
-            u = (url or "").strip()
-            if not u:
-                continue
-            # Avoid scheduling obvious non-HTML assets.
-            lower = u.lower()
-            if any(lower.endswith(ext) for ext in (".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".pdf", ".xml", ".gz")):
-                continue
-            scheduled += 1
+        # Avoid scheduling obvious non-HTML assets; the reader skips them while parsing.
+        sitemap = SitemapReader(response.body, exclude_extensions=SKIPPED_EXTENSIONS)
+        for entry in sitemap:
             yield Request(
-                u,
+                entry.loc,
                 headers=self.profile_headers,
                 callback=self.parse_profile,
                 dont_filter=True,
+                meta={SITEMAP_LASTMOD_META: entry.lastmod},
             )
 
-        self.sitemap_locs_scheduled = int(getattr(self, "sitemap_locs_scheduled", 0) or 0) + scheduled
+        if not sitemap.locs:
+            self.logger.warning("Asklepios sitemap: no <loc> found for %s", response.url)
+            return
+        # Track coverage for validation.
+        self.sitemap_locs_total = int(getattr(self, "sitemap_locs_total", 0) or 0) + sitemap.locs
+        self.sitemap_locs_scheduled = int(getattr(self, "sitemap_locs_scheduled", 0) or 0) + sitemap.yielded
         self.logger.info(
             "Asklepios sitemap: %d locs, scheduled %d URLs (%s)",
-            len(locs),
-            scheduled,
+            sitemap.locs,
+            sitemap.yielded,
             response.url,
         )
 
@@ -5,40 +5,18 @@ import re
 from scrapy import Spider
 from scrapy.http import Request
 
-
-TITLES = [
-    "Dr. med.",
-    "Dr.",
-    "Prof. Dr. med.",
-    "Prof. Dr.",
-    "Dipl.-Psych.",
-    "PD Dr. med.",
-    "PD Dr.",
-    "Med. pract.",
-]
+from sven_scraping_projects.recrawl_state import SITEMAP_LASTMOD_META
+from sven_scraping_projects.utils.name_parsing import parse_person_name
+from sven_scraping_projects.utils.sitemap import SitemapReader
 
 
 def parse_doctor_name(raw_name):
-    if not raw_name:
-        return {"title": "", "first_name": "", "last_name": ""}
-    name = raw_name.strip()
-    matched_title = None
-    for t in TITLES:
-        if name.startswith(t):
-            matched_title = t
-            name = name.replace(t, "", 1).strip()
-            break
-    parts = name.split()
-    if len(parts) <= 1:
-        first_name = parts[0] if parts else ""
-        last_name = ""
-    else:
-        first_name = parts[0]
-        last_name = " ".join(parts[1:])
+    """Split a KVHH profile heading into title, first_name, last_name."""
+    parsed = parse_person_name(raw_name)
     return {
-        "title": matched_title or "",
-        "first_name": first_name,
-        "last_name": last_name,
+        "title": parsed["title"],
+        "first_name": parsed["first_name"],
+        "last_name": parsed["last_name"],
     }
 
 
@@ -94,6 +72,12 @@ class KvhhSpider(Spider):
         "AUTOTHROTTLE_START_DELAY": 0.25,
         "AUTOTHROTTLE_MAX_DELAY": 30,
         "AUTOTHROTTLE_TARGET_CONCURRENCY": 2.0,
+        # Bounds for AdaptiveConcurrencyMiddleware once ADAPTIVE_CONCURRENCY_ENABLED is set
+        # for this spider. The ceiling stays at the fixed per-domain limit until production
+        # stats show more is stable.
+        "ADAPTIVE_CONCURRENCY_MIN": 2,
+        "ADAPTIVE_CONCURRENCY_MAX": 16,
+        "ADAPTIVE_CONCURRENCY_MAX_DELAY": 30,
         "USER_AGENT": (
             "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
             "(KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36"
@@ -108,17 +92,22 @@ class KvhhSpider(Spider):
             meta={"download_timeout": 120},
         )
 
+    async def start(self):
+        # Scrapy >= 2.13 entry point; start_requests() is kept for older Scrapy versions.
+        for request in self.start_requests():
+            yield request
+
     def parse_sitemap(self, response):
-        # Sitemap XML: extract <loc> URLs (namespace-agnostic)
-        locs = response.xpath("//*[local-name()='loc']/text()").getall()
-        doctor_urls = [
-            u.strip()
-            for u in locs
-            if u and u.strip().startswith(self.doctor_url_prefix)
-        ]
-        self.logger.info("Found %d KVHH doctor profile URLs", len(doctor_urls))
-        for url in doctor_urls:
-            yield Request(url, callback=self.parse_profile, dont_filter=True)
+        # Streamed, namespace-agnostic <loc> URLs; profile requests go out while the sitemap is still parsed.
+        sitemap = SitemapReader(response.body, prefixes=(self.doctor_url_prefix,))
+        for entry in sitemap:
+            yield Request(
+                entry.loc,
+                callback=self.parse_profile,
+                dont_filter=True,
+                meta={SITEMAP_LASTMOD_META: entry.lastmod},
+            )
+        self.logger.info("Found %d KVHH doctor profile URLs", sitemap.yielded)
 
     def parse_profile(self, response):
         raw_name = (response.xpath("string(//h1)").get() or "").strip()
@@ -1,8 +1,6 @@
 import json
 from scrapy import Spider
 from scrapy.http import Request
-from scrapy.shell import inspect_response
-from scrapy.utils.response import open_in_browser
 
 from sven_scraping_projects.utils.name_parsing import parse_person_name
 
@@ -60,8 +58,6 @@ class UkeSpider(Spider):
             "Accept-Language": "en-US,en;q=0.9,pl;q=0.8,de;q=0.7,sr;q=0.6,bs;q=0.5,nl;q=0.4",
             "Cache-Control": "max-age=0",
             "Connection": "keep-alive",
-            "If-Modified-Since": "Tue, 27 Jan 2026 06:05:36 GMT",
-            "If-None-Match": "\"8c00bb-79115-64958697ccc00\"",
             "Sec-Fetch-Dest": "document",
             "Sec-Fetch-Mode": "navigate",
             "Sec-Fetch-Site": "none",
@@ -101,10 +97,16 @@ class UkeSpider(Spider):
             callback=self.parse
         )
 
+    async def start(self):
+        # Scrapy >= 2.13 entry point; start_requests() is kept for older Scrapy versions.
+        for request in self.start_requests():
+            yield request
+
     def parse(self, response):
-        # Debug helpers (uncomment when inspecting HTML/JSON responses)
-        # open_in_browser(response)
-        # inspect_response(response, self)
+        # Debug helpers (uncomment when inspecting HTML/JSON responses). Imported here, not at
+        # module level: scrapy.shell is heavy and only needed while debugging.
+        # from scrapy.utils.response import open_in_browser; open_in_browser(response)
+        # from scrapy.shell import inspect_response; inspect_response(response, self)
 
         # Parse raw JSON response manually
         jsonresponse = json.loads(response.text)
@@ -125,8 +127,8 @@ class UkeSpider(Spider):
 
     def parse_profile(self, response):
         # Debug helpers for individual profile pages
-        # open_in_browser(response)
-        # inspect_response(response, self)
+        # from scrapy.utils.response import open_in_browser; open_in_browser(response)
+        # from scrapy.shell import inspect_response; inspect_response(response, self)
 
         name_raw = extract_text(response, '//div[@class="name"]/text()')
         parsed_name = parse_person_name(name_raw)
@@ -9,48 +9,16 @@ from urllib.parse import urljoin
 from scrapy import Spider
 from scrapy.http import Request
 
-
-# Dental titles for name parsing (extended from kvhh for dentists)
-DENTAL_TITLES = [
-    "Dr. med. dent.",
-    "Dr. med.",
-    "Dr.",
-    "Prof. Dr. med. dent.",
-    "Prof. Dr. med.",
-    "Prof. Dr.",
-    "PD Dr. med. dent.",
-    "PD Dr. med.",
-    "PD Dr.",
-]
+from sven_scraping_projects.utils.name_parsing import parse_person_name
 
 
 def parse_dentist_name(raw_name):
     """Parse dentist name into title, first_name, last_name. Handles 'Frau/Herr' prefix."""
-    if not raw_name:
-        return {"title": "", "first_name": "", "last_name": ""}
-    name = raw_name.strip()
-    # Strip Frau/Herr
-    for prefix in ("Frau ", "Herr "):
-        if name.startswith(prefix):
-            name = name[len(prefix) :].strip()
-            break
-    matched_title = None
-    for t in DENTAL_TITLES:
-        if name.startswith(t):
-            matched_title = t
-            name = name.replace(t, "", 1).strip()
-            break
-    parts = name.split()
-    if len(parts) <= 1:
-        first_name = parts[0] if parts else ""
-        last_name = ""
-    else:
-        first_name = parts[0]
-        last_name = " ".join(parts[1:])
+    parsed = parse_person_name(raw_name)
     return {
-        "title": matched_title or "",
-        "first_name": first_name,
-        "last_name": last_name,
+        "title": parsed["title"],
+        "first_name": parsed["first_name"],
+        "last_name": parsed["last_name"],
     }
 
 
@@ -83,6 +51,11 @@ class ZahnaerzteHhSpider(Spider):
             callback=self.parse,
         )
 
+    async def start(self):
+        # Scrapy >= 2.13 entry point; start_requests() is kept for older Scrapy versions.
+        for request in self.start_requests():
+            yield request
+
     def parse(self, response):
         # Data is embedded in data-filter-data attribute as HTML-entity-encoded JSON
         elem = response.xpath("//*[@data-filter-data]")
@@ -0,0 +1,245 @@
+"""
+Append-only on-disk overflow for ApifyPipeline's push queue.
+
+When the in-memory push queue is full (the dataset API is slower than the
+crawl), records are appended as NDJSON lines to segment files under the
+spider's JOBDIR instead of an unbounded list. The push worker reads them back
+in byte-bounded batches and acknowledges each batch once the dataset accepted
+it; the acknowledged position is persisted in cursor.json, and segments that
+are fully behind the cursor are deleted.
+
+Records are flushed to the OS on every append, so a SIGTERM (platform
+migration) loses nothing that was spilled: the next run of the same JOBDIR
+resumes reading at the cursor. Records read but not yet acknowledged are read
+again after a restart (at-least-once).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from typing import NamedTuple
+
+from sven_scraping_projects.dataset_push import EncodedRecord
+
+SEGMENT_NAME = "segment-{:06d}.ndjson"
+_SEGMENT_RE = re.compile(r"^segment-(\d{6})\.ndjson$")
+CURSOR_FILE = "cursor.json"
+STATS_PREFIX = "pipeline/spill"
+
+
+class SpillPosition(NamedTuple):
+    segment: int
+    offset: int
+
+
+class SpillQueue:
+    """
+    Single-writer (reactor thread), single-reader (push worker) FIFO on disk.
+
+    has_unread() tells process_item whether to keep appending here: once
+    records have spilled, newer records follow them to disk until the reader
+    catches up, so records are pushed in the order they were scraped.
+    """
+
+    def __init__(self, directory: str, *, segment_bytes: int = 8 * 1024 * 1024, stats=None):
+        self.directory = directory
+        self.segment_bytes = max(1, int(segment_bytes))
+        self._stats = stats
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        acked = self._load_cursor()
+        segments = self._segments()
+        # Drop segments that were fully acknowledged before a crash could delete them.
+        for n in [n for n in segments if n < acked.segment]:
+            self._remove_segment(n)
+        segments = [n for n in segments if n >= acked.segment]
+        if not segments or segments[0] != acked.segment:
+            # No cursor yet (or its segment is gone): start at the oldest segment left.
+            acked = SpillPosition(segments[0] if segments else max(acked.segment, 1), 0)
+
+        self._acked = acked
+        self._read = acked
+        self._write_segment = segments[-1] if segments else acked.segment
+        path = self._path(self._write_segment)
+        self._truncate_partial_line(path)
+        self._writer = open(path, "ab")
+        self._write_offset = self._writer.tell()
+        self.recovered_records = self._count_unread()
+        self._unread = self.recovered_records
+        if self.recovered_records:
+            self._stat_inc("recovered_records", self.recovered_records)
+
+    # -- files ---------------------------------------------------------------
+
+    def _path(self, segment: int) -> str:
+        return os.path.join(self.directory, SEGMENT_NAME.format(segment))
+
+    def _segments(self) -> list[int]:
+        out = []
+        for name in os.listdir(self.directory):
+            m = _SEGMENT_RE.match(name)
+            if m:
+                out.append(int(m.group(1)))
+        return sorted(out)
+
+    def _remove_segment(self, segment: int) -> None:
+        try:
+            os.remove(self._path(segment))
+            self._stat_inc("segments_deleted")
+        except FileNotFoundError:
+            pass
+
+    def _load_cursor(self) -> SpillPosition:
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE), encoding="utf-8") as fh:
+                data = json.load(fh)
+            return SpillPosition(int(data["segment"]), int(data["offset"]))
+        except (OSError, ValueError, KeyError, TypeError):
+            return SpillPosition(0, 0)
+
+    def _save_cursor(self, position: SpillPosition) -> None:
+        path = os.path.join(self.directory, CURSOR_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"segment": position.segment, "offset": position.offset}, fh)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _truncate_partial_line(path: str) -> None:
+        """A crash mid-append can leave a line without its newline; drop it."""
+        try:
+            with open(path, "rb+") as fh:
+                data = fh.read()
+                end = data.rfind(b"\n") + 1
+                if end != len(data):
+                    fh.truncate(end)
+        except FileNotFoundError:
+            pass
+
+    def _count_unread(self) -> int:
+        count = 0
+        for n in self._segments():
+            if n < self._read.segment:
+                continue
+            with open(self._path(n), "rb") as fh:
+                if n == self._read.segment:
+                    fh.seek(self._read.offset)
+                count += sum(1 for _ in fh)
+        return count
+
+    def _stat_inc(self, key: str, count=1) -> None:
+        if self._stats is not None:
+            self._stats.inc_value(f"{STATS_PREFIX}/{key}", count)
+
+    # -- queue ---------------------------------------------------------------
+
+    def has_unread(self) -> bool:
+        with self._lock:
+            return self._unread > 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._unread
+
+    def append(self, record: dict) -> None:
+        if record.__class__ is EncodedRecord:
+            line = record.payload + b"\n"
+        else:
+            line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._lock:
+            if self._write_offset and self._write_offset + len(line) > self.segment_bytes:
+                self._writer.close()
+                self._write_segment += 1
+                self._writer = open(self._path(self._write_segment), "ab")
+                self._write_offset = 0
+            self._writer.write(line)
+            self._writer.flush()
+            self._write_offset += len(line)
+            self._unread += 1
+        self._stat_inc("records_written")
+        self._stat_inc("bytes_written", len(line))
+
+    def read(self, *, max_bytes: int, max_items: int = 5000) -> tuple[list, int, SpillPosition | None]:
+        """
+        Read the next batch: (records, payload_bytes, position after the batch).
+
+        payload_bytes is the size of the batch as a JSON array, matching
+        dataset_push.payload_bytes(); at least one record is returned when
+        any is unread, even if it alone exceeds max_bytes.
+        """
+        lines: list = []
+        size = 0
+        # Only file positions are handled under the lock; decoding happens after releasing it.
+        with self._lock:
+            position = self._read
+            full = False
+            while self._unread and not full:
+                if not self._has_more(position):
+                    if position.segment >= self._write_segment:
+                        break
+                    position = SpillPosition(position.segment + 1, 0)
+                    continue
+                with open(self._path(position.segment), "rb") as fh:
+                    fh.seek(position.offset)
+                    offset = position.offset
+                    for line in fh:
+                        item_bytes = len(line) - 1
+                        # JSON array: "[" + records joined by ", " + "]"
+                        if lines and size + item_bytes + 2 * len(lines) + 2 > max_bytes:
+                            full = True
+                            break
+                        lines.append(line)
+                        size += item_bytes
+                        offset += len(line)
+                        self._unread -= 1
+                        if len(lines) >= max_items:
+                            full = True
+                            break
+                    position = SpillPosition(position.segment, offset)
+            self._read = position
+        if not lines:
+            return [], 0, None
+        # The lines are the records' JSON already: keep them, so the push does not encode again.
+        records = [EncodedRecord.from_payload(line[:-1]) for line in lines]
+        self._stat_inc("records_read", len(records))
+        return records, size + 2 * (len(records) - 1) + 2, position
+
+    def _has_more(self, position: SpillPosition) -> bool:
+        if position.segment == self._write_segment:
+            return position.offset < self._write_offset
+        try:
+            return position.offset < os.path.getsize(self._path(position.segment))
+        except OSError:
+            return False
+
+    def ack(self, position: SpillPosition) -> None:
+        """Mark everything up to `position` as pushed. Older positions are ignored."""
+        with self._lock:
+            if position <= self._acked:
+                return
+            done = range(self._acked.segment, position.segment)
+            self._acked = position
+            self._save_cursor(position)
+        for n in done:
+            self._remove_segment(n)
+
+    def close(self) -> None:
+        """Close the writer; remove the directory when nothing is left to push."""
+        with self._lock:
+            self._writer.close()
+            drained = self._unread == 0 and self._acked >= SpillPosition(self._write_segment, self._write_offset)
+        if drained:
+            for n in self._segments():
+                self._remove_segment(n)
+            try:
+                os.remove(os.path.join(self.directory, CURSOR_FILE))
+            except FileNotFoundError:
+                pass
+            try:
+                os.rmdir(self.directory)
+            except OSError:
+                pass
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import re
+from functools import lru_cache
 from typing import TypedDict
 
 
@@ -14,7 +15,7 @@ class ParsedPersonName(TypedDict):
 _WHITESPACE_RE = re.compile(r"\s+")
 
 # Canonical academic titles we expect in Hamburg healthcare directories.
-# Order matters: longest/most-specific first.
+# Matching is longest-first via _TITLE_TRIE, so the order here does not matter.
 ACADEMIC_TITLES: tuple[str, ...] = (
     "Prof. Dr. med. dent.",
     "Prof. Dr. med.",
@@ -22,6 +23,10 @@ ACADEMIC_TITLES: tuple[str, ...] = (
     "PD Dr. med. dent.",
     "PD Dr. med.",
     "PD Dr.",
+    "Univ.-Prof. Dr. med.",
+    "Univ.-Prof. Dr.",
+    "apl. Prof. Dr. med.",
+    "apl. Prof. Dr.",
     "Dr. med. dent.",
     "Dr. med.",
     "Dr.",
@@ -29,6 +34,29 @@ ACADEMIC_TITLES: tuple[str, ...] = (
     "Med. pract.",
 )
 
+# Honorifics that are not academic titles; stripped (case-insensitively) before titles.
+SALUTATIONS: tuple[str, ...] = ("frau ", "herr ")
+
+# Raw names repeat a lot (same doctor on several pages, same field in several records).
+NAME_CACHE_SIZE = 8192
+
+# After a title: end of string, whitespace or a list separator.
+_TITLE_BOUNDARY = frozenset(" ,;")
+_TERMINAL = ""
+
+
+def _build_trie(titles) -> dict:
+    root: dict = {}
+    for title in titles:
+        node = root
+        for ch in title:
+            node = node.setdefault(ch, {})
+        node[_TERMINAL] = title
+    return root
+
+
+_TITLE_TRIE = _build_trie(ACADEMIC_TITLES)
+
 
 def _normalize_name(raw_name: str | None) -> str:
     if not raw_name:
@@ -36,32 +64,61 @@ def _normalize_name(raw_name: str | None) -> str:
     return _WHITESPACE_RE.sub(" ", str(raw_name).strip())
 
 
-def parse_person_name(raw_name: str | None) -> ParsedPersonName:
-    """Split a human name into academic title, first_name, last_name, and a rebuilt full name.
+def strip_salutation(name: str) -> str:
+    """'Frau Dr. Anna Meyer' -> 'Dr. Anna Meyer' (expects whitespace-normalised input)."""
+    for prefix in SALUTATIONS:
+        if name[: len(prefix)].lower() == prefix:
+            return name[len(prefix) :].strip()
+    return name
 
-    Rules:
-    - Strips common German prefixes like 'Frau'/'Herr'.
-    - Extracts academic titles from the beginning of the name (prefix match).
-    - Splits remaining tokens into first token = first_name, remaining = last_name.
-    """
-    name = _normalize_name(raw_name)
-    if not name:
-        return {"title": "", "first_name": "", "last_name": "", "name": ""}
 
-    # Strip honorific prefixes that are not academic titles.
-    for prefix in ("Frau ", "Herr "):
-        if name.startswith(prefix):
-            name = name[len(prefix) :].strip()
+def _match_title(s: str, start: int) -> str | None:
+    """Longest title starting at s[start] that ends on a boundary."""
+    node = _TITLE_TRIE
+    best = None
+    i = start
+    n = len(s)
+    while i < n:
+        node = node.get(s[i])
+        if node is None:
             break
+        i += 1
+        title = node.get(_TERMINAL)
+        if title is not None and (i == n or s[i] in _TITLE_BOUNDARY):
+            best = title
+    return best
+
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def split_academic_titles(name: str) -> tuple[tuple[str, ...], str]:
+    """
+    Split stacked leading titles off a name in one left-to-right scan.
 
-    title = ""
-    for t in ACADEMIC_TITLES:
-        if name.startswith(t):
-            title = t
-            name = name[len(t) :].strip()
+    'Prof. Dr. med. Anna Meyer' -> (('Prof. Dr. med.',), 'Anna Meyer')
+    'Dr. med., Dipl.-Psych. Jan Ott' -> (('Dr. med.', 'Dipl.-Psych.'), 'Jan Ott')
+    """
+    s = _normalize_name(name)
+    titles: list[str] = []
+    pos = 0
+    n = len(s)
+    while pos < n:
+        title = _match_title(s, pos)
+        if title is None:
             break
+        titles.append(title)
+        pos += len(title)
+        while pos < n and s[pos] in _TITLE_BOUNDARY:
+            pos += 1
+    return tuple(titles), s[pos:]
+
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def _parse_person_name(raw_name: str) -> tuple[str, str, str, str]:
+    name = strip_salutation(_normalize_name(raw_name))
+    titles, rest = split_academic_titles(name)
+    title = " ".join(titles)
 
-    parts = [p for p in name.split(" ") if p]
+    parts = rest.split(" ") if rest else []
     if len(parts) <= 1:
         first_name = parts[0] if parts else ""
         last_name = ""
@@ -70,10 +127,23 @@ def parse_person_name(raw_name: str | None) -> ParsedPersonName:
         last_name = " ".join(parts[1:])
 
     full_name = " ".join(p for p in (title, first_name, last_name) if p)
+    return title, first_name, last_name, full_name
+
+
+def parse_person_name(raw_name: str | None) -> ParsedPersonName:
+    """Split a human name into academic title, first_name, last_name, and a rebuilt full name.
+
+    Rules:
+    - Strips common German prefixes like 'Frau'/'Herr'.
+    - Extracts stacked academic titles from the beginning of the name (longest match first).
+    - Splits remaining tokens into first token = first_name, remaining = last_name.
+    """
+    if not raw_name:
+        return {"title": "", "first_name": "", "last_name": "", "name": ""}
+    title, first_name, last_name, full_name = _parse_person_name(str(raw_name))
     return {
         "title": title,
         "first_name": first_name,
         "last_name": last_name,
         "name": full_name,
     }
-
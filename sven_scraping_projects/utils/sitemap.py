@@ -0,0 +1,148 @@
+"""
+Streaming sitemap reader shared by the KVHH and Asklepios spiders.
+
+Parsing a sitemap into a DOM (Selector / response.xpath) holds the whole
+document tree in memory, and for .xml.gz sitemaps first the gunzipped body and
+a decoded str copy of it as well, before the first URL comes out.
+SitemapReader feeds the body in chunks to an lxml pull parser instead,
+gunzipping incrementally where needed, and yields a SitemapEntry for each
+<url> / <sitemap> element as soon as it is closed. Each element is dropped
+once it has been read, so memory beyond the response body stays bounded
+by the chunk size, and a spider callback looping over the reader hands its
+requests to Scrapy while the rest of the sitemap is still being parsed.
+
+Filtering by URL prefix or extension happens inside the loop, so skipped
+URLs never become entries. The reader counts every <loc> it saw (`locs`)
+and every entry it yielded (`yielded`) for coverage stats.
+
+Tags are matched in any namespace or none, like the
+`//*[local-name()='loc']` XPath used before. Entities are not resolved and
+nothing is fetched from the network. Malformed XML is recovered where lxml can;
+a corrupt gzip stream ends the iteration with what was read so far.
+"""
+
+from __future__ import annotations
+
+import logging
+import zlib
+from typing import Iterator, NamedTuple
+
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class SitemapEntry(NamedTuple):
+    loc: str
+    lastmod: str | None
+
+
+def _gunzip_chunks(body, chunk_size: int) -> Iterator[bytes]:
+    """Decompress a (possibly multi-member) gzip body, yielding at most `chunk_size` bytes at a time."""
+    view = memoryview(body)
+    pos = 0
+    decomp = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    pending = b""
+    while True:
+        if not pending:
+            if pos >= len(view):
+                return
+            pending = view[pos : pos + chunk_size]
+            pos += len(pending)
+        out = decomp.decompress(pending, chunk_size)
+        pending = decomp.unconsumed_tail
+        if out:
+            yield out
+        if decomp.eof:
+            rest = decomp.unused_data + bytes(view[pos:])
+            if not rest.startswith(_GZIP_MAGIC):
+                return
+            view, pos, pending = memoryview(rest), 0, b""
+            decomp = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+
+
+def _plain_chunks(body, chunk_size: int) -> Iterator[bytes]:
+    view = memoryview(body)
+    for pos in range(0, len(view), chunk_size):
+        yield view[pos : pos + chunk_size].tobytes()
+
+
+def _localname(tag) -> str:
+    if not isinstance(tag, str):  # comments, processing instructions
+        return ""
+    return tag.rsplit("}", 1)[-1]
+
+
+class SitemapReader:
+    """
+    Iterate (loc, lastmod) entries of a sitemap or sitemap index body.
+
+    `prefixes`: keep only locs starting with one of these. `exclude_extensions`:
+    drop locs ending with one of these (lower-cased comparison, e.g. ".pdf").
+    Gzip is detected from the body's magic bytes, not from the URL.
+    """
+
+    def __init__(self, body: bytes, *, prefixes=(), exclude_extensions=(), chunk_size: int = CHUNK_SIZE):
+        self.body = body or b""
+        self.prefixes = tuple(prefixes)
+        self.exclude_extensions = tuple(e.lower() for e in exclude_extensions)
+        self.chunk_size = chunk_size
+        self.gzipped = self.body[:2] == _GZIP_MAGIC
+        self.locs = 0
+        self.yielded = 0
+
+    def _keep(self, loc: str) -> bool:
+        if self.prefixes and not loc.startswith(self.prefixes):
+            return False
+        if self.exclude_extensions and loc.lower().endswith(self.exclude_extensions):
+            return False
+        return True
+
+    def _entries(self, parser) -> Iterator[SitemapEntry]:
+        for _, elem in parser.read_events():
+            loc = lastmod = None
+            for child in elem:
+                name = _localname(child.tag)
+                if name == "loc":
+                    loc = (child.text or "").strip()
+                elif name == "lastmod":
+                    lastmod = (child.text or "").strip() or None
+            # Drop the element and the already-read siblings before it: the tree stays a root and one entry.
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+            if not loc:
+                continue
+            self.locs += 1
+            if self._keep(loc):
+                self.yielded += 1
+                yield SitemapEntry(loc, lastmod)
+
+    def __iter__(self) -> Iterator[SitemapEntry]:
+        parser = etree.XMLPullParser(
+            events=("end",),
+            tag=("{*}url", "{*}sitemap"),
+            resolve_entities=False,
+            no_network=True,
+            recover=True,
+            huge_tree=True,
+        )
+        chunks = _gunzip_chunks if self.gzipped else _plain_chunks
+        try:
+            for chunk in chunks(self.body, self.chunk_size):
+                parser.feed(chunk)
+                yield from self._entries(parser)
+            parser.close()
+        except zlib.error as exc:
+            logger.warning("Sitemap: corrupt gzip stream after %d locs: %s", self.locs, exc)
+        except etree.XMLSyntaxError as exc:
+            logger.warning("Sitemap: XML error after %d locs: %s", self.locs, exc)
+        yield from self._entries(parser)
+
+
+def iter_sitemap(body: bytes, **kwargs) -> Iterator[SitemapEntry]:
+    """Shortcut for iter(SitemapReader(body, **kwargs)) when the counters are not needed."""
+    return iter(SitemapReader(body, **kwargs))
@@ -0,0 +1,146 @@
+"""
+HTTP validators (ETag / Last-Modified) and bodies from earlier runs, for conditional GETs.
+
+ConditionalGetMiddleware (middlewares.py) remembers, per URL, the ETag and
+Last-Modified of the last 200 response together with its body. On the next
+run it sends If-None-Match / If-Modified-Since for that URL. When the server
+answers 304 Not Modified, it hands the stored body to the spider in place of
+the empty 304. The server then sends a few hundred bytes of headers instead
+of the page, and the callback parses exactly what it parsed last time.
+
+Bodies are kept zlib-compressed, in memory and on disk. The state is one
+binary document per spider, written at spider close and loaded at spider open
+through the same backends as the recrawl state (recrawl_state.LocalStateFile,
+recrawl_state.KeyValueStoreState). Its layout is a magic header followed by
+one record per URL:
+
+    ">IHHHdI" lengths/seen_at, then url, etag, last_modified, content_type, body (zlib)
+
+Entries not seen for CONDITIONAL_GET_MAX_AGE_DAYS are dropped on save, and
+bodies above CONDITIONAL_GET_MAX_BODY_BYTES are not stored.
+"""
+
+from __future__ import annotations
+
+import logging
+import struct
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+STATS_PREFIX = "conditional_get"
+# Request.meta flags: the request carries our validators / must go out without any.
+CONDITIONAL_META = "conditional_get"
+DONT_REVALIDATE_META = "dont_revalidate"
+# Added to Response.flags of a 304 answered from the store.
+REVALIDATED_FLAG = "revalidated"
+
+_MAGIC = b"VST1"
+_RECORD = struct.Struct(">IHHHdI")
+
+
+def _header(headers, name: bytes) -> str | None:
+    value = headers.get(name)
+    return value.decode("latin-1") if value else None
+
+
+class ValidatorEntry:
+    __slots__ = ("etag", "last_modified", "content_type", "body_z", "seen_at")
+
+    def __init__(self, etag, last_modified, content_type, body_z, seen_at):
+        self.etag: str | None = etag
+        self.last_modified: str | None = last_modified
+        self.content_type: str | None = content_type
+        self.body_z: bytes = body_z
+        self.seen_at: float = seen_at
+
+    def body(self) -> bytes:
+        return zlib.decompress(self.body_z)
+
+
+class ValidatorStore:
+    def __init__(self, backend, *, max_age_s: float = 30 * 86400.0, max_body_bytes: int = 4 * 1024 * 1024):
+        self.backend = backend
+        self.max_age_s = float(max_age_s)
+        self.max_body_bytes = int(max_body_bytes)
+        self.entries: dict[str, ValidatorEntry] = {}
+
+    def get(self, url: str) -> ValidatorEntry | None:
+        return self.entries.get(url)
+
+    def put(self, url: str, headers, body: bytes, now: float | None = None) -> bool:
+        """Remember a 200 response's validators and body; False if it has no validator or is too large."""
+        etag = _header(headers, b"ETag")
+        last_modified = _header(headers, b"Last-Modified")
+        if not (etag or last_modified) or len(body) > self.max_body_bytes:
+            self.entries.pop(url, None)
+            return False
+        self.entries[url] = ValidatorEntry(
+            etag,
+            last_modified,
+            _header(headers, b"Content-Type"),
+            zlib.compress(body, 6),
+            time.time() if now is None else now,
+        )
+        return True
+
+    def touch(self, url: str, headers, now: float | None = None) -> None:
+        """A 304 confirmed the entry; take over refreshed validators if the server sent any."""
+        entry = self.entries[url]
+        entry.seen_at = time.time() if now is None else now
+        entry.etag = _header(headers, b"ETag") or entry.etag
+        entry.last_modified = _header(headers, b"Last-Modified") or entry.last_modified
+
+    def forget(self, url: str) -> None:
+        self.entries.pop(url, None)
+
+    # -- persistence ---------------------------------------------------------
+
+    def dumps(self, now: float | None = None) -> bytes:
+        now = time.time() if now is None else now
+        cutoff = now - self.max_age_s
+        parts = [_MAGIC]
+        for url, e in self.entries.items():
+            if e.seen_at < cutoff:
+                continue
+            fields = [(s or "").encode("utf-8") for s in (url, e.etag, e.last_modified, e.content_type)]
+            parts.append(_RECORD.pack(*(len(f) for f in fields), e.seen_at, len(e.body_z)))
+            parts.extend(fields)
+            parts.append(e.body_z)
+        return b"".join(parts)
+
+    def loads(self, data: bytes) -> int:
+        self.entries = {}
+        if not data:
+            return 0
+        if data[: len(_MAGIC)] != _MAGIC:
+            logger.warning("Validator state %s has an unknown format; starting empty", self.backend)
+            return 0
+        view = memoryview(data)
+        pos = len(_MAGIC)
+        try:
+            while pos < len(view):
+                n_url, n_etag, n_lm, n_ct, seen_at, n_body = _RECORD.unpack_from(view, pos)
+                pos += _RECORD.size
+                fields = []
+                for n in (n_url, n_etag, n_lm, n_ct):
+                    fields.append(bytes(view[pos : pos + n]).decode("utf-8") or None)
+                    pos += n
+                body_z = bytes(view[pos : pos + n_body])
+                pos += n_body
+                if len(body_z) != n_body:
+                    raise ValueError("truncated record")
+                self.entries[fields[0]] = ValidatorEntry(fields[1], fields[2], fields[3], body_z, seen_at)
+        except (struct.error, ValueError) as exc:
+            # Keep what was read before the damage.
+            logger.warning("Validator state %s is damaged after %d entries: %r", self.backend, len(self.entries), exc)
+        return len(self.entries)
+
+    def load(self) -> int:
+        return self.loads(self.backend.read() or b"")
+
+    def save(self, now: float | None = None) -> int:
+        data = self.dumps(now)
+        self.backend.write(data)
+        return len(data)
@@ -0,0 +1,125 @@
+"""Offline stand-ins for Apify/Scrapy objects, shared by the tests and the benchmarks."""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeStats:
+    """Minimal StatsCollector surface used by the pipeline and extensions."""
+
+    def __init__(self):
+        self._stats: dict = {}
+        self._lock = threading.Lock()
+
+    def get_value(self, key, default=None, spider=None):
+        return self._stats.get(key, default)
+
+    def set_value(self, key, value, spider=None):
+        with self._lock:
+            self._stats[key] = value
+
+    def inc_value(self, key, count=1, start=0, spider=None):
+        with self._lock:
+            self._stats[key] = self._stats.get(key, start) + count
+
+    def max_value(self, key, value, spider=None):
+        with self._lock:
+            self._stats[key] = max(self._stats.get(key, value), value)
+
+    def min_value(self, key, value, spider=None):
+        with self._lock:
+            self._stats[key] = min(self._stats.get(key, value), value)
+
+    def get_stats(self, spider=None):
+        return dict(self._stats)
+
+
+def fake_spider(name: str, settings: dict | None = None):
+    """A spider-shaped namespace with crawler.stats and crawler.settings."""
+    from scrapy.settings import Settings
+
+    crawler = SimpleNamespace(stats=FakeStats(), settings=Settings(settings or {}))
+    return SimpleNamespace(name=name, crawler=crawler)
+
+
+class FakeDatasetClient:
+    """
+    Stands in for `ApifyClient(...).dataset(id)`.
+
+    push_items() takes what the real client takes: a list of records, which it
+    serialises like the client does (so the JSON cost lands on the push
+    thread), or a JSON array string, which the client sends as-is. It then
+    sleeps for `latency_s` to model the HTTP round trip. Strings are decoded
+    for the accounting only when items/pushed_urls/push_times are read, since
+    the real client does no such work.
+    """
+
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.batches = 0
+        self.bytes = 0
+        self._items = 0
+        self._push_times: list[float] = []
+        self._pushed_urls: list[str] = []
+        self._unsettled: list = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _encode(items) -> bytes:
+        if isinstance(items, str):
+            return items.encode("utf-8")
+        return json.dumps(items, ensure_ascii=False).encode("utf-8")
+
+    def push_items(self, items) -> None:
+        payload = self._encode(items)
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        self._account(items, payload)
+
+    def _account(self, items, payload: bytes) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            self.batches += 1
+            self.bytes += len(payload)
+            self._unsettled.append((now, items))
+
+    def _settle(self) -> None:
+        with self._lock:
+            pending, self._unsettled = self._unsettled, []
+            for now, items in pending:
+                if isinstance(items, str):
+                    items = json.loads(items)
+                self._items += len(items)
+                self._push_times.extend([now] * len(items))
+                self._pushed_urls.extend(r.get("source_url", "") for r in items)
+
+    @property
+    def items(self) -> int:
+        self._settle()
+        return self._items
+
+    @property
+    def push_times(self) -> list[float]:
+        self._settle()
+        return self._push_times
+
+    @property
+    def pushed_urls(self) -> list[str]:
+        self._settle()
+        return self._pushed_urls
+
+
+class FakeAsyncDatasetClient(FakeDatasetClient):
+    """`ApifyClientAsync(...).dataset(id)`: the same accounting, with an awaitable round trip."""
+
+    async def push_items(self, items) -> None:
+        import asyncio
+
+        payload = self._encode(items)
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        self._account(items, payload)
@@ -0,0 +1,124 @@
+"""Per-callback latency/CPU histograms and the spider middleware that records them."""
+
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from scrapy import Request, Spider
+from scrapy.http import Response
+from scrapy.settings import Settings
+
+from sven_scraping_projects.callback_profile import CallbackProfile, LogHistogram, callback_name
+from sven_scraping_projects.middlewares import CallbackProfileMiddleware, RunValidationExtension
+from tests.fakes import FakeStats
+
+
+class _Spider(Spider):
+    name = "profiled"
+
+    def parse_listing(self, response):
+        for i in range(3):
+            yield Request(f"https://example.com/{i}", callback=self.parse_profile)
+
+    def parse_profile(self, response):
+        sum(range(20000))
+        yield {"url": response.url}
+
+
+class TestLogHistogram(unittest.TestCase):
+    def test_percentiles_within_one_bucket(self):
+        hist = LogHistogram()
+        for ms in range(1, 1001):
+            hist.add(ms)
+        for pct, exact in ((50, 500), (90, 900), (99, 990)):
+            self.assertLessEqual(abs(hist.percentile(pct) - exact) / exact, 0.1, pct)
+        self.assertEqual((hist.count, hist.max), (1000, 1000))
+        self.assertLess(len(hist.counts), 100)
+
+    def test_empty_and_zero(self):
+        hist = LogHistogram()
+        self.assertEqual(hist.percentile(50), 0.0)
+        hist.add(0)
+        self.assertEqual(hist.percentile(99), 0.0)
+
+
+class TestCallbackProfile(unittest.TestCase):
+    def test_callback_name(self):
+        spider = _Spider()
+        self.assertEqual(
+            callback_name(Request("https://example.com", callback=spider.parse_profile)), "_Spider.parse_profile"
+        )
+        self.assertEqual(callback_name(Request("https://example.com"), spider), "Spider.parse")
+
+    def test_publish_and_summary(self):
+        profile = CallbackProfile()
+        for ms in (10, 20, 30):
+            profile.add_download("S.parse", total_ms=ms * 2, slot_wait_ms=ms / 2, download_ms=ms)
+            profile.add_parse("S.parse", cpu_ms=ms / 10, items=2, requests=1)
+        stats = FakeStats()
+        profile.publish(stats)
+        self.assertEqual(stats.get_value("callback_profile/S.parse/responses"), 3)
+        self.assertEqual(stats.get_value("callback_profile/S.parse/items"), 6)
+        self.assertEqual(stats.get_value("callback_profile/S.parse/download_ms/max"), 30)
+        self.assertAlmostEqual(stats.get_value("callback_profile/S.parse/download_ms/p50"), 20, delta=2)
+        self.assertAlmostEqual(stats.get_value("callback_profile/S.parse/parse_cpu_s_total"), 0.006)
+        self.assertIn("S.parse[n=3 items=6 total=", profile.summary())
+
+
+class TestCallbackProfileMiddleware(unittest.TestCase):
+    def _middleware(self):
+        crawler = SimpleNamespace(
+            settings=Settings({"CALLBACK_PROFILE_ENABLED": True}),
+            stats=FakeStats(),
+            signals=SimpleNamespace(connect=lambda *a, **kw: None),
+        )
+        return CallbackProfileMiddleware.from_crawler(crawler), crawler
+
+    def _run(self, mw, spider, callback, url="https://example.com/"):
+        request = Request(url, callback=callback)
+        response = Response(url, request=request)
+
+        async def collect():
+            async def wrapped():
+                for out in callback(response):
+                    yield out
+
+            return [out async for out in mw.process_spider_output(response, wrapped(), spider)]
+
+        return asyncio.run(collect())
+
+    def test_counts_and_times_callbacks(self):
+        mw, crawler = self._middleware()
+        spider = _Spider()
+        mw.spider_opened(spider)
+        self.assertEqual(len(self._run(mw, spider, spider.parse_listing)), 3)
+        for _ in range(2):
+            self._run(mw, spider, spider.parse_profile)
+
+        listing = mw.profile.callbacks["_Spider.parse_listing"]
+        profile = mw.profile.callbacks["_Spider.parse_profile"]
+        self.assertEqual((listing.responses, listing.items, listing.requests), (1, 0, 3))
+        self.assertEqual((profile.responses, profile.items, profile.requests), (2, 2, 0))
+        self.assertGreater(profile.histograms["parse_cpu_ms"].total, 0)
+
+    def test_download_split_and_run_summary(self):
+        mw, crawler = self._middleware()
+        spider = _Spider()
+        mw.spider_opened(spider)
+        request = Request("https://example.com/1", callback=spider.parse_profile)
+        mw.request_scheduled(request, spider)
+        mw.request_reached_downloader(request, spider)
+        request.meta["download_latency"] = 0.0
+        mw.response_downloaded(Response(request.url), request, spider)
+        hist = mw.profile.callbacks["_Spider.parse_profile"].histograms
+        self.assertEqual((hist["total_ms"].count, hist["slot_wait_ms"].count, hist["download_ms"].count), (1, 1, 1))
+
+        self._run(mw, spider, spider.parse_profile)
+        ext = RunValidationExtension(SimpleNamespace(stats=crawler.stats, settings=Settings()))
+        with self.assertLogs("profiled", level="INFO") as logs:
+            ext.spider_closed(spider, "finished")
+        self.assertIn("callbacks(ms p50/p90/p99): _Spider.parse_profile[n=1 items=1", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
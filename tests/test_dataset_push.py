@@ -0,0 +1,350 @@
+"""Tests for record encoding, byte-sized push batching and the concurrent dataset push engines."""
+
+import asyncio
+import json
+import pickle
+import threading
+import time
+import unittest
+
+from sven_scraping_projects.dataset_push import (
+    AsyncPushEngine,
+    BatchSizeController,
+    ByteBatcher,
+    EncodedRecord,
+    PushBackpressure,
+    PushEngine,
+    encode_record,
+    iter_batches,
+    join_payload,
+    latency_bucket,
+    orjson,
+    payload_bytes,
+    record_bytes,
+    record_encoder,
+)
+from sven_scraping_projects.push_ledger import record_id
+from tests.fakes import FakeStats
+
+
+class _RecordingPush:
+    def __init__(self, delay_s=0.0, fail_on=None):
+        self.delay_s = delay_s
+        self.fail_on = fail_on
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.active_by_source = {}
+        self.max_active_by_source = {}
+        self.completed = []
+
+    def __call__(self, chunk, mode):
+        source = chunk[0]["source"]
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            n = self.active_by_source.get(source, 0) + 1
+            self.active_by_source[source] = n
+            self.max_active_by_source[source] = max(self.max_active_by_source.get(source, 0), n)
+        try:
+            # Later batches finish first unless the engine serialises them.
+            time.sleep(self.delay_s / (1 + chunk[0]["seq"] % 3))
+            if self.fail_on is not None and chunk[0]["seq"] == self.fail_on:
+                raise RuntimeError("push failed")
+            with self.lock:
+                self.completed.append((source, chunk[0]["seq"]))
+        finally:
+            with self.lock:
+                self.active -= 1
+                self.active_by_source[source] -= 1
+
+
+def _chunk(source, seq, size=3):
+    return [{"source": source, "seq": seq, "i": i} for i in range(size)]
+
+
+class TestPushEngine(unittest.TestCase):
+    def test_keeps_n_batches_in_flight(self):
+        push = _RecordingPush(delay_s=0.05)
+        stats = FakeStats()
+        engine = PushEngine(push, max_in_flight=4, stats=stats)
+        for seq in range(12):
+            engine.submit("zahnaerzte_hh", _chunk("zahnaerzte_hh", seq))
+        engine.drain()
+        engine.close()
+        self.assertEqual(push.max_active, 4)
+        self.assertEqual(len(push.completed), 12)
+        self.assertEqual(stats.get_value("pipeline/push/batches"), 12)
+        self.assertEqual(stats.get_value("pipeline/push/items"), 36)
+        self.assertEqual(stats.get_value("pipeline/push/in_flight_max"), 4)
+        self.assertGreater(stats.get_value("pipeline/push/bytes"), 0)
+        histogram = {k: v for k, v in stats.get_stats().items() if k.startswith("pipeline/push/latency_ms/")}
+        self.assertEqual(sum(histogram.values()), 12)
+
+    def test_preserve_order_serialises_each_source(self):
+        push = _RecordingPush(delay_s=0.02)
+        engine = PushEngine(push, max_in_flight=4, preserve_order=True)
+        for seq in range(6):
+            for source in ("uke", "kvhh"):
+                engine.submit(source, _chunk(source, seq))
+        engine.drain()
+        engine.close()
+        for source in ("uke", "kvhh"):
+            self.assertEqual(push.max_active_by_source[source], 1)
+            self.assertEqual([seq for s, seq in push.completed if s == source], list(range(6)))
+        # Sources still push in parallel.
+        self.assertEqual(push.max_active, 2)
+
+    def test_acknowledges_in_submit_order(self):
+        push = _RecordingPush(delay_s=0.03)
+        engine = PushEngine(push, max_in_flight=3)
+        engine.submit("uke", _chunk("uke", 0))
+        engine.submit("uke", _chunk("uke", 1))
+        # seq 1 finishes well before seq 0; it must not be counted until seq 0 is.
+        deadline = time.monotonic() + 1.0
+        while ("uke", 1) not in push.completed and time.monotonic() < deadline:
+            time.sleep(0.001)
+        self.assertNotIn(("uke", 0), push.completed)
+        self.assertEqual(engine.batches, 0)
+        engine.drain()
+        engine.close()
+        self.assertEqual((engine.batches, engine.items), (2, 6))
+
+    def test_push_error_is_raised(self):
+        push = _RecordingPush(delay_s=0.01, fail_on=2)
+        engine = PushEngine(push, max_in_flight=2)
+        with self.assertRaises(RuntimeError):
+            for seq in range(10):
+                engine.submit("asklepios", _chunk("asklepios", seq))
+            engine.drain()
+        engine.close()
+        self.assertLess(engine.batches, 10)
+
+    def test_latency_buckets(self):
+        self.assertEqual(latency_bucket(3), "le_50")
+        self.assertEqual(latency_bucket(50), "le_50")
+        self.assertEqual(latency_bucket(51), "le_100")
+        self.assertEqual(latency_bucket(60000), "gt_10000")
+
+
+class _AsyncRecordingPush(_RecordingPush):
+    async def __call__(self, chunk, mode):
+        source = chunk[0]["source"]
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        n = self.active_by_source.get(source, 0) + 1
+        self.active_by_source[source] = n
+        self.max_active_by_source[source] = max(self.max_active_by_source.get(source, 0), n)
+        try:
+            await asyncio.sleep(self.delay_s / (1 + chunk[0]["seq"] % 3))
+            if self.fail_on is not None and chunk[0]["seq"] == self.fail_on:
+                raise RuntimeError("push failed")
+            self.completed.append((source, chunk[0]["seq"]))
+        finally:
+            self.active -= 1
+            self.active_by_source[source] -= 1
+
+
+class TestAsyncPushEngine(unittest.TestCase):
+    def _run(self, push, submit, **kwargs):
+        async def main():
+            engine = AsyncPushEngine(push, loop=asyncio.get_running_loop(), **kwargs)
+            submit(engine)
+            # submit() never blocks: whatever is over the in-flight limit waits in the engine.
+            pending = engine.pending_items
+            await engine.drain(timeout=10)
+            engine.close()
+            return engine, pending
+
+        return asyncio.run(main())
+
+    def test_in_flight_limit_and_ordered_acks(self):
+        push = _AsyncRecordingPush(delay_s=0.03)
+        stats = FakeStats()
+        acked = []
+
+        def submit(engine):
+            for seq in range(12):
+                engine.submit("uke", _chunk("uke", seq), on_acked=lambda seq=seq: acked.append(seq))
+
+        engine, pending = self._run(push, submit, max_in_flight=4, stats=stats)
+        self.assertEqual(pending, 8 * 3)
+        self.assertEqual(push.max_active, 4)
+        # Later batches finish first; acknowledgements still follow submit order.
+        self.assertNotEqual([seq for _, seq in push.completed], list(range(12)))
+        self.assertEqual(acked, list(range(12)))
+        self.assertEqual((engine.batches, engine.items, engine.pending_items), (12, 36, 0))
+        self.assertEqual(stats.get_value("pipeline/push/in_flight_max"), 4)
+
+    def test_preserve_order_lets_other_sources_overtake(self):
+        push = _AsyncRecordingPush(delay_s=0.02)
+
+        def submit(engine):
+            for seq in range(4):
+                engine.submit("uke", _chunk("uke", seq))
+            engine.submit("kvhh", _chunk("kvhh", 0))
+
+        self._run(push, submit, max_in_flight=4, preserve_order=True)
+        self.assertEqual(push.max_active_by_source["uke"], 1)
+        self.assertEqual([seq for s, seq in push.completed if s == "uke"], [0, 1, 2, 3])
+        self.assertEqual(push.max_active, 2)
+
+    def test_push_error_is_raised_from_drain(self):
+        push = _AsyncRecordingPush(delay_s=0.01, fail_on=2)
+
+        def submit(engine):
+            for seq in range(10):
+                engine.submit("asklepios", _chunk("asklepios", seq))
+
+        with self.assertRaises(RuntimeError):
+            self._run(push, submit, max_in_flight=2)
+        self.assertLess(len(push.completed), 10)
+
+
+def _record(i, size):
+    return {"url": f"https://example.com/{i}", "career_highlights": "ü" * size}
+
+
+class TestRecordEncoding(unittest.TestCase):
+    RECORD = {
+        "full_name": "Dr. Jürgen Groß",
+        "career_highlights": 'Zitat: "Ärztin" \\ Tab\t \u2028 ✓',
+        "raw_source_fields": '{"a": 1}',
+        "lone_surrogate": "\ud800",
+    }
+
+    def test_payload_is_what_the_client_would_send(self):
+        encoded = encode_record(self.RECORD)
+        self.assertEqual(encoded, self.RECORD)
+        self.assertEqual(json.loads(encoded.payload)["full_name"], "Dr. Jürgen Groß")
+        self.assertEqual(record_bytes(encoded), len(encoded.payload))
+        # Compact separators: smaller than the client's own encoding.
+        self.assertLess(record_bytes(encoded), len(json.dumps(self.RECORD, ensure_ascii=False).encode("utf-8", "replace")))
+        self.assertEqual(pickle.loads(pickle.dumps(encoded)).payload, encoded.payload)
+
+    @unittest.skipUnless(orjson is not None, "orjson is not installed")
+    def test_orjson_and_json_write_the_same_bytes(self):
+        plain = {k: v for k, v in self.RECORD.items() if k != "lone_surrogate"}
+        self.assertEqual(
+            encode_record(plain, record_encoder("orjson")).payload, encode_record(plain, record_encoder("json")).payload
+        )
+        # orjson rejects lone surrogates; the json fallback escapes them.
+        self.assertEqual(encode_record(self.RECORD, record_encoder("orjson")), self.RECORD)
+
+    def test_joined_batch_is_valid_json_with_exact_size(self):
+        chunk = [encode_record(_record(i, i * 7)) for i in range(20)]
+        data = join_payload(chunk)
+        self.assertEqual(json.loads(data), [dict(r) for r in chunk])
+        self.assertEqual(len(data), payload_bytes(chunk))
+        self.assertEqual(join_payload([]), b"[]")
+
+    def test_record_id_is_computed_once(self):
+        encoded = encode_record(_record(1, 10))
+        rid = record_id(encoded)
+        self.assertEqual(encoded.rid, rid)
+        self.assertEqual(record_id(EncodedRecord.from_payload(encoded.payload)), rid)
+
+    def test_encoder_names(self):
+        self.assertIsNone(record_encoder("client"))
+        with self.assertRaises(ValueError):
+            record_encoder("ujson")
+
+
+class TestByteBatching(unittest.TestCase):
+    def test_batches_stay_under_target_and_report_exact_bytes(self):
+        controller = BatchSizeController(initial_bytes=20_000, min_bytes=1_000, max_payload_bytes=100_000)
+        stats = FakeStats()
+        batcher = ByteBatcher(controller, stats=stats)
+        batches = []
+        for i in range(200):
+            batches.extend(batcher.add(_record(i, 50 + (i * 37) % 900)))
+        batches.append(batcher.take("final"))
+        self.assertEqual(sum(len(b[0]) for b in batches), 200)
+        for records, nbytes, reason in batches:
+            self.assertEqual(nbytes, payload_bytes(records))
+            self.assertLessEqual(nbytes, controller.target)
+        self.assertEqual(stats.get_value("pipeline/push/flush_reason/final"), 1)
+        self.assertEqual(stats.get_value("pipeline/push/flush_reason/bytes"), len(batches) - 1)
+
+    def test_item_cap_and_interval(self):
+        batcher = ByteBatcher(BatchSizeController(), max_items=3, flush_interval_s=0.0)
+        ready = [b for i in range(7) for b in batcher.add({"i": i})]
+        self.assertEqual([len(r) for r, _, reason in ready], [3, 3])
+        self.assertEqual({reason for _, _, reason in ready}, {"items"})
+        self.assertTrue(batcher.due())
+        self.assertEqual(batcher.take("interval")[2], "interval")
+        self.assertIsNone(batcher.take("final"))
+
+    def test_oversized_record_is_sent_alone(self):
+        controller = BatchSizeController(initial_bytes=2_000, min_bytes=1_000, max_payload_bytes=5_000)
+        batcher = ByteBatcher(controller)
+        batcher.add(_record(0, 10))
+        ready = batcher.add(_record(1, 10_000))
+        self.assertEqual([(len(r), reason) for r, _, reason in ready], [(1, "bytes"), (1, "oversized")])
+
+    def test_controller_grows_when_fast_and_shrinks_when_slow(self):
+        stats = FakeStats()
+        c = BatchSizeController(
+            initial_bytes=100_000, min_bytes=10_000, max_payload_bytes=1_000_000, target_latency_ms=500, stats=stats
+        )
+        c.observe(100, 100_000)
+        self.assertEqual(c.target, 125_000)
+        # Small (interval) batches do not move the target.
+        c.observe(5_000, 1_000)
+        self.assertEqual(c.target, 125_000)
+        c.observe(1_500, 125_000)
+        self.assertEqual(c.target, 62_500)
+        for _ in range(100):
+            c.observe(10, c.target)
+        self.assertEqual(c.target, c.limit)
+        self.assertLess(c.limit, 1_000_000)
+        self.assertEqual(stats.get_value("pipeline/push/batch_bytes_target"), c.limit)
+        self.assertEqual(stats.get_value("pipeline/push/batch_bytes_target_min"), 62_500)
+
+    def test_iter_batches_preserves_records(self):
+        controller = BatchSizeController(initial_bytes=5_000, min_bytes=1_000)
+        records = [_record(i, i % 300) for i in range(500)]
+        batches = list(iter_batches(records, controller, reason="overflow"))
+        self.assertEqual([r for b, _, _ in batches for r in b], records)
+        self.assertEqual(batches[-1][2], "overflow")
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPushBackpressure(unittest.TestCase):
+    def test_pauses_at_high_and_resumes_at_low_watermark(self):
+        events = []
+        clock = _Clock()
+        stats = FakeStats()
+        bp = PushBackpressure(
+            lambda: events.append("pause"), lambda: events.append("resume"),
+            high_items=100, low_items=20, stats=stats, clock=clock,
+        )
+        for backlog in (10, 99, 100, 150, 60, 21):
+            bp.check(backlog)
+            clock.now += 1.0
+        self.assertEqual(events, ["pause"])
+        self.assertTrue(bp.paused)
+        bp.check(20)
+        self.assertEqual(events, ["pause", "resume"])
+        bp.check(99)
+        clock.now += 2.0
+        bp.check(120)
+        clock.now += 0.5
+        bp.release()
+        bp.release()
+        self.assertEqual(events, ["pause", "resume", "pause", "resume"])
+        self.assertEqual(stats.get_value("pipeline/push/backpressure/pauses"), 2)
+        self.assertEqual(stats.get_value("pipeline/push/backpressure/paused_seconds"), 4.5)
+        self.assertEqual(stats.get_value("pipeline/push/backpressure/pause_seconds_max"), 4.0)
+        self.assertEqual(stats.get_value("pipeline/push/backpressure/backlog_max"), 120)
+
+
+if __name__ == "__main__":
+    unittest.main()
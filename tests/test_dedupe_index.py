@@ -0,0 +1,134 @@
+"""Tests for the compact duplicate-key index and the pipeline's duplicate policies."""
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+from sven_scraping_projects.dedupe_index import BloomHashIndex, SortedHashIndex, open_key_index
+from sven_scraping_projects.pipelines import ApifyPipeline
+from tests.fakes import fake_spider
+
+
+def _url(i):
+    return f"https://www.kvhh.net/de/arztsuche/profil/{i}.html"
+
+
+class TestKeyIndex(unittest.TestCase):
+    def test_sorted_index_is_exact_and_compact(self):
+        index = SortedHashIndex(merge_every=64)
+        for i in range(5000):
+            self.assertTrue(index.add(_url(i)))
+        self.assertFalse(index.add(_url(17)))
+        self.assertIn(_url(4999), index)
+        self.assertNotIn(_url(5000), index)
+        self.assertEqual(len(index), 5000)
+        # 8 bytes per hash in the array, plus its spare capacity and the hashes not merged yet.
+        self.assertLessEqual(index.memory_bytes() / len(index), 9)
+
+    def test_sorted_merge_keeps_one_sorted_copy_of_each_hash(self):
+        rng = random.Random(7)
+        hashes = [rng.getrandbits(64) for _ in range(3000)]
+        index = SortedHashIndex(merge_every=16)
+        for h in hashes[:2000]:
+            index.add_hash(h)
+        # A log kept after the snapshot by a crash replays hashes the array already has.
+        index._replay(hashes[1500:])
+        self.assertEqual(index._sorted.tolist(), sorted(set(hashes)))
+
+    def test_sorted_index_reports_the_set_at_its_real_cost(self):
+        index = SortedHashIndex(merge_every=10_000)
+        for i in range(1000):
+            index.add(_url(i))
+        # Not merged yet: each hash is a set slot plus a 64-bit int object, far more than 8 bytes.
+        self.assertGreater(index.memory_bytes() / len(index), 8 + sys.getsizeof(1 << 63))
+        before = index.memory_bytes()
+        index._merge()
+        self.assertEqual(len(index), 1000)
+        self.assertLess(index.memory_bytes(), before / 4)
+
+    def test_bloom_false_positive_rate(self):
+        index = BloomHashIndex(capacity=10_000, fp_rate=0.01)
+        for i in range(10_000):
+            index.add(_url(i))
+        self.assertTrue(all(_url(i) in index for i in range(10_000)))
+        false_positives = sum(_url(i) in index for i in range(10_000, 30_000))
+        self.assertLess(false_positives / 20_000, 0.02)
+        self.assertLess(index.memory_bytes() / 10_000, 2)
+        self.assertFalse(index.saturated)
+
+    def test_persisted_across_restart(self):
+        for kind in ("sorted", "bloom"):
+            with self.subTest(kind=kind), tempfile.TemporaryDirectory() as tmp:
+                index = open_key_index(tmp, kind=kind, capacity=1000)
+                for i in range(100):
+                    index.add(_url(i))
+                index.close()
+                # Keys added after the snapshot live only in the log (crash before close()).
+                index = open_key_index(tmp, kind=kind, capacity=1000)
+                self.assertEqual(index.recovered, 100)
+                index.add(_url(100))
+                # Log writes are batched; a merge, every _LOG_FLUSH_EVERY hashes or close() flushes them.
+                self.assertEqual(os.path.getsize(os.path.join(tmp, "keys.log")), 0)
+                index._flush_log()
+                with open(os.path.join(tmp, "keys.log"), "ab") as fh:
+                    fh.write(b"\x01\x02\x03")
+
+                index = open_key_index(tmp, kind=kind, capacity=1000)
+                self.assertEqual(index.recovered, 101)
+                self.assertTrue(all(_url(i) in index for i in range(101)))
+                index.close()
+
+
+def _pipeline(settings):
+    spider = fake_spider("kvhh", settings)
+    p = ApifyPipeline()
+    p._apify_available = False
+    p._open_key_index(spider, spider.crawler.settings, spider.crawler.stats)
+    return p, spider
+
+
+class TestDuplicatePolicy(unittest.TestCase):
+    def _run(self, policy, jobdir=None):
+        settings = {"APIFY_DUPLICATE_KEY_POLICY": policy}
+        if jobdir:
+            settings["JOBDIR"] = jobdir
+        p, spider = _pipeline(settings)
+        for item in (
+            {"url": _url(1), "name": "A"},
+            {"url": _url(2), "name": "B"},
+            {"url": _url(1), "name": "A"},
+            {"url": _url(1), "name": "A (neue Praxis)"},
+        ):
+            p.process_item(item, spider)
+        p._close_key_index(spider.crawler.stats)
+        return [r["name"] for r in p.items], spider.crawler.stats
+
+    def test_count_pushes_everything(self):
+        names, stats = self._run("count")
+        self.assertEqual(names, ["A", "B", "A", "A (neue Praxis)"])
+        self.assertEqual(stats.get_value("pipeline/duplicate_key_count"), 2)
+
+    def test_drop(self):
+        names, stats = self._run("drop")
+        self.assertEqual(names, ["A", "B"])
+        self.assertEqual(stats.get_value("pipeline/duplicate_key_dropped"), 2)
+
+    def test_merge_keeps_changed_versions_only(self):
+        names, stats = self._run("merge")
+        self.assertEqual(names, ["A", "B", "A (neue Praxis)"])
+        self.assertEqual(stats.get_value("pipeline/duplicate_key_updated"), 1)
+
+    def test_resumed_crawl_detects_keys_from_before_the_restart(self):
+        with tempfile.TemporaryDirectory() as jobdir:
+            self._run("drop", jobdir)
+            p, spider = _pipeline({"APIFY_DUPLICATE_KEY_POLICY": "drop", "JOBDIR": jobdir})
+            p.process_item({"url": _url(2), "name": "B"}, spider)
+            p.process_item({"url": _url(3), "name": "C"}, spider)
+            self.assertEqual([r["name"] for r in p.items], ["C"])
+            self.assertEqual(spider.crawler.stats.get_value("pipeline/dedupe/keys_recovered"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""Tests for cross-source entity resolution on synthetic duplicates."""
+
+import unittest
+
+from benchmarks.bench_entity_resolution import pairwise_quality, synthetic_people
+from sven_scraping_projects.entity_resolution import normalize_name, phone_numbers, resolve
+
+
+def _person(source, i, **fields):
+    rec = {"source": source, "source_url": f"https://{source}.example/{i}", "entity_type": "person"}
+    rec.update(fields)
+    return rec
+
+
+class TestEntityResolution(unittest.TestCase):
+    def test_normalisation(self):
+        self.assertEqual(normalize_name("Müller-Lüdenscheidt"), "muellerluedenscheidt")
+        self.assertEqual(normalize_name("Çelik"), "celik")
+        self.assertEqual(phone_numbers("+49 (40) 7410-0"), frozenset({"04074100"}))
+        self.assertEqual(phone_numbers("040 / 741 00, 0049 40 555 123"), frozenset({"04074100", "040555123"}))
+
+    def test_clusters_cross_source_duplicates(self):
+        records = [
+            _person("kvhh", 1, first_name="Jörg", last_name="Müller", postal_code="20246", phone="040 / 123 456"),
+            _person("uke", 2, first_name="J.", last_name="Mueller", phone="+49 40 123456", email="j.mueller@uke.de"),
+            _person("asklepios", 3, first_name="Jörg", last_name="Müller", email="j.mueller@uke.de"),
+            # Same name, different practice and phone: a different person.
+            _person("kvhh", 4, first_name="Jörg", last_name="Müller", postal_code="22143", phone="040 999 999"),
+            _person("uke", 5, first_name="Anna", last_name="Schmidt", email="a.schmidt@uke.de"),
+            {"source": "apothekerkammer-hamburg", "source_url": "https://a.example/1", "entity_type": "organization",
+             "last_name": "Müller", "phone": "040 123 456"},
+        ]
+        result = resolve(records)
+        ids = result.cluster_ids
+        self.assertEqual(ids[0], ids[1])
+        self.assertEqual(ids[1], ids[2])
+        self.assertEqual(len({ids[0], ids[3], ids[4], ids[5]}), 4)
+        self.assertEqual(len(result.clusters), 1)
+        summary = result.clusters[0]
+        self.assertEqual(summary["size"], 3)
+        self.assertEqual(summary["sources"], ["asklepios", "kvhh", "uke"])
+        # Cluster IDs depend only on the members, not on record order.
+        self.assertEqual(resolve(list(reversed(records))).cluster_ids[::-1], ids)
+
+    def test_oversized_blocks_are_skipped(self):
+        records = [_person("uke", i, last_name=f"{chr(65 + i % 26)}{chr(97 + i // 26)}son", email=f"x{i}@uke.de") for i in range(30)]
+        result = resolve(records, max_block_size=10)
+        self.assertEqual(result.stats["blocks_skipped"], 1)
+        self.assertEqual(result.stats["pairs_scored"], 0)
+
+    def test_synthetic_duplicates(self):
+        records, truth = synthetic_people(3000, dup_fraction=0.4, seed=7)
+        result = resolve(records)
+        precision, recall = pairwise_quality(result.cluster_ids, truth)
+        self.assertGreater(precision, 0.97)
+        self.assertGreater(recall, 0.95)
+
+
+if __name__ == "__main__":
+    unittest.main()
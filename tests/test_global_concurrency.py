@@ -0,0 +1,117 @@
+"""Process-wide in-flight cap (GlobalLimitDownloader) with two spiders crawling at once."""
+
+import json
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+_ROOT = Path(__file__).resolve().parent.parent
+
+# Runs in a fresh interpreter: the Twisted reactor cannot be restarted inside the test process.
+_CRAWL = r"""
+import json, time
+from urllib.parse import urlparse
+
+import scrapy
+from scrapy.crawler import CrawlerRunner
+from scrapy.http import HtmlResponse
+from scrapy.utils.defer import maybe_deferred_to_future
+
+LIMIT = 2
+LATENCY_S = 0.05
+state = {"active": 0, "active_max": 0, "started": {"delayed": [], "fast": []}, "done": {}}
+
+
+class FakeHandler:
+    lazy = False
+
+    def __init__(self, crawler=None):
+        pass
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    async def download_request(self, request):
+        state["started"][urlparse(request.url).netloc].append(time.monotonic())
+        state["active"] += 1
+        state["active_max"] = max(state["active_max"], state["active"])
+        try:
+            await maybe_deferred_to_future(task.deferLater(reactor, LATENCY_S, lambda: None))
+        finally:
+            state["active"] -= 1
+        return HtmlResponse(request.url, body=b"<html></html>", request=request)
+
+    async def close(self):
+        pass
+
+
+class Spider(scrapy.Spider):
+    n = 0
+
+    async def start(self):
+        for i in range(self.n):
+            yield scrapy.Request(f"fake://{self.name}/{i}", dont_filter=True)
+
+    def parse(self, response):
+        pass
+
+    def closed(self, reason):
+        state["done"][self.name] = time.monotonic() - started
+
+
+class Delayed(Spider):
+    name = "delayed"
+    n = 4
+    custom_settings = {"DOWNLOAD_DELAY": 0.4, "RANDOMIZE_DOWNLOAD_DELAY": False}
+
+
+class Fast(Spider):
+    name = "fast"
+    n = 20
+
+
+settings = {
+    "DOWNLOADER": "sven_scraping_projects.middlewares.GlobalLimitDownloader",
+    "CONCURRENT_REQUESTS_GLOBAL": LIMIT,
+    "CONCURRENT_REQUESTS": 8,
+    "CONCURRENT_REQUESTS_PER_DOMAIN": 8,
+    "DOWNLOAD_HANDLERS": {"fake": "__main__.FakeHandler"},
+    "TWISTED_REACTOR": "twisted.internet.asyncioreactor.AsyncioSelectorReactor",
+    "LOG_ENABLED": False,
+    "TELNETCONSOLE_ENABLED": False,
+    "ROBOTSTXT_OBEY": False,
+}
+from scrapy.utils.reactor import install_reactor
+install_reactor(settings["TWISTED_REACTOR"])
+from twisted.internet import reactor, task
+
+runner = CrawlerRunner(settings)
+started = time.monotonic()
+# The delayed spider starts first, so its queued requests would take the tokens.
+runner.crawl(Delayed)
+runner.crawl(Fast)
+runner.join().addBoth(lambda _: reactor.stop())
+reactor.run()
+fast = state["started"]["fast"]
+print(json.dumps({"active_max": state["active_max"], "fast_window_s": fast[-1] - fast[0] + LATENCY_S, "done": state["done"]}))
+"""
+
+
+class TestGlobalLimitDownloader(unittest.TestCase):
+    def test_delayed_spider_does_not_hold_the_cap(self):
+        out = subprocess.run(
+            [sys.executable, "-c", _CRAWL], capture_output=True, text=True, timeout=120, check=True, cwd=_ROOT
+        ).stdout
+        state = json.loads(out.strip().splitlines()[-1])
+        self.assertEqual(set(state["done"]), {"delayed", "fast"})
+        self.assertLessEqual(state["active_max"], 2)
+        # 20 downloads of 0.05 s on both tokens take 0.5 s. When the delayed spider's requests
+        # held a token while waiting out DOWNLOAD_DELAY, the fast one was left one token: 1.5 s.
+        self.assertLess(state["fast_window_s"], 0.9)
+        self.assertLess(state["done"]["fast"], state["done"]["delayed"])
+
+
+if __name__ == "__main__":
+    unittest.main()
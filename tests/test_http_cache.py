@@ -0,0 +1,171 @@
+"""Packed HTTP cache: the file format, record/replay storage modes and the Actor input mapping."""
+
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from scrapy import Request
+from scrapy.http import HtmlResponse, TextResponse
+from scrapy.settings import Settings
+from scrapy.utils.request import RequestFingerprinter
+
+from src.main import _http_cache_settings
+from sven_scraping_projects import http_cache
+from sven_scraping_projects.http_cache import CacheFormatError, PackedCache, PackedCacheStorage
+
+URL = "https://www.kvhh.net/de/arztsuche/net-kvhh-physician-{}"
+BODY = "<html><h1>Dr. Jürgen Beispiel</h1>{}</html>"
+
+
+class _Spider:
+    name = "kvhh"
+
+    def __init__(self):
+        self.crawler = SimpleNamespace(request_fingerprinter=RequestFingerprinter())
+        self.logger = SimpleNamespace(info=lambda *a: None, warning=lambda *a: None)
+
+
+def _fp(n):
+    return RequestFingerprinter().fingerprint(Request(URL.format(n)))
+
+
+class TestPackedCache(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "kvhh.httpcache")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _fill(self, n, codec="auto"):
+        cache = PackedCache(self.path, codec=codec)
+        for i in range(n):
+            cache.put(_fp(i), URL.format(i), 200, b"Content-Type: text/html", BODY.format(i).encode(), now=1.0)
+        return cache
+
+    def test_round_trip_through_the_index(self):
+        cache = self._fill(50)
+        self.assertEqual(cache.get(_fp(3))[1:], (URL.format(3), 200, b"Content-Type: text/html", BODY.format(3).encode()))
+        cache.close()
+
+        reopened = PackedCache(self.path, writable=False)
+        self.assertFalse(reopened.recovered)
+        self.assertEqual(len(reopened), 50)
+        self.assertEqual(reopened.get(_fp(49))[4], BODY.format(49).encode())
+        self.assertIsNone(reopened.get(_fp(50)))
+        reopened.close()
+
+        # Appending writes the index again; nothing before it is lost.
+        cache = PackedCache(self.path)
+        cache.put(_fp(50), URL.format(50), 404, b"", b"", now=2.0)
+        cache.close()
+        reopened = PackedCache(self.path, writable=False)
+        self.assertEqual(len(reopened), 51)
+        self.assertEqual(reopened.get(_fp(50))[:3], (2.0, URL.format(50), 404))
+        self.assertEqual(reopened.get(_fp(0))[4], BODY.format(0).encode())
+
+    def test_killed_run_is_recovered_by_scanning(self):
+        cache = self._fill(20)
+        cache._fh.flush()
+        size = os.path.getsize(self.path)
+        cache._fh.close()
+        with open(self.path, "r+b") as fh:
+            fh.truncate(size - 5)  # torn last record, no index
+        with self.assertLogs("sven_scraping_projects.http_cache", level="WARNING"):
+            cache = PackedCache(self.path)
+        self.assertTrue(cache.recovered)
+        self.assertEqual(len(cache), 19)
+        self.assertIsNone(cache.get(_fp(19)))
+        cache.put(_fp(19), URL.format(19), 200, b"", b"again")
+        cache.close()
+        self.assertEqual(PackedCache(self.path, writable=False).get(_fp(19))[4], b"again")
+
+    def test_not_a_cache_file(self):
+        with open(self.path, "wb") as fh:
+            fh.write(b"<html></html>")
+        with self.assertRaises(CacheFormatError):
+            PackedCache(self.path)
+
+    @unittest.skipUnless(http_cache.zstandard is not None, "zstandard is not installed")
+    def test_zstd_and_zlib_records_mix(self):
+        cache = self._fill(2, codec="zlib")
+        cache.close()
+        cache = PackedCache(self.path, codec="zstd")
+        cache.put(_fp(2), URL.format(2), 200, b"", b"zstd body")
+        self.assertEqual([cache.get(_fp(n))[4][:4] for n in range(3)], [b"<htm", b"<htm", b"zstd"])
+        cache.close()
+
+
+class TestPackedCacheStorage(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _storage(self, mode, **extra):
+        storage = PackedCacheStorage(
+            Settings({"HTTPCACHE_DIR": self._tmp.name, "HTTPCACHE_MODE": mode, **extra})
+        )
+        storage.open_spider(_Spider())
+        return storage
+
+    def test_record_then_replay(self):
+        spider = _Spider()
+        request = Request(URL.format(1))
+        response = HtmlResponse(
+            URL.format(1), body=BODY.format(1).encode(), headers={"Content-Type": "text/html; charset=utf-8"}
+        )
+        recorder = self._storage("record")
+        recorder.store_response(spider, request, response)
+        # Record mode always goes to the network.
+        self.assertIsNone(recorder.retrieve_response(spider, request))
+        recorder.close_spider(spider)
+
+        replayer = self._storage("replay")
+        cached = replayer.retrieve_response(spider, Request(URL.format(1)))
+        self.assertIsInstance(cached, HtmlResponse)
+        self.assertEqual((cached.status, cached.url), (200, URL.format(1)))
+        self.assertEqual(cached.css("h1::text").get(), "Dr. Jürgen Beispiel")
+        self.assertIsNone(replayer.retrieve_response(spider, Request(URL.format(2))))
+        replayer.store_response(spider, Request(URL.format(2)), TextResponse(URL.format(2), body=b"x"))
+        replayer.close_spider(spider)
+        self.assertEqual(len(PackedCache(replayer.cache.path, writable=False)), 1)
+
+    def test_replay_without_a_recording_and_expiry(self):
+        spider = _Spider()
+        replayer = self._storage("replay")
+        self.assertIsNone(replayer.cache)
+        self.assertIsNone(replayer.retrieve_response(spider, Request(URL.format(1))))
+
+        storage = self._storage("", HTTPCACHE_EXPIRATION_SECS=60)
+        storage.cache.put(_fp(1), URL.format(1), 200, b"", b"old", now=1.0)
+        self.assertIsNone(storage.retrieve_response(spider, Request(URL.format(1))))
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            PackedCacheStorage(Settings({"HTTPCACHE_DIR": self._tmp.name, "HTTPCACHE_MODE": "sometimes"}))
+
+
+class TestHttpCacheInput(unittest.TestCase):
+    def test_input_mapping(self):
+        settings = Settings({"HTTPCACHE_ENABLED": False, "RECRAWL_ENABLED": True, "CONDITIONAL_GET_ENABLED": True})
+        self.assertIsNone(_http_cache_settings(None, settings))
+        self.assertIsNone(_http_cache_settings("sometimes", settings))
+        self.assertFalse(settings.getbool("HTTPCACHE_ENABLED"))
+
+        self.assertEqual(_http_cache_settings("record", settings), "record")
+        self.assertTrue(settings.getbool("HTTPCACHE_ENABLED"))
+        self.assertTrue(settings.getbool("RECRAWL_ENABLED"))
+
+        self.assertEqual(_http_cache_settings({"mode": "Replay", "dir": "/tmp/c", "codec": "zlib"}, settings), "replay")
+        self.assertEqual(settings.get("HTTPCACHE_DIR"), "/tmp/c")
+        self.assertEqual(settings.get("HTTPCACHE_CODEC"), "zlib")
+        self.assertTrue(settings.getbool("HTTPCACHE_IGNORE_MISSING"))
+        self.assertFalse(settings.getbool("RECRAWL_ENABLED"))
+        self.assertFalse(settings.getbool("CONDITIONAL_GET_ENABLED"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+"""Per-spider memory accounting, spider-boundary ledger and leak flagging."""
+
+import tracemalloc
+import unittest
+from types import SimpleNamespace
+
+from scrapy import Spider
+from scrapy.exceptions import NotConfigured
+from scrapy.settings import Settings
+
+from sven_scraping_projects.memory_accounting import (
+    MB,
+    MemoryLedger,
+    MemorySample,
+    SpiderMemory,
+    format_boundary,
+    top_allocation_sites,
+)
+from sven_scraping_projects.middlewares import MemoryAccountingExtension, RunValidationExtension
+from tests.fakes import FakeStats
+
+# Stands in for pipeline state that close_spider forgot to release.
+_leaked = []
+
+
+class TestSpiderMemory(unittest.TestCase):
+    def test_retained_prefers_traced_heap(self):
+        report = SpiderMemory("uke", MemorySample(rss=100 * MB, traced=10 * MB))
+        report.observe(MemorySample(rss=180 * MB, traced=60 * MB))
+        report.close(MemorySample(rss=170 * MB, traced=12 * MB), traced_peak=60 * MB, top_sites=["x.py:1 +1 KiB"])
+        # RSS stays up after the peak (pymalloc keeps arenas); the heap shows what is really held.
+        self.assertEqual(report.retained, 2 * MB)
+        self.assertEqual(report.summary(), "start=100 peak=180 end=170 retained=+2.0 heap_peak=60")
+        stats = FakeStats()
+        report.publish(stats)
+        self.assertEqual(stats.get_value("memory/rss_peak_mb"), 180.0)
+        self.assertEqual(stats.get_value("memory/top_sites"), ["x.py:1 +1 KiB"])
+
+        rss_only = SpiderMemory("kvhh", MemorySample(rss=100 * MB))
+        rss_only.close(MemorySample(rss=150 * MB))
+        self.assertEqual(rss_only.retained, 50 * MB)
+
+    def test_top_allocation_sites(self):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            held = [bytes(1024) for _ in range(2000)]
+            sites = top_allocation_sites(before, tracemalloc.take_snapshot(), limit=3)
+        finally:
+            tracemalloc.stop()
+        self.assertTrue(sites[0].startswith("test_memory_accounting.py:"), sites)
+        self.assertLessEqual(len(sites), 3)
+        del held
+
+    def test_ledger_boundaries(self):
+        ledger = MemoryLedger()
+        first = ledger.boundary("before first scraper")
+        second = ledger.boundary("after 'uke'")
+        self.assertEqual(first.delta, 0)
+        self.assertEqual(second.total_delta, second.delta)
+        self.assertIn("Memory after 'uke': rss=", format_boundary(second))
+
+
+class TestMemoryAccountingExtension(unittest.TestCase):
+    def tearDown(self):
+        _leaked.clear()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def test_flags_memory_held_after_close(self):
+        crawler = SimpleNamespace(
+            settings=Settings(
+                {
+                    "MEMORY_ACCOUNTING_ENABLED": True,
+                    "MEMORY_TRACEMALLOC": True,
+                    "MEMORY_LEAK_THRESHOLD_MB": 1,
+                    "LOGSTATS_INTERVAL": 0,
+                }
+            ),
+            stats=FakeStats(),
+            signals=SimpleNamespace(connect=lambda *a, **kw: None),
+        )
+        ext = MemoryAccountingExtension.from_crawler(crawler)
+        spider = Spider(name="leaky")
+        ext.spider_opened(spider)
+        _leaked.extend(bytes(1024) for _ in range(4096))
+        with self.assertLogs("leaky", level="WARNING") as logs:
+            ext.spider_closed(spider, "finished")
+        self.assertIn("Memory not released after close_spider", logs.output[0])
+        self.assertTrue(crawler.stats.get_value("memory/leak_suspected"))
+        self.assertGreaterEqual(crawler.stats.get_value("memory/retained_mb"), 4.0)
+        self.assertTrue(crawler.stats.get_value("memory/top_sites")[0].startswith("test_memory_accounting.py:"))
+
+        validation = RunValidationExtension(SimpleNamespace(stats=crawler.stats, settings=Settings()))
+        with self.assertLogs("leaky", level="INFO") as logs:
+            validation.spider_closed(spider, "finished")
+        self.assertIn(" memory(MB): start=", logs.output[0])
+
+    def test_disabled(self):
+        crawler = SimpleNamespace(settings=Settings({"MEMORY_ACCOUNTING_ENABLED": False}))
+        with self.assertRaises(NotConfigured):
+            MemoryAccountingExtension.from_crawler(crawler)
+
+
+if __name__ == "__main__":
+    unittest.main()
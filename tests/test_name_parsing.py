@@ -0,0 +1,105 @@
+"""Unified title/name parser: behaviour, and equivalence with the parsers it replaced."""
+
+import itertools
+import unittest
+
+from benchmarks.bench_name_parsing import (
+    _LEGACY_ACADEMIC_TITLES,
+    _LEGACY_DENTAL_TITLES,
+    _LEGACY_KVHH_TITLES,
+    legacy_extract_academic_titles_left,
+    legacy_parse_dentist_name,
+    legacy_parse_doctor_name,
+    legacy_parse_person_name,
+)
+from sven_scraping_projects.pipelines import _extract_academic_titles_left, _normalize_academic_titles_for_person
+from sven_scraping_projects.spiders.kvhh import parse_doctor_name
+from sven_scraping_projects.spiders.zahnaerzte_hh import parse_dentist_name
+from sven_scraping_projects.utils.name_parsing import ACADEMIC_TITLES, parse_person_name, split_academic_titles
+
+_NAMES = ("Anna Schmidt", "Jörg von Hoff", "Hanna-Lena Meyer-Stein", "Özdemir")
+
+
+def _longest_first_correct(title, legacy_titles):
+    """The legacy first-match scan returns `title` only if no shorter listed title comes first."""
+    if title not in legacy_titles:
+        return False
+    for t in legacy_titles:
+        if title.startswith(t):
+            return t == title
+    return False
+
+
+class TestUnifiedParser(unittest.TestCase):
+    def test_longest_title_wins_and_stacks(self):
+        self.assertEqual(split_academic_titles("Dr. med. dent. Anna Schmidt"), (("Dr. med. dent.",), "Anna Schmidt"))
+        self.assertEqual(
+            split_academic_titles("Prof. Dr. med.,  Dipl.-Psych. Jan Ott"),
+            (("Prof. Dr. med.", "Dipl.-Psych."), "Jan Ott"),
+        )
+        # A title must end on a boundary: "Dr. medicus" is "Dr." + "medicus", not "Dr. med." + "icus".
+        self.assertEqual(split_academic_titles("Drago Petrović"), ((), "Drago Petrović"))
+        self.assertEqual(split_academic_titles("Dr. medicus Ott"), (("Dr.",), "medicus Ott"))
+
+    def test_kvhh_title_order_bug_is_fixed(self):
+        self.assertEqual(
+            parse_doctor_name("Dr. med. dent. Anna Schmidt"),
+            {"title": "Dr. med. dent.", "first_name": "Anna", "last_name": "Schmidt"},
+        )
+        self.assertEqual(legacy_parse_doctor_name("Dr. med. dent. Anna Schmidt")["first_name"], "dent.")
+
+    def test_salutation_and_whitespace(self):
+        self.assertEqual(
+            parse_person_name("  herr   PD Dr. med.\tJan  von Hoff "),
+            {"title": "PD Dr. med.", "first_name": "Jan", "last_name": "von Hoff", "name": "PD Dr. med. Jan von Hoff"},
+        )
+        self.assertEqual(parse_person_name(None)["name"], "")
+
+    def test_cache_returns_fresh_dicts(self):
+        a = parse_person_name("Dr. Anna Schmidt")
+        a["first_name"] = "changed"
+        self.assertEqual(parse_person_name("Dr. Anna Schmidt")["first_name"], "Anna")
+
+
+class TestEquivalence(unittest.TestCase):
+    """Where the old parsers were right, the unified one must agree with them."""
+
+    def _cases(self, legacy_titles, salutations):
+        titles = [""] + [t for t in ACADEMIC_TITLES if _longest_first_correct(t, legacy_titles)]
+        for salutation, title, name in itertools.product(salutations, titles, _NAMES):
+            yield " ".join(p for p in (salutation, title, name) if p)
+
+    def test_parse_person_name(self):
+        for raw in self._cases(_LEGACY_ACADEMIC_TITLES, ("", "Frau", "Herr")):
+            self.assertEqual(parse_person_name(raw), legacy_parse_person_name(raw), raw)
+
+    def test_parse_doctor_name(self):
+        for raw in self._cases(_LEGACY_KVHH_TITLES, ("",)):
+            self.assertEqual(parse_doctor_name(raw), legacy_parse_doctor_name(raw), raw)
+
+    def test_parse_dentist_name(self):
+        for raw in self._cases(_LEGACY_DENTAL_TITLES, ("", "Frau", "Herr")):
+            self.assertEqual(parse_dentist_name(raw), legacy_parse_dentist_name(raw), raw)
+
+    def test_pipeline_title_extraction(self):
+        samples = [
+            "Prof. Dr. med. Anna Schmidt",
+            "Dr. med., Dipl.-Psych. Jan Ott",
+            "apl. Prof. Dr. med. Jörg von Hoff",
+            "Univ.-Prof. Dr.;Hanna Meyer",
+            "Dr.",
+            "Dr.med. Ott",
+            "Med. pract. Özdemir",
+            "Anna Schmidt",
+            "",
+        ]
+        for raw in samples:
+            self.assertEqual(_extract_academic_titles_left(raw), legacy_extract_academic_titles_left(raw), raw)
+        self.assertEqual(
+            _normalize_academic_titles_for_person("Frau Dr. med. Anna Schmidt", "", "", "", "Oberärztin"),
+            ("Anna Schmidt", "", "", "Dr. med.", "Dr. med., Oberärztin"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
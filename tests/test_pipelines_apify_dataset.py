@@ -6,23 +6,11 @@ import unittest
 from pathlib import Path
 from types import SimpleNamespace
 
-from sven_scraping_projects.pipelines import (
-    ApifyPipeline,
-    _add_legacy_dataset_aliases,
-    _canonicalize_item,
-    _flatten_for_apify_dataset_schema,
-    _normalize_for_dataset,
-    _stringify_apify_dataset_record,
-)
+from sven_scraping_projects.pipelines import ApifyPipeline, _to_apify_dataset_record
 
 
 def _full_pipeline_item(item_dict):
-    item_dict = dict(item_dict)
-    canonical = _canonicalize_item(item_dict)
-    flattened = _flatten_for_apify_dataset_schema(canonical)
-    normalized = _normalize_for_dataset(flattened)
-    with_aliases = _add_legacy_dataset_aliases(normalized)
-    return _stringify_apify_dataset_record(with_aliases)
+    return _to_apify_dataset_record(dict(item_dict))
 
 
 class TestApifyDatasetRecord(unittest.TestCase):
@@ -174,5 +162,46 @@ class TestApifyDatasetRecord(unittest.TestCase):
         self.assertEqual(total_pushed, 1200)
 
 
+class TestSingleEventLoopPush(unittest.TestCase):
+    def test_batches_are_awaited_on_the_loop_and_committed(self):
+        """APIFY_EVENT_LOOP_MODE=single: no push thread; close_spider's Deferred wraps the final drain."""
+        import asyncio
+        import tempfile
+        from unittest import mock
+
+        import sven_scraping_projects.pipelines as pipelines_mod
+        from tests.fakes import FakeAsyncDatasetClient, fake_spider
+        from sven_scraping_projects.push_ledger import PushLedger
+
+        async def crawl(jobdir):
+            spider = fake_spider(
+                "uke", {"APIFY_EVENT_LOOP_MODE": "single", "JOBDIR": jobdir, "APIFY_PUSH_BATCH_BYTES": 64 * 1024}
+            )
+            client = FakeAsyncDatasetClient(latency_s=0.005)
+            p = ApifyPipeline()
+            p.open_spider(spider)
+            p._apify_dataset_async = client
+            self.assertIsNone(p._push_worker)
+            self.assertIsNone(p._push_queue)
+            for i in range(1200):
+                p.process_item({"url": f"https://example.com/{i}", "name": f"Name {i}"}, spider)
+                if i % 100 == 0:
+                    await asyncio.sleep(0)
+            self.assertGreater(client.items, 0, "expected streaming pushes before close_spider")
+            await p.close_spider(spider).asFuture(asyncio.get_running_loop())
+            return client, spider
+
+        with tempfile.TemporaryDirectory() as jobdir, mock.patch.object(
+            pipelines_mod, "_single_loop_mode", return_value=True
+        ):
+            client, spider = asyncio.run(crawl(jobdir))
+            self.assertEqual(client.items, 1200)
+            self.assertEqual(len(set(client.pushed_urls)), 1200)
+            self.assertEqual(spider.crawler.stats.get_value("pipeline/push/items"), 1200)
+            ledger = PushLedger(f"{jobdir}/push_ledger")
+            self.assertEqual((ledger.recovered_committed, len(ledger.replay)), (1200, 0))
+            ledger.close()
+
+
 if __name__ == "__main__":
     unittest.main()
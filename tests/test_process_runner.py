@@ -0,0 +1,50 @@
+"""Parent dataset pusher of the process-per-spider mode: batching and its push ledger."""
+
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from scrapy.settings import Settings
+
+from src.process_runner import _ParentDatasetPusher
+from sven_scraping_projects.pipelines import ApifyPipeline
+from sven_scraping_projects.push_ledger import PushLedger, record_id
+from tests.fakes import FakeDatasetClient
+
+
+def _rec(i):
+    return {"source_url": f"https://example.com/{i}", "name": f"Dr. Müller {i}"}
+
+
+class TestParentDatasetPusher(unittest.TestCase):
+    def test_resumed_run_replays_and_skips_committed(self):
+        client = FakeDatasetClient()
+        with tempfile.TemporaryDirectory() as root, mock.patch.dict(os.environ, {"SCRAPY_JOBDIR_ROOT": root}), \
+                mock.patch.object(ApifyPipeline, "_open_dataset_client", lambda p: setattr(p, "_apify_dataset", client)):
+            directory = os.path.join(root, "kvhh", "push_ledger")
+            # Before the migration: five records reached the parent, one was pushed.
+            ledger = PushLedger(directory)
+            for i in range(5):
+                ledger.accept(_rec(i))
+            ledger.commit([record_id(_rec(0))])
+            ledger.close()
+
+            reader, writer = multiprocessing.Pipe(duplex=False)
+            pusher = _ParentDatasetPusher({reader: "kvhh"}, apify_available=True, settings=Settings())
+            # The resumed worker emits the records of its unfinished requests again.
+            writer.send([_rec(i) for i in range(8)])
+            writer.close()
+            pusher.run()
+
+            self.assertIsNone(pusher.error)
+            self.assertEqual(pusher.records_received, 8)
+            self.assertEqual(sorted(client.pushed_urls), [f"https://example.com/{i}" for i in range(1, 8)])
+            self.assertTrue(os.path.isdir(directory))
+            pusher.discard_ledgers(["kvhh"])
+            self.assertFalse(os.path.exists(directory))
+
+
+if __name__ == "__main__":
+    unittest.main()
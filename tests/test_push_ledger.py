@@ -0,0 +1,183 @@
+"""Tests for the JOBDIR push ledger (exactly-once pushes across restarts)."""
+
+import os
+import tempfile
+import threading
+import unittest
+
+from scrapy import signals
+
+from sven_scraping_projects.pipelines import ApifyPipeline
+from sven_scraping_projects.push_ledger import COMMITTED_FILE, PushLedger, record_id
+from sven_scraping_projects.spill_queue import SpillQueue
+from tests.fakes import FakeDatasetClient, fake_spider
+
+
+def _rec(i):
+    return {"source_url": f"https://example.com/{i}", "name": f"Dr. Müller {i}"}
+
+
+class TestPushLedger(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = os.path.join(self._tmp.name, "push_ledger")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_record_id_is_content_addressed(self):
+        a = {"b": 1, "a": "ä"}
+        self.assertEqual(record_id(a), record_id({"a": "ä", "b": 1}))
+        self.assertNotEqual(record_id(a), record_id({"a": "ä", "b": 2}))
+
+    def test_restart_skips_committed_and_replays_the_rest(self):
+        ledger = PushLedger(self.dir)
+        for i in range(10):
+            self.assertTrue(ledger.accept(_rec(i)))
+        self.assertFalse(ledger.accept(_rec(3)))
+        ledger.commit([record_id(_rec(i)) for i in range(4)])
+        ledger.close()
+
+        ledger = PushLedger(self.dir)
+        self.assertEqual(ledger.recovered_committed, 4)
+        self.assertEqual(ledger.replay, [_rec(i) for i in range(4, 10)])
+        self.assertFalse(ledger.accept(_rec(0)))
+        # Replayed records are pending again, so a re-crawl does not queue them twice.
+        self.assertFalse(ledger.accept(_rec(5)))
+        self.assertTrue(ledger.accept(_rec(10)))
+        records, ids = ledger.uncommitted([_rec(2), _rec(4)])
+        self.assertEqual((records, ids), ([_rec(4)], [record_id(_rec(4))]))
+        ledger.close()
+
+    def test_torn_commit_marker_counts_as_uncommitted(self):
+        ledger = PushLedger(self.dir)
+        for i in range(3):
+            ledger.accept(_rec(i))
+        ledger.commit([record_id(_rec(0))])
+        ledger.close()
+        with open(os.path.join(self.dir, COMMITTED_FILE), "ab") as fh:
+            fh.write(b"LC\x00\x00\x00\x02" + b"\x01" * 11)
+
+        ledger = PushLedger(self.dir)
+        self.assertEqual(ledger.recovered_committed, 1)
+        self.assertEqual(ledger.replay, [_rec(1), _rec(2)])
+        ledger.close()
+
+    def test_committed_journal_segments_are_deleted(self):
+        ledger = PushLedger(self.dir, journal_segment_bytes=300)
+        for i in range(30):
+            ledger.accept(_rec(i))
+        journals = [n for n in os.listdir(self.dir) if n.startswith("journal-")]
+        self.assertGreater(len(journals), 3)
+        ledger.commit([record_id(_rec(i)) for i in range(30)])
+        self.assertEqual(len([n for n in os.listdir(self.dir) if n.startswith("journal-")]), 1)
+        self.assertEqual(len(ledger), 0)
+        ledger.close()
+        self.assertEqual([n for n in os.listdir(self.dir) if n.startswith("journal-")], [])
+
+    def test_batches_in_flight_do_not_overlap(self):
+        ledger = PushLedger(self.dir)
+        for i in range(3):
+            ledger.accept(_rec(i))
+        replayed, replayed_ids = ledger.uncommitted([_rec(0), _rec(1)])
+        self.assertEqual(len(replayed), 2)
+        # The spilled copy of record 1 arrives while the replayed batch is still being pushed.
+        spilled, spilled_ids = ledger.uncommitted([_rec(1), _rec(2)])
+        self.assertEqual((spilled, spilled_ids), ([_rec(2)], [record_id(_rec(2))]))
+        ledger.release(spilled_ids)
+        ledger.commit(replayed_ids)
+        self.assertEqual(ledger.uncommitted([_rec(1), _rec(2)]), ([_rec(2)], [record_id(_rec(2))]))
+        ledger.close()
+
+    def test_discard_after_a_clean_close(self):
+        ledger = PushLedger(self.dir)
+        ledger.accept(_rec(0))
+        self.assertFalse(ledger.discard())
+        ledger.close()
+        # Still pending: the next run must replay it.
+        self.assertFalse(ledger.discard())
+        self.assertTrue(os.path.isdir(self.dir))
+
+        ledger = PushLedger(self.dir)
+        ledger.commit([record_id(_rec(0))])
+        ledger.close()
+        self.assertTrue(ledger.discard())
+        self.assertFalse(os.path.exists(self.dir))
+
+
+def _run_pipeline(jobdir, items, client):
+    spider = fake_spider("kvhh", {"JOBDIR": jobdir})
+    p = ApifyPipeline()
+    p._open_dataset_client = lambda: setattr(p, "_apify_dataset", client)
+    p.open_spider(spider)
+    for item in items:
+        p.process_item(dict(item), spider)
+    p.close_spider(spider)
+    p._push_worker.join(timeout=30)
+    return p, spider.crawler.stats
+
+
+class TestPipelineLedger(unittest.TestCase):
+    def test_recrawl_pushes_only_new_records(self):
+        with tempfile.TemporaryDirectory() as jobdir:
+            items = [{"url": f"https://example.com/{i}", "name": f"Name {i}"} for i in range(40)]
+            first = FakeDatasetClient()
+            _run_pipeline(jobdir, items[:30], first)
+            self.assertEqual(first.items, 30)
+
+            second = FakeDatasetClient()
+            _, stats = _run_pipeline(jobdir, items, second)
+            self.assertEqual(second.pushed_urls, [f"https://example.com/{i}" for i in range(30, 40)])
+            self.assertEqual(stats.get_value("pipeline/ledger/skipped_committed"), 30)
+
+    def test_uncommitted_records_are_replayed_on_open(self):
+        with tempfile.TemporaryDirectory() as jobdir:
+            ledger = PushLedger(os.path.join(jobdir, "push_ledger"))
+            for i in range(5):
+                ledger.accept(_rec(i))
+            ledger.commit([record_id(_rec(0))])
+            ledger.close()
+
+            client = FakeDatasetClient()
+            _run_pipeline(jobdir, [], client)
+            self.assertEqual(client.pushed_urls, [f"https://example.com/{i}" for i in range(1, 5)])
+
+    def test_replayed_and_spilled_copies_are_pushed_once(self):
+        with tempfile.TemporaryDirectory() as jobdir:
+            # A crash after a record was journaled and spilled, before its push committed.
+            ledger = PushLedger(os.path.join(jobdir, "push_ledger"))
+            spill = SpillQueue(os.path.join(jobdir, "push_spill"))
+            for i in range(3):
+                ledger.accept(_rec(i))
+                spill.append(_rec(i))
+            ledger.close()
+            spill._writer.close()
+
+            client = FakeDatasetClient(latency_s=0.2)
+            _, stats = _run_pipeline(jobdir, [], client)
+            self.assertEqual(sorted(client.pushed_urls), [f"https://example.com/{i}" for i in range(3)])
+            self.assertEqual(stats.get_value("pipeline/ledger/skipped_inflight"), 3)
+
+    def test_ledger_is_removed_when_the_spider_finished(self):
+        from scrapy.signalmanager import SignalManager
+
+        with tempfile.TemporaryDirectory() as jobdir:
+            directory = os.path.join(jobdir, "push_ledger")
+            for reason, kept in (("shutdown", True), ("finished", False)):
+                spider = fake_spider("kvhh", {"JOBDIR": jobdir})
+                spider.crawler.signals = SignalManager(spider)
+                p = ApifyPipeline()
+                p._open_dataset_client = lambda: setattr(p, "_apify_dataset", FakeDatasetClient())
+                p.open_spider(spider)
+                p.process_item({"url": "https://example.com/1", "name": "Name"}, spider)
+                p.close_spider(spider)
+                # The pipeline closes the ledger on its final push thread, before the engine sends spider_closed.
+                for thread in threading.enumerate():
+                    if thread.name == "apify-push-final":
+                        thread.join(timeout=30)
+                spider.crawler.signals.send_catch_log(signals.spider_closed, spider=spider, reason=reason)
+                self.assertEqual(os.path.isdir(directory), kept)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+"""raw_source_fields side store: shards, references, ApifyPipeline and the Actor input mapping."""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from scrapy.settings import Settings
+
+from src.main import _raw_fields_settings
+from sven_scraping_projects import raw_fields_store
+from sven_scraping_projects.pipelines import ApifyPipeline, _to_apify_dataset_record
+from sven_scraping_projects.push_ledger import record_id
+from sven_scraping_projects.raw_fields_store import LocalShards, RawFieldsStore, read_shard
+from tests.fakes import FakeStats, fake_spider
+
+
+def _raw(i):
+    return json.dumps({"url": f"https://www.kvhh.net/{i}", "name": f"Dr. Jürgen {i}", "n": i}, ensure_ascii=False)
+
+
+class _FailingShards(LocalShards):
+    def write(self, key, data, content_type):
+        raise OSError("disk full")
+
+
+class TestRawFieldsStore(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _shards(self):
+        out = {}
+        for name in sorted(os.listdir(self.dir)):
+            with open(os.path.join(self.dir, name), "rb") as fh:
+                out[name] = read_shard(fh.read())
+        return out
+
+    def test_shards_hold_every_payload_once(self):
+        stats = FakeStats()
+        store = RawFieldsStore(LocalShards(self.dir), "kvhh-run", shard_bytes=1_000, codec="gzip", stats=stats)
+        refs = [store.put(_raw(i % 40)) for i in range(60)]
+        store.close()
+
+        self.assertEqual(refs[40:], refs[:20])
+        self.assertEqual(len(set(refs)), 40)
+        self.assertTrue(all(ref.startswith(f"local:{self.dir}#") for ref in refs))
+        shards = self._shards()
+        self.assertGreater(len(shards), 1)
+        self.assertTrue(all(name.startswith("kvhh-run-") and name.endswith(".ndjson.gz") for name in shards))
+        stored = {rid: raw for shard in shards.values() for rid, raw in shard.items()}
+        self.assertEqual(len(stored), 40)
+        for i, ref in enumerate(refs[:40]):
+            self.assertEqual(stored[ref.split("#")[1]], json.loads(_raw(i)))
+        self.assertEqual(stats.get_value("pipeline/raw_fields/records"), 40)
+        self.assertEqual(stats.get_value("pipeline/raw_fields/duplicates"), 20)
+        self.assertEqual(stats.get_value("pipeline/raw_fields/shards"), len(shards))
+
+    def test_restarted_run_keeps_earlier_shards(self):
+        settings = Settings({"RAW_FIELDS_STORE": "local", "RAW_FIELDS_DIR": self.dir, "RAW_FIELDS_CODEC": "gzip"})
+        refs = []
+        with mock.patch.dict(os.environ, {"ACTOR_RUN_ID": "run1"}):
+            # A migrated run resumes in a new process under the same run ID.
+            for i in range(2):
+                store = RawFieldsStore.from_settings(settings, fake_spider("kvhh"))
+                refs.append(store.put(_raw(i)))
+                store.close()
+        shards = self._shards()
+        self.assertEqual(len(shards), 2)
+        self.assertTrue(all(name.startswith("kvhh-run1-") for name in shards))
+        stored = {rid for shard in shards.values() for rid in shard}
+        self.assertEqual(stored, {ref.split("#")[1] for ref in refs})
+
+    def test_failed_write_is_raised_at_close(self):
+        store = RawFieldsStore(_FailingShards(self.dir), "kvhh-run", codec="gzip")
+        store.put(_raw(1))
+        with self.assertRaises(OSError):
+            store.close()
+
+    def test_settings(self):
+        spider = fake_spider("kvhh")
+        self.assertIsNone(RawFieldsStore.from_settings(Settings({"RAW_FIELDS_STORE": "inline"}), spider))
+        with self.assertRaises(ValueError):
+            RawFieldsStore.from_settings(Settings({"RAW_FIELDS_STORE": "s3"}), spider)
+        with self.assertRaises(ValueError):
+            RawFieldsStore(LocalShards(self.dir), "x", codec="brotli")
+        store = RawFieldsStore.from_settings(
+            Settings({"RAW_FIELDS_STORE": "local", "RAW_FIELDS_DIR": self.dir, "RAW_FIELDS_CODEC": "auto"}), spider
+        )
+        suffix = ".ndjson.zst" if raw_fields_store.zstandard is not None else ".ndjson.gz"
+        self.assertEqual(store._suffix, suffix)
+        store.put(_raw(1))
+        store.close()
+        self.assertEqual(len(self._shards()), 1)
+
+
+class TestPipelineRawFields(unittest.TestCase):
+    ITEM = {"url": "https://www.kvhh.net/de/arzt-1", "name": "Dr. med. Jürgen Beispiel", "phone": "040 123"}
+
+    def test_rows_keep_a_reference(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            spider = fake_spider("kvhh", {"RAW_FIELDS_STORE": "local", "RAW_FIELDS_DIR": tmp})
+            p = ApifyPipeline()
+            p._open_raw_store(spider, spider.crawler.settings, spider.crawler.stats)
+            p.process_item(dict(self.ITEM), spider)
+            p.process_item(dict(self.ITEM), spider)
+            p.close_spider(spider)
+
+            inline = _to_apify_dataset_record({**self.ITEM, "source": "kvhh"})
+            row = p.items[0]
+            self.assertNotIn("raw_source_fields", row)
+            self.assertEqual(
+                {k: v for k, v in row.items() if k != "raw_source_ref"},
+                {k: v for k, v in inline.items() if k != "raw_source_fields"},
+            )
+            # The reference depends on the content only: same row, same record ID.
+            self.assertEqual(record_id(p.items[1]), record_id(row))
+            self.assertEqual(spider.crawler.stats.get_value("pipeline/raw_fields/records"), 1)
+            (name,) = os.listdir(tmp)
+            with open(os.path.join(tmp, name), "rb") as fh:
+                stored = read_shard(fh.read())
+            self.assertEqual(stored[row["raw_source_ref"].split("#")[1]], json.loads(inline["raw_source_fields"]))
+
+
+    def test_dropped_duplicates_are_not_stored(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            spider = fake_spider(
+                "kvhh", {"RAW_FIELDS_STORE": "local", "RAW_FIELDS_DIR": tmp, "APIFY_DUPLICATE_KEY_POLICY": "drop"}
+            )
+            p = ApifyPipeline()
+            p._duplicate_key_policy = "drop"
+            p._open_raw_store(spider, spider.crawler.settings, spider.crawler.stats)
+            p.process_item(dict(self.ITEM), spider)
+            p.process_item({**self.ITEM, "phone": "040 999"}, spider)
+            p.close_spider(spider)
+            self.assertEqual(len(p.items), 1)
+            (name,) = os.listdir(tmp)
+            with open(os.path.join(tmp, name), "rb") as fh:
+                self.assertEqual(list(read_shard(fh.read())), [p.items[0]["raw_source_ref"].split("#")[1]])
+
+
+class TestRawFieldsInput(unittest.TestCase):
+    def test_input_mapping(self):
+        settings = Settings({"RAW_FIELDS_STORE": "inline"})
+        self.assertIsNone(_raw_fields_settings(None, settings))
+        self.assertIsNone(_raw_fields_settings(False, settings))
+        self.assertIsNone(_raw_fields_settings("inline", settings))
+        self.assertIsNone(_raw_fields_settings("s3", settings))
+        self.assertEqual(settings.get("RAW_FIELDS_STORE"), "inline")
+
+        self.assertEqual(_raw_fields_settings(True, settings, kv_available=True), "kv")
+        self.assertEqual(_raw_fields_settings(True, settings), "local")
+        self.assertEqual(_raw_fields_settings({"store": "local", "dir": "/tmp/raw", "codec": "gzip"}, settings), "local")
+        self.assertEqual(settings.get("RAW_FIELDS_STORE"), "local")
+        self.assertEqual(settings.get("RAW_FIELDS_DIR"), "/tmp/raw")
+        self.assertEqual(settings.get("RAW_FIELDS_CODEC"), "gzip")
+
+
+if __name__ == "__main__":
+    unittest.main()
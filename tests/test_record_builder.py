@@ -0,0 +1,87 @@
+"""Equivalence tests: fused record builder vs. the original five-stage chain."""
+
+import json
+import random
+import unittest
+
+from benchmarks.synthetic_items import SOURCES, generate_items
+from sven_scraping_projects.pipelines import _SOURCE_FIELD_MAPS, _to_apify_dataset_record
+from tests.staged_record_builder import to_apify_dataset_record_staged
+
+
+def _staged(item_dict):
+    return to_apify_dataset_record_staged(dict(item_dict))
+
+
+class TestFusedRecordBuilder(unittest.TestCase):
+    def assertSameRecord(self, item):
+        expected = _staged(item)
+        actual = _to_apify_dataset_record(dict(item))
+        # Same keys in the same order and the same serialized bytes.
+        self.assertEqual(list(actual), list(expected), msg=f"key order differs for {item!r}")
+        self.assertEqual(
+            json.dumps(actual, ensure_ascii=False),
+            json.dumps(expected, ensure_ascii=False),
+            msg=f"record differs for {item!r}",
+        )
+
+    def test_field_map_covers_every_spider(self):
+        self.assertEqual(set(_SOURCE_FIELD_MAPS), set(SOURCES))
+
+    def test_synthetic_items_per_source(self):
+        for source in SOURCES:
+            for item in generate_items(source, 300, seed=7):
+                self.assertSameRecord(item)
+
+    def test_unknown_source_uses_default_map(self):
+        self.assertSameRecord({"source": "other", "name": "Dr. med. A B", "url": "https://x/1"})
+        self.assertSameRecord({"url": "https://x/2", "name": "Name"})
+
+    def test_edge_values(self):
+        cases = [
+            {"source": "zahnaerzte_hh", "name": "Dr. Test", "zip": 20095, "street": "Foo 1", "specialization": ""},
+            {"source": "zahnaerzte_hh", "specialization": 0, "primary_specialty": ""},
+            {"source": "kvhh", "specialization": None, "position": "  ", "area_of_work": "Chirurgie"},
+            {"source": "kvhh", "main_areas_of_activity": ["A", " ", None, "A"], "languages": ("x", "y")},
+            {"source": "uke", "title": "Oberarzt", "work_area": "Haus 1", "phone": ["040 1", "040 2"]},
+            {"source": "uke", "name": "Frau Prof. Dr. med. Eva Maria Klein", "name_title": "PD"},
+            {"source": "asklepios", "specialty": "Neurologie", "clinic_1": "  A\nB  ", "clinic_2": 5},
+            {"source": "asklepios", "affiliated_facilities": "X, Y, X", "clinic_1": "ignored"},
+            {"source": "apothekerkammer-hamburg", "name": "Dr. Apotheke", "website": "https://a"},
+            {"source": "apothekerkammer-hamburg", "entity_type": "person", "name": "Dr. med. A B"},
+            {"source": "kvhh", "url": "https://k", "postal_code": 1.5, "fax": True, "city": False},
+            {"source": "kvhh", "email": {"a": None, "b": [1, None]}, "memberships": "M1, M2, M1"},
+            {"source": "uke", "raw": {"nested": None}, "extra": [None, 1], "weird": object.__name__},
+        ]
+        for item in cases:
+            self.assertSameRecord(item)
+
+    def test_randomised_items(self):
+        rng = random.Random(1234)
+        keys = [
+            "name", "display_name", "first_name", "last_name", "name_title", "title", "url", "source_url",
+            "phone", "telephone", "fax", "email", "website", "internet", "address", "street", "zip",
+            "postal_code", "city", "location", "job_title", "position", "department", "einrichtung",
+            "work_area", "area_of_work", "specialty", "specialization", "specialties", "areas_of_expertise",
+            "main_areas_of_activity", "areas_of_activity", "languages", "memberships", "field_membership",
+            "clinic_1", "clinic_2", "img_url", "career_highlights", "entity_type",
+        ]
+        values = ["", "  ", None, "Dr. med. Anna Schmidt", "A, B, A", " x ", 0, 7, 2.5, True, ["p", " q ", None]]
+        for _ in range(2000):
+            item = {"source": rng.choice(SOURCES + ("",))}
+            for k in rng.sample(keys, rng.randint(0, len(keys))):
+                item[k] = rng.choice(values)
+            if item.get("entity_type") not in (None, "", "person", "organization"):
+                item["entity_type"] = "person"
+            try:
+                expected = _staged(item)
+            except Exception as e:  # pragma: no cover - both paths must fail identically
+                with self.assertRaises(type(e)):
+                    _to_apify_dataset_record(dict(item))
+                continue
+            actual = _to_apify_dataset_record(dict(item))
+            self.assertEqual(json.dumps(actual), json.dumps(expected), msg=repr(item))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,213 @@
+"""Sitemap lastmod-driven incremental recrawl: the state store, its middleware and the Actor input mapping."""
+
+import asyncio
+import gzip
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from scrapy import Request, Spider
+from scrapy.http import HtmlResponse
+from scrapy.settings import Settings
+
+from src.main import _incremental_settings
+from sven_scraping_projects.middlewares import IncrementalRecrawlMiddleware
+from sven_scraping_projects.recrawl_state import (
+    RECRAWL_URL_META,
+    SITEMAP_LASTMOD_META,
+    LocalStateFile,
+    RecrawlStore,
+)
+from tests.fakes import FakeStats
+
+DAY = 86400.0
+NOW = 1_750_000_000.0
+URL = "https://www.kvhh.net/de/arztsuche/net-kvhh-physician-1"
+
+
+class _Spider(Spider):
+    name = "kvhh"
+
+    def parse_sitemap(self, response):
+        for n, lastmod in enumerate(("2025-01-01", "2025-01-01", None)):
+            yield Request(f"{URL}{n}", callback=self.parse_profile, meta={SITEMAP_LASTMOD_META: lastmod})
+        yield Request("https://www.kvhh.net/other", callback=self.parse_profile)
+
+    def parse_profile(self, response):
+        yield {"url": response.url, "name": "Dr. A", "languages": ["de"]}
+
+
+def _store(tmp, **kwargs):
+    return RecrawlStore(LocalStateFile(os.path.join(tmp, "kvhh.ndjson.gz")), **kwargs)
+
+
+class TestRecrawlStore(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_fetch_reasons(self):
+        store = _store(self.tmp, policy="reemit", ttl_s=10 * DAY)
+        self.assertEqual(store.fetch_reason(URL, "2025-01-01", NOW), "new")
+        self.assertTrue(store.update(URL, "2025-01-01", b"<html>1</html>", [{"a": 1}], NOW))
+        self.assertIsNone(store.fetch_reason(URL, "2025-01-01", NOW + DAY))
+        # Sitemaps without <lastmod>: the TTL alone decides.
+        self.assertIsNone(store.fetch_reason(URL, None, NOW + DAY))
+        self.assertEqual(store.fetch_reason(URL, "2025-02-01", NOW + DAY), "changed")
+        self.assertEqual(store.fetch_reason(URL, "2025-01-01", NOW + 10 * DAY), "expired")
+        self.assertEqual(store.stored_items(URL), [{"a": 1}])
+        self.assertFalse(store.update(URL, "2025-02-01", b"<html>1</html>", [{"a": 1}], NOW))
+
+    def test_ttl_is_spread_per_url(self):
+        store = _store(self.tmp, ttl_s=100 * DAY)
+        ttls = [store._ttl_for(f"{URL}{n}") for n in range(200)]
+        self.assertTrue(all(75 * DAY <= t <= 100 * DAY for t in ttls))
+        self.assertGreater(max(ttls) - min(ttls), 15 * DAY)
+
+    def test_skip_policy_keeps_no_items_and_reemit_refetches_them(self):
+        skip = _store(self.tmp, policy="skip", ttl_s=10 * DAY)
+        skip.update(URL, "2025-01-01", b"x", [{"a": 1}], NOW)
+        self.assertIsNone(skip.fetch_reason(URL, "2025-01-01", NOW))
+        self.assertEqual(skip.stored_items(URL), [])
+        skip.save(NOW)
+
+        reemit = _store(self.tmp, policy="reemit", ttl_s=10 * DAY)
+        self.assertEqual(reemit.load(), 1)
+        self.assertEqual(reemit.fetch_reason(URL, "2025-01-01", NOW), "no_items")
+
+    def test_round_trip_and_pruning(self):
+        store = _store(self.tmp, ttl_s=10 * DAY)
+        store.update(URL, "2025-01-01", b"body", [{"name": "Jürgen", "list": [1, 2]}], NOW)
+        store.update(URL + "-gone", None, b"body", [], NOW - 40 * DAY)
+        store.save(NOW)
+
+        loaded = _store(self.tmp, ttl_s=10 * DAY)
+        self.assertEqual(loaded.load(), 1)
+        entry = loaded.entries[URL]
+        self.assertEqual((entry.lastmod, entry.content_hash), ("2025-01-01", store.entries[URL].content_hash))
+        self.assertIsInstance(entry.record_id, int)
+        self.assertEqual(loaded.stored_items(URL), [{"name": "Jürgen", "list": [1, 2]}])
+
+    def test_unreadable_state_starts_empty(self):
+        path = os.path.join(self.tmp, "kvhh.ndjson.gz")
+        for data in (b"not gzip", gzip.compress(b'{"version": 99}\n["x"]'), gzip.compress(b"{}\n[1, 2]")):
+            with open(path, "wb") as fh:
+                fh.write(data)
+            with self.assertLogs("sven_scraping_projects.recrawl_state", level="WARNING"):
+                self.assertEqual(_store(self.tmp).load(), 0)
+        self.assertEqual(_store(os.path.join(self.tmp, "missing")).load(), 0)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            _store(self.tmp, policy="sometimes")
+
+
+class TestIncrementalRecrawlMiddleware(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _middleware(self, policy="reemit"):
+        settings = Settings(
+            {"RECRAWL_ENABLED": True, "RECRAWL_POLICY": policy, "RECRAWL_STATE_DIR": self._tmp.name}
+        )
+        crawler = SimpleNamespace(
+            settings=settings, stats=FakeStats(), signals=SimpleNamespace(connect=lambda *a, **kw: None)
+        )
+        mw = IncrementalRecrawlMiddleware.from_crawler(crawler)
+        mw.store = mw._open_store(_Spider())
+        return mw, crawler.stats
+
+    def _run(self, mw, callback, url, meta=None):
+        request = Request(url, callback=callback, meta=meta or {})
+        response = HtmlResponse(url, body=b"<html><h1>Dr. A</h1></html>", request=request)
+
+        async def collect():
+            async def wrapped():
+                for out in callback(response):
+                    yield out
+
+            return [out async for out in mw.process_spider_output(response, wrapped(), _Spider())]
+
+        return asyncio.run(collect())
+
+    def _crawl(self, mw, spider):
+        """Sitemap callback, then the profile callback for every request that went out."""
+        out = self._run(mw, spider.parse_sitemap, "https://www.kvhh.net/de/sitemap.xml")
+        requests = [o for o in out if isinstance(o, Request)]
+        items = [o for o in out if isinstance(o, dict)]
+        for request in requests:
+            items.extend(self._run(mw, spider.parse_profile, request.url, request.meta))
+        return requests, items
+
+    def test_first_run_fetches_everything_second_run_reemits(self):
+        spider = _Spider()
+        mw, stats = self._middleware()
+        requests, items = self._crawl(mw, spider)
+        self.assertEqual(len(requests), 4)
+        self.assertEqual(stats.get_value("recrawl/fetch/new"), 3)
+        # Requests without a sitemap lastmod tag are not tracked.
+        self.assertNotIn(RECRAWL_URL_META, requests[-1].meta)
+        self.assertEqual(len(mw.store.entries), 3)
+        mw.store.save()
+
+        mw, stats = self._middleware()
+        requests, items = self._crawl(mw, spider)
+        self.assertEqual([r.url for r in requests], ["https://www.kvhh.net/other"])
+        self.assertEqual(stats.get_value("recrawl/unchanged"), 3)
+        self.assertEqual(stats.get_value("recrawl/items_reemitted"), 3)
+        self.assertEqual(sorted(i["url"] for i in items)[:3], [f"{URL}{n}" for n in range(3)])
+
+    def test_skip_policy_yields_nothing_for_unchanged_pages(self):
+        spider = _Spider()
+        mw, _ = self._middleware("skip")
+        self._crawl(mw, spider)
+        mw.store.save()
+        mw, stats = self._middleware("skip")
+        requests, items = self._crawl(mw, spider)
+        self.assertEqual(len(requests), 1)
+        self.assertEqual([i["url"] for i in items], ["https://www.kvhh.net/other"])
+        self.assertIsNone(stats.get_value("recrawl/items_reemitted"))
+
+    def test_non_200_is_not_recorded(self):
+        mw, _ = self._middleware()
+        request = Request(URL, meta={SITEMAP_LASTMOD_META: None, RECRAWL_URL_META: URL})
+        response = HtmlResponse(URL, status=503, body=b"", request=request)
+
+        async def collect():
+            async def empty():
+                return
+                yield
+
+            return [o async for o in mw.process_spider_output(response, empty(), _Spider())]
+
+        asyncio.run(collect())
+        self.assertEqual(mw.store.entries, {})
+
+
+class TestIncrementalInput(unittest.TestCase):
+    def test_input_mapping(self):
+        settings = Settings({"RECRAWL_ENABLED": False, "RECRAWL_STORE": "local"})
+        self.assertFalse(_incremental_settings(None, settings))
+        self.assertFalse(_incremental_settings(False, settings))
+        self.assertFalse(_incremental_settings({"enabled": False}, settings))
+        self.assertFalse(settings.getbool("RECRAWL_ENABLED"))
+
+        self.assertTrue(_incremental_settings(True, settings, kv_available=True))
+        self.assertTrue(settings.getbool("RECRAWL_ENABLED"))
+        self.assertEqual(settings.get("RECRAWL_STORE"), "kv")
+
+        self.assertTrue(_incremental_settings({"policy": "Skip", "ttl_days": 3, "store": "local"}, settings, True))
+        self.assertEqual(settings.get("RECRAWL_POLICY"), "skip")
+        self.assertEqual(settings.getfloat("RECRAWL_TTL_DAYS"), 3.0)
+        self.assertEqual(settings.get("RECRAWL_STORE"), "local")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""Stack-sampling profiler, its per-spider extension and the Actor input mapping in src/main.py."""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from scrapy import Spider
+from scrapy.settings import Settings
+
+from src.main import _profile_settings, _store_profiles
+from sven_scraping_projects.apify_runtime import get_sampling_profiler, set_sampling_profiler
+from sven_scraping_projects.middlewares import SamplingProfilerExtension
+from sven_scraping_projects.sampling_profiler import SamplingProfiler, format_collapsed, thread_label
+from tests.fakes import FakeStats
+
+
+def _busy(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _run_threads(profiler, seconds=0.2):
+    stop = threading.Event()
+    busy = threading.Thread(target=_busy, args=(stop,), name="apify-push-worker")
+    idle = threading.Thread(target=stop.wait, name="apify-actor-loop")
+    busy.start()
+    idle.start()
+    try:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            profiler.sample(skip=threading.get_ident())
+            time.sleep(0.002)
+    finally:
+        stop.set()
+        busy.join()
+        idle.join()
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    def test_collapsed_stacks_per_thread(self):
+        profiler = SamplingProfiler(interval_ms=1)
+        _run_threads(profiler)
+        counts = profiler.stop()
+        busy = [stack for stack in counts if stack.startswith("apify-push-worker;")]
+        self.assertTrue(busy)
+        self.assertTrue(all("_busy (tests/test_sampling_profiler.py:" in stack for stack in busy))
+        # The thread blocked in Event.wait is idle and dropped by default.
+        self.assertFalse([stack for stack in counts if stack.startswith("apify-actor-loop;")])
+        self.assertGreater(profiler.idle_samples, 0)
+
+        with_idle = SamplingProfiler(include_idle=True)
+        _run_threads(with_idle, seconds=0.05)
+        self.assertTrue([stack for stack in with_idle.stop() if stack.startswith("apify-actor-loop;")])
+
+    def test_segments_and_background_sampling(self):
+        profiler = SamplingProfiler(interval_ms=1)
+        profiler.begin("kvhh")
+        profiler.start()
+        stop = threading.Event()
+        worker = threading.Thread(target=_busy, args=(stop,), name="dataset-push_3")
+        worker.start()
+        time.sleep(0.1)
+        stop.set()
+        worker.join()
+        segment = profiler.end("kvhh")
+        run = profiler.stop()
+        self.assertGreater(profiler.samples, 10)
+        self.assertTrue(any(stack.startswith("dataset-push;") for stack in segment))
+        self.assertLessEqual(sum(segment.values()), sum(run.values()))
+        self.assertEqual(profiler.end("kvhh"), {})
+
+    def test_format(self):
+        self.assertEqual(thread_label("MainThread", is_main=True), "reactor")
+        self.assertEqual(thread_label("dataset-push_12"), "dataset-push")
+        self.assertEqual(format_collapsed({"a;b": 2, "a;c": 5}), "a;c 5\na;b 2\n")
+
+
+class TestSamplingProfilerExtension(unittest.TestCase):
+    def tearDown(self):
+        profiler = get_sampling_profiler()
+        if profiler is not None:
+            profiler.stop()
+        set_sampling_profiler(None)
+
+    def test_per_spider_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            settings = Settings({"SAMPLING_PROFILER_INTERVAL_MS": 1, "SAMPLING_PROFILER_DIR": tmp})
+            crawler = SimpleNamespace(
+                settings=settings, stats=FakeStats(), signals=SimpleNamespace(connect=lambda *a, **kw: None)
+            )
+            ext = SamplingProfilerExtension.from_crawler(crawler)
+            # No sampler registered (process-mode worker): the extension starts one.
+            self.assertIs(get_sampling_profiler(), ext.profiler)
+            spider = Spider(name="kvhh")
+            ext.spider_opened(spider)
+            _run_threads(ext.profiler, seconds=0.05)
+            ext.spider_closed(spider, "finished")
+
+            path = os.path.join(tmp, "kvhh.collapsed")
+            self.assertEqual(crawler.stats.get_value("sampling_profiler/path"), path)
+            with open(path, encoding="utf-8") as fh:
+                lines = fh.read().splitlines()
+            samples = sum(int(line.rsplit(" ", 1)[1]) for line in lines)
+            self.assertEqual(samples, crawler.stats.get_value("sampling_profiler/samples"))
+
+            paths = _store_profiles(ext.profiler, tmp)
+            self.assertEqual([os.path.basename(p) for p in paths], ["run.collapsed", "kvhh.collapsed"])
+
+    def test_disabled_by_default_and_input_mapping(self):
+        settings = Settings({"SAMPLING_PROFILER_INTERVAL_MS": 0})
+        self.assertFalse(_profile_settings({"mode": "off"}, settings))
+        self.assertFalse(_profile_settings(None, settings))
+        self.assertTrue(_profile_settings({"mode": "sample", "interval_ms": 2}, settings))
+        self.assertEqual(settings.getfloat("SAMPLING_PROFILER_INTERVAL_MS"), 2.0)
+        self.assertTrue(_profile_settings({"mode": "Sample", "interval_ms": "fast"}, settings))
+        self.assertEqual(settings.getfloat("SAMPLING_PROFILER_INTERVAL_MS"), 5.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
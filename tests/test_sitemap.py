@@ -0,0 +1,98 @@
+import gzip
+import unittest
+
+from sven_scraping_projects.utils.sitemap import SitemapEntry, SitemapReader, iter_sitemap
+
+NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def _urlset(entries, ns=NS):
+    rows = "".join(
+        f"<url><loc> {loc} </loc>" + (f"<lastmod>{lastmod}</lastmod>" if lastmod else "") + "</url>"
+        for loc, lastmod in entries
+    )
+    xmlns = f' xmlns="{ns}"' if ns else ""
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset{xmlns}>{rows}</urlset>'.encode()
+
+
+ENTRIES = [
+    ("https://www.kvhh.net/de/arztsuche/net-kvhh-physician-1", "2025-01-02"),
+    ("https://www.kvhh.net/de/arztsuche/net-kvhh-physician-2", None),
+    ("https://www.kvhh.net/de/impressum", "2024-12-01T10:00:00+01:00"),
+    ("https://www.kvhh.net/media/flyer.PDF", None),
+]
+
+
+class TestSitemapReader(unittest.TestCase):
+    def test_entries_with_and_without_namespace(self):
+        for ns in (NS, None):
+            with self.subTest(ns=ns):
+                self.assertEqual(list(iter_sitemap(_urlset(ENTRIES, ns))), [SitemapEntry(*e) for e in ENTRIES])
+
+    def test_sitemap_index(self):
+        body = (
+            f'<sitemapindex xmlns="{NS}"><sitemap><loc>https://a/s1.xml.gz</loc></sitemap>'
+            f"<sitemap><loc>https://a/s2.xml.gz</loc><lastmod>2025-03-04</lastmod></sitemap></sitemapindex>"
+        ).encode()
+        self.assertEqual(
+            list(iter_sitemap(body)),
+            [("https://a/s1.xml.gz", None), ("https://a/s2.xml.gz", "2025-03-04")],
+        )
+
+    def test_chunk_boundaries_do_not_matter(self):
+        body = _urlset(ENTRIES * 50)
+        expected = list(iter_sitemap(body))
+        for chunk_size in (1, 7, 100):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(iter_sitemap(body, chunk_size=chunk_size)), expected)
+                self.assertEqual(list(iter_sitemap(gzip.compress(body), chunk_size=chunk_size)), expected)
+
+    def test_gzip_is_detected_from_the_body(self):
+        body = gzip.compress(_urlset(ENTRIES))
+        reader = SitemapReader(body)
+        self.assertTrue(reader.gzipped)
+        self.assertEqual(len(list(reader)), len(ENTRIES))
+        # Concatenated gzip members, as `cat a.gz b.gz` produces.
+        self.assertEqual(len(list(iter_sitemap(body + body))), len(ENTRIES))
+
+    def test_filters_and_counters(self):
+        reader = SitemapReader(
+            _urlset(ENTRIES),
+            prefixes=("https://www.kvhh.net/de/",),
+            exclude_extensions=(".pdf",),
+        )
+        self.assertEqual([e.loc for e in reader], [e[0] for e in ENTRIES[:3]])
+        reader = SitemapReader(_urlset(ENTRIES), prefixes=("https://www.kvhh.net/de/arztsuche/",))
+        self.assertEqual(len(list(reader)), 2)
+        self.assertEqual((reader.locs, reader.yielded), (4, 2))
+        reader = SitemapReader(_urlset(ENTRIES), exclude_extensions=(".pdf",))
+        self.assertEqual(len(list(reader)), 3)
+
+    def test_entries_arrive_before_the_end_of_the_body(self):
+        body = _urlset(ENTRIES * 200)
+        for data in (body, gzip.compress(body)):
+            reader = SitemapReader(data, chunk_size=256)
+            first = next(iter(reader))
+            self.assertEqual(first.loc, ENTRIES[0][0])
+            self.assertLess(reader.locs, 20)
+
+    def test_truncated_and_corrupt_input_keeps_what_was_read(self):
+        body = _urlset([(f"https://a/profile-{n * 7919 % 10007}", None) for n in range(500)])
+        self.assertGreater(len(list(iter_sitemap(body[: len(body) // 2]))), 200)
+        gz = gzip.compress(body)
+        self.assertGreater(len(list(iter_sitemap(gz[: len(gz) // 2], chunk_size=64))), 100)
+        self.assertEqual(list(iter_sitemap(gz[:10] + b"garbage" * 10)), [])
+        self.assertEqual(list(iter_sitemap(b"")), [])
+        self.assertEqual(list(iter_sitemap(b"<html><body>not a sitemap</body></html>")), [])
+
+    def test_entities_are_not_resolved(self):
+        body = (
+            b'<?xml version="1.0"?><!DOCTYPE urlset [<!ENTITY x SYSTEM "file:///etc/passwd">]>'
+            b"<urlset><url><loc>https://a/&x;</loc></url></urlset>"
+        )
+        for entry in iter_sitemap(body):
+            self.assertNotIn("root:", entry.loc)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+"""AIMD slot controller and the downloader middleware that applies it."""
+
+import unittest
+from types import SimpleNamespace
+
+from scrapy import Request
+from scrapy.core.downloader import Slot
+from scrapy.http import Response
+from scrapy.settings import Settings
+from twisted.internet.error import TimeoutError as TxTimeoutError
+
+from sven_scraping_projects.middlewares import AdaptiveConcurrencyMiddleware
+from sven_scraping_projects.slot_control import SlotController, percentile, retry_after_seconds
+from tests.fakes import FakeStats
+
+
+def _clean_window(ctrl, latency=0.1):
+    adjustment = None
+    for _ in range(ctrl.window):
+        adjustment = ctrl.observe(200, latency) or adjustment
+    return adjustment
+
+
+class TestSlotController(unittest.TestCase):
+    def test_additive_increase_up_to_ceiling(self):
+        ctrl = SlotController(concurrency=4, max_concurrency=6, window=10)
+        _clean_window(ctrl)
+        self.assertEqual(ctrl.concurrency, 5)
+        for _ in range(5):
+            _clean_window(ctrl)
+        self.assertEqual(ctrl.concurrency, 6)
+        self.assertEqual(ctrl.max_seen, 6)
+
+    def test_delay_is_lowered_before_concurrency_grows(self):
+        ctrl = SlotController(concurrency=4, delay=0.4, min_delay=0.1, window=10)
+        _clean_window(ctrl)
+        self.assertEqual((ctrl.concurrency, ctrl.delay), (4, 0.2))
+        _clean_window(ctrl)
+        _clean_window(ctrl)
+        self.assertEqual((ctrl.concurrency, ctrl.delay), (5, 0.1))
+
+    def test_error_rate_halves_once_per_window(self):
+        ctrl = SlotController(concurrency=16, min_concurrency=2, window=10, error_rate=0.1)
+        # One error per window is tolerated.
+        self.assertIsNone(ctrl.observe(503))
+        adjustment = ctrl.observe(429)
+        self.assertEqual((adjustment.reason, adjustment.concurrency), ("status", 8))
+        # Responses to requests sent at the old rate do not cut it again.
+        for _ in range(10):
+            self.assertIsNone(ctrl.observe(503))
+        self.assertEqual(ctrl.concurrency, 8)
+        ctrl.timeout()
+        self.assertEqual(ctrl.timeout().concurrency, 4)
+        self.assertEqual((ctrl.throttled, ctrl.timeouts, ctrl.decreases), (12, 2, 2))
+
+    def test_stray_errors_do_not_stop_growth(self):
+        ctrl = SlotController(concurrency=4, window=10, error_rate=0.1)
+        for _ in range(3):
+            ctrl.observe(503)
+            for _ in range(9):
+                ctrl.observe(200, 0.1)
+        self.assertEqual(ctrl.concurrency, 7)
+
+    def test_floor_then_delay_backoff(self):
+        ctrl = SlotController(concurrency=2, min_concurrency=2, max_delay=0.3, window=1, error_rate=0)
+        self.assertEqual(ctrl.observe(429).delay, 0.1)
+        self.assertIsNone(ctrl.observe(503))
+        self.assertEqual(ctrl.observe(429).delay, 0.2)
+        ctrl.observe(200)
+        self.assertEqual(ctrl.timeout().delay, 0.3)
+        self.assertEqual(ctrl.concurrency, 2)
+
+    def test_latency_growth_counts_as_congestion(self):
+        ctrl = SlotController(concurrency=10, window=10)
+        _clean_window(ctrl, latency=0.1)
+        self.assertEqual(ctrl.baseline, 0.1)
+        adjustment = _clean_window(ctrl, latency=0.5)
+        self.assertEqual((adjustment.reason, adjustment.concurrency), ("latency", 5))
+        # Sub-slack jitter on a fast site is not queueing.
+        fast = SlotController(concurrency=10, window=10)
+        _clean_window(fast, latency=0.002)
+        _clean_window(fast, latency=0.02)
+        self.assertEqual(fast.concurrency, 12)
+
+    def test_helpers(self):
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2.0)
+        self.assertEqual(percentile([1, 2, 3, 4], 99), 4.0)
+        self.assertEqual(percentile([], 90), 0.0)
+        self.assertEqual(retry_after_seconds(b"12"), 12.0)
+        self.assertIsNone(retry_after_seconds(b"Wed, 21 Oct 2015 07:28:00 GMT"))
+
+
+class TestAdaptiveConcurrencyMiddleware(unittest.TestCase):
+    def _middleware(self, **overrides):
+        settings = Settings(
+            {
+                "ADAPTIVE_CONCURRENCY_ENABLED": True,
+                "CONCURRENT_REQUESTS": 32,
+                "ADAPTIVE_CONCURRENCY_MAX": 64,
+                "ADAPTIVE_CONCURRENCY_WINDOW": 5,
+                "ADAPTIVE_CONCURRENCY_ERROR_RATE": 0.2,
+                **overrides,
+            }
+        )
+        slots = {"example.com": Slot(8, 0.0, 0)}
+        crawler = SimpleNamespace(
+            settings=settings,
+            stats=FakeStats(),
+            signals=SimpleNamespace(connect=lambda *a, **kw: None),
+            engine=SimpleNamespace(downloader=SimpleNamespace(slots=slots)),
+        )
+        return AdaptiveConcurrencyMiddleware.from_crawler(crawler), slots["example.com"], crawler.stats
+
+    def _request(self):
+        return Request("https://example.com/a", meta={"download_slot": "example.com", "download_latency": 0.05})
+
+    def test_adjusts_the_downloader_slot(self):
+        mw, slot, stats = self._middleware()
+        self.assertEqual(mw._limits["max_concurrency"], 32)
+        for _ in range(5):
+            mw.process_response(self._request(), Response("https://example.com/a", status=200))
+        self.assertEqual(slot.concurrency, 9)
+        mw.process_exception(self._request(), TxTimeoutError(), None)
+        mw.process_response(
+            self._request(), Response("https://example.com/a", status=429, headers={"Retry-After": "2"})
+        )
+        # Retry-After pauses the slot once; the controller's delay comes back afterwards.
+        self.assertEqual((slot.concurrency, slot.delay), (4, 2.0))
+        mw._holds["example.com"].cancel()
+        mw._release_hold("example.com", slot)
+        self.assertEqual(slot.delay, 0.0)
+        self.assertEqual(stats.get_value("adaptive_concurrency/throttled"), 1)
+        self.assertEqual(stats.get_value("adaptive_concurrency/timeouts"), 1)
+        self.assertEqual(stats.get_value("adaptive_concurrency/decreases"), 1)
+        self.assertEqual(stats.get_value("adaptive_concurrency/retry_after_holds"), 1)
+
+    def test_cached_responses_and_autothrottle(self):
+        mw, slot, _ = self._middleware(AUTOTHROTTLE_ENABLED=True)
+        cached = Response("https://example.com/a", status=429, flags=["cached"])
+        mw.process_response(self._request(), cached)
+        self.assertEqual(slot.concurrency, 8)
+        mw.process_response(self._request(), Response("https://example.com/a", status=503))
+        mw.process_response(
+            self._request(), Response("https://example.com/a", status=503, headers={"Retry-After": "5"})
+        )
+        # AutoThrottle owns the delay; only concurrency is adapted.
+        self.assertEqual((slot.concurrency, slot.delay), (4, 0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
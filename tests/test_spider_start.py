@@ -0,0 +1,43 @@
+"""Every spider's start requests, through Scrapy's start() (2.13+) and start_requests() (older releases)."""
+
+import asyncio
+import unittest
+
+from scrapy import Spider
+from scrapy.spiderloader import SpiderLoader
+from scrapy.utils.project import get_project_settings
+
+
+def _describe(request):
+    return (
+        request.url,
+        request.method,
+        getattr(request.callback, "__name__", None),
+        getattr(request.errback, "__name__", None),
+        request.dont_filter,
+        dict(request.headers),
+        request.meta,
+    )
+
+
+async def _collect(spider):
+    return [request async for request in spider.start()]
+
+
+class TestSpiderStart(unittest.TestCase):
+    def test_start_yields_the_start_requests(self):
+        loader = SpiderLoader.from_settings(get_project_settings())
+        names = loader.list()
+        self.assertEqual(len(names), 5)
+        for name in names:
+            with self.subTest(spider=name):
+                spider = loader.load(name)()
+                # Scrapy >= 2.13 only calls start(); the inherited one ignores start_requests().
+                self.assertIsNot(type(spider).start, Spider.start)
+                started = asyncio.run(_collect(spider))
+                self.assertTrue(started)
+                self.assertEqual([_describe(r) for r in started], [_describe(r) for r in spider.start_requests()])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+"""Tests for the on-disk push overflow (SpillQueue) and its use in ApifyPipeline."""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from sven_scraping_projects.dataset_push import EncodedRecord, encode_record, payload_bytes
+from sven_scraping_projects.pipelines import ApifyPipeline
+from sven_scraping_projects.spill_queue import SpillQueue
+from tests.fakes import FakeDatasetClient, fake_spider
+
+
+def _rec(i):
+    return {"source_url": f"https://example.com/{i}", "name": f"Zahnärztin {i}"}
+
+
+class TestSpillQueue(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = os.path.join(self._tmp.name, "push_spill")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_fifo_with_exact_payload_bytes(self):
+        q = SpillQueue(self.dir)
+        for i in range(50):
+            q.append(_rec(i))
+        self.assertEqual(len(q), 50)
+        out = []
+        while q.has_unread():
+            records, nbytes, position = q.read(max_bytes=1_000, max_items=100)
+            self.assertEqual(nbytes, payload_bytes(records))
+            self.assertTrue(nbytes <= 1_000 or len(records) == 1)
+            out.extend(records)
+            q.ack(position)
+        self.assertEqual(out, [_rec(i) for i in range(50)])
+        self.assertEqual(q.read(max_bytes=1_000), ([], 0, None))
+        q.close()
+        self.assertFalse(os.path.exists(self.dir))
+
+    def test_encoded_records_are_written_as_they_are(self):
+        q = SpillQueue(self.dir)
+        encoded = [encode_record(_rec(i)) for i in range(5)]
+        for rec in encoded:
+            q.append(rec)
+        records, nbytes, _ = q.read(max_bytes=10_000)
+        self.assertTrue(all(type(r) is EncodedRecord for r in records))
+        self.assertEqual([r.payload for r in records], [r.payload for r in encoded])
+        self.assertEqual(nbytes, payload_bytes(encoded))
+        q.close()
+
+    def test_segments_rotate_and_are_deleted_once_acked(self):
+        q = SpillQueue(self.dir, segment_bytes=500)
+        for i in range(40):
+            q.append(_rec(i))
+        segments = [n for n in os.listdir(self.dir) if n.startswith("segment-")]
+        self.assertGreater(len(segments), 3)
+        records, _, position = q.read(max_bytes=10_000_000, max_items=25)
+        self.assertEqual(records, [_rec(i) for i in range(25)])
+        q.ack(position)
+        remaining = [n for n in os.listdir(self.dir) if n.startswith("segment-")]
+        self.assertLess(len(remaining), len(segments))
+        records, _, _ = q.read(max_bytes=10_000_000)
+        self.assertEqual(records, [_rec(i) for i in range(25, 40)])
+        q.close()
+
+    def test_restart_resumes_after_last_ack(self):
+        q = SpillQueue(self.dir, segment_bytes=400)
+        for i in range(20):
+            q.append(_rec(i))
+        _, _, acked = q.read(max_bytes=10_000_000, max_items=6)
+        q.ack(acked)
+        # Read but never acknowledged: must be delivered again after the restart.
+        q.read(max_bytes=10_000_000, max_items=5)
+        q._writer.close()
+        # Simulate a crash in the middle of an append.
+        last = sorted(n for n in os.listdir(self.dir) if n.startswith("segment-"))[-1]
+        with open(os.path.join(self.dir, last), "ab") as fh:
+            fh.write(b'{"source_url": "https://example.com/tr')
+
+        q2 = SpillQueue(self.dir, segment_bytes=400)
+        self.assertEqual(q2.recovered_records, 14)
+        q2.append(_rec(20))
+        out = []
+        while q2.has_unread():
+            records, _, position = q2.read(max_bytes=300)
+            out.extend(records)
+            q2.ack(position)
+        self.assertEqual(out, [_rec(i) for i in range(6, 21)])
+        q2.close()
+        self.assertFalse(os.path.exists(self.dir))
+
+
+class TestPipelineSpill(unittest.TestCase):
+    def test_overflow_spills_to_jobdir_and_is_pushed_in_order(self):
+        with tempfile.TemporaryDirectory() as jobdir:
+            spider = fake_spider(
+                "zahnaerzte_hh",
+                {"JOBDIR": jobdir, "APIFY_PUSH_QUEUE_MAX_ITEMS": 20, "APIFY_PUSH_CONCURRENCY": 1},
+            )
+            client = FakeDatasetClient(latency_s=0.01)
+            sent = []
+            push_items = client.push_items
+            client.push_items = lambda items: (sent.append(type(items)), push_items(items))
+            p = ApifyPipeline()
+            p.open_spider(spider)
+            p._apify_dataset = client
+            for i in range(600):
+                p.process_item({"url": f"https://example.com/{i}", "name": f"Name {i}"}, spider)
+            stats = spider.crawler.stats
+            self.assertGreater(stats.get_value("pipeline/spill/records_written", 0), 0)
+            self.assertEqual(p.items, [])
+
+            p.close_spider(spider)
+            deadline = time.monotonic() + 30
+            while client.items < 600 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            p._push_worker.join(timeout=10)
+            self.assertEqual(client.pushed_urls, [f"https://example.com/{i}" for i in range(600)])
+            # Pre-encoded JSON array strings, not lists for the client to encode.
+            self.assertEqual(set(sent), {str})
+            self.assertFalse(os.path.exists(os.path.join(jobdir, "push_spill")))
+
+    def test_backlog_pauses_the_engine(self):
+        with tempfile.TemporaryDirectory() as jobdir:
+            spider = fake_spider(
+                "asklepios",
+                {
+                    "JOBDIR": jobdir,
+                    "APIFY_PUSH_QUEUE_MAX_ITEMS": 20,
+                    "APIFY_PUSH_CONCURRENCY": 1,
+                    "APIFY_PUSH_MAX_BATCH_ITEMS": 10,
+                    "APIFY_PUSH_BACKPRESSURE_HIGH_ITEMS": 100,
+                    "APIFY_PUSH_BACKPRESSURE_LOW_ITEMS": 10,
+                },
+            )
+            calls = []
+            spider.crawler.engine = SimpleNamespace(
+                pause=lambda: calls.append("pause"), unpause=lambda: calls.append("unpause")
+            )
+            client = FakeDatasetClient()
+            # Hold the push worker until the backlog has built up.
+            drain = threading.Event()
+            push_items = client.push_items
+            client.push_items = lambda items: (drain.wait(30), push_items(items))
+            p = ApifyPipeline()
+            p._open_dataset_client = lambda: setattr(p, "_apify_dataset", client)
+            p.open_spider(spider)
+            for i in range(200):
+                p.process_item({"url": f"https://example.com/{i}"}, spider)
+            self.assertEqual(calls, ["pause"])
+            self.assertTrue(p._backpressure.paused)
+            drain.set()
+
+            deadline = time.monotonic() + 30
+            while p._push_backlog() > 10 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            p._backpressure.check(p._push_backlog())
+            self.assertEqual(calls, ["pause", "unpause"])
+            self.assertGreater(spider.crawler.stats.get_value("pipeline/push/backpressure/paused_seconds"), 0)
+            p.close_spider(spider)
+            p._push_worker.join(timeout=30)
+            self.assertEqual(client.items, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
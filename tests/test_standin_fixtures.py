@@ -0,0 +1,92 @@
+"""The crawl benchmark's stand-in pages must parse with the real spiders' callbacks."""
+
+import unittest
+
+from scrapy.http import HtmlResponse, Request, TextResponse, XmlResponse
+
+from benchmarks.standin.fixtures import build_pages, page_key
+from benchmarks.standin.handler import standin_url
+from sven_scraping_projects.spiders.apothekerkammer_hamburg import ApothekerkammerHamburgSpider
+from sven_scraping_projects.spiders.asklepios import AsklepiosSpider
+from sven_scraping_projects.spiders.kvhh import KvhhSpider
+from sven_scraping_projects.spiders.uke import UkeSpider
+from sven_scraping_projects.spiders.zahnaerzte_hh import ZahnaerzteHhSpider
+
+PROFILES = 25
+
+
+def _response(pages, url, cls=HtmlResponse):
+    page = pages[page_key(url)]
+    return cls(url=url, body=page.body, encoding="utf-8", request=Request(url))
+
+
+def _split(output):
+    output = list(output)
+    requests = [o for o in output if isinstance(o, Request)]
+    items = [o for o in output if isinstance(o, dict)]
+    return requests, items
+
+
+class TestStandInFixtures(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pages = build_pages(PROFILES, seed=3)
+
+    def test_uke(self):
+        spider = UkeSpider()
+        start = next(iter(spider.start_requests()))
+        requests, _ = _split(spider.parse(_response(self.pages, start.url, TextResponse)))
+        self.assertEqual(len(requests), PROFILES)
+        items = [i for r in requests for i in spider.parse_profile(_response(self.pages, r.url))]
+        self.assertEqual(len(items), PROFILES)
+        self.assertTrue(all(i["last_name"] and i["telephone"] and i["email"] for i in items))
+
+    def test_apothekerkammer_pagination(self):
+        spider = ApothekerkammerHamburgSpider()
+        url = next(iter(spider.start_requests())).url
+        items = []
+        while url:
+            requests, page_items = _split(spider.parse(_response(self.pages, url)))
+            items.extend(page_items)
+            url = requests[0].url if requests else None
+        self.assertEqual(len(items), PROFILES)
+        self.assertTrue(all(i["name"] and i["address"] and i["phone"] and i["website"] for i in items))
+
+    def test_asklepios_gzip_child_sitemaps(self):
+        spider = AsklepiosSpider()
+        index_url = next(iter(spider.start_requests())).url
+        children, _ = _split(spider.parse_sitemap_index(_response(self.pages, index_url, XmlResponse)))
+        self.assertGreater(len(children), 1)
+        profiles = []
+        for child in children:
+            requests, _ = _split(spider.parse_profile_sitemap(_response(self.pages, child.url, TextResponse)))
+            profiles.extend(requests)
+        items = [i for r in profiles for i in spider.parse_profile(_response(self.pages, r.url))]
+        # The non-profile page has no <h1> and yields nothing; image URLs are never scheduled.
+        self.assertEqual(len(items), PROFILES)
+        self.assertTrue(all(i["name"] and i["specialty"] and i["img_url"] for i in items))
+
+    def test_kvhh(self):
+        spider = KvhhSpider()
+        sitemap_url = next(iter(spider.start_requests())).url
+        requests, _ = _split(spider.parse_sitemap(_response(self.pages, sitemap_url, XmlResponse)))
+        self.assertEqual(len(requests), PROFILES)
+        items = [i for r in requests for i in spider.parse_profile(_response(self.pages, r.url))]
+        self.assertTrue(all(i["first_name"] and i["phone"] for i in items))
+
+    def test_zahnaerzte(self):
+        spider = ZahnaerzteHhSpider()
+        _, items = _split(spider.parse(_response(self.pages, spider.start_url)))
+        self.assertEqual(len(items), PROFILES)
+        self.assertTrue(all(i["last_name"] and i["address"] for i in items))
+
+    def test_standin_url_keeps_host_path_and_query(self):
+        self.assertEqual(
+            standin_url("http://127.0.0.1:9/", "https://www.uke.de/searchadapter/search?q=a&p=1"),
+            "http://127.0.0.1:9/www.uke.de/searchadapter/search?q=a&p=1",
+        )
+        self.assertEqual(page_key("https://www.uke.de/a%20b"), "www.uke.de/a b")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""Startup cost: the lazy spider loader and the BOOT startup timing line."""
+
+import os
+import sys
+import tempfile
+import textwrap
+import unittest
+
+from scrapy.settings import Settings
+
+from sven_scraping_projects.spider_loader import LazySpiderLoader, spider_index
+from sven_scraping_projects.startup_timing import StartupTimer, process_age_s
+
+_SPIDERS = {
+    "__init__.py": "",
+    "plain.py": """
+        from scrapy import Spider
+
+
+        def helper():
+            name = "not-a-spider"
+            return name
+
+
+        class PlainSpider(Spider):
+            name = "plain"
+            custom_settings = {"name": "ignored"}
+
+            def parse(self, response):
+                name = "local"
+                yield {"name": name}
+    """,
+    "annotated.py": """
+        from scrapy import Spider
+
+
+        class AnnotatedSpider(Spider):
+            name: str = 'annotated-spider'  # trailing comment
+    """,
+    "computed.py": """
+        from scrapy import Spider
+
+        PREFIX = "comp"
+
+
+        class ComputedSpider(Spider):
+            name = PREFIX + "uted"
+    """,
+}
+
+
+class TestLazySpiderLoader(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.package = f"lazy_spiders_{id(self)}"
+        root = os.path.join(self._tmp.name, self.package)
+        os.makedirs(root)
+        for filename, source in _SPIDERS.items():
+            with open(os.path.join(root, filename), "w", encoding="utf-8") as fh:
+                fh.write(textwrap.dedent(source))
+        sys.path.insert(0, self._tmp.name)
+        self.settings = Settings({"SPIDER_MODULES": [self.package]})
+
+    def tearDown(self):
+        sys.path.remove(self._tmp.name)
+        for name in [m for m in sys.modules if m.startswith(self.package)]:
+            del sys.modules[name]
+        self._tmp.cleanup()
+
+    def _imported(self):
+        return sorted(m.rsplit(".", 1)[1] for m in sys.modules if m.startswith(self.package + "."))
+
+    def test_index_reads_class_level_names_only(self):
+        index = spider_index([self.package])
+        self.assertEqual(
+            index, {"annotated-spider": f"{self.package}.annotated", "plain": f"{self.package}.plain"}
+        )
+        self.assertEqual(self._imported(), [])
+
+    def test_load_imports_only_the_requested_spider(self):
+        loader = LazySpiderLoader.from_settings(self.settings)
+        self.assertEqual(sorted(loader.list()), ["annotated-spider", "plain"])
+        self.assertEqual(loader.load("plain").__name__, "PlainSpider")
+        self.assertEqual(self._imported(), ["plain"])
+
+    def test_unknown_name_falls_back_to_importing_everything(self):
+        loader = LazySpiderLoader.from_settings(self.settings)
+        loader.load("plain")
+        self.assertEqual(loader.load("computed").__name__, "ComputedSpider")
+        self.assertEqual(self._imported(), ["annotated", "computed", "plain"])
+        self.assertEqual(sorted(loader.list()), ["annotated-spider", "computed", "plain"])
+        with self.assertRaises(KeyError):
+            loader.load("missing")
+
+    def test_project_spiders(self):
+        loader = LazySpiderLoader.from_settings(Settings({"SPIDER_MODULES": ["sven_scraping_projects.spiders"]}))
+        self.assertEqual(
+            sorted(loader.list()), ["apothekerkammer-hamburg", "asklepios", "kvhh", "uke", "zahnaerzte_hh"]
+        )
+        self.assertEqual(loader.load("zahnaerzte_hh").name, "zahnaerzte_hh")
+
+
+class TestStartupTimer(unittest.TestCase):
+    def test_phases_add_up(self):
+        timer = StartupTimer()
+        timer.mark("imports")
+        timer.mark("actor_init")
+        line = timer.format()
+        names = [part.split("=")[0] for part in line.split()]
+        expected = ["imports", "actor_init", "total"]
+        if process_age_s() is not None:
+            expected.insert(0, "python")
+        self.assertEqual(names, expected)
+        self.assertAlmostEqual(timer.total, sum(d for _, d in timer.phases))
+        self.assertIsNotNone(timer.get("imports"))
+        self.assertIsNone(timer.get("first_request"))
+
+    def test_process_age(self):
+        age = process_age_s()
+        if age is None:
+            self.skipTest("no /proc")
+        self.assertGreater(age, 0.0)
+        self.assertLess(age, 24 * 3600)
+
+
+if __name__ == "__main__":
+    unittest.main()
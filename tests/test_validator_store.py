@@ -0,0 +1,156 @@
+"""Conditional GETs: the validator store, ConditionalGetMiddleware and the Actor input mapping."""
+
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from scrapy import Request
+from scrapy.http import HtmlResponse, Response
+from scrapy.settings import Settings
+
+from src.main import _conditional_get_settings
+from sven_scraping_projects.middlewares import ConditionalGetMiddleware
+from sven_scraping_projects.recrawl_state import LocalStateFile
+from sven_scraping_projects.validator_store import (
+    CONDITIONAL_META,
+    DONT_REVALIDATE_META,
+    REVALIDATED_FLAG,
+    ValidatorStore,
+)
+from tests.fakes import FakeStats
+
+DAY = 86400.0
+NOW = 1_750_000_000.0
+URL = "https://www.uke.de/kliniken-institute/kliniken/profil-1.html"
+BODY = "<html><h1>Prof. Dr. Müller</h1></html>".encode("utf-8")
+HEADERS = {"ETag": '"8c00bb-79115"', "Last-Modified": "Tue, 27 Jan 2026 06:05:36 GMT", "Content-Type": "text/html"}
+
+
+def _store(tmp, **kwargs):
+    return ValidatorStore(LocalStateFile(os.path.join(tmp, "uke.bin")), **kwargs)
+
+
+class _Spider:
+    name = "uke"
+
+
+class TestValidatorStore(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_put_needs_a_validator_and_a_small_body(self):
+        store = _store(self.tmp, max_body_bytes=100)
+        self.assertTrue(store.put(URL, HtmlResponse(URL, headers=HEADERS).headers, BODY, NOW))
+        self.assertFalse(store.put(URL, HtmlResponse(URL).headers, BODY, NOW))
+        self.assertIsNone(store.get(URL))
+        self.assertFalse(store.put(URL, HtmlResponse(URL, headers=HEADERS).headers, b"x" * 101, NOW))
+
+    def test_round_trip_and_pruning(self):
+        store = _store(self.tmp, max_age_s=10 * DAY)
+        store.put(URL, HtmlResponse(URL, headers=HEADERS).headers, BODY, NOW)
+        store.put(URL + "?gone", HtmlResponse(URL, headers={"ETag": '"1"'}).headers, b"", NOW - 20 * DAY)
+        store.save(NOW)
+
+        loaded = _store(self.tmp, max_age_s=10 * DAY)
+        self.assertEqual(loaded.load(), 1)
+        entry = loaded.get(URL)
+        self.assertEqual((entry.etag, entry.last_modified, entry.content_type), tuple(HEADERS.values()))
+        self.assertEqual(entry.body(), BODY)
+
+    def test_damaged_state_keeps_what_was_read(self):
+        store = _store(self.tmp)
+        for n in range(3):
+            store.put(f"{URL}?{n}", HtmlResponse(URL, headers=HEADERS).headers, BODY, NOW)
+        data = store.dumps(NOW)
+        with self.assertLogs("sven_scraping_projects.validator_store", level="WARNING"):
+            self.assertEqual(store.loads(data[:-5]), 2)
+        with self.assertLogs("sven_scraping_projects.validator_store", level="WARNING"):
+            self.assertEqual(store.loads(b"\x1f\x8b not ours"), 0)
+        self.assertEqual(_store(os.path.join(self.tmp, "missing")).load(), 0)
+
+
+class TestConditionalGetMiddleware(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        settings = Settings({"CONDITIONAL_GET_ENABLED": True, "CONDITIONAL_GET_STATE_DIR": self._tmp.name})
+        crawler = SimpleNamespace(
+            settings=settings, stats=FakeStats(), signals=SimpleNamespace(connect=lambda *a, **kw: None)
+        )
+        self.mw = ConditionalGetMiddleware.from_crawler(crawler)
+        self.mw.store = self.mw._open_store(_Spider())
+        self.stats = crawler.stats
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _fetch(self, status, body=b"", headers=None, request=None):
+        request = request or Request(URL)
+        self.assertIsNone(self.mw.process_request(request, _Spider()))
+        response = HtmlResponse(URL, status=status, body=body, headers=headers or {}, request=request)
+        return request, self.mw.process_response(request, response, _Spider())
+
+    def test_304_is_answered_from_the_store(self):
+        request, response = self._fetch(200, BODY, HEADERS)
+        self.assertNotIn(b"If-None-Match", request.headers)
+        self.assertEqual(self.stats.get_value("conditional_get/stored"), 1)
+
+        request, response = self._fetch(304, headers={"ETag": '"new"'})
+        self.assertEqual(request.headers[b"If-None-Match"], HEADERS["ETag"].encode())
+        self.assertEqual(request.headers[b"If-Modified-Since"], HEADERS["Last-Modified"].encode())
+        self.assertTrue(request.meta[CONDITIONAL_META])
+        self.assertIsInstance(response, HtmlResponse)
+        self.assertEqual((response.status, response.body), (200, BODY))
+        self.assertIn(REVALIDATED_FLAG, response.flags)
+        self.assertEqual(response.css("h1::text").get(), "Prof. Dr. Müller")
+        self.assertEqual(self.mw.store.get(URL).etag, '"new"')
+        self.assertEqual(self.stats.get_value("conditional_get/bytes_saved"), len(BODY))
+
+    def test_changed_page_replaces_the_entry(self):
+        self._fetch(200, BODY, HEADERS)
+        self._fetch(200, b"<html>v2</html>", {"ETag": '"v2"'})
+        self.assertEqual(self.mw.store.get(URL).body(), b"<html>v2</html>")
+        self.assertEqual(self.stats.get_value("conditional_get/modified"), 1)
+
+    def test_304_without_an_entry_is_requested_again(self):
+        request = Request(URL, headers={"If-None-Match": '"hard-coded"'})
+        _, retry = self._fetch(304, request=request)
+        self.assertIsInstance(retry, Request)
+        self.assertNotIn(b"If-None-Match", retry.headers)
+        self.assertTrue(retry.meta[DONT_REVALIDATE_META] and retry.dont_filter)
+        # A server that still answers 304 gets its 304 through (and the guard drops it).
+        _, response = self._fetch(304, request=retry)
+        self.assertIs(type(response), HtmlResponse)
+        self.assertEqual(response.status, 304)
+
+    def test_post_is_left_alone(self):
+        self._fetch(200, BODY, HEADERS)
+        request = Request(URL, method="POST", body=b"q=1")
+        self.assertIsNone(self.mw.process_request(request, _Spider()))
+        self.assertNotIn(b"If-None-Match", request.headers)
+        response = Response(URL, status=304, request=request)
+        self.assertIs(self.mw.process_response(request, response, _Spider()), response)
+
+
+class TestConditionalGetInput(unittest.TestCase):
+    def test_input_mapping(self):
+        settings = Settings({"CONDITIONAL_GET_ENABLED": False, "CONDITIONAL_GET_STORE": "local"})
+        self.assertFalse(_conditional_get_settings(None, settings))
+        self.assertFalse(_conditional_get_settings({"enabled": False}, settings))
+        self.assertFalse(settings.getbool("CONDITIONAL_GET_ENABLED"))
+
+        self.assertTrue(_conditional_get_settings(True, settings, kv_available=True))
+        self.assertTrue(settings.getbool("CONDITIONAL_GET_ENABLED"))
+        self.assertEqual(settings.get("CONDITIONAL_GET_STORE"), "kv")
+
+        self.assertTrue(_conditional_get_settings({"max_age_days": 7, "store": "local"}, settings, True))
+        self.assertEqual(settings.getfloat("CONDITIONAL_GET_MAX_AGE_DAYS"), 7.0)
+        self.assertEqual(settings.get("CONDITIONAL_GET_STORE"), "local")
+
+
+if __name__ == "__main__":
+    unittest.main()